@@ -6,15 +6,18 @@ Aplicação web para geração automática de contestações jurídicas
 """
 
 import streamlit as st
+import time
 from pathlib import Path
 from datetime import datetime
 import json
 
 from config.settings import Config
-from modules.document_processor import ProcessadorPeticao
 from modules.rag_retriever import RAGRetriever
-from modules.llm_generator import ContextBuilder, LLMGenerator
+from modules.pipeline import ETAPAS, NOMES_ETAPAS
+from modules.jobs import STATUS_CONCLUIDO, STATUS_FALHOU, STATUS_FINAIS, ETAPA_CONCLUIDA, obter_fila_jobs
 from modules.validator import ValidadorContestacao, FormatadorDOCX
+from modules.recursos import obter_gerador, obter_indice_citacoes, registrar_sessao, relatorio_memoria
+from modules.telemetria import obter_exportador
 
 # Configuração da página
 st.set_page_config(
@@ -68,25 +71,35 @@ st.markdown("""
 
 def inicializar_sessao():
     """Inicializa variáveis de sessão"""
-    if 'processador' not in st.session_state:
-        st.session_state.processador = ProcessadorPeticao()
+    if 'sessao_recursos' not in st.session_state:
+        st.session_state.sessao_recursos = registrar_sessao()
     
     if 'retriever' not in st.session_state:
+        # Modelo e collection são do processo; só a primeira sessão os carrega
         with st.spinner("🔄 Carregando sistema RAG..."):
             st.session_state.retriever = RAGRetriever()
     
     if 'generator' not in st.session_state:
-        st.session_state.generator = LLMGenerator()
-    
-    if 'builder' not in st.session_state:
-        st.session_state.builder = ContextBuilder()
+        st.session_state.generator = obter_gerador()
     
     if 'validador' not in st.session_state:
-        st.session_state.validador = ValidadorContestacao()
+        # Índice de citações do nível 3 (reconstruído se a collection mudou)
+        indice_citacoes = None
+        if Config.VERIFICAR_CITACOES:
+            indice_citacoes = obter_indice_citacoes()
+        st.session_state.validador = ValidadorContestacao(indice_citacoes)
     
     if 'formatador' not in st.session_state:
         st.session_state.formatador = FormatadorDOCX()
     
+    if 'jobs' not in st.session_state:
+        # Jobs de geração submetidos por esta sessão (mais recente primeiro)
+        st.session_state.jobs = []
+        st.session_state.job_aberto = None
+        # Último progresso visto pelo polling e quando ele mudou
+        st.session_state.progresso_jobs = None
+        st.session_state.progresso_jobs_em = time.monotonic()
+    
     if 'resultado' not in st.session_state:
         st.session_state.resultado = None
 
@@ -102,6 +115,95 @@ def validar_configuracao():
         st.stop()
 
 
+def painel_jobs():
+    """Progresso por etapa dos jobs da sessão; o concluído mais recente é aberto automaticamente"""
+    if not st.session_state.jobs:
+        return
+    
+    fila = obter_fila_jobs()
+    estados = fila.listar(st.session_state.jobs)
+    
+    st.subheader(f"🗂️ Gerações ({fila.pendentes()} na fila do servidor)")
+    
+    for estado in estados:
+        icone = {STATUS_CONCLUIDO: "✅", STATUS_FALHOU: "❌"}.get(estado['status'], "⏳")
+        concluidas = sum(1 for e in estado['etapas'].values() if e['status'] == ETAPA_CONCLUIDA)
+        
+        with st.container(border=True):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"{icone} **{estado['referencia']}** · {estado['criado_em'][11:]}")
+                st.progress(
+                    concluidas / len(ETAPAS),
+                    text=NOMES_ETAPAS[estado['etapa_atual']] if estado['etapa_atual'] else estado['status']
+                )
+                st.caption(" · ".join(
+                    f"{NOMES_ETAPAS[etapa]} {info['duracao_s']:.1f}s"
+                    for etapa, info in estado['etapas'].items() if 'duracao_s' in info
+                ))
+            with col2:
+                if estado['status'] == STATUS_CONCLUIDO and st.button(
+                    "📄 Abrir", key=f"abrir_{estado['id']}", use_container_width=True
+                ):
+                    st.session_state.resultado = fila.resultado(estado['id'])
+                    st.session_state.job_aberto = estado['id']
+                    st.rerun()
+            
+            parcial = fila.parcial(estado['id'])
+            if parcial:
+                with st.container(height=300):
+                    st.markdown(parcial)
+            
+            if estado['status'] == STATUS_FALHOU:
+                erro = estado['erro']
+                st.error(f"❌ Erro na geração: {erro['mensagem']}")
+                if erro.get('interrupcoes'):
+                    evitados = sum(i['tokens_economizados_estimados'] for i in erro['interrupcoes'])
+                    st.caption(
+                        f"🛑 ~{evitados:,} tokens de output evitados · "
+                        f"custo das tentativas: ${erro['custo']:.4f}"
+                    )
+                if erro.get('traceback'):
+                    with st.expander("Detalhes"):
+                        st.code(erro['traceback'])
+    
+    # Abrir automaticamente a geração mais recente ao concluir
+    recente = estados[0] if estados else None
+    if recente and recente['status'] == STATUS_CONCLUIDO and st.session_state.job_aberto != recente['id']:
+        st.session_state.resultado = fila.resultado(recente['id'])
+        st.session_state.job_aberto = recente['id']
+        st.success("✅ Contestação gerada com sucesso!")
+
+
+def acompanhar_jobs():
+    """
+    Reexecuta o script enquanto houver job da sessão em andamento (polling)
+    
+    O polling para se nenhum job mudar (estado ou texto parcial) por
+    Config.JOBS_POLLING_MAX_SEM_MUDANCA_S; a atualização fica manual.
+    """
+    fila = obter_fila_jobs()
+    andamento = [e for e in fila.listar(st.session_state.jobs) if e['status'] not in STATUS_FINAIS]
+    if not andamento:
+        return
+    
+    progresso = tuple((e['id'], e['versao'], len(fila.parcial(e['id']))) for e in andamento)
+    if progresso != st.session_state.progresso_jobs:
+        st.session_state.progresso_jobs = progresso
+        st.session_state.progresso_jobs_em = time.monotonic()
+    
+    parado_s = time.monotonic() - st.session_state.progresso_jobs_em
+    if parado_s > Config.JOBS_POLLING_MAX_SEM_MUDANCA_S:
+        st.warning(f"⏸️ Sem progresso nas gerações há {parado_s / 60:.0f} min; atualização automática pausada.")
+        if st.button("🔄 Atualizar gerações"):
+            st.session_state.progresso_jobs_em = time.monotonic()
+            st.rerun()
+        return
+    
+    time.sleep(Config.JOBS_INTERVALO_POLLING_S)
+    st.rerun()
+
+
 def interface_principal():
     """Interface principal da aplicação"""
     
@@ -130,14 +232,8 @@ def interface_principal():
         )
         
         if arquivo:
-            # Salvar temporariamente
-            temp_path = Path("./temp") / arquivo.name
-            
-            # Criar diretório temp se não existir
-            temp_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(temp_path, 'wb') as f:
-                f.write(arquivo.getvalue())
+            # Conteúdo mantido em memória (sem gravar em ./temp)
+            extensao = Path(arquivo.name).suffix
             
             st.success(f"✅ Arquivo carregado: {arquivo.name}")
             
@@ -181,65 +277,61 @@ def interface_principal():
                 mostrar_analise = st.checkbox("Mostrar análise detalhada da petição", value=True)
                 mostrar_rag = st.checkbox("Mostrar chunks RAG recuperados", value=False)
                 mostrar_metricas = st.checkbox("Mostrar métricas de qualidade", value=True)
+                gerar_streaming = st.checkbox("Exibir contestação em tempo real (streaming)", value=True)
+                validar_streaming = st.checkbox(
+                    "Validar durante o streaming (interromper gerações com falhas estruturais)",
+                    value=Config.VALIDACAO_STREAM_ATIVA,
+                    help="Seção obrigatória ausente, falta de citações legais ou seção descontrolada "
+                         "interrompem a geração antes de consumir todo o max_tokens"
+                )
+                usar_roteamento = st.checkbox(
+                    "Escolher modelo automaticamente (roteamento)",
+                    value=Config.ROTEAMENTO_ATIVO,
+                    help=f"Casos rotineiros usam {Config.MODELO_RAPIDO} (sem streaming); rascunhos com score "
+                         f"abaixo de {Config.ROTEAMENTO_SCORE_MINIMO} e os demais casos usam {Config.CLAUDE_MODEL} "
+                         f"no modo escolhido acima"
+                )
+                gerar_paralelo = st.checkbox(
+                    "Redigir partes em paralelo (menor latência)",
+                    value=False,
+                    help="Identificação, fatos, direito e pedidos são redigidos simultaneamente e unidos "
+                         "com numeração refeita (sem streaming)"
+                )
+                usar_cache = st.checkbox(
+                    "Reutilizar resultado idêntico (cache de geração)",
+                    value=Config.CACHE_GERACAO_ATIVO,
+                    help="Mesma petição, contexto e parâmetros retornam a contestação já gerada, sem nova cobrança"
+                )
             
             st.divider()
             
-            # Botão de geração
+            # Botão de geração: o pipeline roda em segundo plano (fila de jobs)
             if st.button("🚀 GERAR CONTESTAÇÃO", type="primary", use_container_width=True):
+                if gerar_paralelo:
+                    modo = 'paralelo'
+                elif gerar_streaming:
+                    modo = 'streaming'
+                else:
+                    modo = 'agendador'
                 
-                with st.spinner("🔄 Processando..."):
-                    try:
-                        # 1. Processar petição
-                        st.info("📄 Processando petição inicial...")
-                        dados_peticao = st.session_state.processador.processar_arquivo(temp_path)
-                        
-                        # 2. Retrieval RAG
-                        st.info("🔍 Executando retrieval RAG...")
-                        texto_query = st.session_state.processador.get_texto_para_embedding()
-                        resultado_rag = st.session_state.retriever.retrieval_hierarquico(texto_query)
-                        
-                        # 3. Construir contexto
-                        st.info("📚 Construindo contexto...")
-                        contexto = st.session_state.builder.construir_contexto(
-                            dados_peticao,
-                            resultado_rag
-                        )
-                        
-                        # 4. Gerar contestação
-                        st.info("🤖 Gerando contestação com Claude...")
-                        resultado = st.session_state.generator.gerar_contestacao(
-                            dados_peticao,
-                            contexto,
-                            temperatura=temperatura,
-                            top_k=top_k,
-                            max_tokens=max_tokens
-                        )
-                        
-                        if resultado['sucesso']:
-                            # 5. Validar
-                            validacao = st.session_state.validador.validar(resultado['contestacao'])
-                            
-                            # 6. Salvar resultado na sessão
-                            st.session_state.resultado = {
-                                'contestacao': resultado['contestacao'],
-                                'metadados': resultado['metadados'],
-                                'validacao': validacao,
-                                'dados_peticao': dados_peticao,
-                                'contexto_rag': contexto,
-                                'resultado_rag_completo': resultado_rag,
-                                'custo': resultado['custo_estimado']
-                            }
-                            
-                            st.success("✅ Contestação gerada com sucesso!")
-                            st.rerun()
-                        
-                        else:
-                            st.error(f"❌ Erro na geração: {resultado.get('erro', 'Erro desconhecido')}")
-                    
-                    except Exception as e:
-                        st.error(f"❌ Erro: {str(e)}")
-                        import traceback
-                        st.code(traceback.format_exc())
+                id_job = obter_fila_jobs().submeter(
+                    arquivo.getvalue(),
+                    extensao,
+                    arquivo.name,
+                    opcoes={
+                        'temperatura': temperatura,
+                        'top_k': top_k,
+                        'max_tokens': max_tokens,
+                        'modo': modo,
+                        'roteamento': usar_roteamento,
+                        'usar_cache': usar_cache,
+                        'validacao_incremental': validar_streaming
+                    }
+                )
+                st.session_state.jobs.insert(0, id_job)
+                st.rerun()
+            
+            painel_jobs()
             
             # Mostrar resultado se existir
             if st.session_state.resultado:
@@ -276,6 +368,67 @@ def interface_principal():
                         f"${res['custo']:.4f}"
                     )
                 
+                # Resultado reaproveitado do cache de geração
+                if res.get('do_cache'):
+                    st.info(
+                        "♻️ Resultado do cache de geração: mesma petição, contexto e parâmetros "
+                        "de uma geração anterior (sem nova chamada à API; custo e tokens são os originais)"
+                    )
+                
+                # Prompt caching
+                met_cache = res['metadados']
+                if met_cache.get('cache_read_input_tokens') or met_cache.get('cache_creation_input_tokens'):
+                    st.caption(
+                        f"🗄️ Cache de prompt: {met_cache['cache_read_input_tokens']:,} tokens lidos · "
+                        f"{met_cache['cache_creation_input_tokens']:,} tokens gravados"
+                    )
+                
+                # Decisão do roteador de modelos
+                if res.get('roteamento'):
+                    rota = res['roteamento']
+                    st.caption(
+                        f"🧭 Modelo: {rota['modelo_final']}"
+                        + (f" (rascunho de {rota['modelo_inicial']} com score {rota['score_inicial']} escalado)"
+                           if rota['escalado'] else f" - {'; '.join(rota['motivos'])}")
+                        + f" · economia estimada ${rota['economia_usd']:.4f}"
+                    )
+                
+                # Continuação automática após max_tokens
+                if res['metadados'].get('continuacoes'):
+                    st.caption(
+                        f"↪️ Limite de tokens atingido: geração continuada "
+                        f"{res['metadados']['continuacoes']}x a partir do texto parcial"
+                    )
+                if res['metadados'].get('stop_reason') == 'max_tokens':
+                    st.warning(
+                        "⚠️ A contestação atingiu o limite de tokens mesmo após as continuações "
+                        f"(Config.MAX_CONTINUACOES = {Config.MAX_CONTINUACOES}) e pode estar incompleta"
+                    )
+                
+                for interrupcao in res['metadados'].get('interrupcoes', []):
+                    st.caption(
+                        f"↩️ Geração reiniciada pela validação incremental: {interrupcao['mensagem']} "
+                        f"(~{interrupcao['tokens_economizados_estimados']:,} tokens de output evitados)"
+                    )
+                
+                # Latência da geração em streaming
+                if 'ttft_s' in res['metadados']:
+                    met_geracao = res['metadados']
+                    st.caption(
+                        f"⚡ Primeiro token em {met_geracao['ttft_s']:.1f}s · "
+                        f"{met_geracao['tokens_por_segundo']:.0f} tokens/s · "
+                        f"{met_geracao['duracao_s']:.1f}s no total"
+                    )
+                
+                # Latência da geração em partes paralelas
+                if 'duracao_sequencial_estimada_s' in res['metadados']:
+                    met_geracao = res['metadados']
+                    st.caption(
+                        f"⚡ {len(met_geracao['partes'])} partes em paralelo: {met_geracao['duracao_s']:.1f}s · "
+                        f"chamada única estimada em {met_geracao['duracao_sequencial_estimada_s']:.1f}s "
+                        f"({met_geracao['aceleracao']}x mais rápido)"
+                    )
+                
                 # Métricas de qualidade
                 if mostrar_metricas:
                     st.subheader("📊 Métricas de Qualidade")
@@ -292,7 +445,13 @@ def interface_principal():
                         st.metric("Classificação", met['classificacao'])
                     
                     with col3:
-                        st.metric("Citações Legais", met['citacoes_legais'])
+                        st.metric(
+                            "Citações Legais",
+                            met['citacoes_legais'],
+                            help=(f"{met['citacoes_verificadas']} verificadas no material de referência, "
+                                  f"{met['citacoes_nao_verificadas']} não encontradas")
+                            if 'citacoes_verificadas' in met else None
+                        )
                     
                     with col4:
                         st.metric("Completude", f"{met['completude_estrutural']:.0%}")
@@ -312,30 +471,51 @@ def interface_principal():
                     label_visibility="collapsed"
                 )
                 
+                # Ajustes: reescreve só as seções afetadas
+                with st.expander("✏️ Ajustar Contestação"):
+                    ajustes = st.text_area(
+                        "Ajustes desejados",
+                        placeholder="Ex: reforçar a jurisprudência do STJ sobre o rol da ANS e retirar o pedido subsidiário",
+                        help="Apenas as seções mencionadas (preliminares, fatos, direito, pedidos...) são reescritas"
+                    )
+                    
+                    if st.button("✏️ Aplicar Ajustes", disabled=not ajustes.strip()):
+                        with st.spinner("Reescrevendo seções afetadas..."):
+                            novo = st.session_state.generator.regenerar_com_ajustes(
+                                res,
+                                ajustes,
+                                res['dados_peticao'],
+                                res['contexto_rag']
+                            )
+                        
+                        if novo['sucesso']:
+                            res['contestacao'] = novo['contestacao']
+                            res['metadados'] = novo['metadados']
+                            res['validacao'] = st.session_state.validador.validar(novo['contestacao'])
+                            res['custo'] += novo['custo_estimado']
+                            res['do_cache'] = False
+                            st.rerun()
+                        else:
+                            st.error(f"❌ Erro nos ajustes: {novo.get('erro', 'Erro desconhecido')}")
+                    
+                    if 'secoes_regeneradas' in res['metadados']:
+                        st.caption(
+                            f"Última rodada de ajustes reescreveu: {', '.join(res['metadados']['secoes_regeneradas'])}"
+                            f" · preservou: {', '.join(res['metadados']['secoes_preservadas']) or 'nenhuma'}"
+                        )
+                
                 # Botões de ação
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    if st.button("📥 Download DOCX", use_container_width=True):
-                        # Gerar DOCX
-                        output_path = Config.OUTPUT_DIR / f"contestacao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-                        Config.OUTPUT_DIR.mkdir(exist_ok=True)
-                        
-                        st.session_state.formatador.criar_docx(
-                            res['contestacao'],
-                            res['metadados'],
-                            output_path
-                        )
-                        
-                        # Download
-                        with open(output_path, 'rb') as f:
-                            st.download_button(
-                                "⬇️ Baixar DOCX",
-                                data=f.read(),
-                                file_name=output_path.name,
-                                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                                use_container_width=True
-                            )
+                    # DOCX montado em memória e guardado em cache pelo hash da contestação
+                    st.download_button(
+                        "📥 Download DOCX",
+                        data=st.session_state.formatador.criar_docx_bytes(res['contestacao'], res['metadados']),
+                        file_name=f"contestacao_{FormatadorDOCX.chave_docx(res['contestacao'], res['metadados'])[:12]}.docx",
+                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                        use_container_width=True
+                    )
                 
                 with col2:
                     if st.button("📋 Copiar Texto", use_container_width=True):
@@ -401,6 +581,33 @@ def interface_principal():
             
             st.metric("Total de Chunks Recuperados", rag['total_chunks'])
             
+            # Alocação do orçamento de tokens do contexto (ContextBuilder)
+            alocacao = st.session_state.resultado['contexto_rag'].get('alocacao_tokens')
+            if alocacao:
+                st.subheader("📦 Orçamento de Tokens do Contexto")
+                st.progress(
+                    min(alocacao['total'] / alocacao['orcamento'], 1.0),
+                    text=f"{alocacao['total']:,} / {alocacao['orcamento']:,} tokens"
+                )
+                st.dataframe(
+                    [
+                        {
+                            'Seção': nivel,
+                            'Chunks no prompt': uso['chunks'],
+                            'Candidatos': uso['candidatos'],
+                            'Tokens': uso['tokens'],
+                            'Truncados': uso['truncados']
+                        }
+                        for nivel, uso in alocacao['por_nivel'].items()
+                    ],
+                    hide_index=True
+                )
+                fator = alocacao.get('fator_correcao')
+                if not alocacao['contagem_exata']:
+                    st.caption(f"⚠️ tiktoken indisponível: tokens estimados (~4 caracteres/token × {fator})")
+                elif fator:
+                    st.caption(f"Contagem cl100k_base × {fator} (calibrada pelo count_tokens da API)")
+            
             # Nível 1
             with st.expander(f"📚 Nível 1 - Contexto Global ({len(rag['nivel_1'])} chunks)"):
                 for i, chunk in enumerate(rag['nivel_1'][:5], 1):
@@ -450,11 +657,74 @@ def interface_principal():
             info_tipo = Config.get_tipo_caso_info(tipo)
             st.write(f"**{info_tipo['nome']}:** {count} chunks")
         
+        # Índice de citações do nível 3
+        indice_citacoes = st.session_state.validador.indice_citacoes
+        if indice_citacoes is not None:
+            st.subheader("🔖 Índice de Citações (Nível 3)")
+            resumo = indice_citacoes.resumo()
+            colunas = st.columns(len(resumo))
+            for coluna, (tipo, total) in zip(colunas, resumo.items()):
+                with coluna:
+                    st.metric(tipo.capitalize(), total)
+            st.caption(f"{indice_citacoes.chunks_nivel_3:,} chunks indexados · {Config.INDICE_CITACOES_PATH}")
+        
+        # Memória dos recursos compartilhados entre sessões
+        st.subheader("🧠 Memória do Processo")
+        memoria = relatorio_memoria()
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("RSS do Processo", f"{memoria['rss_mb']:,.0f} MB")
+        with col2:
+            st.metric("Sessões Ativas", memoria['sessoes_ativas'])
+        with col3:
+            st.metric(
+                "Economia Estimada",
+                f"{memoria['economia_mb']:,.0f} MB",
+                help="Memória que as demais sessões ocupariam carregando cópias próprias dos recursos"
+            )
+        if memoria['recursos']:
+            st.dataframe(memoria['recursos'], hide_index=True)
+        
+        # Tempo por etapa (spans desde o início do processo)
+        st.subheader("⏱️ Latência por Etapa")
+        spans = obter_exportador().resumo()
+        if spans:
+            st.dataframe(spans, hide_index=True)
+            st.caption(f"Spans completos em {Config.TELEMETRIA_SPANS} · Prometheus: {Config.TELEMETRIA_PROMETHEUS}")
+        else:
+            st.info("Nenhuma etapa medida ainda neste processo")
+        
+        # Gastos (livro de custos persistente em output_rag/metrics)
+        st.subheader("💰 Gastos com a API")
+        livro = st.session_state.generator.livro_custos
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Hoje", f"${livro.total(desde=datetime.now().date().isoformat()):.4f}")
+        with col2:
+            st.metric("Total Registrado", f"${livro.total():.2f}")
+        
+        dimensao = st.radio(
+            "Agrupar por",
+            options=['dia', 'tipo_caso', 'model', 'operacao'],
+            format_func=lambda d: {
+                'dia': 'Dia', 'tipo_caso': 'Tipo de caso', 'model': 'Modelo', 'operacao': 'Operação'
+            }[d],
+            horizontal=True
+        )
+        linhas = livro.agregar(por=dimensao)
+        if linhas:
+            st.dataframe(linhas, hide_index=True)
+        else:
+            st.info("Nenhuma requisição registrada ainda")
+        
         # Informações do modelo
         st.subheader("🤖 Configuração")
         st.json({
             "Embedding Model": Config.EMBEDDING_MODEL,
             "Claude Model": Config.CLAUDE_MODEL,
+            "Modelo Rápido (roteamento)": Config.MODELO_RAPIDO,
             "Collection": Config.COLLECTION_NAME,
             "Vector Store": str(Config.VECTOR_STORE_DIR)
         })
@@ -501,6 +771,9 @@ def main():
         st.markdown("---")
         
         st.markdown(f"**Versão:** 1.0.0  \n**Data:** {datetime.now().strftime('%d/%m/%Y')}")
+    
+    # Atualizar o progresso das gerações em segundo plano
+    acompanhar_jobs()
 
 
 if __name__ == "__main__":
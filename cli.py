@@ -0,0 +1,454 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+CLI - GERAÇÃO DE CONTESTAÇÕES SEM INTERFACE
+═══════════════════════════════════════════════════════════════════════════
+Executa o pipeline completo para um arquivo ou um diretório de petições:
+
+    processamento → retrieval → contexto → geração → validação → docx
+
+Cada etapa tem seu próprio pool de workers (padrão: Config.CLI_WORKERS),
+de modo que petições diferentes avançam em etapas diferentes ao mesmo
+tempo. O resultado de cada petição (métricas, custo, tempos por etapa,
+DOCX ou erro) é acrescentado ao JSONL de saída assim que ela termina;
+reexecutar com a mesma saída retoma o lote, pulando as petições já
+concluídas com sucesso (mesmo conteúdo).
+
+Uso:
+    python cli.py peticoes/ --saida resultados.jsonl --workers geracao=4 --workers retrieval=2
+    python cli.py peticao.pdf --modo streaming --sem-docx
+
+Com --lote, a geração de todas as petições vai em um único lote da Message
+Batches API (metade do preço, processamento em até 24h; ver modules.lotes):
+as etapas anteriores rodam normalmente, o lote é submetido quando todas as
+petições chegam à geração e a CLI aguarda o fim do processamento para
+validar e exportar cada contestação.
+
+    python cli.py peticoes/ --lote --saida noturno.jsonl
+
+Código de saída: 0 se todas as petições foram geradas, 1 se alguma falhou,
+2 em erro de uso ou de configuração.
+"""
+
+import argparse
+import hashlib
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from config.settings import Config
+from modules.lotes import STATUS_CONCLUIDO as STATUS_LOTE_CONCLUIDO, GeradorLote
+from modules.pipeline import MODOS_GERACAO, OPCOES_PADRAO, ErroPipeline, PipelineContestacao
+from modules.telemetria import Span, dentro_de, encerrar_rastro
+from modules.validator import FormatadorDOCX
+
+# Etapas executadas pela CLI (as do pipeline + exportação DOCX)
+ETAPAS_CLI = ('processamento', 'retrieval', 'contexto', 'geracao', 'validacao', 'docx')
+
+
+def listar_peticoes(entrada: Path) -> List[Path]:
+    """Arquivo único ou petições (Config.ALLOWED_FILE_TYPES) do diretório, recursivamente"""
+    if entrada.is_file():
+        return [entrada]
+    
+    extensoes = {f".{tipo}" for tipo in Config.ALLOWED_FILE_TYPES}
+    return sorted(
+        caminho for caminho in entrada.rglob('*')
+        if caminho.is_file() and caminho.suffix.lower() in extensoes
+    )
+
+
+def sha256_arquivo(caminho: Path, bloco: int = 1 << 20) -> str:
+    """SHA-256 do arquivo lido em blocos (sem carregar o conteúdo inteiro)"""
+    digest = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        while True:
+            dados = f.read(bloco)
+            if not dados:
+                break
+            digest.update(dados)
+    return digest.hexdigest()
+
+
+def carregar_concluidas(saida: Path) -> Set[tuple]:
+    """(arquivo, sha256) das petições já geradas com sucesso no JSONL de saída"""
+    concluidas = set()
+    if not saida.exists():
+        return concluidas
+    
+    with open(saida, encoding='utf-8') as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                # Linha truncada por interrupção durante a escrita
+                continue
+            if registro.get('sucesso'):
+                concluidas.add((registro['arquivo'], registro['sha256']))
+    return concluidas
+
+
+def parse_workers(valores: List[str]) -> Dict[str, int]:
+    """Workers por etapa: Config.CLI_WORKERS sobrescrito por itens 'etapa=N'"""
+    workers = dict(Config.CLI_WORKERS)
+    for valor in valores:
+        etapa, _, quantidade = valor.partition('=')
+        if etapa not in ETAPAS_CLI or not quantidade.isdigit() or int(quantidade) < 1:
+            raise argparse.ArgumentTypeError(
+                f"--workers inválido: {valor!r} (use etapa=N, etapas: {', '.join(ETAPAS_CLI)})"
+            )
+        workers[etapa] = int(quantidade)
+    return workers
+
+
+class ExecutorEtapas:
+    """Petições atravessando as etapas, cada uma com seu pool de workers"""
+    
+    def __init__(
+        self,
+        pipeline: PipelineContestacao,
+        workers: Dict[str, int],
+        opcoes: Dict,
+        formatador: Optional[FormatadorDOCX] = None,
+        dir_docx: Optional[Path] = None,
+        lote: Optional[GeradorLote] = None
+    ):
+        """
+        Args:
+            pipeline: PipelineContestacao
+            workers: Workers por etapa (ETAPAS_CLI)
+            opcoes: Parâmetros de geração (ver modules.pipeline.OPCOES_PADRAO)
+            formatador: FormatadorDOCX (None: etapa docx não gera arquivo)
+            dir_docx: Diretório dos DOCX gerados
+            lote: Gerar todas as petições em um único lote (Message Batches
+                API); None: geração síncrona por petição
+        """
+        self.pipeline = pipeline
+        self.opcoes = opcoes
+        self.formatador = formatador
+        self.dir_docx = dir_docx
+        self.lote = lote
+        self.pools = {
+            etapa: ThreadPoolExecutor(max_workers=workers[etapa], thread_name_prefix=f"cli-{etapa}")
+            for etapa in ETAPAS_CLI
+        }
+        self._concluidos = queue.Queue()
+        
+        # Modo lote: petições que chegaram à geração e quantas faltam chegar
+        self._lock_lote = threading.Lock()
+        self._fila_lote: List[Dict] = []
+        self._faltam_lote = 0
+        self._encerrando = threading.Event()
+    
+    def executar(self, itens: List[Dict]) -> Iterator[Dict]:
+        """
+        Submete as petições e devolve cada uma assim que termina (ou falha)
+        
+        Args:
+            itens: Dicts com 'arquivo' (relativo), 'caminho' e 'sha256' (o
+                conteúdo só é lido na etapa de processamento)
+        """
+        self._faltam_lote = len(itens)
+        for item in itens:
+            item['duracoes_s'] = {}
+            item['inicio'] = time.perf_counter()
+            # Rastro da petição: agrupa os spans das etapas (threads diferentes)
+            item['span'] = Span('cli.peticao', {'arquivo': item['arquivo']})
+            self._submeter(item, 0)
+        
+        for _ in range(len(itens)):
+            yield self._concluidos.get()
+    
+    def encerrar(self, cancelar: bool = False):
+        """Encerra os pools (cancelar: descarta o que ainda não começou e para de aguardar o lote)"""
+        if cancelar:
+            self._encerrando.set()
+        for pool in self.pools.values():
+            pool.shutdown(wait=not cancelar, cancel_futures=cancelar)
+    
+    def _submeter(self, item: Dict, indice: int):
+        etapa = ETAPAS_CLI[indice]
+        self.pools[etapa].submit(self._rodar, item, indice)
+    
+    def _rodar(self, item: Dict, indice: int):
+        """Executa uma etapa e encaminha a petição à próxima"""
+        etapa = ETAPAS_CLI[indice]
+        inicio = time.perf_counter()
+        try:
+            with dentro_de(item['span']):
+                getattr(self, f"_etapa_{etapa}")(item)
+        except Exception as e:
+            item['etapa_falha'] = etapa
+            item['erro'] = str(e) or type(e).__name__
+            self._concluir(item, type(e).__name__)
+            if self.lote is not None and indice < ETAPAS_CLI.index('geracao'):
+                self._chegar_lote(None)
+            return
+        item['duracoes_s'][etapa] = round(time.perf_counter() - inicio, 3)
+        
+        if indice + 1 < len(ETAPAS_CLI):
+            if self.lote is not None and ETAPAS_CLI[indice + 1] == 'geracao':
+                self._chegar_lote(item)
+            else:
+                self._submeter(item, indice + 1)
+        else:
+            self._concluir(item)
+    
+    def _chegar_lote(self, item: Optional[Dict]):
+        """Petição pronta para a geração (None: falhou antes); a última dispara o lote"""
+        with self._lock_lote:
+            if item is not None:
+                self._fila_lote.append(item)
+            self._faltam_lote -= 1
+            disparar = self._faltam_lote == 0 and self._fila_lote
+        
+        if disparar:
+            self.pools['geracao'].submit(self._gerar_lote, list(self._fila_lote))
+    
+    def _gerar_lote(self, itens: List[Dict]):
+        """Submete as petições como um lote, aguarda o fim e encaminha cada uma à validação"""
+        inicio = time.perf_counter()
+        try:
+            estado = self.lote.submeter(
+                [
+                    {
+                        'referencia': item['arquivo'],
+                        'dados_peticao': item['peticao']['dados_peticao'],
+                        'contexto_rag': item['contexto']
+                    }
+                    for item in itens
+                ],
+                temperatura=self.opcoes['temperatura'],
+                top_k=self.opcoes['top_k'],
+                max_tokens=self.opcoes['max_tokens']
+            )
+            id_local = estado['id_local']
+            print(f"⏳ Aguardando o lote {id_local} (consulta a cada {Config.BATCH_INTERVALO_POLLING_S}s)")
+            while self.lote.atualizar(id_local)['status'] != STATUS_LOTE_CONCLUIDO:
+                if self._encerrando.wait(Config.BATCH_INTERVALO_POLLING_S):
+                    # O lote segue processando na API; estado salvo em Config.BATCH_DIR
+                    raise RuntimeError(f"acompanhamento interrompido (lote {id_local} segue na API)")
+            resultados = self.lote.resultados(id_local)
+        except Exception as e:
+            resultados = {item['arquivo']: {'sucesso': False, 'erro': f"Lote: {e}"} for item in itens}
+        duracao = round(time.perf_counter() - inicio, 3)
+        
+        for item in itens:
+            item['duracoes_s']['geracao'] = duracao
+            resultado = resultados.get(item['arquivo']) or {'sucesso': False, 'erro': "Sem resultado no lote"}
+            item['resultado'] = resultado
+            if resultado['sucesso']:
+                self._submeter(item, ETAPAS_CLI.index('geracao') + 1)
+            else:
+                item['etapa_falha'] = 'geracao'
+                item['erro'] = resultado['erro']
+                self._concluir(item, 'ErroLote')
+    
+    def _concluir(self, item: Dict, erro: Optional[str] = None):
+        """Registra o span raiz da petição e a entrega ao consumidor"""
+        item['span'].atributos['etapa_falha'] = item.get('etapa_falha')
+        encerrar_rastro(item['span'], time.perf_counter() - item['inicio'], erro)
+        self._concluidos.put(item)
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # ETAPAS
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    def _etapa_processamento(self, item: Dict):
+        item['peticao'] = self.pipeline.processar(item['caminho'].read_bytes(), item['caminho'].suffix)
+    
+    def _etapa_retrieval(self, item: Dict):
+        item['resultado_rag'] = self.pipeline.recuperar(item['peticao']['texto_query'])
+    
+    def _etapa_contexto(self, item: Dict):
+        item['contexto'] = self.pipeline.construir_contexto(item['peticao']['dados_peticao'], item['resultado_rag'])
+    
+    def _etapa_geracao(self, item: Dict):
+        resultado = self.pipeline.gerar(item['peticao']['dados_peticao'], item['contexto'], self.opcoes)
+        item['resultado'] = resultado
+        if not resultado['sucesso']:
+            raise ErroPipeline('geracao', resultado.get('erro', 'Erro desconhecido'), resultado)
+    
+    def _etapa_validacao(self, item: Dict):
+        item['validacao'] = self.pipeline.validar(item['resultado'])
+    
+    def _etapa_docx(self, item: Dict):
+        if self.formatador is None:
+            return
+        # Caminho relativo com a extensão (peticao.pdf e peticao.docx não colidem)
+        nome = "__".join(Path(item['arquivo']).parts).replace('.', '_')
+        caminho = self.dir_docx / f"contestacao_{nome}.docx"
+        self.formatador.criar_docx(item['resultado']['contestacao'], item['resultado']['metadados'], caminho)
+        item['docx'] = str(caminho)
+
+
+def montar_registro(item: Dict) -> Dict:
+    """Linha do JSONL de saída para uma petição concluída ou com falha"""
+    registro = {
+        'arquivo': item['arquivo'],
+        'sha256': item['sha256'],
+        'sucesso': 'erro' not in item,
+        'concluido_em': datetime.now().isoformat(timespec='seconds'),
+        'duracao_total_s': round(time.perf_counter() - item['inicio'], 3),
+        'duracoes_s': item['duracoes_s']
+    }
+    
+    if 'erro' in item:
+        registro['etapa_falha'] = item['etapa_falha']
+        registro['erro'] = item['erro']
+    
+    dados_peticao = item.get('peticao', {}).get('dados_peticao', {})
+    if 'tipo_caso' in dados_peticao:
+        registro['tipo_caso'] = dados_peticao['tipo_caso']
+        registro['confianca'] = dados_peticao.get('confianca')
+    
+    resultado = item.get('resultado')
+    if resultado:
+        metadados = resultado.get('metadados', {})
+        registro['modelo'] = metadados.get('model')
+        registro['input_tokens'] = metadados.get('input_tokens')
+        registro['output_tokens'] = metadados.get('output_tokens')
+        registro['do_cache'] = resultado.get('do_cache', False)
+        # Resultado do cache não gera requisição: custo_estimado é o da geração original
+        registro['custo'] = 0.0 if registro['do_cache'] else resultado.get('custo_estimado')
+    
+    validacao = item.get('validacao')
+    if validacao:
+        registro['score'] = validacao['metricas']['score_qualidade']
+        registro['classificacao'] = validacao['metricas']['classificacao']
+        registro['metricas'] = validacao['metricas']
+        registro['alertas'] = validacao['alertas']
+        if 'citacoes_nao_verificadas' in validacao:
+            registro['citacoes_nao_verificadas'] = validacao['citacoes_nao_verificadas']
+    
+    if 'docx' in item:
+        registro['docx'] = item['docx']
+    if resultado and resultado.get('sucesso'):
+        registro['contestacao'] = resultado['contestacao']
+    
+    return registro
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Geração de contestações em lote, sem interface")
+    parser.add_argument('entrada', type=Path, help="Arquivo de petição ou diretório (busca recursiva)")
+    parser.add_argument('--saida', type=Path, default=Config.OUTPUT_DIR / "contestacoes.jsonl",
+                        help="JSONL de resultados (acrescentado; usado para retomar)")
+    parser.add_argument('--dir-docx', type=Path, default=Config.OUTPUT_DIR, help="Diretório dos DOCX")
+    parser.add_argument('--sem-docx', action='store_true', help="Não exportar DOCX")
+    parser.add_argument('--refazer', action='store_true', help="Gerar de novo petições já concluídas")
+    parser.add_argument('--workers', action='append', default=[], metavar='ETAPA=N',
+                        help=f"Workers de uma etapa ({', '.join(ETAPAS_CLI)}); repetível")
+    parser.add_argument('--modo', choices=MODOS_GERACAO, default=OPCOES_PADRAO['modo'])
+    parser.add_argument('--sem-roteamento', dest='roteamento', action='store_false',
+                        default=OPCOES_PADRAO['roteamento'],
+                        help="Não usar o modelo rápido nos casos rotineiros")
+    parser.add_argument('--temperatura', type=float, default=Config.DEFAULT_TEMPERATURE)
+    parser.add_argument('--top-k', type=int, default=Config.DEFAULT_TOP_K)
+    parser.add_argument('--max-tokens', type=int, default=Config.DEFAULT_MAX_TOKENS)
+    parser.add_argument('--usar-cache', action='store_true', default=Config.CACHE_GERACAO_ATIVO,
+                        help="Reutilizar resultados idênticos do cache de geração")
+    parser.add_argument('--lote', action='store_true',
+                        help="Gerar todas as petições em um lote da Message Batches API (metade do "
+                             "preço; aguarda o processamento, ignora --modo, --sem-roteamento e --usar-cache)")
+    args = parser.parse_args()
+    
+    try:
+        workers = parse_workers(args.workers)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    
+    if not args.entrada.exists():
+        print(f"❌ Entrada não encontrada: {args.entrada}")
+        return 2
+    
+    erros = Config.validar_configuracao()
+    if erros:
+        print("❌ Erros de configuração:")
+        for erro in erros:
+            print(f"   • {erro}")
+        return 2
+    
+    # Petições a gerar (pulando as já concluídas com o mesmo conteúdo)
+    raiz = args.entrada if args.entrada.is_dir() else args.entrada.parent
+    concluidas = set() if args.refazer else carregar_concluidas(args.saida)
+    itens, puladas = [], 0
+    for caminho in listar_peticoes(args.entrada):
+        item = {
+            'arquivo': caminho.relative_to(raiz).as_posix(),
+            'caminho': caminho,
+            'sha256': sha256_arquivo(caminho)
+        }
+        if (item['arquivo'], item['sha256']) in concluidas:
+            puladas += 1
+        else:
+            itens.append(item)
+    
+    print("="*80)
+    print(f"📦 GERAÇÃO EM LOTE: {len(itens)} petições ({puladas} já concluídas)")
+    print(f"   Workers: {', '.join(f'{etapa}={n}' for etapa, n in workers.items())}")
+    if args.lote:
+        print(f"   Geração: lote único (Message Batches API, {Config.CLAUDE_MODEL})")
+    print("="*80 + "\n")
+    
+    if not itens:
+        return 0
+    
+    pipeline = PipelineContestacao()
+    formatador = None
+    if not args.sem_docx:
+        formatador = FormatadorDOCX()
+        args.dir_docx.mkdir(parents=True, exist_ok=True)
+    
+    opcoes = {
+        'temperatura': args.temperatura,
+        'top_k': args.top_k,
+        'max_tokens': args.max_tokens,
+        'modo': args.modo,
+        'roteamento': args.roteamento,
+        'usar_cache': args.usar_cache
+    }
+    lote = GeradorLote(pipeline.generator) if args.lote else None
+    executor = ExecutorEtapas(pipeline, workers, opcoes, formatador, args.dir_docx, lote)
+    
+    args.saida.parent.mkdir(parents=True, exist_ok=True)
+    falhas, custo, inicio = 0, 0.0, time.perf_counter()
+    
+    try:
+        with open(args.saida, 'a', encoding='utf-8') as saida:
+            for n, item in enumerate(executor.executar(itens), 1):
+                registro = montar_registro(item)
+                saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                saida.flush()
+                
+                custo += registro.get('custo') or 0.0
+                if registro['sucesso']:
+                    origem = " (cache)" if registro.get('do_cache') else ""
+                    print(f"[{n}/{len(itens)}] ✅ {registro['arquivo']} · score {registro['score']} · "
+                          f"${registro['custo']:.4f}{origem} · {registro['duracao_total_s']:.1f}s")
+                else:
+                    falhas += 1
+                    print(f"[{n}/{len(itens)}] ❌ {registro['arquivo']} · {registro['etapa_falha']}: {registro['erro']}")
+    except KeyboardInterrupt:
+        executor.encerrar(cancelar=True)
+        print(f"\n⏹️  Interrompido; rode novamente com --saida {args.saida} para retomar")
+        return 130
+    
+    executor.encerrar()
+    
+    print("\n" + "="*80)
+    print(f"✅ {len(itens) - falhas} geradas · ❌ {falhas} falhas · "
+          f"${custo:.4f} · {time.perf_counter() - inicio:.1f}s")
+    print(f"📄 Resultados: {args.saida}")
+    print("="*80)
+    
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -53,55 +53,18 @@ DIRETRIZES OBRIGATÓRIAS:
 - NÃO use argumentos genéricos sem fundamentação específica
 - NÃO omita questões relevantes levantadas na inicial"""
 
-USER_PROMPT_TEMPLATE = """# PETIÇÃO INICIAL RECEBIDA
+# ═══════════════════════════════════════════════════════════════════════════
+# PROMPT DO USUÁRIO EM BLOCOS (ordem estável → variável, para prompt caching)
+# ═══════════════════════════════════════════════════════════════════════════
+#
+# 1. Instruções + tipo de caso: idênticas para todas as petições do mesmo
+#    tipo_caso (prefixo reaproveitado entre gerações)
+# 2. Contexto RAG recuperado
+# 3. Petição inicial e análise estruturada (específicas da petição)
 
-{peticao_inicial_completa}
-
-═══════════════════════════════════════════════════════════════════════════
-
-# ANÁLISE ESTRUTURADA DO CASO
-
-## Classificação
-**Tipo de Caso:** {tipo_caso}
-**Confiança da Classificação:** {confianca_classificacao}%
-
-## Partes Identificadas
-**Autor:** {autor}
-**Réu:** {reu}
-
-## Elementos Factuais Principais
-{elementos_facticos}
-
-## Pedidos do Autor
-{pedidos_autor}
-
-{valor_causa_info}
-
-═══════════════════════════════════════════════════════════════════════════
-
-# CONTEXTO RAG RECUPERADO
-
-## 📚 Contestações Similares (Trechos Relevantes)
-
-{contestacoes_similares}
-
-═══════════════════════════════════════════════════════════════════════════
-
-## ⚖️ Fundamentação Jurídica Aplicável
-
-{fundamentacao_juridica}
+PROMPT_INSTRUCOES_TEMPLATE = """# TAREFA
 
-═══════════════════════════════════════════════════════════════════════════
-
-## 🎯 Argumentos de Defesa Específicos para Este Tipo de Caso
-
-{argumentos_tipo_caso}
-
-═══════════════════════════════════════════════════════════════════════════
-
-# TAREFA
-
-Com base na petição inicial apresentada e em todo o contexto jurídico fornecido acima, redija uma CONTESTAÇÃO completa e fundamentada, seguindo rigorosamente a estrutura abaixo:
+Com base na petição inicial e em todo o contexto jurídico fornecidos a seguir, redija uma CONTESTAÇÃO completa e fundamentada, seguindo rigorosamente a estrutura abaixo:
 
 ## ESTRUTURA DA CONTESTAÇÃO
 
@@ -180,28 +143,144 @@ Formule pedidos claros e específicos:
 
 ═══════════════════════════════════════════════════════════════════════════
 
+# TIPO DE CASO EM ANÁLISE
+
+**{tipo_caso_nome}** — {tipo_caso_descricao}"""
+
+PROMPT_CONTEXTO_TEMPLATE = """# CONTEXTO RAG RECUPERADO
+
+## 📚 Contestações Similares (Trechos Relevantes)
+
+{contestacoes_similares}
+
+═══════════════════════════════════════════════════════════════════════════
+
+## ⚖️ Fundamentação Jurídica Aplicável
+
+{fundamentacao_juridica}
+
+═══════════════════════════════════════════════════════════════════════════
+
+## 🎯 Argumentos de Defesa Específicos para Este Tipo de Caso
+
+{argumentos_tipo_caso}
+
+═══════════════════════════════════════════════════════════════════════════"""
+
+PROMPT_PETICAO_TEMPLATE = """# PETIÇÃO INICIAL RECEBIDA
+
+{peticao_inicial_completa}
+
+═══════════════════════════════════════════════════════════════════════════
+
+# ANÁLISE ESTRUTURADA DO CASO
+
+## Classificação
+**Tipo de Caso:** {tipo_caso}
+**Confiança da Classificação:** {confianca_classificacao}%
+
+## Partes Identificadas
+**Autor:** {autor}
+**Réu:** {reu}
+
+## Elementos Factuais Principais
+{elementos_facticos}
+
+## Pedidos do Autor
+{pedidos_autor}
+
+{valor_causa_info}
+
+═══════════════════════════════════════════════════════════════════════════
+
 Inicie a redação da contestação abaixo:"""
 
+# ═══════════════════════════════════════════════════════════════════════════
+# REGENERAÇÃO COM AJUSTES (turno seguinte à contestação já gerada)
+# ═══════════════════════════════════════════════════════════════════════════
+
+PROMPT_REGENERAR_SECAO_TEMPLATE = """# AJUSTE EM SEÇÃO DA CONTESTAÇÃO
+
+Reescreva APENAS a seção "{titulo_secao}" da contestação acima, aplicando os ajustes solicitados:
+
+{ajustes}
+
+- Mantenha o título e a numeração originais da seção
+- Preserve a coerência com as demais seções, que permanecerão inalteradas
+- Responda somente com o texto completo da seção reescrita, sem comentários"""
+
+PROMPT_REGENERAR_COMPLETA_TEMPLATE = """# AJUSTES NA CONTESTAÇÃO
+
+Reescreva a contestação acima por completo, aplicando os ajustes solicitados:
+
+{ajustes}
+
+- Mantenha a estrutura, os títulos e a numeração das seções
+- Preserve integralmente os trechos que os ajustes não afetam
+- Responda somente com o texto completo da contestação, sem comentários"""
+
+# ═══════════════════════════════════════════════════════════════════════════
+# GERAÇÃO PARALELA POR PARTES (bloco final, após o prefixo cacheado)
+# ═══════════════════════════════════════════════════════════════════════════
+
+PROMPT_PARTE_TEMPLATE = """# REDAÇÃO POR PARTES
+
+A contestação está sendo redigida em partes independentes e simultâneas, que serão unidas na ordem da estrutura acima. Redija APENAS: {secoes_parte}
+
+{orientacao}
+
+- Use os títulos e a numeração da estrutura acima (a numeração final é ajustada na união das partes)
+- Não redija as demais seções nem inclua comentários fora desta parte"""
+
+# Partes redigidas em paralelo, na ordem da estrutura: (seções, orientação)
+PARTES_CONTESTACAO = {
+    'identificacao_preliminares': (
+        "1. IDENTIFICAÇÃO e 2. PRELIMINARMENTE",
+        "Inicie pelo endereçamento ao juízo. Se não houver preliminar pertinente ao caso, omita a seção 2."
+    ),
+    'fatos': (
+        "o título 3. DO MÉRITO e a subseção 3.1. DOS FATOS",
+        "Não antecipe a fundamentação jurídica: ela é redigida em outra parte."
+    ),
+    'direito': (
+        "a subseção 3.2. DO DIREITO, com as subseções 3.2.1 a 3.2.4",
+        "Não repita o título DO MÉRITO nem narre novamente os fatos: eles são redigidos em outra parte."
+    ),
+    'pedidos_requerimentos': (
+        "4. DOS PEDIDOS e 5. REQUERIMENTOS FINAIS",
+        "Encerre com o fecho da peça (termos em que pede deferimento, local, data e advogado)."
+    ),
+}
+
+def construir_bloco_parte(parte):
+    """Instrução da parte, anexada após os blocos do prompt (fora do cache)"""
+    secoes_parte, orientacao = PARTES_CONTESTACAO[parte]
+    return PROMPT_PARTE_TEMPLATE.format(secoes_parte=secoes_parte, orientacao=orientacao)
+
+def _conteudo_chunk(chunk):
+    """Conteúdo do chunk, marcando com reticências quando truncado pelo orçamento"""
+    return f"{chunk['conteudo']} [...]" if chunk.get('truncado') else chunk['conteudo']
+
 def formatar_contestacoes_similares(chunks_nivel_1, chunks_nivel_2):
-    """Formata chunks recuperados para inclusão no prompt"""
+    """Formata chunks recuperados para inclusão no prompt (já empacotados no orçamento)"""
     
     resultado = []
     
     # Nível 1 - Contexto global
     if chunks_nivel_1:
         resultado.append("### Documentos Similares (Contexto Global)\n")
-        for i, chunk in enumerate(chunks_nivel_1[:5], 1):  # Top 5
+        for i, chunk in enumerate(chunks_nivel_1, 1):
             resultado.append(f"**Documento {i}** (Similaridade: {chunk['similaridade']:.2%})")
             resultado.append(f"Tipo: {chunk['metadata'].get('tipo_lit', 'N/A')}")
-            resultado.append(f"```\n{chunk['conteudo'][:500]}...\n```\n")
+            resultado.append(f"```\n{_conteudo_chunk(chunk)}\n```\n")
     
     # Nível 2 - Seções específicas
     if chunks_nivel_2:
         resultado.append("\n### Seções Processuais Relevantes\n")
-        for i, chunk in enumerate(chunks_nivel_2[:8], 1):  # Top 8
+        for i, chunk in enumerate(chunks_nivel_2, 1):
             resultado.append(f"**Trecho {i}** (Similaridade: {chunk['similaridade']:.2%})")
             resultado.append(f"Seção: {chunk['metadata'].get('secao', 'N/A')}")
-            resultado.append(f"```\n{chunk['conteudo'][:400]}...\n```\n")
+            resultado.append(f"```\n{_conteudo_chunk(chunk)}\n```\n")
     
     return "\n".join(resultado) if resultado else "Nenhum documento similar encontrado."
 
@@ -231,18 +310,18 @@ def formatar_fundamentacao_juridica(chunks_nivel_3):
     # Formatação
     if artigos:
         resultado.append("### Dispositivos Legais Aplicáveis\n")
-        for chunk in artigos[:5]:
-            resultado.append(f"```\n{chunk['conteudo'][:300]}...\n```\n")
+        for chunk in artigos:
+            resultado.append(f"```\n{_conteudo_chunk(chunk)}\n```\n")
     
     if precedentes:
         resultado.append("\n### Precedentes Jurisprudenciais\n")
-        for chunk in precedentes[:4]:
-            resultado.append(f"```\n{chunk['conteudo'][:300]}...\n```\n")
+        for chunk in precedentes:
+            resultado.append(f"```\n{_conteudo_chunk(chunk)}\n```\n")
     
     if outros:
         resultado.append("\n### Argumentação Jurídica\n")
-        for chunk in outros[:3]:
-            resultado.append(f"```\n{chunk['conteudo'][:300]}...\n```\n")
+        for chunk in outros:
+            resultado.append(f"```\n{_conteudo_chunk(chunk)}\n```\n")
     
     return "\n".join(resultado)
 
@@ -260,15 +339,34 @@ def formatar_argumentos_tipo_caso(tipo_caso, chunks_especificos):
     ]
     
     if chunks_especificos:
-        for i, chunk in enumerate(chunks_especificos[:5], 1):
-            resultado.append(f"{i}. {chunk['conteudo'][:250]}...")
+        for i, chunk in enumerate(chunks_especificos, 1):
+            resultado.append(f"{i}. {_conteudo_chunk(chunk)}")
     else:
         resultado.append("Use os argumentos gerais presentes nas contestações similares recuperadas.")
     
     return "\n".join(resultado)
 
-def construir_prompt_usuario(dados_peticao, contexto_rag):
-    """Constrói o prompt do usuário com todos os dados"""
+def construir_bloco_instrucoes(tipo_caso):
+    """Bloco de instruções estável por tipo de caso (prefixo cacheável)"""
+    
+    from config.settings import Config
+    
+    info_tipo = Config.get_tipo_caso_info(tipo_caso)
+    
+    return PROMPT_INSTRUCOES_TEMPLATE.format(
+        tipo_caso_nome=info_tipo['nome'],
+        tipo_caso_descricao=info_tipo['descricao']
+    )
+
+def construir_blocos_prompt(dados_peticao, contexto_rag):
+    """
+    Constrói o prompt do usuário como blocos de conteúdo ordenados
+    
+    Ordem: instruções do tipo de caso (estável) → contexto RAG → petição.
+    Breakpoints de cache (cache_control) ficam no fim do bloco estável e no
+    fim do prompt completo, que é reaproveitado em continuações e
+    regenerações da mesma petição.
+    """
     
     # Formatar elementos factuais
     elementos = "\n".join([f"- {elem}" for elem in dados_peticao.get('elementos_facticos', [])])
@@ -280,16 +378,9 @@ def construir_prompt_usuario(dados_peticao, contexto_rag):
     valor = dados_peticao.get('valor_causa')
     valor_info = f"\n## Valor da Causa\n{valor}\n" if valor else ""
     
-    # Construir prompt
-    prompt = USER_PROMPT_TEMPLATE.format(
-        peticao_inicial_completa=dados_peticao.get('texto_completo', ''),
-        tipo_caso=dados_peticao.get('tipo_caso', 'Não identificado'),
-        confianca_classificacao=dados_peticao.get('confianca', 0) * 100,
-        autor=dados_peticao.get('autor', 'Não identificado'),
-        reu=dados_peticao.get('reu', 'UNIMED FERJ'),
-        elementos_facticos=elementos if elementos else '- Não identificados',
-        pedidos_autor=pedidos if pedidos else '- Não identificados',
-        valor_causa_info=valor_info,
+    instrucoes = construir_bloco_instrucoes(dados_peticao.get('tipo_caso', ''))
+    
+    contexto = PROMPT_CONTEXTO_TEMPLATE.format(
         contestacoes_similares=formatar_contestacoes_similares(
             contexto_rag.get('nivel_1', []),
             contexto_rag.get('nivel_2', [])
@@ -303,4 +394,26 @@ def construir_prompt_usuario(dados_peticao, contexto_rag):
         )
     )
     
-    return prompt
+    peticao = PROMPT_PETICAO_TEMPLATE.format(
+        peticao_inicial_completa=dados_peticao.get('texto_completo', ''),
+        tipo_caso=dados_peticao.get('tipo_caso', 'Não identificado'),
+        confianca_classificacao=dados_peticao.get('confianca', 0) * 100,
+        autor=dados_peticao.get('autor', 'Não identificado'),
+        reu=dados_peticao.get('reu', 'UNIMED FERJ'),
+        elementos_facticos=elementos if elementos else '- Não identificados',
+        pedidos_autor=pedidos if pedidos else '- Não identificados',
+        valor_causa_info=valor_info
+    )
+    
+    return [
+        {"type": "text", "text": instrucoes, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": contexto},
+        {"type": "text", "text": peticao, "cache_control": {"type": "ephemeral"}}
+    ]
+
+def construir_prompt_usuario(dados_peticao, contexto_rag):
+    """Constrói o prompt do usuário com todos os dados (texto único)"""
+    
+    blocos = construir_blocos_prompt(dados_peticao, contexto_rag)
+    
+    return "\n\n".join(bloco['text'] for bloco in blocos)
@@ -30,6 +30,17 @@ from pathlib import Path
 import os
 import streamlit as st
 
+
+def _segredo(nome: str, padrao: str = "") -> str:
+    """Segredo do Streamlit (secrets.toml) ou, na falta dele, variável de ambiente"""
+    try:
+        valor = st.secrets.get(nome)
+    except Exception:
+        # Sem secrets.toml (CLI, scripts): st.secrets levanta em vez de retornar None
+        valor = None
+    return valor or os.getenv(nome, padrao)
+
+
 class Config:
     # Diretório base do projeto
     BASE_DIR = Path(__file__).parent.parent
@@ -45,10 +56,7 @@ class Config:
     METRICS_DIR.mkdir(parents=True, exist_ok=True)
     
     # API Keys
-    ANTHROPIC_API_KEY = (
-        st.secrets.get("ANTHROPIC_API_KEY") if hasattr(st, 'secrets') 
-        else os.getenv("ANTHROPIC_API_KEY")
-    )
+    ANTHROPIC_API_KEY = _segredo("ANTHROPIC_API_KEY")
     
     # ... resto das configurações ...
     
@@ -71,6 +79,11 @@ class Config:
     OUTPUT_DIR = Path("./outputs")
     LOGS_DIR = Path("./logs")
     
+    # Exportação DOCX: template opcional (margens/estilos/timbre; os estilos
+    # "Contestacao ..." ausentes são criados) e documentos em cache na memória
+    DOCX_TEMPLATE_PATH = BASE_DIR / "templates" / "contestacao.docx"
+    DOCX_CACHE_MAX_ITENS = 32
+    
     # ═══════════════════════════════════════════════════════════════════════
     # MODELO DE EMBEDDINGS
     # ═══════════════════════════════════════════════════════════════════════
@@ -85,6 +98,13 @@ class Config:
     COLLECTION_NAME = "contestacoes_juridicas_v1"
     DISTANCE_METRIC = "cosine"
     
+    # Índice das citações (leis, artigos, súmulas, temas, recursos e
+    # processos) dos chunks de nível 3, gravado junto ao vector store e
+    # reconstruído quando o número de chunks da collection muda
+    INDICE_CITACOES_PATH = VECTOR_STORE_DIR / "indice_citacoes.json"
+    VERIFICAR_CITACOES = True
+    CITACOES_TIPOS_VERIFICADOS = ['lei', 'artigo', 'sumula', 'tema', 'recurso', 'processo']
+    
     # ═══════════════════════════════════════════════════════════════════════
     # RAG - PARÂMETROS DE RETRIEVAL
     # ═══════════════════════════════════════════════════════════════════════
@@ -129,8 +149,139 @@ class Config:
     MIN_TOP_K = 20
     MAX_TOP_K = 60
     
-    # API Key (será lida de variável de ambiente)
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
+    # Continuação automática: quando a geração para em max_tokens, retoma a
+    # partir do texto parcial (turno do assistente) até este número de vezes
+    MAX_CONTINUACOES = 2
+    
+    # Regeneração com ajustes: limite de tokens por seção reescrita
+    MAX_TOKENS_REGENERACAO_SECAO = 8000
+    
+    # Geração paralela por partes: requisições simultâneas sobre o mesmo
+    # prefixo cacheado (aquecido antes por uma requisição de max_tokens=1)
+    GERACAO_PARALELA_WORKERS = 4
+    MAX_TOKENS_POR_PARTE = 8000
+    GERACAO_PARALELA_AQUECER_CACHE = True
+    
+    # Prompt caching: o cache efêmero expira após ~5 min sem uso; o
+    # prefixo (system + instruções) de cada tipo de caso gerado na última
+    # janela é renovado em segundo plano com requisições de 1 token
+    PROMPT_CACHE_TTL_S = 300
+    PROMPT_CACHE_MANTER_AQUECIDO = True
+    PROMPT_CACHE_JANELA_AQUECIMENTO_S = 1800
+    
+    # Preços em USD por milhão de tokens: input, output, escrita de cache
+    # (1,25x input) e leitura de cache (0,1x input)
+    PRECOS_MODELOS = {
+        'claude-sonnet-4-5': {'input': 3.00, 'output': 15.00, 'cache_escrita': 3.75, 'cache_leitura': 0.30},
+        'claude-haiku-4-5': {'input': 1.00, 'output': 5.00, 'cache_escrita': 1.25, 'cache_leitura': 0.10},
+        'claude-opus-4-1': {'input': 15.00, 'output': 75.00, 'cache_escrita': 18.75, 'cache_leitura': 1.50}
+    }
+    
+    # Pré-contagem de tokens de input via endpoint count_tokens da API
+    # (se False ou indisponível, conta localmente com modules.tokens)
+    CONTAGEM_TOKENS_API = True
+    
+    # Contagem local (orçamento de contexto, reservas de taxa): fator
+    # inicial sobre o cl100k_base / estimativa por caracteres, até ser
+    # calibrado pelo count_tokens, e margem de segurança sobre o fator
+    TOKENS_FATOR_INICIAL = {'tiktoken': 1.2, 'caracteres': 1.3}
+    TOKENS_MARGEM_SEGURANCA = 0.05
+    
+    # Livro de custos: uma linha JSON por requisição (somente acréscimo)
+    LEDGER_CUSTOS = METRICS_DIR / "custos.jsonl"
+    
+    # Geração em lote (Message Batches API): metade do preço, resultados
+    # em até 24h; estado dos lotes persistido para sobreviver a reinícios
+    BATCH_DIR = OUTPUT_RAG_DIR / "batches"
+    FATOR_PRECO_LOTE = 0.5
+    BATCH_INTERVALO_POLLING_S = 60
+    
+    # Limites de taxa da organização (Console Anthropic → Limits): requisições,
+    # tokens de input (sem leituras de cache) e de output por minuto
+    LIMITE_RPM = 50
+    LIMITE_ITPM = 30000
+    LIMITE_OTPM = 8000
+    
+    # Agendador assíncrono: gerações simultâneas e novas tentativas em
+    # 429/529/5xx (backoff exponencial com jitter, respeitando retry-after)
+    AGENDADOR_CONCORRENCIA = 4
+    AGENDADOR_MAX_TENTATIVAS = 5
+    AGENDADOR_BACKOFF_BASE_S = 1.0
+    AGENDADOR_BACKOFF_MAX_S = 60.0
+    
+    # Fila de jobs: o pipeline completo de cada petição roda em segundo
+    # plano, com estado por job em JOBS_DIR (retomado após reinício)
+    JOBS_DIR = OUTPUT_RAG_DIR / "jobs"
+    JOBS_MAX_CONCORRENTES = 2
+    JOBS_INTERVALO_POLLING_S = 1.0
+    # Jobs finalizados (estado e resultado) são removidos após este tempo
+    JOBS_TTL_SEGUNDOS = 86400
+    # A interface para de reexecutar se nenhum job progredir por este tempo
+    JOBS_POLLING_MAX_SEM_MUDANCA_S = 600
+    
+    # CLI em lote (cli.py): workers de cada etapa do pipeline (--workers etapa=N)
+    CLI_WORKERS = {
+        'processamento': 2,
+        'retrieval': 1,
+        'contexto': 2,
+        'geracao': 4,
+        'validacao': 2,
+        'docx': 1
+    }
+    
+    # Cache de resultados de geração (opcional): requisição idêntica
+    # (modelo, prompts, temperatura, top_k, max_tokens) reaproveita a
+    # contestação já gerada; entradas comprimidas, descarte LRU
+    CACHE_GERACAO_ATIVO = False
+    CACHE_GERACAO_DIR = OUTPUT_RAG_DIR / "cache_geracao"
+    CACHE_GERACAO_MAX_MB = 200
+    
+    # Roteamento de modelo: casos rotineiros (tipo frequente, classificação
+    # confiável, poucos pedidos, petição curta) vão ao modelo rápido com
+    # orçamento menor; o rascunho é validado e, abaixo do score mínimo,
+    # regerado com CLAUDE_MODEL. Decisões registradas em LOG_ROTEAMENTO
+    ROTEAMENTO_ATIVO = True
+    MODELO_RAPIDO = "claude-haiku-4-5-20251001"
+    ROTEAMENTO_TIPOS_ROTINEIROS = ['REEMBOLSO', 'AVISO_PREVIO']
+    ROTEAMENTO_MIN_CONFIANCA = 0.85
+    ROTEAMENTO_MAX_PEDIDOS = 4
+    ROTEAMENTO_MAX_CARACTERES = 30000
+    ROTEAMENTO_SCORE_MINIMO = 70
+    # Histórico: com ao menos N rascunhos do tipo nos últimos dias, se a
+    # fração escalada passar do limite, o tipo vai direto ao modelo
+    # principal; a cada SONDAGEM_A_CADA casos assim, um ainda recebe
+    # rascunho do modelo rápido (sondagem), para a taxa poder se recuperar
+    ROTEAMENTO_JANELA_HISTORICO = 20
+    ROTEAMENTO_HISTORICO_DIAS = 14
+    ROTEAMENTO_MIN_HISTORICO = 5
+    ROTEAMENTO_MAX_TAXA_ESCALADA = 0.3
+    ROTEAMENTO_SONDAGEM_A_CADA = 10
+    # Histórico mantido em memória, carregado uma vez do fim do log
+    ROTEAMENTO_LOG_CAUDA_BYTES = 2 * 1024 * 1024
+    # max_tokens = base + por pedido, limitado ao max_tokens solicitado
+    ROTEAMENTO_TOKENS_BASE = 6000
+    ROTEAMENTO_TOKENS_POR_PEDIDO = 1500
+    LOG_ROTEAMENTO = METRICS_DIR / "roteamento.jsonl"
+    
+    # Telemetria: spans (duração, variação de RSS, chunks, tokens) de cada
+    # etapa do pipeline, em JSONL e em métricas no formato texto do Prometheus
+    TELEMETRIA_ATIVA = True
+    TELEMETRIA_SPANS = METRICS_DIR / "spans.jsonl"
+    # Rotação do JSONL por tamanho: spans.jsonl.1 ... .N (o mais antigo é descartado)
+    TELEMETRIA_SPANS_MAX_MB = 50
+    TELEMETRIA_SPANS_ARQUIVOS = 3
+    # Spans aguardando gravação; acima disso são descartados (com aviso)
+    TELEMETRIA_FILA_MAX = 10000
+    TELEMETRIA_PROMETHEUS = METRICS_DIR / "pipeline.prom"
+    TELEMETRIA_INTERVALO_PROMETHEUS_S = 10
+    TELEMETRIA_BUCKETS_S = [0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+    
+    # API Key (secrets.toml do Streamlit ou variável de ambiente)
+    ANTHROPIC_API_KEY = _segredo("ANTHROPIC_API_KEY")
+    
+    # URL base da API (opcional): aponte para o stub local
+    # (scripts/stub_messages_api.py) para testes de desempenho offline
+    ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL") or None
     
     # ═══════════════════════════════════════════════════════════════════════
     # CLASSIFICAÇÃO DE TIPOS DE CASO
@@ -167,6 +318,23 @@ class Config:
     # Limite mínimo de confiança para classificação
     MIN_CONFIDENCE_CLASSIFICATION = 0.70
     
+    # ═══════════════════════════════════════════════════════════════════════
+    # PROCESSAMENTO DE DOCUMENTOS
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    # Backends de extração de texto, em ordem de preferência (o primeiro
+    # disponível é usado). Medir com: python scripts/benchmark_extracao.py
+    EXTRATORES_PREFERIDOS = {
+        'pdf': ['pypdfium2', 'pypdf2', 'pdfminer'],
+        'docx': ['docx_xml', 'python_docx']
+    }
+    
+    # Extração incremental: para de ler o PDF ao fim do corpo da petição
+    # (marcadores de encerramento + campos obrigatórios), ignorando anexos
+    EXTRACAO_STREAMING = True
+    MAX_PAGINAS_PETICAO = 60
+    CAMPOS_OBRIGATORIOS_EXTRACAO = ['autor', 'reu', 'fatos', 'pedidos', 'valor_causa']
+    
     # ═══════════════════════════════════════════════════════════════════════
     # VALIDAÇÃO E QUALIDADE
     # ═══════════════════════════════════════════════════════════════════════
@@ -184,6 +352,24 @@ class Config:
     MIN_CONTESTACAO_LENGTH = 2000  # caracteres
     MAX_CONTESTACAO_LENGTH = 50000  # caracteres
     
+    # Validação incremental durante o streaming: expectativas verificadas a
+    # cada delta; a violação interrompe a geração antes de pagar o restante
+    VALIDACAO_STREAM_ATIVA = True
+    # Seção → caracteres gerados até os quais ela deve ter aparecido
+    VALIDACAO_STREAM_SECOES_ATE = {'IDENTIFICAÇÃO': 4000, 'DOS FATOS': 20000}
+    # Mínimo de citações legais após N caracteres gerados
+    VALIDACAO_STREAM_MIN_CITACOES = 1
+    VALIDACAO_STREAM_CITACOES_ATE = 15000
+    # Limites de tamanho derivados do max_tokens pedido (caracteres por
+    # token de saída): a contestação é descontrolada acima do orçamento (ou
+    # de MAX_CONTESTACAO_LENGTH, o maior) e uma seção acima desta fração dele
+    VALIDACAO_STREAM_CARACTERES_POR_TOKEN = 4
+    VALIDACAO_STREAM_FRACAO_MAX_SECAO = 0.6
+    # 'redirecionar' (reinicia com orientação corretiva, até o limite abaixo;
+    # depois aborta), 'abortar' ou 'alertar' (apenas registra)
+    VALIDACAO_STREAM_ACAO = 'redirecionar'
+    VALIDACAO_STREAM_MAX_REDIRECIONAMENTOS = 1
+    
     # ═══════════════════════════════════════════════════════════════════════
     # INTERFACE
     # ═══════════════════════════════════════════════════════════════════════
@@ -0,0 +1,441 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+AGENDADOR DE GERAÇÕES - LIMITES DE TAXA E PRIORIDADE
+═══════════════════════════════════════════════════════════════════════════
+Agendador assíncrono em torno do LLMGenerator para maximizar a vazão sob
+os limites de taxa da organização:
+
+- um único cliente AsyncAnthropic por processo (pool de conexões
+  compartilhado), rodando em um event loop dedicado em segundo plano;
+- baldes de tokens para requisições, tokens de input e de output por minuto;
+- fila de prioridade (interativo antes de lote);
+- novas tentativas em 429/529/5xx com backoff exponencial e jitter,
+  respeitando o cabeçalho retry-after.
+
+Chamadores síncronos (Streamlit, scripts) usam gerar() ou submeter().
+"""
+
+import asyncio
+import concurrent.futures
+import itertools
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import anthropic
+
+from config.settings import Config
+from modules.contabilidade import CAMPOS_USO
+from modules.llm_generator import LLMGenerator, _params_continuacao, _uso_resposta
+from modules.recursos import obter_gerador
+from modules.telemetria import registrar_span
+from modules.tokens import contar_tokens
+
+# Prioridades da fila (menor = atendida primeiro)
+PRIORIDADE_INTERATIVA = 0
+PRIORIDADE_LOTE = 10
+
+# Status HTTP que justificam nova tentativa (529 = API sobrecarregada)
+STATUS_RETENTAVEIS = (408, 409, 429, 500, 502, 503, 504, 529)
+
+
+class BaldeTaxa:
+    """
+    Balde de tokens com reposição contínua (limite por minuto)
+    
+    adquirir() espera até haver saldo; pedidos maiores que a capacidade são
+    limitados à capacidade (esperam o balde encher por completo).
+    """
+    
+    def __init__(self, por_minuto: int):
+        self.capacidade = float(por_minuto)
+        self.disponivel = float(por_minuto)
+        self._taxa_s = por_minuto / 60.0
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _repor(self):
+        agora = time.monotonic()
+        self.disponivel = min(self.capacidade, self.disponivel + (agora - self._ultimo) * self._taxa_s)
+        self._ultimo = agora
+    
+    async def adquirir(self, quantidade: float) -> float:
+        """
+        Consome saldo, esperando a reposição se necessário
+        
+        Returns:
+            Quantidade efetivamente consumida (para devolução posterior)
+        """
+        quantidade = min(float(quantidade), self.capacidade)
+        
+        # O lock mantém a ordem de chegada entre quem espera saldo
+        async with self._lock:
+            while True:
+                self._repor()
+                if self.disponivel >= quantidade:
+                    self.disponivel -= quantidade
+                    return quantidade
+                await asyncio.sleep((quantidade - self.disponivel) / self._taxa_s)
+    
+    def devolver(self, quantidade: float):
+        """Devolve saldo reservado e não usado (ex: output abaixo de max_tokens)"""
+        self._repor()
+        self.disponivel = min(self.capacidade, self.disponivel + max(quantidade, 0.0))
+
+
+@dataclass(order=True)
+class _Tarefa:
+    """Item da fila de prioridade"""
+    prioridade: int
+    sequencia: int
+    params: Dict = field(compare=False)
+    dados_peticao: Dict = field(compare=False)
+    tokens_previstos: int = field(compare=False)
+    usar_cache: Optional[bool] = field(compare=False)
+    futuro: concurrent.futures.Future = field(compare=False)
+    enfileirada: float = field(compare=False, default_factory=time.monotonic)
+
+
+class AgendadorGeracao:
+    """Agendador de gerações com limites de taxa, prioridade e novas tentativas"""
+    
+    def __init__(
+        self,
+        gerador: Optional[LLMGenerator] = None,
+        cliente_async: Optional[anthropic.AsyncAnthropic] = None,
+        rpm: int = Config.LIMITE_RPM,
+        itpm: int = Config.LIMITE_ITPM,
+        otpm: int = Config.LIMITE_OTPM,
+        concorrencia: int = Config.AGENDADOR_CONCORRENCIA,
+        max_tentativas: int = Config.AGENDADOR_MAX_TENTATIVAS
+    ):
+        """
+        Args:
+            gerador: LLMGenerator usado para montar requisições, metadados e
+                custos (padrão: o compartilhado, ver obter_gerador)
+            cliente_async: Cliente assíncrono (padrão: AsyncAnthropic criado
+                no loop do agendador, sem retries próprios)
+            rpm: Requisições por minuto
+            itpm: Tokens de input por minuto
+            otpm: Tokens de output por minuto
+            concorrencia: Gerações simultâneas
+            max_tentativas: Tentativas por geração
+        """
+        self.gerador = gerador or obter_gerador()
+        self.concorrencia = concorrencia
+        self.max_tentativas = max_tentativas
+        self._limites = (rpm, itpm, otpm)
+        self._cliente = cliente_async
+        self._sequencia = itertools.count()
+        self._pausado_ate = 0.0
+        self._iniciado = threading.Event()
+        
+        self.estatisticas = {
+            'concluidas': 0,
+            'falhas': 0,
+            'novas_tentativas': 0,
+            'limite_atingido': 0
+        }
+        
+        # Event loop dedicado: o cliente assíncrono e os baldes vivem nele
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._executar_loop,
+            name="agendador-geracao",
+            daemon=True
+        )
+        self._thread.start()
+        self._iniciado.wait()
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # API SÍNCRONA
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    def submeter(
+        self,
+        dados_peticao: Dict,
+        contexto_rag: Dict,
+        temperatura: float = Config.DEFAULT_TEMPERATURE,
+        top_k: int = Config.DEFAULT_TOP_K,
+        max_tokens: int = Config.DEFAULT_MAX_TOKENS,
+        prioridade: int = PRIORIDADE_INTERATIVA,
+        usar_cache: Optional[bool] = None,
+        modelo: Optional[str] = None
+    ) -> concurrent.futures.Future:
+        """
+        Enfileira uma geração
+        
+        Args:
+            dados_peticao: Dados estruturados da petição
+            contexto_rag: Contexto RAG construído
+            temperatura: Parâmetro de temperatura (0.3-0.9)
+            top_k: Parâmetro top-k (20-60)
+            max_tokens: Tokens máximos para geração
+            prioridade: PRIORIDADE_INTERATIVA ou PRIORIDADE_LOTE
+            usar_cache: Reutilizar resultado idêntico do cache de geração
+                (padrão: Config.CACHE_GERACAO_ATIVO)
+            modelo: Modelo a usar (padrão: Config.CLAUDE_MODEL)
+        
+        Returns:
+            Future cujo resultado tem o formato de gerar_contestacao
+        """
+        params = self.gerador._montar_parametros(
+            dados_peticao, contexto_rag, temperatura, top_k, max_tokens, modelo
+        )
+        
+        # Acerto no cache de geração não ocupa a fila nem os limites
+        em_cache = self.gerador._consultar_cache_resultados(params, usar_cache)
+        if em_cache:
+            futuro = concurrent.futures.Future()
+            futuro.set_result(em_cache)
+            return futuro
+        
+        tokens_previstos = self.gerador._pre_contar(
+            params, dados_peticao, aquecer_cache=prioridade == PRIORIDADE_INTERATIVA
+        )
+        
+        tarefa = _Tarefa(
+            prioridade=prioridade,
+            sequencia=next(self._sequencia),
+            params=params,
+            dados_peticao=dados_peticao,
+            tokens_previstos=tokens_previstos,
+            usar_cache=usar_cache,
+            futuro=concurrent.futures.Future()
+        )
+        self._loop.call_soon_threadsafe(self._fila.put_nowait, tarefa)
+        
+        return tarefa.futuro
+    
+    def gerar(self, dados_peticao: Dict, contexto_rag: Dict, **kwargs) -> Dict:
+        """Enfileira uma geração e aguarda o resultado (mesmos argumentos de submeter)"""
+        return self.submeter(dados_peticao, contexto_rag, **kwargs).result()
+    
+    def pendentes(self) -> int:
+        """Gerações aguardando na fila"""
+        return self._fila.qsize()
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # LOOP ASSÍNCRONO
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    def _executar_loop(self):
+        asyncio.set_event_loop(self._loop)
+        
+        rpm, itpm, otpm = self._limites
+        self._requisicoes = BaldeTaxa(rpm)
+        self._tokens_input = BaldeTaxa(itpm)
+        self._tokens_output = BaldeTaxa(otpm)
+        self._fila: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        
+        if self._cliente is None:
+            # Novas tentativas ficam a cargo do agendador (coordenadas entre
+            # todas as gerações), não do SDK
+            self._cliente = anthropic.AsyncAnthropic(
+                api_key=self.gerador.api_key,
+                base_url=Config.ANTHROPIC_BASE_URL,
+                max_retries=0
+            )
+        
+        for indice in range(self.concorrencia):
+            self._loop.create_task(self._trabalhador(), name=f"trabalhador-{indice}")
+        
+        self._iniciado.set()
+        self._loop.run_forever()
+    
+    async def _trabalhador(self):
+        """Consome a fila em ordem de prioridade"""
+        while True:
+            tarefa = await self._fila.get()
+            try:
+                # Cancelada enquanto aguardava na fila: descartar. Daqui em
+                # diante o futuro está em execução e cancel() não o afeta
+                if not tarefa.futuro.set_running_or_notify_cancel():
+                    continue
+                
+                try:
+                    resultado = await self._processar(tarefa)
+                except Exception as e:
+                    print(f"❌ Erro inesperado no agendador: {e}\n")
+                    resultado = {'contestacao': None, 'erro': str(e), 'sucesso': False}
+                
+                tarefa.futuro.set_result(resultado)
+            finally:
+                self._fila.task_done()
+    
+    async def _processar(self, tarefa: _Tarefa) -> Dict:
+        """Executa uma geração (com continuações se parar em max_tokens)"""
+        espera_fila = time.monotonic() - tarefa.enfileirada
+        
+        params = tarefa.params
+        tokens_previstos = tarefa.tokens_previstos
+        texto = ''
+        uso_total = {campo: 0 for campo in CAMPOS_USO}
+        tentativas = 0
+        continuacoes = 0
+        duracao = 0.0
+        
+        while True:
+            try:
+                response, tentativas_req, duracao_req = await self._requisitar(params, tokens_previstos)
+            except Exception as e:
+                self.estatisticas['falhas'] += 1
+                return self._resultado_falha(tarefa, e, uso_total, continuacoes)
+            
+            tentativas += tentativas_req
+            duracao += duracao_req
+            texto += response.content[0].text
+            for campo, valor in _uso_resposta(response).items():
+                uso_total[campo] += valor
+            
+            if response.stop_reason != 'max_tokens' or continuacoes >= Config.MAX_CONTINUACOES:
+                break
+            
+            # Continuar a partir do texto parcial (nova requisição pelos baldes)
+            continuacoes += 1
+            print(f"↪️  Limite de tokens atingido; continuando ({continuacoes}/{Config.MAX_CONTINUACOES})...")
+            texto = texto.rstrip()
+            params = _params_continuacao(tarefa.params, texto)
+            tokens_previstos = tarefa.tokens_previstos + contar_tokens(texto)
+        
+        metadados = self.gerador._montar_metadados(
+            tarefa.params, response, tarefa.dados_peticao, tarefa.tokens_previstos
+        )
+        metadados.update(uso_total)
+        metadados['continuacoes'] = continuacoes
+        metadados['duracao_s'] = round(duracao, 3)
+        metadados['espera_fila_s'] = round(espera_fila, 3)
+        metadados['tentativas'] = tentativas
+        
+        self.estatisticas['concluidas'] += 1
+        resultado = self.gerador._resultado_sucesso(texto, metadados)
+        self.gerador._gravar_cache_resultados(tarefa.params, resultado, tarefa.usar_cache)
+        
+        return resultado
+    
+    def _resultado_falha(self, tarefa: _Tarefa, erro: Exception, uso_total: Dict, continuacoes: int) -> Dict:
+        """Falha da geração; o uso das requisições já atendidas (continuações) vai ao livro"""
+        resultado = {'contestacao': None, 'erro': str(erro), 'sucesso': False}
+        
+        if continuacoes:
+            registro = self.gerador.livro_custos.registrar(
+                tarefa.params['model'],
+                uso_total,
+                operacao='geracao_falha',
+                tipo_caso=tarefa.dados_peticao.get('tipo_caso'),
+                input_tokens_previstos=tarefa.tokens_previstos
+            )
+            resultado['custo_estimado'] = registro['custo_usd']['total']
+        
+        return resultado
+    
+    async def _requisitar(self, params: Dict, tokens_previstos: int) -> Tuple[object, int, float]:
+        """
+        Uma requisição respeitando os limites, com novas tentativas
+        
+        Returns:
+            (resposta, tentativas usadas, duração da tentativa bem-sucedida)
+        
+        Raises:
+            Erro não retentável ou da última tentativa (reservas devolvidas)
+        """
+        for tentativa in range(1, self.max_tentativas + 1):
+            await self._aguardar_pausa()
+            await self._requisicoes.adquirir(1)
+            input_reservado = await self._tokens_input.adquirir(tokens_previstos)
+            output_reservado = await self._tokens_output.adquirir(params['max_tokens'])
+            
+            try:
+                inicio = time.perf_counter()
+                response = await self._cliente.messages.create(**params)
+                duracao = time.perf_counter() - inicio
+            
+            except Exception as e:
+                # Requisição não atendida: nada do reservado foi consumido
+                self._tokens_input.devolver(input_reservado)
+                self._tokens_output.devolver(output_reservado)
+                
+                if not _retentavel(e) or tentativa == self.max_tentativas:
+                    print(f"❌ Erro na API (tentativa {tentativa}/{self.max_tentativas}): {e}\n")
+                    raise
+                
+                espera = self._tempo_espera(e, tentativa)
+                self.estatisticas['novas_tentativas'] += 1
+                
+                # Limite de taxa atingido: pausar todos os trabalhadores
+                if getattr(e, 'status_code', None) == 429:
+                    self.estatisticas['limite_atingido'] += 1
+                    self._pausado_ate = max(self._pausado_ate, time.monotonic() + espera)
+                
+                print(f"⏳ {type(e).__name__}: nova tentativa em {espera:.1f}s "
+                      f"({tentativa}/{self.max_tentativas})")
+                await asyncio.sleep(espera)
+                continue
+            
+            # Devolver o que foi reservado e não consumido
+            uso = _uso_resposta(response)
+            self._tokens_output.devolver(output_reservado - uso['output_tokens'])
+            self._tokens_input.devolver(
+                input_reservado - uso['input_tokens'] - uso['cache_creation_input_tokens']
+            )
+            registrar_span(
+                'api.messages',
+                duracao,
+                operacao='agendador',
+                modelo=params['model'],
+                tentativa=tentativa,
+                stop_reason=response.stop_reason,
+                **uso
+            )
+            
+            return response, tentativa, duracao
+    
+    async def _aguardar_pausa(self):
+        """Espera o fim de uma pausa global causada por 429"""
+        restante = self._pausado_ate - time.monotonic()
+        if restante > 0:
+            await asyncio.sleep(restante)
+    
+    @staticmethod
+    def _tempo_espera(erro: Exception, tentativa: int) -> float:
+        """Backoff exponencial com jitter completo; retry-after é o piso"""
+        teto = min(Config.AGENDADOR_BACKOFF_MAX_S, Config.AGENDADOR_BACKOFF_BASE_S * 2 ** (tentativa - 1))
+        espera = random.uniform(0, teto)
+        
+        resposta = getattr(erro, 'response', None)
+        retry_after = resposta.headers.get('retry-after') if resposta is not None else None
+        if retry_after:
+            try:
+                # Jitter acima do piso para não sincronizar os trabalhadores
+                espera = float(retry_after) + random.uniform(0, Config.AGENDADOR_BACKOFF_BASE_S)
+            except ValueError:
+                pass
+        
+        return espera
+
+
+def _retentavel(erro: Exception) -> bool:
+    """Erros transitórios: conexão/timeout e status de STATUS_RETENTAVEIS"""
+    if isinstance(erro, anthropic.APIConnectionError):
+        return True
+    return getattr(erro, 'status_code', None) in STATUS_RETENTAVEIS
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# INSTÂNCIA COMPARTILHADA
+# ═══════════════════════════════════════════════════════════════════════════
+
+_AGENDADOR: Optional[AgendadorGeracao] = None
+_LOCK_AGENDADOR = threading.Lock()
+
+
+def obter_agendador() -> AgendadorGeracao:
+    """Agendador único do processo (compartilhado entre sessões do Streamlit)"""
+    global _AGENDADOR
+    
+    with _LOCK_AGENDADOR:
+        if _AGENDADOR is None:
+            _AGENDADOR = AgendadorGeracao()
+        return _AGENDADOR
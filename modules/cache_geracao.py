@@ -0,0 +1,137 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+CACHE DE RESULTADOS DE GERAÇÃO
+═══════════════════════════════════════════════════════════════════════════
+Cache em disco (opcional) de contestações geradas, endereçado pelo hash de
+(modelo, system prompt, prompt do usuário, temperatura, top_k, max_tokens).
+Entradas são JSON comprimido com zlib; ao exceder Config.CACHE_GERACAO_MAX_MB
+as menos usadas recentemente (mtime, atualizado a cada acerto) são removidas.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+from config.settings import Config
+
+# Parâmetros da requisição que determinam o resultado
+CAMPOS_CHAVE = ('model', 'system', 'messages', 'temperature', 'top_k', 'max_tokens')
+
+_EXTENSAO = '.json.z'
+
+
+class CacheGeracao:
+    """Cache LRU em disco de resultados de gerar_contestacao"""
+    
+    def __init__(self, diretorio: Optional[Path] = None, max_mb: Optional[float] = None):
+        """
+        Args:
+            diretorio: Diretório das entradas (padrão: Config.CACHE_GERACAO_DIR)
+            max_mb: Tamanho máximo do cache (padrão: Config.CACHE_GERACAO_MAX_MB)
+        """
+        self.diretorio = Path(diretorio or Config.CACHE_GERACAO_DIR)
+        self.max_bytes = int((max_mb or Config.CACHE_GERACAO_MAX_MB) * 1_000_000)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def chave(params: Dict) -> str:
+        """
+        Hash SHA-256 dos parâmetros que determinam o resultado
+        
+        Args:
+            params: Argumentos de messages.create
+        
+        Returns:
+            Chave hexadecimal
+        """
+        normalizado = json.dumps(
+            {campo: params.get(campo) for campo in CAMPOS_CHAVE},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(normalizado.encode('utf-8')).hexdigest()
+    
+    def obter(self, params: Dict) -> Optional[Dict]:
+        """
+        Busca resultado para os parâmetros
+        
+        Args:
+            params: Argumentos de messages.create
+        
+        Returns:
+            Resultado gravado (com os metadados originais) ou None
+        """
+        arquivo = self._arquivo(self.chave(params))
+        
+        try:
+            dados = arquivo.read_bytes()
+            resultado = json.loads(zlib.decompress(dados).decode('utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error, ValueError) as e:
+            print(f"⚠️  Entrada de cache ilegível, descartando: {e}")
+            arquivo.unlink(missing_ok=True)
+            return None
+        
+        # Acerto: marcar como usado recentemente (LRU por mtime)
+        try:
+            os.utime(arquivo)
+        except OSError:
+            pass
+        
+        return resultado
+    
+    def gravar(self, params: Dict, resultado: Dict):
+        """
+        Grava resultado de sucesso e aplica o limite de tamanho
+        
+        Args:
+            params: Argumentos de messages.create
+            resultado: Resultado de gerar_contestacao
+        """
+        if not resultado.get('sucesso'):
+            return
+        
+        dados = zlib.compress(json.dumps(resultado, ensure_ascii=False).encode('utf-8'), 6)
+        destino = self._arquivo(self.chave(params))
+        
+        try:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            parcial = destino.with_name(f"{destino.name}.{os.getpid()}.{threading.get_ident()}.parcial")
+            parcial.write_bytes(dados)
+            os.replace(parcial, destino)
+        except OSError as e:
+            print(f"⚠️  Não foi possível gravar no cache de geração: {e}")
+            return
+        
+        self._aplicar_limite()
+    
+    def limpar(self):
+        """Remove todas as entradas"""
+        for arquivo in self.diretorio.glob(f'*{_EXTENSAO}'):
+            arquivo.unlink(missing_ok=True)
+    
+    def _arquivo(self, chave: str) -> Path:
+        return self.diretorio / f"{chave}{_EXTENSAO}"
+    
+    def _aplicar_limite(self):
+        """Remove as entradas menos usadas recentemente até caber no limite"""
+        with self._lock:
+            entradas = []
+            for arquivo in self.diretorio.glob(f'*{_EXTENSAO}'):
+                try:
+                    info = arquivo.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((info.st_mtime, info.st_size, arquivo))
+            
+            total = sum(tamanho for _, tamanho, _ in entradas)
+            for _, tamanho, arquivo in sorted(entradas, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                arquivo.unlink(missing_ok=True)
+                total -= tamanho
@@ -0,0 +1,342 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+ÍNDICE DE CITAÇÕES DO MATERIAL DE REFERÊNCIA
+═══════════════════════════════════════════════════════════════════════════
+Extrai citações normalizadas (leis, artigos, súmulas, temas repetitivos,
+recursos e números de processo CNJ) dos chunks de nível 3 e as grava como
+mapa de hash em JSON junto ao vector store. As citações de uma contestação
+gerada são verificadas contra o índice com buscas O(1), sem consultar o
+ChromaDB por citação.
+
+Chaves normalizadas (texto sem acentos, em minúsculas):
+    lei:9656            Lei nº 9.656/98
+    artigo:35-c@lei:9656  art. 35-C da Lei 9.656/98 (e artigo:35-c)
+    artigo:51@cdc       art. 51, IV, do CDC (e artigo:51)
+    sumula:608@stj      Súmula 608 do STJ (e sumula:608)
+    tema:990            Tema 990
+    recurso:resp:1733013  REsp 1.733.013/PR
+    processo:00123456720198190001  0012345-67.2019.8.19.0001
+
+O índice é reconstruído quando o número de chunks da collection muda.
+"""
+
+import json
+import re
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config.settings import Config
+
+# Número com ou sem separador de milhar (9.656, 1.733.013, 608)
+_NUM = r'(\d{1,3}(?:\.\d{3})+|\d+)'
+_NO = r'(?:n[o°]?\.?\s*)?'
+
+# Leis que têm nome de código: a citação pelo número equivale à sigla
+_CODIGOS_POR_LEI = {'8078': 'cdc', '10406': 'cc', '13105': 'cpc'}
+
+_RE_CODIGO = re.compile(
+    r'\b(?:(cdc|cpc|cc|cf|crfb)\b(?:\s*/\s*\d{2,4})?'
+    r'|codigo\s+de\s+(defesa\s+do\s+consumidor|processo\s+civil)|(codigo\s+civil)'
+    r'|(constituicao\s+(?:federal|da\s+republica)))'
+)
+_RE_LEI = re.compile(r'\blei\s+(complementar\s+)?(?:federal\s+|estadual\s+)?' + _NO + _NUM)
+
+# Artigo seguido (na mesma linha, até ~80 caracteres) da lei ou código
+_RE_ARTIGO = re.compile(r'\b(?:art\.?|artigo)s?\s*' + _NO + r'(\d+)(?:\s*-\s*([a-z])\b)?')
+_RE_DIPLOMA_ARTIGO = re.compile(
+    r'[^\n;()]{0,80}?\b(?:d[oa]|n[oa]|,)\s*(?:e\.?\s*)?'
+    r'(?=lei\b|cdc\b|cpc\b|cc\b|cf\b|crfb\b|codigo\b|constituicao\b)'
+)
+
+_RE_SUMULA = re.compile(
+    r'\bsumulas?\s+(vinculante\s+)?' + _NO + r'(\d+)'
+    r'(?:\s*(?:/\s*|,?\s*d[oa]\s+(?:(?:e|c)\.\s*)?)(stj|stf|tst|tjrj|tjsp|ans))?'
+)
+_RE_TEMA = re.compile(r'\btema\s+(?:repetitivo\s+)?' + _NO + r'(\d+)')
+_RE_RECURSO = re.compile(r'\b(resp|aresp|eresp|rms|adi|adpf|rcl)\s*' + _NO + _NUM)
+_RE_PROCESSO = re.compile(r'\b(\d{7})-?(\d{2})\.?(\d{4})\.?(\d)\.?(\d{2})\.?(\d{4})\b')
+
+TIPOS_CITACAO = ('lei', 'artigo', 'sumula', 'tema', 'recurso', 'processo')
+
+_VERSAO_INDICE = 1
+
+
+def _tabela_sem_acentos() -> Dict[int, Optional[str]]:
+    """Tabela de str.translate: letras latinas acentuadas → base, º/ª → o/a, marcas combinantes removidas"""
+    tabela: Dict[int, Optional[str]] = {codigo: None for codigo in range(0x300, 0x370)}
+    for codigo in range(0xA0, 0x250):
+        decomposto = unicodedata.normalize('NFKD', chr(codigo))
+        base = ''.join(c for c in decomposto if not unicodedata.combining(c))
+        if base != chr(codigo) and base.isalpha():
+            tabela[codigo] = base
+    return tabela
+
+
+_SEM_ACENTOS = _tabela_sem_acentos()
+
+
+def normalizar_texto(texto: str) -> str:
+    """Texto sem acentos e em minúsculas (º e ª viram o/a)"""
+    return texto.translate(_SEM_ACENTOS).lower()
+
+
+def _numero(texto: str) -> str:
+    return texto.replace('.', '').lstrip('0') or '0'
+
+
+def _diploma(texto: str, posicao: int) -> Optional[str]:
+    """Chave da lei/código citado a partir da posição (ou None)"""
+    codigo = _RE_CODIGO.match(texto, posicao)
+    if codigo:
+        sigla, nome_codigo, codigo_civil, _ = codigo.groups()
+        if sigla:
+            return 'cf' if sigla == 'crfb' else sigla
+        if nome_codigo:
+            return 'cdc' if nome_codigo.startswith('defesa') else 'cpc'
+        return 'cc' if codigo_civil else 'cf'
+    
+    lei = _RE_LEI.match(texto, posicao)
+    if lei:
+        return _chave_lei(lei)
+    
+    return None
+
+
+def _chave_lei(lei: re.Match) -> str:
+    numero = _numero(lei.group(2))
+    if lei.group(1):
+        return f"lei-complementar:{numero}"
+    return _CODIGOS_POR_LEI.get(numero, f"lei:{numero}")
+
+
+def extrair_citacoes(texto: str) -> Iterator[Tuple[str, str]]:
+    """
+    Citações normalizadas de um texto
+    
+    Artigos e súmulas com diploma/tribunal identificado geram a chave
+    qualificada; a verificação usa a qualificada quando houver, e o índice
+    guarda as duas formas.
+    
+    Args:
+        texto: Texto original
+    
+    Yields:
+        (tipo, chave) para cada citação encontrada (com repetições)
+    """
+    texto = normalizar_texto(texto)
+    
+    for lei in _RE_LEI.finditer(texto):
+        chave = _chave_lei(lei)
+        if chave.startswith('lei'):
+            yield 'lei', chave
+    
+    for artigo in _RE_ARTIGO.finditer(texto):
+        numero = artigo.group(1).lstrip('0') + (f"-{artigo.group(2)}" if artigo.group(2) else '')
+        ligacao = _RE_DIPLOMA_ARTIGO.match(texto, artigo.end())
+        diploma = _diploma(texto, ligacao.end()) if ligacao else None
+        yield 'artigo', f"artigo:{numero}@{diploma}" if diploma else f"artigo:{numero}"
+    
+    for sumula in _RE_SUMULA.finditer(texto):
+        vinculante, numero, tribunal = sumula.groups()
+        tribunal = 'stf' if vinculante else tribunal
+        yield 'sumula', f"sumula:{_numero(numero)}@{tribunal}" if tribunal else f"sumula:{_numero(numero)}"
+    
+    for tema in _RE_TEMA.finditer(texto):
+        yield 'tema', f"tema:{_numero(tema.group(1))}"
+    
+    for recurso in _RE_RECURSO.finditer(texto):
+        yield 'recurso', f"recurso:{recurso.group(1)}:{_numero(recurso.group(2))}"
+    
+    for processo in _RE_PROCESSO.finditer(texto):
+        yield 'processo', "processo:" + ''.join(processo.groups())
+
+
+def rotulo_citacao(chave: str) -> str:
+    """Forma legível de uma chave (ex: 'sumula:608@stj' → 'Súmula 608/STJ')"""
+    tipo, _, resto = chave.partition(':')
+    referencia, _, diploma = resto.partition('@')
+    
+    if tipo == 'processo':
+        d = referencia
+        return f"Processo {d[:7]}-{d[7:9]}.{d[9:13]}.{d[13]}.{d[14:16]}.{d[16:]}"
+    if tipo == 'recurso':
+        classe, _, numero = referencia.partition(':')
+        nomes = {'resp': 'REsp', 'aresp': 'AREsp', 'eresp': 'EREsp'}
+        return f"{nomes.get(classe, classe.upper())} {numero}"
+    
+    nomes = {'lei': 'Lei', 'lei-complementar': 'LC', 'artigo': 'art.', 'sumula': 'Súmula', 'tema': 'Tema'}
+    rotulo = f"{nomes.get(tipo, tipo)} {referencia.upper() if tipo == 'artigo' else referencia}"
+    if diploma:
+        separador = ' da ' if diploma.startswith('lei') or diploma == 'cf' else ' do ' if tipo == 'artigo' else '/'
+        rotulo += separador + (rotulo_citacao(diploma) if ':' in diploma else diploma.upper())
+    return rotulo
+
+
+class IndiceCitacoes:
+    """Mapa de hash das citações do nível 3 (chave → nº de chunks que a citam)"""
+    
+    def __init__(self, citacoes: Optional[Dict[str, int]] = None, total_chunks: int = 0, chunks_nivel_3: int = 0):
+        """
+        Args:
+            citacoes: Chave normalizada → número de chunks que a citam
+            total_chunks: collection.count() no momento da construção
+            chunks_nivel_3: Chunks de nível 3 indexados
+        """
+        self.citacoes = citacoes or {}
+        self.total_chunks = total_chunks
+        self.chunks_nivel_3 = chunks_nivel_3
+    
+    @classmethod
+    def construir(cls, collection, lote: int = 1000) -> 'IndiceCitacoes':
+        """
+        Constrói o índice a partir dos chunks de nível 3 da collection
+        
+        Args:
+            collection: Collection do ChromaDB
+            lote: Chunks lidos por requisição (limita a memória)
+        
+        Returns:
+            Índice construído
+        """
+        print("🔖 Construindo índice de citações do nível 3...")
+        inicio = time.perf_counter()
+        total_chunks = collection.count()
+        
+        citacoes: Dict[str, int] = {}
+        chunks = 0
+        deslocamento = 0
+        while True:
+            resultado = collection.get(
+                where={'nivel': 3},
+                include=['documents'],
+                limit=lote,
+                offset=deslocamento
+            )
+            documentos = resultado['documents']
+            if not documentos:
+                break
+            
+            for documento in documentos:
+                for chave in cls._chaves_documento(documento or ''):
+                    citacoes[chave] = citacoes.get(chave, 0) + 1
+            
+            chunks += len(documentos)
+            deslocamento += lote
+            if len(documentos) < lote:
+                break
+        
+        print(f"✅ {len(citacoes):,} citações distintas em {chunks:,} chunks "
+              f"({time.perf_counter() - inicio:.1f}s)\n")
+        
+        return cls(citacoes, total_chunks, chunks)
+    
+    @classmethod
+    def carregar_ou_construir(cls, collection, caminho: Optional[Path] = None) -> 'IndiceCitacoes':
+        """
+        Carrega o índice gravado ou o reconstrói se a collection mudou
+        
+        Args:
+            collection: Collection do ChromaDB
+            caminho: Arquivo JSON do índice (padrão: Config.INDICE_CITACOES_PATH)
+        
+        Returns:
+            Índice atualizado
+        """
+        caminho = Path(caminho or Config.INDICE_CITACOES_PATH)
+        indice = cls.carregar(caminho)
+        
+        if indice is not None and indice.total_chunks == collection.count():
+            return indice
+        
+        if indice is not None:
+            print(f"🔄 Collection mudou ({indice.total_chunks:,} → {collection.count():,} chunks)")
+        
+        indice = cls.construir(collection)
+        indice.salvar(caminho)
+        return indice
+    
+    @classmethod
+    def carregar(cls, caminho: Path) -> Optional['IndiceCitacoes']:
+        """Índice gravado (None se ausente, corrompido ou de outra versão)"""
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                dados = json.load(arquivo)
+        except (OSError, json.JSONDecodeError):
+            return None
+        
+        if dados.get('versao') != _VERSAO_INDICE or dados.get('colecao') != Config.COLLECTION_NAME:
+            return None
+        
+        return cls(dados['citacoes'], dados['total_chunks'], dados['chunks_nivel_3'])
+    
+    def salvar(self, caminho: Path):
+        """Grava o índice em JSON (falhas de escrita são apenas avisadas)"""
+        dados = {
+            'versao': _VERSAO_INDICE,
+            'colecao': Config.COLLECTION_NAME,
+            'construido_em': datetime.now().isoformat(timespec='seconds'),
+            'total_chunks': self.total_chunks,
+            'chunks_nivel_3': self.chunks_nivel_3,
+            'citacoes': self.citacoes
+        }
+        
+        try:
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            temporario = caminho.with_suffix('.tmp')
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump(dados, arquivo, ensure_ascii=False)
+            temporario.replace(caminho)
+        except OSError as e:
+            print(f"⚠️  Não foi possível gravar o índice de citações: {e}")
+    
+    def verificar(self, texto: str, tipos: Optional[List[str]] = None) -> Dict:
+        """
+        Verifica as citações de um texto contra o índice
+        
+        Args:
+            texto: Contestação gerada
+            tipos: Tipos verificados (padrão: Config.CITACOES_TIPOS_VERIFICADOS)
+        
+        Returns:
+            Dict com 'verificadas' e 'nao_verificadas' (chaves distintas,
+            na ordem de aparição) e 'duracao_ms'
+        """
+        inicio = time.perf_counter()
+        tipos = set(tipos or Config.CITACOES_TIPOS_VERIFICADOS)
+        
+        verificadas: Dict[str, None] = {}
+        nao_verificadas: Dict[str, None] = {}
+        for tipo, chave in extrair_citacoes(texto):
+            if tipo not in tipos:
+                continue
+            destino = verificadas if chave in self.citacoes else nao_verificadas
+            destino[chave] = None
+        
+        return {
+            'verificadas': list(verificadas),
+            'nao_verificadas': list(nao_verificadas),
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2)
+        }
+    
+    def resumo(self) -> Dict[str, int]:
+        """Número de citações distintas por tipo"""
+        contagem = {tipo: 0 for tipo in TIPOS_CITACAO}
+        for chave in self.citacoes:
+            tipo = chave.split(':', 1)[0]
+            tipo = 'lei' if tipo.startswith('lei') else tipo
+            if tipo in contagem and '@' not in chave:
+                contagem[tipo] += 1
+        return contagem
+    
+    @staticmethod
+    def _chaves_documento(documento: str) -> Set[str]:
+        """Chaves de um chunk, incluindo a forma não qualificada de artigos e súmulas"""
+        chaves = set()
+        for _, chave in extrair_citacoes(documento):
+            chaves.add(chave)
+            if '@' in chave:
+                chaves.add(chave.split('@', 1)[0])
+        return chaves
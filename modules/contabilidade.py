@@ -0,0 +1,274 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+CONTABILIDADE DE TOKENS E CUSTOS
+═══════════════════════════════════════════════════════════════════════════
+Pré-contagem de tokens antes do envio, cálculo de custo com os preços de
+Config.PRECOS_MODELOS e livro de custos persistente (JSONL, somente
+acréscimo) em output_rag/metrics, com agregação por dia, tipo de caso e
+modelo.
+"""
+
+import json
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from config.settings import Config
+from modules.tokens import calibrar, contar_tokens, contar_tokens_brutos
+
+# Campos de uso (tokens) registrados e somados na agregação
+CAMPOS_USO = (
+    'input_tokens',
+    'output_tokens',
+    'cache_creation_input_tokens',
+    'cache_read_input_tokens'
+)
+
+# Dimensões aceitas por LivroCustos.agregar
+DIMENSOES_AGREGACAO = ('dia', 'tipo_caso', 'model', 'operacao')
+
+# Escritas no livro são serializadas entre threads do processo
+_LOCK_LIVRO = threading.Lock()
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PREÇOS E CUSTO
+# ═══════════════════════════════════════════════════════════════════════════
+
+def precos_modelo(modelo: str) -> Dict[str, float]:
+    """
+    Preços por milhão de tokens do modelo
+    
+    Aceita o nome com sufixo de data (ex: claude-sonnet-4-5-20250929),
+    casando pelo prefixo mais longo cadastrado em Config.PRECOS_MODELOS.
+    
+    Args:
+        modelo: Identificador do modelo
+    
+    Returns:
+        Dict com 'input', 'output', 'cache_escrita' e 'cache_leitura'
+    """
+    candidatos = [nome for nome in Config.PRECOS_MODELOS if modelo.startswith(nome)]
+    if not candidatos:
+        raise ValueError(f"Modelo sem preço em Config.PRECOS_MODELOS: {modelo}")
+    
+    return Config.PRECOS_MODELOS[max(candidatos, key=len)]
+
+
+def calcular_custo(modelo: str, uso: Dict, fator_preco: float = 1.0) -> Dict[str, float]:
+    """
+    Calcula o custo de uma requisição
+    
+    Args:
+        modelo: Identificador do modelo
+        uso: Dict com os campos de CAMPOS_USO (ausentes contam como 0)
+        fator_preco: Multiplicador sobre a tabela (ex: desconto de lote)
+    
+    Returns:
+        Custo em USD por componente e 'total'
+    """
+    precos = precos_modelo(modelo)
+    
+    custo = {
+        'input': uso.get('input_tokens', 0) * precos['input'],
+        'output': uso.get('output_tokens', 0) * precos['output'],
+        'cache_escrita': uso.get('cache_creation_input_tokens', 0) * precos['cache_escrita'],
+        'cache_leitura': uso.get('cache_read_input_tokens', 0) * precos['cache_leitura']
+    }
+    custo = {componente: valor * fator_preco / 1_000_000 for componente, valor in custo.items()}
+    custo['total'] = sum(custo.values())
+    
+    return custo
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PRÉ-CONTAGEM
+# ═══════════════════════════════════════════════════════════════════════════
+
+def contar_tokens_requisicao(client, params: Dict) -> Tuple[int, str]:
+    """
+    Conta os tokens de input de uma requisição antes do envio
+    
+    Usa o endpoint count_tokens da Messages API (contagem exata, gratuita);
+    se desativado em Config ou indisponível, soma a contagem local dos
+    blocos de texto do system e das mensagens.
+    
+    Args:
+        client: Cliente anthropic.Anthropic (ou compatível)
+        params: Argumentos que serão passados a messages.create
+    
+    Returns:
+        (tokens de input, origem: 'api' ou 'local')
+    """
+    if Config.CONTAGEM_TOKENS_API and hasattr(client.messages, 'count_tokens'):
+        try:
+            resposta = client.messages.count_tokens(
+                model=params['model'],
+                system=params.get('system', []),
+                messages=params['messages']
+            )
+            # Mesma requisição medida nas duas contagens: recalibra a local
+            calibrar(_contar_tokens_local(params, contar=contar_tokens_brutos), resposta.input_tokens)
+            return resposta.input_tokens, 'api'
+        except Exception as e:
+            print(f"⚠️  count_tokens indisponível ({type(e).__name__}); contando localmente")
+    
+    return _contar_tokens_local(params), 'local'
+
+
+def _contar_tokens_local(params: Dict, contar: Callable[[str], int] = contar_tokens) -> int:
+    """Soma a contagem local dos textos do system e das mensagens"""
+    def textos(conteudo) -> Iterator[str]:
+        if isinstance(conteudo, str):
+            yield conteudo
+            return
+        for bloco in conteudo:
+            if bloco.get('type') == 'text':
+                yield bloco['text']
+    
+    total = sum(contar(texto) for texto in textos(params.get('system', [])))
+    for mensagem in params['messages']:
+        total += sum(contar(texto) for texto in textos(mensagem['content']))
+    
+    return total
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# LIVRO DE CUSTOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+class LivroCustos:
+    """Livro de custos persistente: uma linha JSON por requisição à API"""
+    
+    def __init__(self, caminho: Optional[Path] = None):
+        """
+        Args:
+            caminho: Arquivo JSONL (padrão: Config.LEDGER_CUSTOS)
+        """
+        self.caminho = Path(caminho or Config.LEDGER_CUSTOS)
+    
+    def registrar(
+        self,
+        modelo: str,
+        uso: Dict,
+        operacao: str = 'geracao',
+        tipo_caso: Optional[str] = None,
+        input_tokens_previstos: Optional[int] = None,
+        fator_preco: float = 1.0,
+        referencia: Optional[str] = None
+    ) -> Dict:
+        """
+        Acrescenta uma requisição ao livro
+        
+        Falhas de escrita são apenas avisadas: a contabilidade nunca
+        interrompe uma geração já paga.
+        
+        Args:
+            modelo: Modelo usado
+            uso: Uso retornado pela API (campos de CAMPOS_USO)
+            operacao: 'geracao', 'aquecimento_cache'...
+            tipo_caso: Tipo de caso da petição (se houver)
+            input_tokens_previstos: Pré-contagem feita antes do envio
+            fator_preco: Multiplicador sobre a tabela (ex: desconto de lote)
+            referencia: Identificador da requisição para deduplicação (ex:
+                'lote/custom_id'; ver referencias)
+        
+        Returns:
+            Registro gravado (com o custo calculado)
+        """
+        agora = datetime.now()
+        registro = {
+            'ts': agora.isoformat(timespec='seconds'),
+            'dia': agora.date().isoformat(),
+            'operacao': operacao,
+            'model': modelo,
+            'tipo_caso': tipo_caso,
+            **{campo: uso.get(campo, 0) for campo in CAMPOS_USO},
+            'input_tokens_previstos': input_tokens_previstos,
+            'custo_usd': calcular_custo(modelo, uso, fator_preco),
+            'referencia': referencia
+        }
+        
+        linha = json.dumps(registro, ensure_ascii=False) + "\n"
+        try:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            with _LOCK_LIVRO, open(self.caminho, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(linha)
+        except OSError as e:
+            print(f"⚠️  Não foi possível gravar no livro de custos: {e}")
+        
+        return registro
+    
+    def ler(self, desde: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Percorre os registros do livro
+        
+        Args:
+            desde: Data mínima no formato AAAA-MM-DD (opcional)
+        
+        Yields:
+            Registros em ordem de gravação (linhas corrompidas são ignoradas)
+        """
+        if not self.caminho.exists():
+            return
+        
+        with open(self.caminho, encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue
+                if desde is None or registro.get('dia', '') >= desde:
+                    yield registro
+    
+    def referencias(self, prefixo: str, desde: Optional[str] = None) -> Set[str]:
+        """
+        Referências já registradas que começam com o prefixo
+        
+        Args:
+            prefixo: Início da referência (ex: id do lote + '/')
+            desde: Data mínima no formato AAAA-MM-DD (opcional)
+        
+        Returns:
+            Conjunto de referências
+        """
+        return {
+            registro['referencia'] for registro in self.ler(desde)
+            if (registro.get('referencia') or '').startswith(prefixo)
+        }
+    
+    def agregar(self, por: str = 'dia', desde: Optional[str] = None) -> List[Dict]:
+        """
+        Agrega tokens e custo por dimensão
+        
+        Args:
+            por: Dimensão ('dia', 'tipo_caso', 'model' ou 'operacao')
+            desde: Data mínima no formato AAAA-MM-DD (opcional)
+        
+        Returns:
+            Uma linha por valor da dimensão, ordenadas pelo valor, com
+            requisições, tokens por tipo e custo total em USD
+        """
+        if por not in DIMENSOES_AGREGACAO:
+            raise ValueError(f"Dimensão inválida: {por} (use {', '.join(DIMENSOES_AGREGACAO)})")
+        
+        grupos = defaultdict(lambda: {
+            'requisicoes': 0,
+            **{campo: 0 for campo in CAMPOS_USO},
+            'custo_usd': 0.0
+        })
+        
+        for registro in self.ler(desde):
+            grupo = grupos[registro.get(por) or 'N/A']
+            grupo['requisicoes'] += 1
+            for campo in CAMPOS_USO:
+                grupo[campo] += registro.get(campo, 0)
+            grupo['custo_usd'] += registro.get('custo_usd', {}).get('total', 0.0)
+        
+        return [{por: chave, **valores} for chave, valores in sorted(grupos.items())]
+    
+    def total(self, desde: Optional[str] = None) -> float:
+        """Custo total em USD (opcionalmente a partir de uma data)"""
+        return sum(r.get('custo_usd', {}).get('total', 0.0) for r in self.ler(desde))
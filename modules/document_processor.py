@@ -3,246 +3,594 @@
 PROCESSADOR DE PETIÇÃO INICIAL
 ═══════════════════════════════════════════════════════════════════════════
 Extrai e estrutura informações da petição inicial para alimentar o RAG
+
+A API principal é funcional e sem estado: processar_peticao() e
+processar_peticao_bytes() retornam uma PeticaoProcessada imutável, que
+carrega o próprio texto para embedding. Várias petições podem ser
+processadas em paralelo (threads ou processos) sem estado compartilhado.
 """
 
 import re
+import io
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional
-import PyPDF2
-import docx
+from typing import Dict, List, Optional, Tuple, Union
 
-class ProcessadorPeticao:
-    """Processa petição inicial e extrai informações estruturadas"""
+from config.settings import Config
+from modules.extratores import extrair_texto, selecionar_extrator
+from modules.telemetria import span
+
+# Conteúdo binário aceito por processar_peticao_bytes
+DadosBinarios = Union[bytes, bytearray, memoryview]
+
+# Limite de tamanho do texto para embedding (caracteres)
+MAX_TEXTO_EMBEDDING = 2000
+
+# Valor retornado quando uma parte não é encontrada
+NAO_IDENTIFICADO = "Não identificado"
+
+
+@dataclass(frozen=True)
+class PeticaoProcessada:
+    """Petição inicial processada (imutável e segura para uso concorrente)"""
     
-    def __init__(self):
-        self.texto_completo = ""
-        self.dados_estruturados = {}
+    texto_completo: str
+    autor: str
+    reu: str
+    numero_processo: Optional[str]
+    elementos_facticos: Tuple[str, ...]
+    pedidos: Tuple[str, ...]
+    valor_causa: Optional[str]
+    documentos_anexos: Tuple[str, ...]
+    texto_embedding: str = field(repr=False)
     
-    def processar_arquivo(self, arquivo_path: Path) -> Dict:
+    # Extração incremental: unidades lidas (páginas/parágrafos) e motivo da
+    # parada antecipada ('marcadores', 'limite_paginas' ou None se leu tudo)
+    paginas_lidas: Optional[int] = None
+    motivo_parada: Optional[str] = None
+    
+    def para_dict(self) -> Dict:
         """
-        Processa arquivo de petição e retorna dados estruturados
+        Retorna cópia em dicionário no formato usado pelo pipeline
         
-        Args:
-            arquivo_path: Caminho do arquivo (PDF, DOCX ou TXT)
-            
-        Returns:
-            Dicionário com dados estruturados da petição
+        Cada chamada devolve um dicionário novo; alterações feitas por etapas
+        seguintes (ex: ContextBuilder adicionando tipo_caso) não afetam a
+        petição processada.
         """
-        # Extrair texto baseado no tipo de arquivo
-        extensao = arquivo_path.suffix.lower()
-        
-        if extensao == '.pdf':
-            self.texto_completo = self._extrair_texto_pdf(arquivo_path)
-        elif extensao == '.docx':
-            self.texto_completo = self._extrair_texto_docx(arquivo_path)
+        return {
+            'texto_completo': self.texto_completo,
+            'autor': self.autor,
+            'reu': self.reu,
+            'numero_processo': self.numero_processo,
+            'elementos_facticos': list(self.elementos_facticos),
+            'pedidos': list(self.pedidos),
+            'valor_causa': self.valor_causa,
+            'documentos_anexos': list(self.documentos_anexos)
+        }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# API FUNCIONAL (SEM ESTADO)
+# ═══════════════════════════════════════════════════════════════════════════
+
+def processar_peticao(
+    arquivo_path: Path,
+    extratores: Optional[Dict[str, str]] = None,
+    streaming: Optional[bool] = None,
+    max_paginas: Optional[int] = None
+) -> PeticaoProcessada:
+    """
+    Processa arquivo de petição (PDF, DOCX ou TXT)
+    
+    Args:
+        arquivo_path: Caminho do arquivo
+        extratores: Backend de extração por extensão, ex: {'pdf': 'pdfminer'}
+            (se None, usa o primeiro disponível em Config.EXTRATORES_PREFERIDOS)
+        streaming: Extração incremental com parada antecipada ao fim do corpo
+            da petição (usa Config.EXTRACAO_STREAMING se None)
+        max_paginas: Limite de páginas do PDF no modo streaming
+            (usa Config.MAX_PAGINAS_PETICAO se None)
+    
+    Returns:
+        PeticaoProcessada imutável
+    """
+    arquivo_path = Path(arquivo_path)
+    extensao = arquivo_path.suffix.lower()
+    
+    if extensao in ('.pdf', '.docx'):
+        return _processar_documento(arquivo_path, extensao, extratores, streaming, max_paginas)
+    elif extensao == '.txt':
+        texto = arquivo_path.read_text(encoding='utf-8')
+    else:
+        raise ValueError(f"Formato não suportado: {extensao}")
+    
+    return estruturar_peticao(texto)
+
+
+def processar_peticao_bytes(
+    data: DadosBinarios,
+    extensao: str,
+    extratores: Optional[Dict[str, str]] = None,
+    streaming: Optional[bool] = None,
+    max_paginas: Optional[int] = None
+) -> PeticaoProcessada:
+    """
+    Processa petição diretamente da memória, sem gravar em disco
+    
+    Args:
+        data: Conteúdo do arquivo (bytes, bytearray ou memoryview)
+        extensao: Extensão do arquivo ('pdf', '.pdf', 'docx', 'txt'...)
+        extratores: Backend de extração por extensão (opcional)
+        streaming: Extração incremental com parada antecipada (opcional)
+        max_paginas: Limite de páginas do PDF no modo streaming (opcional)
+    
+    Returns:
+        PeticaoProcessada imutável
+    """
+    extensao = _normalizar_extensao(extensao)
+    
+    with span('extracao', extensao=extensao, bytes=len(data)) as registro:
+        if extensao in ('.pdf', '.docx'):
+            peticao = _processar_documento(_abrir_stream(data), extensao, extratores, streaming, max_paginas)
         elif extensao == '.txt':
-            self.texto_completo = arquivo_path.read_text(encoding='utf-8')
+            peticao = estruturar_peticao(str(memoryview(data), encoding='utf-8'))
         else:
             raise ValueError(f"Formato não suportado: {extensao}")
-        
-        # Extrair informações estruturadas
-        self.dados_estruturados = self._estruturar_dados()
-        
-        return self.dados_estruturados
+        registro.atributos['caracteres'] = len(peticao.texto_completo)
     
-    def _extrair_texto_pdf(self, pdf_path: Path) -> str:
-        """Extrai texto de PDF"""
-        texto = []
-        
-        try:
-            with open(pdf_path, 'rb') as arquivo:
-                leitor = PyPDF2.PdfReader(arquivo)
-                for pagina in leitor.pages:
-                    texto.append(pagina.extract_text())
-        except Exception as e:
-            raise Exception(f"Erro ao ler PDF: {e}")
-        
-        return "\n\n".join(texto)
+    return peticao
+
+
+def estruturar_peticao(
+    texto: str,
+    paginas_lidas: Optional[int] = None,
+    motivo_parada: Optional[str] = None
+) -> PeticaoProcessada:
+    """
+    Extrai informações estruturadas de um texto de petição
     
-    def _extrair_texto_docx(self, docx_path: Path) -> str:
-        """Extrai texto de DOCX"""
-        try:
-            doc = docx.Document(docx_path)
-            texto = [paragrafo.text for paragrafo in doc.paragraphs if paragrafo.text.strip()]
-            return "\n\n".join(texto)
-        except Exception as e:
-            raise Exception(f"Erro ao ler DOCX: {e}")
-    
-    def _estruturar_dados(self) -> Dict:
-        """Extrai informações estruturadas do texto"""
+    Args:
+        texto: Texto completo da petição
+        paginas_lidas: Unidades lidas na extração incremental (opcional)
+        motivo_parada: Motivo da parada antecipada da extração (opcional)
+    
+    Returns:
+        PeticaoProcessada imutável
+    """
+    autor = _extrair_autor(texto)
+    reu = _extrair_reu(texto)
+    elementos_facticos = tuple(_extrair_elementos_facticos(texto))
+    pedidos = tuple(_extrair_pedidos(texto))
+    
+    return PeticaoProcessada(
+        texto_completo=texto,
+        autor=autor,
+        reu=reu,
+        numero_processo=_extrair_numero_processo(texto),
+        elementos_facticos=elementos_facticos,
+        pedidos=pedidos,
+        valor_causa=_extrair_valor_causa(texto),
+        documentos_anexos=tuple(_extrair_documentos_anexos(texto)),
+        texto_embedding=_montar_texto_embedding(autor, reu, elementos_facticos, pedidos),
+        paginas_lidas=paginas_lidas,
+        motivo_parada=motivo_parada
+    )
+
+
+def _processar_documento(
+    fonte,
+    extensao: str,
+    extratores: Optional[Dict[str, str]],
+    streaming: Optional[bool],
+    max_paginas: Optional[int]
+) -> PeticaoProcessada:
+    """Extrai texto de PDF/DOCX (completo ou incremental) e estrutura"""
+    if streaming is None:
+        streaming = Config.EXTRACAO_STREAMING
+    
+    if not streaming:
+        return estruturar_peticao(extrair_texto(fonte, extensao, extratores))
+    
+    # Limite de páginas só se aplica a PDF (em DOCX as unidades são parágrafos)
+    if extensao == '.pdf':
+        max_paginas = max_paginas or Config.MAX_PAGINAS_PETICAO
+    else:
+        max_paginas = None
+    
+    texto, paginas_lidas, motivo = extrair_texto_incremental(
+        fonte, extensao, extratores, max_paginas
+    )
+    return estruturar_peticao(texto, paginas_lidas, motivo)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# EXTRAÇÃO INCREMENTAL (PARADA ANTECIPADA)
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Marcadores de encerramento do corpo da petição
+_RE_ENCERRAMENTO = re.compile(
+    r'NESTES\s+TERMOS|TERMOS\s+EM\s+QUE|PEDE\s+DEFERIMENTO',
+    re.IGNORECASE
+)
+
+_RE_SECAO_FATOS = re.compile(r'DOS?\s+FATOS?|HISTÓRICO|NARRATIVA', re.IGNORECASE)
+
+# Título da seção de pedidos no início da linha (opcionalmente numerado:
+# "III - DOS PEDIDOS", "5. DOS REQUERIMENTOS") ou "REQUER" encerrando a
+# linha ("Diante do exposto, requer:"). "Requerente:" na qualificação e
+# "do pedido de tutela" no meio do texto não contam
+_RE_SECAO_PEDIDOS = re.compile(
+    r'^\s*(?:(?:\d+|[IVXLC]+)\s*[-–—.)]\s*)?(?:DOS?\s+PEDIDOS?|DOS\s+REQUERIMENTOS)\b'
+    r'|\bREQUER\s*(?::|$)',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+class DetectorSecoesIncremental:
+    """
+    Detecta, página a página, quando o corpo da petição terminou
+    
+    Cada página é analisada junto com o final da anterior (para capturar
+    padrões que atravessam a quebra de página), de modo que o custo total
+    é linear no tamanho do corpo lido.
+    """
+    
+    # Verificação de cada campo sobre a janela de texto
+    VERIFICADORES = {
+        'autor': lambda texto: _extrair_autor(texto) != NAO_IDENTIFICADO,
+        'reu': lambda texto: _extrair_reu(texto) != NAO_IDENTIFICADO,
+        'fatos': lambda texto: _RE_SECAO_FATOS.search(texto) is not None,
+        'pedidos': lambda texto: _RE_SECAO_PEDIDOS.search(texto) is not None,
+        'valor_causa': lambda texto: _extrair_valor_causa(texto) is not None
+    }
+    
+    def __init__(self, campos_obrigatorios: Optional[List[str]] = None, janela: int = 300):
+        """
+        Inicializa detector
         
-        dados = {
-            'texto_completo': self.texto_completo,
-            'autor': self._extrair_autor(),
-            'reu': self._extrair_reu(),
-            'numero_processo': self._extrair_numero_processo(),
-            'elementos_facticos': self._extrair_elementos_facticos(),
-            'pedidos': self._extrair_pedidos(),
-            'valor_causa': self._extrair_valor_causa(),
-            'documentos_anexos': self._extrair_documentos_anexos()
-        }
+        Args:
+            campos_obrigatorios: Campos exigidos antes de parar
+                (usa Config.CAMPOS_OBRIGATORIOS_EXTRACAO se None)
+            janela: Caracteres da página anterior reanalisados junto à atual
+        """
+        campos = campos_obrigatorios or Config.CAMPOS_OBRIGATORIOS_EXTRACAO
+        self.pendentes = [c for c in campos if c in self.VERIFICADORES]
+        self.encerramento = False
+        self.janela = janela
+        self._cauda = ""
+    
+    def alimentar(self, pagina: str) -> bool:
+        """
+        Analisa nova página
         
-        return dados
-    
-    def _extrair_autor(self) -> str:
-        """Extrai nome do autor da petição"""
-        # Padrões comuns
-        padroes = [
-            r'(?:Autor|Requerente|Impetrante):\s*([^\n]+)',
-            r'(?:vem\s+)?([A-ZÀ-Ú][a-zà-ú]+(?:\s+[A-ZÀ-Ú][a-zà-ú]+)+),?\s+(?:brasileiro|brasileiro\(a\)|nacionalidade)',
-            r'([A-ZÀ-Ú][a-zà-ú]+(?:\s+[A-ZÀÚ][a-zà-ú]+)+),?\s+(?:portador|portadora)'
-        ]
+        Args:
+            pagina: Texto da página (ou parágrafo)
         
-        for padrao in padroes:
-            match = re.search(padrao, self.texto_completo, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+        Returns:
+            True se o corpo da petição já está completo (pode parar)
+        """
+        texto = self._cauda + pagina
+        self._cauda = texto[-self.janela:]
         
-        return "Não identificado"
-    
-    def _extrair_reu(self) -> str:
-        """Extrai nome do réu"""
-        # Padrões comuns
-        padroes = [
-            r'(?:Réu|Requerido|Impetrado):\s*([^\n]+)',
-            r'(?:contra|em\s+face\s+(?:de|da))\s+([A-Z][A-Z\s]+(?:LTDA|S\.?A\.?|COOPERATIVA)?)',
-            r'(UNIMED[^\n,\.]+)'
+        self.pendentes = [
+            campo for campo in self.pendentes
+            if not self.VERIFICADORES[campo](texto)
         ]
         
-        for padrao in padroes:
-            match = re.search(padrao, self.texto_completo, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-        
-        # Padrão: UNIMED
-        if 'UNIMED' in self.texto_completo.upper():
-            return "UNIMED FERJ"
+        if not self.encerramento and _RE_ENCERRAMENTO.search(texto):
+            self.encerramento = True
         
-        return "Não identificado"
+        return self.completo
     
-    def _extrair_numero_processo(self) -> Optional[str]:
-        """Extrai número do processo"""
-        # Padrão CNJ: NNNNNNN-DD.AAAA.J.TR.OOOO
-        padrao = r'\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4}'
-        match = re.search(padrao, self.texto_completo)
-        
-        if match:
-            return match.group(0)
+    @property
+    def completo(self) -> bool:
+        """Marcadores de encerramento encontrados e nenhum campo pendente"""
+        return self.encerramento and not self.pendentes
+
+
+def extrair_texto_incremental(
+    fonte,
+    extensao: str,
+    extratores: Optional[Dict[str, str]] = None,
+    max_paginas: Optional[int] = None,
+    detector: Optional[DetectorSecoesIncremental] = None
+) -> Tuple[str, int, Optional[str]]:
+    """
+    Extrai páginas sob demanda até o fim do corpo da petição
+    
+    Anexos (prontuários, laudos etc.) após "NESTES TERMOS" e a assinatura
+    não são extraídos: tempo e memória acompanham o corpo, não o arquivo.
+    
+    Args:
+        fonte: Caminho do arquivo ou stream binário
+        extensao: Extensão do arquivo ('.pdf' ou '.docx')
+        extratores: Backend de extração por extensão (opcional)
+        max_paginas: Limite de páginas/unidades lidas (None = sem limite)
+        detector: Detector de seções (usa um novo se None)
+    
+    Returns:
+        Tupla (texto, unidades lidas, motivo da parada ou None)
+    """
+    detector = detector or DetectorSecoesIncremental()
+    extrator = selecionar_extrator(extensao, (extratores or {}).get(extensao.lstrip('.')))
+    
+    paginas = []
+    motivo = None
+    
+    try:
+        iterador = extrator.extrair_paginas(fonte)
+        try:
+            for pagina in iterador:
+                paginas.append(pagina)
+                
+                if detector.alimentar(pagina):
+                    motivo = 'marcadores'
+                    break
+                
+                if max_paginas and len(paginas) >= max_paginas:
+                    motivo = 'limite_paginas'
+                    break
+        finally:
+            # Libera o documento no backend (ex: fecha o PDF no pypdfium2)
+            iterador.close()
+    except Exception as e:
+        raise Exception(f"Erro ao ler {extensao.lstrip('.').upper()}: {e}")
+    
+    return "\n\n".join(paginas), len(paginas), motivo
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# COMPATIBILIDADE
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ProcessadorPeticao:
+    """
+    Processa petição inicial e extrai informações estruturadas
+    
+    Mantido por compatibilidade: guarda a última petição processada na
+    instância. Para uso concorrente, prefira processar_peticao() e
+    processar_peticao_bytes().
+    """
+    
+    def __init__(self, extratores: Optional[Dict[str, str]] = None):
+        """
+        Inicializa processador
         
-        return None
+        Args:
+            extratores: Backend de extração por extensão, ex: {'pdf': 'pypdfium2'}
+                (se None, seleciona automaticamente pela disponibilidade)
+        """
+        self.extratores = extratores
+        self.texto_completo = ""
+        self.dados_estruturados = {}
+        self.peticao: Optional[PeticaoProcessada] = None
     
-    def _extrair_elementos_facticos(self) -> List[str]:
-        """Extrai os principais fatos alegados"""
-        elementos = []
+    def processar_arquivo(self, arquivo_path: Path) -> Dict:
+        """
+        Processa arquivo de petição e retorna dados estruturados
         
-        # Procurar seção "DOS FATOS"
-        match_fatos = re.search(
-            r'(?:DOS?\s+FATOS?|HISTÓRICO|NARRATIVA)[:\s]*(.+?)(?=DOS?\s+DIREITOS?|FUNDAMENTAÇÃO|DO\s+PEDIDO|$)',
-            self.texto_completo,
-            re.IGNORECASE | re.DOTALL
-        )
+        Args:
+            arquivo_path: Caminho do arquivo (PDF, DOCX ou TXT)
         
-        if match_fatos:
-            secao_fatos = match_fatos.group(1)
-            
-            # Dividir em parágrafos
-            paragrafos = [p.strip() for p in secao_fatos.split('\n\n') if len(p.strip()) > 50]
-            elementos = paragrafos[:10]  # Limitar a 10 elementos principais
+        Returns:
+            Dicionário com dados estruturados da petição
+        """
+        return self._registrar(processar_peticao(arquivo_path, self.extratores))
+    
+    def processar_bytes(self, data: DadosBinarios, extensao: str) -> Dict:
+        """
+        Processa petição diretamente da memória, sem gravar em disco
         
-        # Se não encontrou seção específica, extrair primeiros parágrafos substantivos
-        if not elementos:
-            paragrafos = self.texto_completo.split('\n\n')
-            elementos = [p.strip() for p in paragrafos if len(p.strip()) > 100][:5]
+        Args:
+            data: Conteúdo do arquivo (bytes, bytearray ou memoryview)
+            extensao: Extensão do arquivo ('pdf', '.pdf', 'docx', 'txt'...)
         
-        return elementos
+        Returns:
+            Dicionário com dados estruturados da petição
+        """
+        return self._registrar(processar_peticao_bytes(data, extensao, self.extratores))
+    
+    def _registrar(self, peticao: PeticaoProcessada) -> Dict:
+        """Guarda a petição processada como estado da instância"""
+        self.peticao = peticao
+        self.texto_completo = peticao.texto_completo
+        self.dados_estruturados = peticao.para_dict()
+        return self.dados_estruturados
+    
+    def get_texto_para_embedding(self) -> str:
+        """Retorna texto otimizado para geração de embedding"""
+        return self.peticao.texto_embedding if self.peticao else ""
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# EXTRAÇÃO DE CAMPOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _extrair_autor(texto: str) -> str:
+    """Extrai nome do autor da petição"""
+    # Padrões comuns
+    padroes = [
+        r'(?:Autor|Requerente|Impetrante):\s*([^\n]+)',
+        r'(?:vem\s+)?([A-ZÀ-Ú][a-zà-ú]+(?:\s+[A-ZÀ-Ú][a-zà-ú]+)+),?\s+(?:brasileiro|brasileiro\(a\)|nacionalidade)',
+        r'([A-ZÀ-Ú][a-zà-ú]+(?:\s+[A-ZÀÚ][a-zà-ú]+)+),?\s+(?:portador|portadora)'
+    ]
+    
+    for padrao in padroes:
+        match = re.search(padrao, texto, re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    
+    return NAO_IDENTIFICADO
+
+
+def _extrair_reu(texto: str) -> str:
+    """Extrai nome do réu"""
+    # Padrões comuns
+    padroes = [
+        r'(?:Réu|Requerido|Impetrado):\s*([^\n]+)',
+        r'(?:contra|em\s+face\s+(?:de|da))\s+([A-Z][A-Z\s]+(?:LTDA|S\.?A\.?|COOPERATIVA)?)',
+        r'(UNIMED[^\n,\.]+)'
+    ]
+    
+    for padrao in padroes:
+        match = re.search(padrao, texto, re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    
+    # Padrão: UNIMED
+    if 'UNIMED' in texto.upper():
+        return "UNIMED FERJ"
+    
+    return NAO_IDENTIFICADO
+
+
+def _extrair_numero_processo(texto: str) -> Optional[str]:
+    """Extrai número do processo"""
+    # Padrão CNJ: NNNNNNN-DD.AAAA.J.TR.OOOO
+    padrao = r'\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4}'
+    match = re.search(padrao, texto)
+    
+    if match:
+        return match.group(0)
+    
+    return None
+
+
+def _extrair_elementos_facticos(texto: str) -> List[str]:
+    """Extrai os principais fatos alegados"""
+    elementos = []
+    
+    # Procurar seção "DOS FATOS"
+    match_fatos = re.search(
+        r'(?:DOS?\s+FATOS?|HISTÓRICO|NARRATIVA)[:\s]*(.+?)(?=DOS?\s+DIREITOS?|FUNDAMENTAÇÃO|DO\s+PEDIDO|$)',
+        texto,
+        re.IGNORECASE | re.DOTALL
+    )
     
-    def _extrair_pedidos(self) -> List[str]:
-        """Extrai os pedidos formulados"""
-        pedidos = []
+    if match_fatos:
+        secao_fatos = match_fatos.group(1)
         
-        # Procurar seção "DOS PEDIDOS" ou "REQUER"
-        match_pedidos = re.search(
-            r'(?:DOS?\s+PEDIDOS?|REQUER|REQUERIMENTOS?)[:\s]*(.+?)(?=NESTES\s+TERMOS|VALOR\s+DA\s+CAUSA|$)',
-            self.texto_completo,
-            re.IGNORECASE | re.DOTALL
+        # Dividir em parágrafos
+        paragrafos = [p.strip() for p in secao_fatos.split('\n\n') if len(p.strip()) > 50]
+        elementos = paragrafos[:10]  # Limitar a 10 elementos principais
+    
+    # Se não encontrou seção específica, extrair primeiros parágrafos substantivos
+    if not elementos:
+        paragrafos = texto.split('\n\n')
+        elementos = [p.strip() for p in paragrafos if len(p.strip()) > 100][:5]
+    
+    return elementos
+
+
+def _extrair_pedidos(texto: str) -> List[str]:
+    """Extrai os pedidos formulados"""
+    pedidos = []
+    
+    # Procurar seção "DOS PEDIDOS" ou "REQUER"
+    match_pedidos = re.search(
+        r'(?:DOS?\s+PEDIDOS?|REQUER|REQUERIMENTOS?)[:\s]*(.+?)(?=NESTES\s+TERMOS|VALOR\s+DA\s+CAUSA|$)',
+        texto,
+        re.IGNORECASE | re.DOTALL
+    )
+    
+    if match_pedidos:
+        secao_pedidos = match_pedidos.group(1)
+        
+        # Encontrar itens numerados ou com alíneas
+        itens = re.findall(
+            r'(?:[a-z]\)|[ivx]+\)|\d+\.|\d+\))\s*([^\n]+)',
+            secao_pedidos,
+            re.IGNORECASE
         )
         
-        if match_pedidos:
-            secao_pedidos = match_pedidos.group(1)
-            
-            # Encontrar itens numerados ou com alíneas
-            itens = re.findall(
-                r'(?:[a-z]\)|[ivx]+\)|\d+\.|\d+\))\s*([^\n]+)',
+        if itens:
+            pedidos = [item.strip() for item in itens]
+        else:
+            # Se não tem numeração, pegar frases que começam com verbos típicos
+            frases = re.findall(
+                r'((?:seja|sejam|determine|condene|declare)[^\.\n]+\.)',
                 secao_pedidos,
                 re.IGNORECASE
             )
-            
-            if itens:
-                pedidos = [item.strip() for item in itens]
-            else:
-                # Se não tem numeração, pegar frases que começam com verbos típicos
-                frases = re.findall(
-                    r'((?:seja|sejam|determine|condene|declare)[^\.\n]+\.)',
-                    secao_pedidos,
-                    re.IGNORECASE
-                )
-                pedidos = [f.strip() for f in frases]
-        
-        return pedidos
-    
-    def _extrair_valor_causa(self) -> Optional[str]:
-        """Extrai valor da causa"""
-        # Padrões comuns
-        padroes = [
-            r'(?:VALOR\s+DA\s+CAUSA|DÁ-SE\s+À\s+CAUSA)[:\s]*R?\$?\s*([\d\.,]+)',
-            r'R\$\s*([\d\.,]+)\s*\(.*?\)',  # Valor por extenso
-        ]
-        
-        for padrao in padroes:
-            match = re.search(padrao, self.texto_completo, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-        
-        return None
+            pedidos = [f.strip() for f in frases]
     
-    def _extrair_documentos_anexos(self) -> List[str]:
-        """Lista documentos anexos mencionados"""
-        documentos = []
-        
-        # Padrões comuns
-        match = re.search(
-            r'(?:DOCUMENTOS?|ANEXOS?|INSTRUI)[:\s]*(.+?)(?=\n\n|$)',
-            self.texto_completo,
-            re.IGNORECASE | re.DOTALL
-        )
-        
+    return pedidos
+
+
+def _extrair_valor_causa(texto: str) -> Optional[str]:
+    """Extrai valor da causa"""
+    # Padrões comuns
+    padroes = [
+        r'(?:VALOR\s+DA\s+CAUSA|DÁ-SE\s+À\s+CAUSA)[:\s]*R?\$?\s*([\d\.,]+)',
+        r'R\$\s*([\d\.,]+)\s*\(.*?\)',  # Valor por extenso
+    ]
+    
+    for padrao in padroes:
+        match = re.search(padrao, texto, re.IGNORECASE)
         if match:
-            secao_docs = match.group(1)
-            itens = re.findall(r'(?:[a-z]\)|\d+\.)\s*([^\n]+)', secao_docs, re.IGNORECASE)
-            documentos = [item.strip() for item in itens if item.strip()]
-        
-        return documentos
+            return match.group(1).strip()
     
-    def get_texto_para_embedding(self) -> str:
-        """Retorna texto otimizado para geração de embedding"""
-        # Combinar elementos principais para embedding mais relevante
-        partes = [
-            self.dados_estruturados.get('autor', ''),
-            self.dados_estruturados.get('reu', ''),
-        ]
-        
-        # Adicionar resumo dos fatos (primeiros 3)
-        fatos = self.dados_estruturados.get('elementos_facticos', [])[:3]
-        partes.extend(fatos)
-        
-        # Adicionar pedidos (primeiros 2)
-        pedidos = self.dados_estruturados.get('pedidos', [])[:2]
-        partes.extend(pedidos)
-        
-        texto_embedding = " | ".join([p for p in partes if p])
-        
-        # Limitar tamanho (para eficiência do embedding)
-        if len(texto_embedding) > 2000:
-            texto_embedding = texto_embedding[:2000]
-        
-        return texto_embedding
+    return None
+
+
+def _extrair_documentos_anexos(texto: str) -> List[str]:
+    """Lista documentos anexos mencionados"""
+    documentos = []
+    
+    # Padrões comuns
+    match = re.search(
+        r'(?:DOCUMENTOS?|ANEXOS?|INSTRUI)[:\s]*(.+?)(?=\n\n|$)',
+        texto,
+        re.IGNORECASE | re.DOTALL
+    )
+    
+    if match:
+        secao_docs = match.group(1)
+        itens = re.findall(r'(?:[a-z]\)|\d+\.)\s*([^\n]+)', secao_docs, re.IGNORECASE)
+        documentos = [item.strip() for item in itens if item.strip()]
+    
+    return documentos
+
+
+def _montar_texto_embedding(
+    autor: str,
+    reu: str,
+    elementos_facticos: Tuple[str, ...],
+    pedidos: Tuple[str, ...]
+) -> str:
+    """Monta texto otimizado para geração de embedding"""
+    # Combinar elementos principais para embedding mais relevante
+    partes = [autor, reu]
+    
+    # Adicionar resumo dos fatos (primeiros 3)
+    partes.extend(elementos_facticos[:3])
+    
+    # Adicionar pedidos (primeiros 2)
+    partes.extend(pedidos[:2])
+    
+    texto_embedding = " | ".join([p for p in partes if p])
+    
+    # Limitar tamanho (para eficiência do embedding)
+    return texto_embedding[:MAX_TEXTO_EMBEDDING]
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# LEITURA EM MEMÓRIA
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _normalizar_extensao(extensao: str) -> str:
+    """Normaliza extensão para o formato '.ext' em minúsculas"""
+    extensao = extensao.lower().strip()
+    return extensao if extensao.startswith('.') else f".{extensao}"
+
+
+def _abrir_stream(data: DadosBinarios) -> io.BytesIO:
+    """
+    Abre stream binário sobre o conteúdo em memória
+    
+    BytesIO inicializado com bytes compartilha o buffer original (sem cópia
+    até a primeira escrita); bytearray/memoryview são copiados uma única vez.
+    """
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    return io.BytesIO(memoryview(data).tobytes())
@@ -0,0 +1,364 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+EXTRATORES DE TEXTO - BACKENDS PLUGÁVEIS
+═══════════════════════════════════════════════════════════════════════════
+Backends de extração de texto para PDF e DOCX, selecionados
+automaticamente conforme disponibilidade e Config.EXTRATORES_PREFERIDOS.
+Use scripts/benchmark_extracao.py para escolher o mais rápido no hardware.
+"""
+
+import io
+import importlib.util
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Type, Union
+
+from config.settings import Config
+
+# Fonte aceita pelos extratores: caminho em disco ou stream binário
+FonteDocumento = Union[Path, BinaryIO]
+
+# Namespace principal do WordprocessingML
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class ExtratorTexto:
+    """Interface base dos backends de extração"""
+    
+    # Identificador usado em Config.EXTRATORES_PREFERIDOS
+    nome: str = ''
+    
+    # Extensões suportadas ('.pdf', '.docx')
+    extensoes: tuple = ()
+    
+    # Módulo Python exigido pelo backend (None = apenas stdlib)
+    dependencia: Optional[str] = None
+    
+    @classmethod
+    def disponivel(cls) -> bool:
+        """Indica se a dependência do backend está instalada"""
+        if cls.dependencia is None:
+            return True
+        return importlib.util.find_spec(cls.dependencia) is not None
+    
+    def extrair_paginas(self, fonte: FonteDocumento) -> Iterator[str]:
+        """
+        Extrai texto de forma incremental
+        
+        Args:
+            fonte: Caminho do arquivo ou stream binário
+        
+        Yields:
+            Texto de cada página (PDF) ou parágrafo não vazio (DOCX)
+        """
+        raise NotImplementedError
+    
+    def extrair_texto(self, fonte: FonteDocumento) -> str:
+        """Extrai texto completo, unindo páginas/parágrafos por linha em branco"""
+        return "\n\n".join(self.extrair_paginas(fonte))
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PDF
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ExtratorPyPdfium2(ExtratorTexto):
+    """PDF via pypdfium2 (binding do PDFium, o mais rápido em geral)"""
+    
+    nome = 'pypdfium2'
+    extensoes = ('.pdf',)
+    dependencia = 'pypdfium2'
+    
+    def extrair_paginas(self, fonte: FonteDocumento) -> Iterator[str]:
+        import pypdfium2 as pdfium
+        
+        documento = pdfium.PdfDocument(fonte)
+        try:
+            for indice in range(len(documento)):
+                pagina = documento[indice]
+                pagina_texto = pagina.get_textpage()
+                try:
+                    yield pagina_texto.get_text_range().replace('\r\n', '\n')
+                finally:
+                    pagina_texto.close()
+                    pagina.close()
+        finally:
+            documento.close()
+
+
+class ExtratorPyPDF2(ExtratorTexto):
+    """PDF via PyPDF2 (dependência padrão do projeto)"""
+    
+    nome = 'pypdf2'
+    extensoes = ('.pdf',)
+    dependencia = 'PyPDF2'
+    
+    def extrair_paginas(self, fonte: FonteDocumento) -> Iterator[str]:
+        import PyPDF2
+        
+        leitor = PyPDF2.PdfReader(fonte)
+        for pagina in leitor.pages:
+            yield pagina.extract_text()
+
+
+class ExtratorPdfMiner(ExtratorTexto):
+    """PDF via pdfminer.six (análise de layout mais fiel, porém mais lenta)"""
+    
+    nome = 'pdfminer'
+    extensoes = ('.pdf',)
+    dependencia = 'pdfminer'
+    
+    def extrair_paginas(self, fonte: FonteDocumento) -> Iterator[str]:
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        
+        arquivo = open(fonte, 'rb') if isinstance(fonte, Path) else fonte
+        try:
+            recursos = PDFResourceManager()
+            for pagina in PDFPage.get_pages(arquivo):
+                saida = io.StringIO()
+                dispositivo = TextConverter(recursos, saida, laparams=LAParams())
+                PDFPageInterpreter(recursos, dispositivo).process_page(pagina)
+                dispositivo.close()
+                yield saida.getvalue()
+        finally:
+            if arquivo is not fonte:
+                arquivo.close()
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# DOCX
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ExtratorDocxXml(ExtratorTexto):
+    """
+    DOCX em streaming, lendo word/document.xml direto do pacote
+    
+    Usa zipfile + iterparse sem montar o modelo de objetos do python-docx.
+    Emite parágrafos e linhas de tabela (células separadas por " | ") na
+    ordem do documento; cada bloco é descartado após emitido, de modo que a
+    memória fica limitada ao maior parágrafo/linha, não ao documento.
+    """
+    
+    nome = 'docx_xml'
+    extensoes = ('.docx',)
+    dependencia = None
+    
+    def extrair_paginas(self, fonte: FonteDocumento) -> Iterator[str]:
+        with zipfile.ZipFile(fonte) as pacote:
+            with pacote.open('word/document.xml') as documento_xml:
+                yield from _iterar_blocos_docx(documento_xml)
+
+
+# Tags usadas pelo leitor em streaming
+_W_P = f'{_W_NS}p'
+_W_TBL = f'{_W_NS}tbl'
+_W_TR = f'{_W_NS}tr'
+_W_TC = f'{_W_NS}tc'
+_W_R = f'{_W_NS}r'
+_W_T = f'{_W_NS}t'
+_W_TAB = f'{_W_NS}tab'
+_W_QUEBRAS = (f'{_W_NS}br', f'{_W_NS}cr')
+
+
+def _iterar_blocos_docx(documento_xml: BinaryIO) -> Iterator[str]:
+    """
+    Percorre o document.xml emitindo parágrafos e linhas de tabela
+    
+    Mantém apenas a pilha de ancestrais do elemento corrente. Parágrafos
+    fora de tabelas e linhas de tabelas de primeiro nível são removidos da
+    árvore assim que emitidos (element clearing). Parágrafos aninhados
+    (caixas de texto) e tabelas internas entram no texto do bloco externo.
+    """
+    pilha: List[ET.Element] = []
+    paragrafos_abertos = 0
+    tabelas_abertas = 0
+    
+    for evento, elemento in ET.iterparse(documento_xml, events=('start', 'end')):
+        tag = elemento.tag
+        
+        if evento == 'start':
+            if tag == _W_P:
+                paragrafos_abertos += 1
+            elif tag == _W_TBL:
+                tabelas_abertas += 1
+            pilha.append(elemento)
+            continue
+        
+        pilha.pop()
+        
+        if tag == _W_P:
+            paragrafos_abertos -= 1
+            if paragrafos_abertos or tabelas_abertas:
+                continue
+            texto = _texto_paragrafo(elemento)
+            if texto.strip():
+                yield texto
+        
+        elif tag == _W_TR:
+            if paragrafos_abertos or tabelas_abertas != 1:
+                continue
+            texto = _texto_linha_tabela(elemento)
+            if texto.strip():
+                yield texto
+        
+        elif tag == _W_TBL:
+            tabelas_abertas -= 1
+            if paragrafos_abertos or tabelas_abertas:
+                continue
+        
+        else:
+            continue
+        
+        # Bloco emitido: descartar da árvore para manter memória limitada
+        if pilha:
+            pilha[-1].remove(elemento)
+
+
+def _texto_paragrafo(paragrafo: ET.Element) -> str:
+    """Texto de um <w:p>, com tabulações e quebras como no python-docx"""
+    partes = []
+    
+    # Apenas filhos de <w:r>: <w:tab> também aparece nas tabulações de <w:pPr>
+    for run in paragrafo.iter(_W_R):
+        for elemento in run:
+            tag = elemento.tag
+            if tag == _W_T:
+                partes.append(elemento.text or '')
+            elif tag == _W_TAB:
+                partes.append('\t')
+            elif tag in _W_QUEBRAS:
+                partes.append('\n')
+    
+    return ''.join(partes)
+
+
+def _texto_linha_tabela(linha: ET.Element) -> str:
+    """Texto de uma linha de tabela: células separadas por ' | '"""
+    celulas = []
+    
+    for celula in linha.findall(_W_TC):
+        partes = []
+        for bloco in celula:
+            if bloco.tag == _W_P:
+                partes.append(_texto_paragrafo(bloco))
+            elif bloco.tag == _W_TBL:
+                # Tabela aninhada: linhas internas entram na célula externa
+                partes.extend(_texto_linha_tabela(tr) for tr in bloco.findall(_W_TR))
+        celulas.append(' '.join(p.strip() for p in partes if p.strip()))
+    
+    return ' | '.join(celulas)
+
+
+class ExtratorPythonDocx(ExtratorTexto):
+    """DOCX via python-docx (modelo de objetos completo)"""
+    
+    nome = 'python_docx'
+    extensoes = ('.docx',)
+    dependencia = 'docx'
+    
+    def extrair_paginas(self, fonte: FonteDocumento) -> Iterator[str]:
+        import docx
+        
+        documento = docx.Document(fonte)
+        for paragrafo in documento.paragraphs:
+            if paragrafo.text.strip():
+                yield paragrafo.text
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# REGISTRO E SELEÇÃO
+# ═══════════════════════════════════════════════════════════════════════════
+
+EXTRATORES: Dict[str, Type[ExtratorTexto]] = {
+    extrator.nome: extrator
+    for extrator in (
+        ExtratorPyPdfium2,
+        ExtratorPyPDF2,
+        ExtratorPdfMiner,
+        ExtratorDocxXml,
+        ExtratorPythonDocx
+    )
+}
+
+
+def listar_extratores(extensao: str, apenas_disponiveis: bool = True) -> List[Type[ExtratorTexto]]:
+    """
+    Lista backends para uma extensão, na ordem de preferência configurada
+    
+    Args:
+        extensao: Extensão do arquivo ('.pdf', 'docx'...)
+        apenas_disponiveis: Se True, omite backends sem dependência instalada
+    
+    Returns:
+        Lista de classes de extrator
+    """
+    extensao = extensao if extensao.startswith('.') else f'.{extensao}'
+    preferidos = Config.EXTRATORES_PREFERIDOS.get(extensao.lstrip('.'), [])
+    
+    # Preferidos primeiro, demais backends registrados em seguida
+    nomes = list(preferidos) + [n for n in EXTRATORES if n not in preferidos]
+    
+    extratores = [
+        EXTRATORES[nome] for nome in nomes
+        if nome in EXTRATORES and extensao in EXTRATORES[nome].extensoes
+    ]
+    
+    if apenas_disponiveis:
+        extratores = [e for e in extratores if e.disponivel()]
+    
+    return extratores
+
+
+def selecionar_extrator(extensao: str, nome: Optional[str] = None) -> ExtratorTexto:
+    """
+    Seleciona backend de extração
+    
+    Args:
+        extensao: Extensão do arquivo ('.pdf', 'docx'...)
+        nome: Backend específico (se None, usa o primeiro disponível)
+    
+    Returns:
+        Instância do extrator
+    """
+    if nome is not None:
+        if nome not in EXTRATORES:
+            raise ValueError(f"Extrator desconhecido: {nome}")
+        extrator = EXTRATORES[nome]
+        if not extrator.disponivel():
+            raise ValueError(f"Extrator '{nome}' indisponível: instale '{extrator.dependencia}'")
+        return extrator()
+    
+    disponiveis = listar_extratores(extensao)
+    if not disponiveis:
+        raise ValueError(f"Nenhum extrator disponível para: {extensao}")
+    
+    return disponiveis[0]()
+
+
+def extrair_texto(
+    fonte: FonteDocumento,
+    extensao: str,
+    extratores: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    Extrai texto de PDF ou DOCX com o backend selecionado
+    
+    Args:
+        fonte: Caminho do arquivo ou stream binário
+        extensao: Extensão do arquivo ('.pdf' ou '.docx')
+        extratores: Backend por extensão, ex: {'pdf': 'pdfminer'} (opcional)
+    
+    Returns:
+        Texto extraído
+    """
+    nome = (extratores or {}).get(extensao.lstrip('.'))
+    extrator = selecionar_extrator(extensao, nome)
+    
+    try:
+        return extrator.extrair_texto(fonte)
+    except Exception as e:
+        raise Exception(f"Erro ao ler {extensao.lstrip('.').upper()}: {e}")
@@ -0,0 +1,414 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+FILA DE JOBS DE GERAÇÃO EM SEGUNDO PLANO
+═══════════════════════════════════════════════════════════════════════════
+Executa o pipeline completo (modules.pipeline) de cada petição como um job
+em um pool de workers com concorrência limitada, fora da thread do script
+do Streamlit: reruns e interações na interface não interrompem a geração,
+e vários jobs podem ser enfileirados.
+
+O estado de cada job (status, progresso por etapa, erro) é gravado em
+Config.JOBS_DIR a cada mudança, com o arquivo da petição e o resultado ao
+lado; jobs pendentes ou interrompidos por um reinício são retomados e jobs
+finalizados há mais de Config.JOBS_TTL_SEGUNDOS são removidos. A interface
+consulta o estado (polling) ou assina as mudanças (assinar).
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config.settings import Config
+from modules.pipeline import ETAPAS, ErroPipeline, PipelineContestacao
+
+# Status do job
+STATUS_NA_FILA = 'na_fila'
+STATUS_EXECUTANDO = 'executando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_FALHOU = 'falhou'
+
+STATUS_FINAIS = (STATUS_CONCLUIDO, STATUS_FALHOU)
+
+# Status de cada etapa
+ETAPA_PENDENTE = 'pendente'
+ETAPA_EXECUTANDO = 'executando'
+ETAPA_CONCLUIDA = 'concluida'
+ETAPA_FALHOU = 'falhou'
+
+
+class FilaJobs:
+    """Pool de workers com estado persistente por job"""
+    
+    def __init__(
+        self,
+        pipeline: Optional[PipelineContestacao] = None,
+        diretorio: Optional[Path] = None,
+        max_concorrentes: Optional[int] = None
+    ):
+        """
+        Args:
+            pipeline: Pipeline executado pelos workers (padrão: criado no
+                primeiro job, com os recursos compartilhados do processo)
+            diretorio: Diretório do estado dos jobs (padrão: Config.JOBS_DIR)
+            max_concorrentes: Jobs executados ao mesmo tempo (padrão:
+                Config.JOBS_MAX_CONCORRENTES)
+        """
+        self.diretorio = Path(diretorio or Config.JOBS_DIR)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.max_concorrentes = max_concorrentes or Config.JOBS_MAX_CONCORRENTES
+        
+        self._pipeline = pipeline
+        self._lock_pipeline = threading.Lock()
+        
+        self._estados: Dict[str, Dict] = {}
+        self._parciais: Dict[str, List[str]] = {}
+        self._assinantes: List[Callable[[Dict], None]] = []
+        self._condicao = threading.Condition()
+        
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concorrentes,
+            thread_name_prefix='job-contestacao'
+        )
+        self._retomar()
+    
+    def submeter(
+        self,
+        conteudo: bytes,
+        extensao: str,
+        referencia: str,
+        opcoes: Optional[Dict] = None
+    ) -> str:
+        """
+        Enfileira a geração de uma petição
+        
+        Args:
+            conteudo: Bytes do arquivo da petição
+            extensao: Extensão do arquivo (ex: '.pdf')
+            referencia: Identificação exibida (ex: nome do arquivo)
+            opcoes: Parâmetros de geração (ver modules.pipeline.OPCOES_PADRAO)
+        
+        Returns:
+            Identificador do job
+        """
+        self._limpar_expirados()
+        
+        id_job = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        (self.diretorio / f"{id_job}{extensao}").write_bytes(conteudo)
+        
+        estado = {
+            'id': id_job,
+            'referencia': referencia,
+            'extensao': extensao,
+            'opcoes': opcoes or {},
+            'status': STATUS_NA_FILA,
+            'criado_em': datetime.now().isoformat(timespec='seconds'),
+            'iniciado_em': None,
+            'concluido_em': None,
+            'etapa_atual': None,
+            'etapas': {etapa: {'status': ETAPA_PENDENTE} for etapa in ETAPAS},
+            'erro': None,
+            'custo': None,
+            'score': None,
+            'versao': 0
+        }
+        with self._condicao:
+            self._estados[id_job] = estado
+            self._salvar(estado)
+        
+        print(f"📥 Job {id_job} enfileirado: {referencia}")
+        self._executor.submit(self._executar, id_job)
+        return id_job
+    
+    def estado(self, id_job: str) -> Dict:
+        """
+        Cópia do estado atual do job (KeyError se não existir ou já expirou)
+        
+        Jobs finalizados fora deste processo são lidos do disco a cada
+        consulta, sem entrar na memória.
+        """
+        with self._condicao:
+            if id_job in self._estados:
+                return json.loads(json.dumps(self._estados[id_job]))
+        
+        try:
+            return json.loads((self.diretorio / f"{id_job}.json").read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            raise KeyError(f"Job não encontrado: {id_job}") from None
+    
+    def listar(self, ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Estados dos jobs, mais recentes primeiro
+        
+        Args:
+            ids: Restringir a estes jobs (padrão: os em memória no processo,
+                isto é, os não finalizados e os finalizados dentro do TTL)
+        """
+        with self._condicao:
+            ids = list(self._estados) if ids is None else ids
+        estados = []
+        for id_job in ids:
+            try:
+                estados.append(self.estado(id_job))
+            except KeyError:
+                continue
+        return sorted(estados, key=lambda e: e['criado_em'], reverse=True)
+    
+    def pendentes(self) -> int:
+        """Jobs na fila ou em execução"""
+        with self._condicao:
+            return sum(1 for e in self._estados.values() if e['status'] not in STATUS_FINAIS)
+    
+    def parcial(self, id_job: str) -> str:
+        """Texto gerado até agora (somente no modo de geração 'streaming')"""
+        with self._condicao:
+            return "".join(self._parciais.get(id_job, ()))
+    
+    def resultado(self, id_job: str) -> Optional[Dict]:
+        """Resultado do job concluído (formato de PipelineContestacao.executar)"""
+        caminho = self.diretorio / f"{id_job}.resultado.json"
+        if not caminho.exists():
+            return None
+        return json.loads(caminho.read_text(encoding='utf-8'))
+    
+    def aguardar(self, id_job: str, timeout: Optional[float] = None) -> Dict:
+        """
+        Bloqueia até o job terminar (ou o timeout)
+        
+        Returns:
+            Estado do job
+        """
+        with self._condicao:
+            self._condicao.wait_for(
+                lambda: id_job not in self._estados or self._estados[id_job]['status'] in STATUS_FINAIS,
+                timeout=timeout
+            )
+        return self.estado(id_job)
+    
+    def assinar(self, callback: Callable[[Dict], None]) -> Callable[[], None]:
+        """
+        Registra um callback chamado com o estado a cada mudança de qualquer job
+        
+        Returns:
+            Função que cancela a assinatura
+        """
+        with self._condicao:
+            self._assinantes.append(callback)
+        
+        def cancelar():
+            with self._condicao:
+                if callback in self._assinantes:
+                    self._assinantes.remove(callback)
+        
+        return cancelar
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # EXECUÇÃO
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    def _obter_pipeline(self) -> PipelineContestacao:
+        with self._lock_pipeline:
+            if self._pipeline is None:
+                self._pipeline = PipelineContestacao()
+            return self._pipeline
+    
+    def _executar(self, id_job: str):
+        """
+        Worker: executa o pipeline do job e registra o desfecho
+        
+        Qualquer erro (no pipeline, ao gravar o resultado ou ao finalizar)
+        termina o job como STATUS_FALHOU; nenhum fica 'executando' para sempre.
+        """
+        try:
+            estado = self.estado(id_job)
+            entrada = self.diretorio / f"{id_job}{estado['extensao']}"
+            self._atualizar(id_job, status=STATUS_EXECUTANDO, iniciado_em=datetime.now().isoformat(timespec='seconds'))
+            
+            resultado = self._obter_pipeline().executar(
+                entrada.read_bytes(),
+                estado['extensao'],
+                estado['opcoes'],
+                progresso=lambda etapa, evento, detalhes: self._progresso(id_job, etapa, evento, detalhes)
+            )
+            self._gravar_resultado(id_job, resultado)
+            
+            self._finalizar(
+                id_job,
+                STATUS_CONCLUIDO,
+                custo=resultado['custo'],
+                score=resultado['validacao']['metricas']['score_qualidade']
+            )
+            print(f"✅ Job {id_job} concluído")
+        except Exception as e:
+            erro = {'mensagem': str(e)}
+            if isinstance(e, ErroPipeline) and e.resultado is not None:
+                erro['custo'] = e.resultado.get('custo_estimado')
+                erro['interrupcoes'] = e.resultado.get('interrupcoes', [])
+            else:
+                erro['traceback'] = traceback.format_exc()
+            
+            with self._condicao:
+                etapa = self._estados.get(id_job, {}).get('etapa_atual')
+            try:
+                self._finalizar(id_job, STATUS_FALHOU, etapa_falha=etapa, erro=erro)
+            except Exception as e_final:
+                print(f"⚠️  Não foi possível registrar a falha do job {id_job}: {e_final}")
+            print(f"❌ Job {id_job} falhou na etapa {etapa}: {e}")
+    
+    def _gravar_resultado(self, id_job: str, resultado: Dict):
+        """Grava o resultado do job de forma atômica (arquivo parcial + rename)"""
+        caminho = self.diretorio / f"{id_job}.resultado.json"
+        parcial = caminho.with_name(f"{caminho.name}.{os.getpid()}.{threading.get_ident()}.parcial")
+        try:
+            parcial.write_text(json.dumps(resultado, ensure_ascii=False), encoding='utf-8')
+            os.replace(parcial, caminho)
+        finally:
+            parcial.unlink(missing_ok=True)
+    
+    def _progresso(self, id_job: str, etapa: str, evento: str, detalhes: Dict):
+        """Callback do pipeline: status e duração de cada etapa"""
+        if evento == 'andamento':
+            # Trechos só em memória (muitas atualizações por segundo),
+            # juntados apenas quando o texto parcial é consultado
+            with self._condicao:
+                if detalhes['reiniciar']:
+                    self._parciais[id_job] = []
+                self._parciais.setdefault(id_job, []).append(detalhes['trecho'])
+            return
+        
+        with self._condicao:
+            etapas = dict(self._estados[id_job]['etapas'])
+        
+        if evento == 'inicio':
+            etapas[etapa] = {'status': ETAPA_EXECUTANDO, 'iniciada_em': datetime.now().isoformat(timespec='seconds')}
+            self._atualizar(id_job, etapa_atual=etapa, etapas=etapas)
+        else:
+            etapas[etapa] = {**etapas[etapa], 'status': ETAPA_CONCLUIDA, **detalhes}
+            self._atualizar(id_job, etapas=etapas)
+    
+    def _finalizar(self, id_job: str, status: str, etapa_falha: Optional[str] = None, **campos):
+        """Registra o desfecho e remove o arquivo da petição"""
+        with self._condicao:
+            etapas = dict(self._estados[id_job]['etapas'])
+            self._parciais.pop(id_job, None)
+        if etapa_falha:
+            etapas[etapa_falha] = {**etapas[etapa_falha], 'status': ETAPA_FALHOU}
+        
+        self._atualizar(
+            id_job,
+            status=status,
+            etapas=etapas,
+            etapa_atual=None,
+            concluido_em=datetime.now().isoformat(timespec='seconds'),
+            **campos
+        )
+        (self.diretorio / f"{id_job}{self._estados[id_job]['extensao']}").unlink(missing_ok=True)
+    
+    def _atualizar(self, id_job: str, **campos):
+        """Aplica mudanças ao estado, persiste e avisa quem espera ou assina"""
+        with self._condicao:
+            estado = self._estados[id_job]
+            estado.update(campos)
+            estado['versao'] += 1
+            self._salvar(estado)
+            self._condicao.notify_all()
+            assinantes = list(self._assinantes)
+            copia = json.loads(json.dumps(estado))
+        
+        for callback in assinantes:
+            try:
+                callback(copia)
+            except Exception as e:
+                print(f"⚠️  Assinante da fila de jobs falhou: {e}")
+    
+    def _salvar(self, estado: Dict):
+        """Grava o estado do job de forma atômica (arquivo parcial + rename)"""
+        destino = self.diretorio / f"{estado['id']}.json"
+        parcial = destino.with_name(f"{destino.name}.{os.getpid()}.parcial")
+        
+        parcial.write_text(json.dumps(estado, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(parcial, destino)
+    
+    def _limpar_expirados(self):
+        """Remove os arquivos de jobs finalizados há mais que o TTL configurado"""
+        limite = time.time() - Config.JOBS_TTL_SEGUNDOS
+        
+        for caminho in self.diretorio.iterdir():
+            try:
+                if caminho.stat().st_mtime >= limite:
+                    continue
+                if caminho.name.endswith('.parcial'):
+                    # Gravação interrompida
+                    caminho.unlink()
+                    continue
+                if caminho.suffix != '.json' or caminho.name.endswith('.resultado.json'):
+                    continue
+                
+                # O estado é regravado a cada mudança: mtime antigo em job
+                # finalizado é o momento da finalização
+                estado = json.loads(caminho.read_text(encoding='utf-8'))
+                if estado['status'] not in STATUS_FINAIS:
+                    continue
+                
+                with self._condicao:
+                    self._estados.pop(estado['id'], None)
+                    self._parciais.pop(estado['id'], None)
+                caminho.with_name(f"{estado['id']}.resultado.json").unlink(missing_ok=True)
+                caminho.unlink()
+            except (OSError, ValueError, KeyError):
+                # Arquivo removido por outro processo ou ilegível
+                continue
+    
+    def _retomar(self):
+        """Reenfileira jobs não finalizados de execuções anteriores (do início)"""
+        self._limpar_expirados()
+        
+        retomados = 0
+        for caminho in sorted(self.diretorio.glob('*.json')):
+            if caminho.name.endswith('.resultado.json'):
+                continue
+            estado = json.loads(caminho.read_text(encoding='utf-8'))
+            if estado['status'] in STATUS_FINAIS:
+                # Consultado do disco só se pedido (ver estado)
+                continue
+            self._estados[estado['id']] = estado
+            
+            if not (self.diretorio / f"{estado['id']}{estado['extensao']}").exists():
+                self._finalizar(estado['id'], STATUS_FALHOU, erro={'mensagem': "Arquivo da petição não encontrado"})
+                continue
+            
+            self._atualizar(
+                estado['id'],
+                status=STATUS_NA_FILA,
+                etapa_atual=None,
+                etapas={etapa: {'status': ETAPA_PENDENTE} for etapa in ETAPAS}
+            )
+            self._executor.submit(self._executar, estado['id'])
+            retomados += 1
+        
+        if retomados:
+            print(f"🔁 {retomados} job(s) pendente(s) retomado(s) de {self.diretorio}")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# INSTÂNCIA COMPARTILHADA
+# ═══════════════════════════════════════════════════════════════════════════
+
+_FILA: Optional[FilaJobs] = None
+_LOCK_FILA = threading.Lock()
+
+
+def obter_fila_jobs() -> FilaJobs:
+    """Fila única do processo (compartilhada entre sessões do Streamlit)"""
+    global _FILA
+    
+    with _LOCK_FILA:
+        if _FILA is None:
+            _FILA = FilaJobs()
+        return _FILA
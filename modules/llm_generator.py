@@ -6,17 +6,57 @@ Constrói contexto RAG otimizado e gera contestação via Claude API
 """
 
 import os
-from typing import Dict, List, Optional
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
 import anthropic
 
 from config.settings import Config
-from config.prompts import SYSTEM_PROMPT, construir_prompt_usuario
+from config.prompts import (
+    PARTES_CONTESTACAO,
+    PROMPT_REGENERAR_COMPLETA_TEMPLATE,
+    PROMPT_REGENERAR_SECAO_TEMPLATE,
+    SYSTEM_PROMPT,
+    construir_bloco_instrucoes,
+    construir_bloco_parte,
+    construir_blocos_prompt
+)
+from modules.cache_geracao import CacheGeracao
+from modules.contabilidade import CAMPOS_USO, LivroCustos, contar_tokens_requisicao, precos_modelo
+from modules.secoes import (
+    NOMES_SECOES,
+    dividir_secoes,
+    juntar_secoes,
+    secoes_afetadas,
+    substituir_secao,
+    unir_partes
+)
+from modules.telemetria import registrar_span, span
+from modules.tokens import contagem_exata, contar_tokens, fator_correcao, truncar_tokens
+from modules.validator import ValidadorContestacao, ViolacaoEstrutural
+
+# Clientes da API compartilhados no processo, por chave (ver obter_cliente)
+_CLIENTES: Dict[str, anthropic.Anthropic] = {}
+_LOCK_CLIENTES = threading.Lock()
 
 class ContextBuilder:
     """Constrói contexto RAG otimizado para o prompt"""
     
-    def __init__(self):
-        pass
+    # Tokens de cabeçalho/cercas de código adicionados pelo formatador a
+    # cada chunk (ex: "**Trecho 3** (Similaridade: 81.20%)\nSeção: ...")
+    TOKENS_CABECALHO_CHUNK = 24
+    
+    # Fragmento mínimo que vale a pena incluir ao truncar o último chunk
+    MIN_TOKENS_FRAGMENTO = 80
+    
+    def __init__(self, max_tokens: Optional[int] = None):
+        """
+        Args:
+            max_tokens: Orçamento de tokens do contexto RAG (padrão:
+                Config.MAX_CONTEXT_TOKENS)
+        """
+        self.max_tokens = max_tokens or Config.MAX_CONTEXT_TOKENS
     
     def construir_contexto(
         self,
@@ -29,28 +69,118 @@ class ContextBuilder:
         Args:
             dados_peticao: Dados estruturados da petição inicial
             resultado_rag: Resultado do retrieval hierárquico
-            
+        
         Returns:
-            Contexto estruturado pronto para o prompt
+            Contexto estruturado pronto para o prompt, com a alocação de
+            tokens por nível em 'alocacao_tokens'
         """
         # Adicionar classificação aos dados da petição
         classificacao = resultado_rag['classificacao']
         dados_peticao['tipo_caso'] = classificacao['tipo_caso']
         dados_peticao['confianca'] = classificacao['confianca']
         
-        # Organizar chunks por nível
-        contexto = {
-            'nivel_1': self._rankear_chunks(resultado_rag['nivel_1'])[:5],  # Top 5
-            'nivel_2': self._rankear_chunks(resultado_rag['nivel_2'])[:10],  # Top 10
-            'nivel_3': self._rankear_chunks(resultado_rag['nivel_3'])[:8],  # Top 8
-            'especificos': self._extrair_chunks_especificos(
-                resultado_rag['nivel_2'],
-                dados_peticao['tipo_caso']
-            )
+        # Chunks de nível 2 do tipo de caso formam a seção de argumentos
+        # específicos; saem da lista geral para não entrarem duas vezes
+        nivel_2 = self._rankear_chunks(resultado_rag['nivel_2'])
+        especificos = self._extrair_chunks_especificos(nivel_2, dados_peticao['tipo_caso'])
+        ids_especificos = {id(chunk) for chunk in especificos}
+        
+        candidatos = {
+            'nivel_1': self._rankear_chunks(resultado_rag['nivel_1']),
+            'nivel_2': [c for c in nivel_2 if id(c) not in ids_especificos],
+            'nivel_3': self._rankear_chunks(resultado_rag['nivel_3']),
+            'especificos': especificos
         }
         
+        contexto = self._empacotar(candidatos)
+        
+        alocacao = contexto['alocacao_tokens']
+        print(f"📦 Contexto RAG: {alocacao['total']}/{alocacao['orcamento']} tokens "
+              f"({alocacao['descartados']} chunks fora do orçamento)")
+        for nivel, uso in alocacao['por_nivel'].items():
+            print(f"   • {nivel}: {uso['chunks']} chunks, {uso['tokens']} tokens"
+                  + (f" ({uso['truncados']} truncado)" if uso['truncados'] else ""))
+        
         return contexto
     
+    def _empacotar(self, candidatos: Dict[str, List[Dict]]) -> Dict:
+        """
+        Seleciona chunks sob o orçamento de tokens (mochila fracionária)
+        
+        Valor de um chunk = peso do nível (RETRIEVAL_CONFIG) × similaridade.
+        Os chunks entram em ordem decrescente de valor por token enquanto
+        couberem; com o orçamento quase esgotado, o melhor chunk que ficou de
+        fora entra truncado em fim de frase no espaço restante.
+        
+        Args:
+            candidatos: Chunks rankeados por seção do prompt
+        
+        Returns:
+            Dict com os chunks escolhidos por seção (na ordem de relevância
+            original) e 'alocacao_tokens'
+        """
+        itens = []
+        for nivel, chunks in candidatos.items():
+            peso = self._peso_nivel(nivel)
+            for posicao, chunk in enumerate(chunks):
+                tokens = contar_tokens(chunk['conteudo']) + self.TOKENS_CABECALHO_CHUNK
+                valor = peso * chunk.get('similaridade', 0.0)
+                itens.append((valor / tokens, nivel, posicao, chunk, tokens))
+        
+        itens.sort(key=lambda item: item[0], reverse=True)
+        
+        restante = self.max_tokens
+        escolhidos = {nivel: [] for nivel in candidatos}
+        fora = []
+        
+        for densidade, nivel, posicao, chunk, tokens in itens:
+            if tokens <= restante:
+                escolhidos[nivel].append((posicao, chunk, tokens))
+                restante -= tokens
+            else:
+                fora.append((nivel, posicao, chunk))
+        
+        # Fração do melhor chunk excedente no espaço que sobrou
+        truncados = {nivel: 0 for nivel in candidatos}
+        if fora and restante >= self.MIN_TOKENS_FRAGMENTO + self.TOKENS_CABECALHO_CHUNK:
+            nivel, posicao, chunk = fora[0]
+            conteudo = truncar_tokens(chunk['conteudo'], restante - self.TOKENS_CABECALHO_CHUNK)
+            if conteudo:
+                tokens = contar_tokens(conteudo) + self.TOKENS_CABECALHO_CHUNK
+                escolhidos[nivel].append((posicao, {**chunk, 'conteudo': conteudo, 'truncado': True}, tokens))
+                truncados[nivel] = 1
+                restante -= tokens
+                fora.pop(0)
+        
+        contexto = {}
+        por_nivel = {}
+        for nivel, selecionados in escolhidos.items():
+            selecionados.sort(key=lambda item: item[0])
+            contexto[nivel] = [chunk for _, chunk, _ in selecionados]
+            por_nivel[nivel] = {
+                'chunks': len(selecionados),
+                'candidatos': len(candidatos[nivel]),
+                'tokens': sum(tokens for _, _, tokens in selecionados),
+                'truncados': truncados[nivel]
+            }
+        
+        contexto['alocacao_tokens'] = {
+            'orcamento': self.max_tokens,
+            'total': self.max_tokens - restante,
+            'por_nivel': por_nivel,
+            'descartados': len(fora),
+            'contagem_exata': contagem_exata(),
+            'fator_correcao': round(fator_correcao(), 3)
+        }
+        
+        return contexto
+    
+    @staticmethod
+    def _peso_nivel(nivel: str) -> float:
+        """Peso do nível em RETRIEVAL_CONFIG (específicos são chunks de nível 2)"""
+        chave = 'nivel_2' if nivel == 'especificos' else nivel
+        return Config.RETRIEVAL_CONFIG[chave]['peso']
+    
     def _rankear_chunks(self, chunks: List[Dict]) -> List[Dict]:
         """Reordena chunks por relevância (já vêm ordenados, mas pode refinar)"""
         # Já vêm ordenados por similaridade, mas podemos aplicar reranking adicional
@@ -63,32 +193,48 @@ class ContextBuilder:
     ) -> List[Dict]:
         """Extrai chunks com argumentos específicos do tipo de caso"""
         # Filtrar chunks que são do tipo de caso identificado
-        especificos = [
+        return [
             chunk for chunk in chunks_nivel_2
             if chunk['metadata'].get('tipo_lit') == tipo_caso
         ]
-        return especificos[:5]  # Top 5
 
 
 class LLMGenerator:
     """Gera contestação usando Claude API"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        client=None,
+        livro_custos: Optional[LivroCustos] = None,
+        cache_resultados: Optional[CacheGeracao] = None
+    ):
         """
         Inicializa gerador
         
         Args:
             api_key: Chave API Anthropic (usa variável de ambiente se None)
+            client: Cliente compatível com anthropic.Anthropic (opcional,
+                ex: stub local da Messages API para testes)
+            livro_custos: Livro onde o uso de cada requisição é registrado
+                (padrão: Config.LEDGER_CUSTOS)
+            cache_resultados: Cache de resultados de geração (padrão: em
+                Config.CACHE_GERACAO_DIR; usado só quando ativado)
         """
         self.api_key = api_key or Config.ANTHROPIC_API_KEY
         
-        if not self.api_key:
+        if client is None and not self.api_key:
             raise ValueError(
                 "ANTHROPIC_API_KEY não encontrada. "
                 "Configure a variável de ambiente ou passe como parâmetro."
             )
         
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.client = client or obter_cliente(self.api_key)
+        
+        # Falhar cedo se o modelo não tiver preço cadastrado
+        precos_modelo(Config.CLAUDE_MODEL)
+        self.livro_custos = livro_custos or LivroCustos()
+        self.cache_resultados = cache_resultados or CacheGeracao()
     
     def gerar_contestacao(
         self,
@@ -96,7 +242,9 @@ class LLMGenerator:
         contexto_rag: Dict,
         temperatura: float = Config.DEFAULT_TEMPERATURE,
         top_k: int = Config.DEFAULT_TOP_K,
-        max_tokens: int = Config.DEFAULT_MAX_TOKENS
+        max_tokens: int = Config.DEFAULT_MAX_TOKENS,
+        usar_cache: Optional[bool] = None,
+        modelo: Optional[str] = None
     ) -> Dict:
         """
         Gera contestação via Claude API
@@ -107,116 +255,1048 @@ class LLMGenerator:
             temperatura: Parâmetro de temperatura (0.3-0.9)
             top_k: Parâmetro top-k (20-60)
             max_tokens: Tokens máximos para geração
-            
+            usar_cache: Reutilizar resultado idêntico do cache de geração
+                (padrão: Config.CACHE_GERACAO_ATIVO)
+            modelo: Modelo a usar (padrão: Config.CLAUDE_MODEL; ver
+                modules.roteador)
+        
         Returns:
-            Dict com contestação gerada e metadados
+            Dict com contestação gerada e metadados ('do_cache' indica
+            resultado reaproveitado)
         """
         print("\n" + "="*80)
-        print("🤖 GERANDO CONTESTAÇÃO COM CLAUDE SONNET 4.5")
+        print("🤖 GERANDO CONTESTAÇÃO COM CLAUDE")
         print("="*80 + "\n")
         
-        # Validar parâmetros
-        temperatura = max(Config.MIN_TEMPERATURE, min(temperatura, Config.MAX_TEMPERATURE))
-        top_k = max(Config.MIN_TOP_K, min(top_k, Config.MAX_TOP_K))
-        
-        print(f"⚙️  Parâmetros:")
-        print(f"   Temperatura: {temperatura}")
-        print(f"   Top-k: {top_k}")
-        print(f"   Max tokens: {max_tokens}\n")
+        params = self._montar_parametros(
+            dados_peticao, contexto_rag, temperatura, top_k, max_tokens, modelo
+        )
         
-        # Construir prompts
-        print("📝 Construindo prompts...")
-        prompt_usuario = construir_prompt_usuario(dados_peticao, contexto_rag)
+        em_cache = self._consultar_cache_resultados(params, usar_cache)
+        if em_cache:
+            return em_cache
         
-        # Estimar tokens (aproximado)
-        tokens_estimados = (len(SYSTEM_PROMPT) + len(prompt_usuario)) // 4
-        print(f"   Tokens estimados (input): ~{tokens_estimados:,}\n")
+        tokens_previstos = self._pre_contar(params, dados_peticao)
         
         # Chamar API
         print("🌐 Chamando API Claude...")
+        uso = {campo: 0 for campo in CAMPOS_USO}
         try:
-            response = self.client.messages.create(
-                model=Config.CLAUDE_MODEL,
-                max_tokens=max_tokens,
-                temperature=temperatura,
-                top_k=top_k,
-                system=SYSTEM_PROMPT,
-                messages=[
-                    {"role": "user", "content": prompt_usuario}
-                ]
-            )
+            inicio = time.perf_counter()
+            response = self._chamar_api(params, 'geracao')
             
-            # Extrair resposta
-            contestacao_texto = response.content[0].text
-            
-            # Metadados da geração
-            metadados = {
-                'model': Config.CLAUDE_MODEL,
-                'temperatura': temperatura,
-                'top_k': top_k,
-                'input_tokens': response.usage.input_tokens,
-                'output_tokens': response.usage.output_tokens,
-                'stop_reason': response.stop_reason,
-                'tipo_caso': dados_peticao.get('tipo_caso'),
-                'confianca_classificacao': dados_peticao.get('confianca')
-            }
-            
-            print(f"✅ Geração concluída!")
-            print(f"   Input tokens: {metadados['input_tokens']:,}")
-            print(f"   Output tokens: {metadados['output_tokens']:,}")
-            print(f"   Total tokens: {metadados['input_tokens'] + metadados['output_tokens']:,}\n")
-            
-            # Custo estimado (aproximado para Sonnet 4.5)
-            custo_input = (metadados['input_tokens'] / 1_000_000) * 15  # $15/MTok
-            custo_output = (metadados['output_tokens'] / 1_000_000) * 75  # $75/MTok
-            custo_total = custo_input + custo_output
+            # Extrair resposta (retomando se parou em max_tokens)
+            contestacao_texto, response, uso, continuacoes = self._continuar(params, response, uso)
+            duracao = time.perf_counter() - inicio
+        
+        except Exception as e:
+            aviso = "Erro na API" if isinstance(e, anthropic.APIError) else "Erro inesperado"
+            print(f"❌ {aviso}: {e}\n")
+            return self._resultado_falha(e, params, dados_peticao, uso, 'geracao_falha', tokens_previstos)
+        
+        metadados = self._montar_metadados(params, response, dados_peticao, tokens_previstos)
+        metadados.update(uso)
+        metadados['continuacoes'] = continuacoes
+        metadados['duracao_s'] = round(duracao, 3)
+        
+        resultado = self._resultado_sucesso(contestacao_texto, metadados)
+        self._gravar_cache_resultados(params, resultado, usar_cache)
+        
+        return resultado
+    
+    def gerar_contestacao_stream(
+        self,
+        dados_peticao: Dict,
+        contexto_rag: Dict,
+        temperatura: float = Config.DEFAULT_TEMPERATURE,
+        top_k: int = Config.DEFAULT_TOP_K,
+        max_tokens: int = Config.DEFAULT_MAX_TOKENS,
+        usar_cache: Optional[bool] = None,
+        modelo: Optional[str] = None,
+        validacao_incremental: Optional[bool] = None,
+        validador: Optional[ValidadorContestacao] = None
+    ) -> 'StreamContestacao':
+        """
+        Gera contestação em streaming (messages.stream)
+        
+        Os trechos de texto são entregues à medida que chegam. Após consumir
+        o stream, `stream.resultado` tem o mesmo formato de gerar_contestacao,
+        com TTFT e tokens/s em metadados. Com validação incremental, a
+        geração que viola as expectativas estruturais é interrompida (ver
+        ValidacaoIncremental) e, conforme Config.VALIDACAO_STREAM_ACAO,
+        reiniciada com orientação corretiva ou abortada.
+        
+        Args:
+            dados_peticao: Dados estruturados da petição
+            contexto_rag: Contexto RAG construído
+            temperatura: Parâmetro de temperatura (0.3-0.9)
+            top_k: Parâmetro top-k (20-60)
+            max_tokens: Tokens máximos para geração
+            usar_cache: Reutilizar resultado idêntico do cache de geração
+                (padrão: Config.CACHE_GERACAO_ATIVO)
+            modelo: Modelo a usar (padrão: Config.CLAUDE_MODEL; ver
+                modules.roteador)
+            validacao_incremental: Validar os deltas durante o streaming
+                (padrão: Config.VALIDACAO_STREAM_ATIVA)
+            validador: Validador da validação incremental (padrão: novo
+                ValidadorContestacao, sem índice de citações)
+        
+        Returns:
+            StreamContestacao (iterável de deltas de texto; em acerto de
+            cache, entrega o texto gravado de uma vez)
+        """
+        print("\n" + "="*80)
+        print("🤖 GERANDO CONTESTAÇÃO COM CLAUDE (STREAMING)")
+        print("="*80 + "\n")
+        
+        params = self._montar_parametros(
+            dados_peticao, contexto_rag, temperatura, top_k, max_tokens, modelo
+        )
+        
+        em_cache = self._consultar_cache_resultados(params, usar_cache)
+        if em_cache:
+            return StreamContestacao(self, params, dados_peticao, resultado_cache=em_cache)
+        
+        tokens_previstos = self._pre_contar(params, dados_peticao)
+        
+        if validacao_incremental is None:
+            validacao_incremental = Config.VALIDACAO_STREAM_ATIVA
+        
+        return StreamContestacao(
+            self, params, dados_peticao, tokens_previstos, usar_cache=usar_cache,
+            validador=(validador or ValidadorContestacao()) if validacao_incremental else None
+        )
+    
+    def gerar_contestacao_paralela(
+        self,
+        dados_peticao: Dict,
+        contexto_rag: Dict,
+        temperatura: float = Config.DEFAULT_TEMPERATURE,
+        top_k: int = Config.DEFAULT_TOP_K,
+        max_tokens_parte: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ) -> Dict:
+        """
+        Gera contestação redigindo as partes simultaneamente
+        
+        Tokens de saída são gerados em sequência, então a latência de uma
+        chamada única cresce com o tamanho da peça. Aqui cada parte de
+        PARTES_CONTESTACAO é uma requisição concorrente sobre o mesmo
+        prompt (prefixo cacheado, aquecido antes do disparo), e as partes são
+        unidas na ordem processual com a numeração dos títulos refeita.
+        
+        Args:
+            dados_peticao: Dados da petição processada
+            contexto_rag: Contexto RAG construído
+            temperatura: Temperatura (0.0-1.0)
+            top_k: Top-k sampling
+            max_tokens_parte: Tokens máximos por parte (padrão:
+                Config.MAX_TOKENS_POR_PARTE)
+            max_workers: Requisições simultâneas (padrão:
+                Config.GERACAO_PARALELA_WORKERS)
+        
+        Returns:
+            Resultado como em gerar_contestacao; metadados trazem a latência
+            de cada parte e a comparação com a chamada única estimada
+        """
+        print("\n" + "="*80)
+        print("🤖 GERANDO CONTESTAÇÃO EM PARTES PARALELAS")
+        print("="*80 + "\n")
+        
+        params = self._montar_parametros(
+            dados_peticao,
+            contexto_rag,
+            temperatura,
+            top_k,
+            max_tokens_parte or Config.MAX_TOKENS_POR_PARTE
+        )
+        tokens_previstos = self._pre_contar(params, dados_peticao)
+        
+        uso_total = {campo: 0 for campo in CAMPOS_USO}
+        partes = {}
+        try:
+            inicio = time.perf_counter()
             
-            print(f"💰 Custo estimado: ${custo_total:.4f}\n")
+            # Aquecer o prefixo: sem isso, as partes disparadas juntas
+            # gravariam o cache cada uma (nenhuma encontra o prefixo pronto)
+            if Config.GERACAO_PARALELA_AQUECER_CACHE:
+                print("🗄️  Aquecendo cache do prompt...")
+                aquecimento = self._chamar_api(
+                    {**params, 'max_tokens': 1, 'messages': _mensagens_parte(params, "Responda apenas: OK")},
+                    'aquecimento_paralelo'
+                )
+                for campo, valor in _uso_resposta(aquecimento).items():
+                    uso_total[campo] += valor
             
-            print("="*80)
-            print("✅ CONTESTAÇÃO GERADA COM SUCESSO")
-            print("="*80 + "\n")
+            duracao_aquecimento = time.perf_counter() - inicio
             
-            return {
-                'contestacao': contestacao_texto,
-                'metadados': metadados,
-                'custo_estimado': custo_total,
-                'sucesso': True
-            }
+            print(f"🌐 Redigindo {len(PARTES_CONTESTACAO)} partes em paralelo...")
+            with ThreadPoolExecutor(
+                max_workers=max_workers or Config.GERACAO_PARALELA_WORKERS,
+                thread_name_prefix="parte-contestacao"
+            ) as executor:
+                futuros = {
+                    executor.submit(self._gerar_parte, params, parte): parte
+                    for parte in PARTES_CONTESTACAO
+                }
+                try:
+                    for futuro in as_completed(futuros):
+                        partes[futuros[futuro]] = futuro.result()
+                except Exception:
+                    # Uma parte falhou: as que não começaram são canceladas;
+                    # as em andamento terminam (e são pagas) mesmo assim
+                    for futuro in futuros:
+                        futuro.cancel()
+                    executor.shutdown(wait=True)
+                    for futuro, parte in futuros.items():
+                        if not futuro.cancelled() and futuro.exception() is None:
+                            partes.setdefault(parte, futuro.result())
+                    raise
             
-        except anthropic.APIError as e:
-            print(f"❌ Erro na API: {e}\n")
-            return {
-                'contestacao': None,
-                'erro': str(e),
-                'sucesso': False
-            }
+            duracao = time.perf_counter() - inicio
+        
         except Exception as e:
-            print(f"❌ Erro inesperado: {e}\n")
-            return {
-                'contestacao': None,
-                'erro': str(e),
-                'sucesso': False
+            aviso = "Erro na API" if isinstance(e, anthropic.APIError) else "Erro inesperado"
+            print(f"❌ {aviso}: {e}\n")
+            return self._resultado_falha(
+                e, params, dados_peticao, _somar_uso(uso_total, partes), 'geracao_paralela_falha', tokens_previstos
+            )
+        
+        # Ordem processual (as partes concluem em qualquer ordem)
+        partes = {parte: partes[parte] for parte in PARTES_CONTESTACAO}
+        contestacao = unir_partes([texto for texto, _, _, _ in partes.values()])
+        uso_total = _somar_uso(uso_total, partes)
+        
+        # Chamada única: as mesmas partes geradas uma após a outra
+        duracao_sequencial = duracao_aquecimento + sum(d for _, _, _, d in partes.values())
+        
+        response = partes[list(PARTES_CONTESTACAO)[-1]][1]
+        metadados = self._montar_metadados(params, response, dados_peticao, tokens_previstos)
+        metadados.update(uso_total)
+        metadados['stop_reason'] = next(
+            (r.stop_reason for _, r, _, _ in partes.values() if r.stop_reason == 'max_tokens'),
+            response.stop_reason
+        )
+        metadados['partes'] = {
+            parte: {
+                'duracao_s': round(d, 3),
+                'output_tokens': uso['output_tokens'],
+                'stop_reason': r.stop_reason
             }
+            for parte, (_, r, uso, d) in partes.items()
+        }
+        metadados['duracao_s'] = round(duracao, 3)
+        metadados['duracao_sequencial_estimada_s'] = round(duracao_sequencial, 3)
+        metadados['economia_latencia_s'] = round(duracao_sequencial - duracao, 3)
+        metadados['aceleracao'] = round(duracao_sequencial / duracao, 2) if duracao else None
+        
+        print(f"⏱️  Latência: {duracao:.1f}s em paralelo vs ~{duracao_sequencial:.1f}s em chamada única "
+              f"(economia de {duracao_sequencial - duracao:.1f}s, {metadados['aceleracao']}x)\n")
+        
+        return self._resultado_sucesso(contestacao, metadados, operacao='geracao_paralela')
+    
+    def _resultado_falha(
+        self,
+        erro: Exception,
+        params: Dict,
+        dados_peticao: Dict,
+        uso: Dict,
+        operacao: str,
+        tokens_previstos: Optional[int] = None
+    ) -> Dict:
+        """
+        Falha da geração; o uso das requisições já atendidas (ex: resposta
+        inicial e continuações antes da que falhou) vai ao livro
+        
+        Args:
+            erro: Exceção da falha
+            params: Argumentos da requisição original
+            dados_peticao: Dados da petição (tipo de caso)
+            uso: Uso somado das requisições concluídas
+            operacao: Operação registrada no livro (ex: 'geracao_falha')
+            tokens_previstos: Tokens de input pré-contados
+        """
+        resultado = {'contestacao': None, 'erro': str(erro), 'sucesso': False}
+        
+        if any(uso.values()):
+            registro = self.livro_custos.registrar(
+                params['model'],
+                uso,
+                operacao=operacao,
+                tipo_caso=dados_peticao.get('tipo_caso'),
+                input_tokens_previstos=tokens_previstos
+            )
+            resultado['custo_estimado'] = registro['custo_usd']['total']
+        
+        return resultado
+    
+    def _gerar_parte(self, params: Dict, parte: str) -> Tuple[str, object, Dict[str, int], float]:
+        """Redige uma parte (executa em thread do pool); retorna (texto, resposta final, uso, duração)"""
+        inicio = time.perf_counter()
+        params_parte = {**params, 'messages': _mensagens_parte(params, construir_bloco_parte(parte))}
+        texto, response, uso, _ = self._continuar(params_parte, self._chamar_api(params_parte, f'parte:{parte}'))
+        return texto, response, uso, time.perf_counter() - inicio
+    
+    def _chamar_api(self, params: Dict, operacao: str):
+        """messages.create medido como span 'api.messages' (ver _criar_mensagem)"""
+        return _criar_mensagem(self.client, params, operacao)
+    
+    def _continuar(
+        self,
+        params: Dict,
+        response,
+        uso: Optional[Dict[str, int]] = None
+    ) -> Tuple[str, object, Dict[str, int], int]:
+        """
+        Retoma a geração enquanto ela parar em max_tokens
+        
+        O texto parcial (sem espaços finais, exigência da API para o turno
+        do assistente) é enviado como início da resposta; o prefixo do prompt
+        é lido do cache. Limitado a Config.MAX_CONTINUACOES.
+        
+        Args:
+            params: Argumentos da requisição original
+            response: Resposta da requisição original
+            uso: Acumulador do uso, atualizado a cada resposta (o chamador
+                o mantém se uma continuação falhar; padrão: novo)
+        
+        Returns:
+            (texto completo, resposta final, uso somado, continuações feitas)
+        """
+        texto = response.content[0].text
+        uso = {campo: 0 for campo in CAMPOS_USO} if uso is None else uso
+        for campo, valor in _uso_resposta(response).items():
+            uso[campo] += valor
+        continuacoes = 0
+        
+        while response.stop_reason == 'max_tokens' and continuacoes < Config.MAX_CONTINUACOES:
+            continuacoes += 1
+            print(f"↪️  Limite de tokens atingido; continuando ({continuacoes}/{Config.MAX_CONTINUACOES})...")
+            
+            texto = texto.rstrip()
+            response = self._chamar_api(_params_continuacao(params, texto), 'continuacao')
+            texto += response.content[0].text
+            for campo, valor in _uso_resposta(response).items():
+                uso[campo] += valor
+        
+        if response.stop_reason == 'max_tokens':
+            print(f"⚠️  Contestação ainda incompleta após {continuacoes} continuação(ões)")
+        
+        return texto, response, uso, continuacoes
+    
+    def _preparar_requisicao(
+        self,
+        dados_peticao: Dict,
+        contexto_rag: Dict,
+        temperatura: float,
+        top_k: int,
+        max_tokens: int,
+        aquecer_cache: bool = True,
+        modelo: Optional[str] = None
+    ) -> Tuple[Dict, int]:
+        """
+        Monta os argumentos da chamada e pré-conta os tokens de input
+        
+        Args:
+            aquecer_cache: Registrar o tipo de caso para manter o prefixo
+                cacheado aquecido (desnecessário em lotes)
+            modelo: Modelo a usar (padrão: Config.CLAUDE_MODEL)
+        
+        Returns:
+            (argumentos de messages.create, tokens de input pré-contados)
+        """
+        params = self._montar_parametros(dados_peticao, contexto_rag, temperatura, top_k, max_tokens, modelo)
+        return params, self._pre_contar(params, dados_peticao, aquecer_cache)
+    
+    def _montar_parametros(
+        self,
+        dados_peticao: Dict,
+        contexto_rag: Dict,
+        temperatura: float,
+        top_k: int,
+        max_tokens: int,
+        modelo: Optional[str] = None
+    ) -> Dict:
+        """Valida parâmetros e monta os argumentos da chamada à Messages API"""
+        # Validar parâmetros
+        temperatura = max(Config.MIN_TEMPERATURE, min(temperatura, Config.MAX_TEMPERATURE))
+        top_k = max(Config.MIN_TOP_K, min(top_k, Config.MAX_TOP_K))
+        
+        modelo = modelo or Config.CLAUDE_MODEL
+        
+        print(f"⚙️  Parâmetros:")
+        print(f"   Modelo: {modelo}")
+        print(f"   Temperatura: {temperatura}")
+        print(f"   Top-k: {top_k}")
+        print(f"   Max tokens: {max_tokens}\n")
+        
+        # Construir prompts (blocos com breakpoints de cache)
+        print("📝 Construindo prompts...")
+        blocos_usuario = construir_blocos_prompt(dados_peticao, contexto_rag)
+        
+        params = {
+            'model': modelo,
+            'max_tokens': max_tokens,
+            'temperature': temperatura,
+            'top_k': top_k,
+            'system': _blocos_system(),
+            'messages': [
+                {"role": "user", "content": blocos_usuario}
+            ]
+        }
+        
+        return params
+    
+    def _pre_contar(self, params: Dict, dados_peticao: Dict, aquecer_cache: bool = True) -> int:
+        """Pré-conta tokens de input e registra o uso do prefixo cacheado"""
+        tokens_previstos, origem = contar_tokens_requisicao(self.client, params)
+        print(f"   Tokens de input ({origem}): {tokens_previstos:,}\n")
+        
+        if aquecer_cache:
+            self._registrar_uso_cache(dados_peticao.get('tipo_caso'), params['model'])
+        
+        return tokens_previstos
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # CACHE DE RESULTADOS
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    def _cache_resultados_ativo(self, usar_cache: Optional[bool]) -> bool:
+        return Config.CACHE_GERACAO_ATIVO if usar_cache is None else usar_cache
+    
+    def _consultar_cache_resultados(self, params: Dict, usar_cache: Optional[bool]) -> Optional[Dict]:
+        """Resultado gravado para a mesma requisição (None se ausente/desativado)"""
+        if not self._cache_resultados_ativo(usar_cache):
+            return None
+        
+        resultado = self.cache_resultados.obter(params)
+        if resultado is None:
+            return None
+        
+        print("♻️  Resultado recuperado do cache de geração (sem nova chamada à API)\n")
+        return {**resultado, 'do_cache': True}
+    
+    def _gravar_cache_resultados(self, params: Dict, resultado: Dict, usar_cache: Optional[bool]):
+        """Grava resultado de sucesso no cache de geração, se ativado"""
+        if self._cache_resultados_ativo(usar_cache):
+            self.cache_resultados.gravar(params, resultado)
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # PROMPT CACHING
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    def _registrar_uso_cache(self, tipo_caso: Optional[str], modelo: str):
+        """Registra uso do prefixo do tipo de caso (no modelo usado) no aquecedor do processo"""
+        obter_aquecedor().registrar_uso(self.client, self.livro_custos, tipo_caso, modelo)
+    
+    def _montar_metadados(
+        self,
+        params: Dict,
+        response,
+        dados_peticao: Dict,
+        tokens_previstos: Optional[int] = None
+    ) -> Dict:
+        """Metadados da geração a partir da mensagem final da API"""
+        return {
+            'model': params['model'],
+            'temperatura': params['temperature'],
+            'top_k': params['top_k'],
+            **_uso_resposta(response),
+            'input_tokens_previstos': tokens_previstos,
+            'stop_reason': response.stop_reason,
+            'tipo_caso': dados_peticao.get('tipo_caso'),
+            'confianca_classificacao': dados_peticao.get('confianca')
+        }
+    
+    def _resultado_sucesso(
+        self,
+        contestacao_texto: str,
+        metadados: Dict,
+        operacao: str = 'geracao'
+    ) -> Dict:
+        """Registra resumo da geração e monta o resultado final"""
+        print(f"✅ Geração concluída!")
+        print(f"   Input tokens: {metadados['input_tokens']:,}")
+        print(f"   Output tokens: {metadados['output_tokens']:,}")
+        print(f"   Cache (escrita/leitura): {metadados['cache_creation_input_tokens']:,} / "
+              f"{metadados['cache_read_input_tokens']:,}")
+        print(f"   Total tokens: {metadados['input_tokens'] + metadados['output_tokens']:,}\n")
+        
+        # Custo pelos preços de Config.PRECOS_MODELOS, registrado no livro
+        registro = self.livro_custos.registrar(
+            metadados['model'],
+            metadados,
+            operacao=operacao,
+            tipo_caso=metadados.get('tipo_caso'),
+            input_tokens_previstos=metadados.get('input_tokens_previstos')
+        )
+        custo_total = registro['custo_usd']['total']
+        
+        print(f"💰 Custo: ${custo_total:.4f}\n")
+        
+        print("="*80)
+        print("✅ CONTESTAÇÃO GERADA COM SUCESSO")
+        print("="*80 + "\n")
+        
+        return {
+            'contestacao': contestacao_texto,
+            'metadados': metadados,
+            'custo_estimado': custo_total,
+            'custo_detalhado': registro['custo_usd'],
+            'do_cache': False,
+            'sucesso': True
+        }
     
     def regenerar_com_ajustes(
         self,
         resultado_anterior: Dict,
         ajustes: str,
+        dados_peticao: Dict,
+        contexto_rag: Dict,
         temperatura: Optional[float] = None,
-        top_k: Optional[int] = None
+        top_k: Optional[int] = None,
+        secoes: Optional[List[str]] = None
     ) -> Dict:
         """
         Regenera contestação com ajustes solicitados pelo usuário
         
+        Reescreve apenas as seções afetadas pelos ajustes (identificadas por
+        termos-chave em modules.secoes); as demais são mantidas literalmente.
+        Cada seção é pedida em um turno após a contestação anterior, sobre o
+        mesmo prompt e modelo da geração original, cujo prefixo é lido do
+        cache de prompt. Sem seção identificada, ou se os ajustes mencionam seção
+        ausente, a contestação inteira é reescrita em uma única requisição.
+        
         Args:
             resultado_anterior: Resultado da geração anterior
             ajustes: Instruções de ajuste do usuário
+            dados_peticao: Dados da petição usados na geração anterior
+            contexto_rag: Contexto RAG usado na geração anterior
             temperatura: Nova temperatura (opcional)
             top_k: Novo top-k (opcional)
+            secoes: Seções a reescrever (opcional; padrão: identificar pelos
+                ajustes)
+        
+        Returns:
+            Nova contestação gerada, com 'secoes_regeneradas' e
+            'secoes_preservadas' em metadados
+        """
+        metadados_anteriores = resultado_anterior['metadados']
+        temperatura = metadados_anteriores['temperatura'] if temperatura is None else temperatura
+        top_k = metadados_anteriores['top_k'] if top_k is None else top_k
+        
+        contestacao_anterior = resultado_anterior['contestacao']
+        divisao = dividir_secoes(contestacao_anterior)
+        alvo = list(secoes) if secoes else secoes_afetadas(ajustes)
+        completa = not alvo or not set(alvo) <= {secao.chave for secao in divisao}
+        
+        print("\n" + "="*80)
+        print("✏️  REGENERANDO CONTESTAÇÃO COM AJUSTES")
+        print("="*80 + "\n")
+        
+        if completa:
+            print("   Seções afetadas não identificadas na contestação: reescrita completa\n")
+            pedidos = [(None, PROMPT_REGENERAR_COMPLETA_TEMPLATE.format(ajustes=ajustes))]
+            max_tokens = Config.DEFAULT_MAX_TOKENS
+        else:
+            pedidos = [
+                (secao, PROMPT_REGENERAR_SECAO_TEMPLATE.format(titulo_secao=secao.titulo, ajustes=ajustes))
+                for secao in divisao if secao.chave in alvo
+            ]
+            max_tokens = Config.MAX_TOKENS_REGENERACAO_SECAO
+            print(f"   Seções a reescrever: {', '.join(NOMES_SECOES[chave] for chave in alvo)}\n")
+        
+        # Mesmo modelo da geração anterior (ex: modelo rápido do roteamento):
+        # o prefixo cacheado é por modelo e o documento não mistura modelos
+        params = self._montar_parametros(
+            dados_peticao, contexto_rag, temperatura, top_k, max_tokens, metadados_anteriores.get('model')
+        )
+        self._registrar_uso_cache(dados_peticao.get('tipo_caso'), params['model'])
+        
+        uso_total = {campo: 0 for campo in CAMPOS_USO}
+        try:
+            inicio = time.perf_counter()
+            
+            reescritas = {}
+            for secao, instrucao in pedidos:
+                print(f"🌐 Reescrevendo: {secao.titulo if secao else 'contestação completa'}")
+                params_secao = {**params, 'messages': _mensagens_reescrita(params, contestacao_anterior, instrucao)}
+                texto, response, _, _ = self._continuar(
+                    params_secao, self._chamar_api(params_secao, 'regeneracao'), uso_total
+                )
+                reescritas[secao] = (texto, response)
+            
+            duracao = time.perf_counter() - inicio
+        
+        except Exception as e:
+            aviso = "Erro na API" if isinstance(e, anthropic.APIError) else "Erro inesperado"
+            print(f"❌ {aviso}: {e}\n")
+            return self._resultado_falha(e, params, dados_peticao, uso_total, 'regeneracao_falha')
+        
+        # Costurar: seções reescritas no lugar, demais literalmente
+        if completa:
+            contestacao = reescritas[None][0]
+        else:
+            contestacao = juntar_secoes([
+                substituir_secao(secao, reescritas[secao][0]) if secao in reescritas else secao
+                for secao in divisao
+            ])
+        
+        metadados = self._montar_metadados(params, response, dados_peticao)
+        metadados.update(uso_total)
+        metadados['duracao_s'] = round(duracao, 3)
+        metadados['stop_reason'] = next(
+            (r.stop_reason for _, r in reescritas.values() if r.stop_reason == 'max_tokens'),
+            response.stop_reason
+        )
+        metadados['secoes_regeneradas'] = [s.chave for s in divisao] if completa else alvo
+        metadados['secoes_preservadas'] = [] if completa else [
+            secao.chave for secao in divisao if secao.chave not in alvo
+        ]
+        
+        return self._resultado_sucesso(contestacao, metadados, operacao='regeneracao')
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# AQUECIMENTO DO PROMPT CACHE
+# ═══════════════════════════════════════════════════════════════════════════
+
+class AquecedorCache:
+    """
+    Renova em segundo plano o prefixo cacheado (system + instruções) dos
+    tipos de caso usados recentemente, antes que o cache efêmero expire
+    
+    Único no processo (ver obter_aquecedor): o cache da API não é por
+    gerador, então sessões que usam o mesmo cliente, modelo e tipo de caso
+    compartilham uma única renovação (o cache é por modelo: cada modelo
+    roteado aquece o próprio prefixo). A thread termina quando nenhum tipo
+    está mais dentro da janela e é reiniciada no próximo uso.
+    """
+    
+    def __init__(self):
+        # Por (cliente, modelo, tipo de caso): cliente, livro de custos,
+        # última geração e último acesso ao prefixo (geração ou aquecimento)
+        self._prefixos: Dict[Tuple[int, str, str], Dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    def registrar_uso(self, cliente, livro_custos: LivroCustos, tipo_caso: Optional[str], modelo: str):
+        """
+        Registra uma geração com o prefixo do tipo de caso e inicia o
+        aquecimento, se parado
+        
+        Args:
+            cliente: Cliente da API usado na geração (e no aquecimento)
+            livro_custos: Livro onde as renovações são registradas
+            tipo_caso: Tipo de caso da petição (None: prefixo sem tipo)
+            modelo: Modelo da geração (o aquecimento usa o mesmo)
+        """
+        agora = time.time()
+        
+        with self._lock:
+            self._prefixos[(id(cliente), modelo, tipo_caso or '')] = {
+                'cliente': cliente,
+                'livro_custos': livro_custos,
+                'modelo': modelo,
+                'tipo': tipo_caso or '',
+                'uso': agora,
+                'acesso': agora
+            }
+            
+            if Config.PROMPT_CACHE_MANTER_AQUECIDO and self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop,
+                    name="aquecedor-prompt-cache",
+                    daemon=True
+                )
+                self._thread.start()
+    
+    def _loop(self):
+        """Renova periodicamente os prefixos enquanto algum estiver na janela"""
+        while True:
+            time.sleep(Config.PROMPT_CACHE_TTL_S * 0.25)
+            self.manter_aquecido()
             
+            with self._lock:
+                if not self._prefixos:
+                    self._thread = None
+                    return
+    
+    def manter_aquecido(self) -> List[str]:
+        """
+        Renova os prefixos devidos
+        
+        Um prefixo é renovado se o último acesso passou da metade do TTL do
+        cache e a última geração do tipo ainda está dentro de
+        Config.PROMPT_CACHE_JANELA_AQUECIMENTO_S (fora dela, é esquecido).
+        A requisição de aquecimento usa max_tokens=1 e lê o prefixo do
+        cache (custo de leitura de cache, não de input completo).
+        
         Returns:
-            Nova contestação gerada
+            Tipos de caso renovados
         """
-        # TODO: Implementar funcionalidade de regeneração com feedback
-        pass
+        agora = time.time()
+        
+        with self._lock:
+            expirados = [
+                chave for chave, prefixo in self._prefixos.items()
+                if agora - prefixo['uso'] > Config.PROMPT_CACHE_JANELA_AQUECIMENTO_S
+            ]
+            for chave in expirados:
+                del self._prefixos[chave]
+            
+            devidos = [
+                prefixo for prefixo in self._prefixos.values()
+                if agora - prefixo['acesso'] >= Config.PROMPT_CACHE_TTL_S * 0.5
+            ]
+        
+        renovados = []
+        for prefixo in devidos:
+            tipo = prefixo['tipo']
+            try:
+                response = _criar_mensagem(prefixo['cliente'], {
+                    'model': prefixo['modelo'],
+                    'max_tokens': 1,
+                    'system': _blocos_system(),
+                    'messages': [{
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": construir_bloco_instrucoes(tipo),
+                                "cache_control": {"type": "ephemeral"}
+                            },
+                            {"type": "text", "text": "Responda apenas: OK"}
+                        ]
+                    }]
+                }, 'aquecimento_cache')
+            except anthropic.APIError as e:
+                print(f"⚠️  Falha ao aquecer cache ({tipo or 'sem tipo'}): {e}")
+                continue
+            
+            prefixo['livro_custos'].registrar(
+                prefixo['modelo'],
+                _uso_resposta(response),
+                operacao='aquecimento_cache',
+                tipo_caso=tipo or None
+            )
+            
+            # Renovação conta como acesso, mas não estende a janela de uso
+            with self._lock:
+                prefixo['acesso'] = time.time()
+            renovados.append(tipo)
+        
+        return renovados
+
+
+_AQUECEDOR: Optional[AquecedorCache] = None
+_LOCK_AQUECEDOR = threading.Lock()
+
+
+def obter_aquecedor() -> AquecedorCache:
+    """Aquecedor de prompt cache único do processo"""
+    global _AQUECEDOR
+    
+    with _LOCK_AQUECEDOR:
+        if _AQUECEDOR is None:
+            _AQUECEDOR = AquecedorCache()
+        return _AQUECEDOR
+
+
+def obter_cliente(api_key: str) -> anthropic.Anthropic:
+    """
+    Cliente síncrono compartilhado no processo (um por chave de API)
+    
+    Sessões do Streamlit e o aquecedor de cache reaproveitam o mesmo pool
+    de conexões HTTP em vez de abrir um cliente por sessão.
+    """
+    with _LOCK_CLIENTES:
+        if api_key not in _CLIENTES:
+            _CLIENTES[api_key] = anthropic.Anthropic(api_key=api_key, base_url=Config.ANTHROPIC_BASE_URL)
+        return _CLIENTES[api_key]
+
+
+def _criar_mensagem(client, params: Dict, operacao: str):
+    """messages.create medido como span 'api.messages' (modelo, operação e uso de tokens)"""
+    with span('api.messages', operacao=operacao, modelo=params['model']) as registro:
+        response = client.messages.create(**params)
+        registro.atributos.update(_uso_resposta(response), stop_reason=response.stop_reason)
+    return response
+
+
+def _mensagens_parte(params: Dict, instrucao: str) -> List[Dict]:
+    """Prompt original com a instrução da parte como último bloco (após os breakpoints de cache)"""
+    mensagem = params['messages'][0]
+    return [{**mensagem, 'content': mensagem['content'] + [{"type": "text", "text": instrucao}]}]
+
+
+def _params_continuacao(params: Dict, parcial: str) -> Dict:
+    """Requisição que retoma a resposta a partir do texto parcial (turno do assistente)"""
+    return {
+        **params,
+        'messages': params['messages'] + [{"role": "assistant", "content": parcial}]
+    }
+
+
+def _mensagens_reescrita(params: Dict, contestacao: str, instrucao: str) -> List[Dict]:
+    """
+    Mensagens para reescrever a contestação: prompt original, contestação
+    anterior como turno do assistente (último breakpoint de cache, comum a
+    todas as seções reescritas) e a instrução de ajuste
+    """
+    return params['messages'] + [
+        {
+            "role": "assistant",
+            "content": [
+                {"type": "text", "text": contestacao, "cache_control": {"type": "ephemeral"}}
+            ]
+        },
+        {"role": "user", "content": instrucao}
+    ]
+
+
+def _somar_uso(uso: Dict[str, int], partes: Dict[str, Tuple]) -> Dict[str, int]:
+    """Uso acumulado somado ao de cada parte concluída (texto, resposta, uso, duração)"""
+    total = dict(uso)
+    for _, _, uso_parte, _ in partes.values():
+        for campo, valor in uso_parte.items():
+            total[campo] += valor
+    return total
+
+
+def _uso_resposta(response) -> Dict[str, int]:
+    """Uso de tokens de uma resposta da API (campos de cache ausentes = 0)"""
+    return {
+        'input_tokens': response.usage.input_tokens,
+        'output_tokens': response.usage.output_tokens,
+        'cache_creation_input_tokens': getattr(response.usage, 'cache_creation_input_tokens', None) or 0,
+        'cache_read_input_tokens': getattr(response.usage, 'cache_read_input_tokens', None) or 0
+    }
+
+
+def _blocos_system() -> List[Dict]:
+    """System prompt como bloco cacheável (primeiro breakpoint do prefixo)"""
+    return [
+        {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+    ]
+
+
+class StreamContestacao:
+    """
+    Geração em streaming: iterável de deltas de texto
+    
+    Após a iteração, `resultado` contém a contestação completa e os
+    metadados (incluindo uso final, stop_reason, TTFT e tokens/s). Se a
+    geração parar em max_tokens, as continuações seguem no mesmo iterável.
+    Com validador, cada delta alimenta uma ValidacaoIncremental; uma
+    violação fecha o stream (a API deixa de gerar) e a geração é reiniciada
+    com a orientação corretiva ou abortada. As tentativas interrompidas
+    ficam em metadados['interrupcoes'] (ou resultado['interrupcoes'], se
+    abortada) e seu custo entra em custo_estimado.
+    
+    O texto de uma tentativa descartada já foi entregue: a cada reinício,
+    `reinicios` é incrementado antes do primeiro trecho da nova tentativa,
+    e o consumidor deve descartar o que acumulou até ali.
+    """
+    
+    def __init__(
+        self,
+        gerador: LLMGenerator,
+        params: Dict,
+        dados_peticao: Dict,
+        tokens_previstos: Optional[int] = None,
+        usar_cache: Optional[bool] = None,
+        resultado_cache: Optional[Dict] = None,
+        validador: Optional[ValidadorContestacao] = None
+    ):
+        self.gerador = gerador
+        self.params = params
+        self.dados_peticao = dados_peticao
+        self.tokens_previstos = tokens_previstos
+        self.usar_cache = usar_cache
+        self.resultado_cache = resultado_cache
+        self.validador = validador
+        self.validacao = None
+        self.reinicios = 0
+        self.resultado: Optional[Dict] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        if self.resultado_cache is not None:
+            self.resultado = self.resultado_cache
+            yield self.resultado_cache['contestacao']
+            return
+        
+        print("🌐 Chamando API Claude (streaming)...")
+        partes = []
+        ttft = None
+        interrupcoes = []
+        # Uso das mensagens concluídas da tentativa atual (as interrompidas
+        # já foram ao livro em _registrar_interrupcao)
+        uso = {campo: 0 for campo in CAMPOS_USO}
+        
+        try:
+            inicio = time.perf_counter()
+            base = self.params
+            params = base
+            continuacoes = 0
+            self.validacao = self._iniciar_validacao()
+            
+            while True:
+                violacao = None
+                with self.gerador.client.messages.stream(**params) as stream:
+                    for texto in stream.text_stream:
+                        if ttft is None:
+                            ttft = time.perf_counter() - inicio
+                            print(f"   ⚡ Primeiro token em {ttft:.2f}s")
+                        partes.append(texto)
+                        yield texto
+                        
+                        if self.validacao is not None:
+                            violacao = self.validacao.consumir(texto)
+                            if violacao is not None:
+                                break
+                    
+                    if violacao is None:
+                        mensagem = stream.get_final_message()
+                    else:
+                        # Uso até aqui: input da abertura da mensagem e output estimado
+                        uso_parcial = _uso_resposta(stream.current_message_snapshot)
+                
+                if violacao is not None:
+                    uso_parcial['output_tokens'] = max(
+                        uso_parcial['output_tokens'], contar_tokens(self.validacao.texto)
+                    )
+                    interrupcoes.append(self._registrar_interrupcao(params, violacao, uso_parcial, uso))
+                    uso = {campo: 0 for campo in CAMPOS_USO}
+                    
+                    redirecionar = (
+                        violacao.acao == 'redirecionar'
+                        and len(interrupcoes) <= Config.VALIDACAO_STREAM_MAX_REDIRECIONAMENTOS
+                    )
+                    if not redirecionar:
+                        self.resultado = self._resultado_interrompido(violacao, interrupcoes)
+                        return
+                    
+                    print(f"↩️  Reiniciando com orientação corretiva: {violacao.orientacao}")
+                    self.reinicios += 1
+                    
+                    base = {**self.params, 'messages': _mensagens_parte(self.params, violacao.orientacao)}
+                    params = base
+                    partes = []
+                    continuacoes = 0
+                    self.validacao = self._iniciar_validacao()
+                    continue
+                
+                for campo, valor in _uso_resposta(mensagem).items():
+                    uso[campo] += valor
+                
+                # Parou em max_tokens: continuar a partir do texto parcial
+                if mensagem.stop_reason != 'max_tokens' or continuacoes >= Config.MAX_CONTINUACOES:
+                    break
+                continuacoes += 1
+                print(f"↪️  Limite de tokens atingido; continuando ({continuacoes}/{Config.MAX_CONTINUACOES})...")
+                partes = [''.join(partes).rstrip()]
+                params = _params_continuacao(base, partes[0])
+            
+            duracao = time.perf_counter() - inicio
+            
+            metadados = self.gerador._montar_metadados(
+                self.params, mensagem, self.dados_peticao, self.tokens_previstos
+            )
+            metadados.update(uso)
+            metadados['continuacoes'] = continuacoes
+            metadados.update(_metricas_streaming(metadados['output_tokens'], ttft, duracao))
+            registrar_span(
+                'api.messages_stream',
+                duracao,
+                modelo=self.params['model'],
+                ttft_s=metadados['ttft_s'],
+                continuacoes=continuacoes,
+                interrupcoes=len(interrupcoes),
+                **uso
+            )
+            if interrupcoes:
+                metadados['interrupcoes'] = interrupcoes
+            
+            print(f"   Tokens/s: {metadados['tokens_por_segundo']:.1f}\n")
+            
+            self.resultado = self.gerador._resultado_sucesso(''.join(partes), metadados)
+            uso = {campo: 0 for campo in CAMPOS_USO}  # já registrado no livro
+            if interrupcoes:
+                self.resultado['custo_estimado'] += sum(i['custo_usd'] for i in interrupcoes)
+            else:
+                self.gerador._gravar_cache_resultados(self.params, self.resultado, self.usar_cache)
+            if self.validacao is not None:
+                self.resultado['validacao'] = self.validacao.finalizar()
+        
+        except Exception as e:
+            aviso = "Erro na API" if isinstance(e, anthropic.APIError) else "Erro inesperado"
+            print(f"❌ {aviso}: {e}\n")
+            self.resultado = self.gerador._resultado_falha(
+                e, self.params, self.dados_peticao, uso, 'geracao_falha', self.tokens_previstos
+            )
+            if interrupcoes:
+                self.resultado['interrupcoes'] = interrupcoes
+                self.resultado['custo_estimado'] = (
+                    self.resultado.get('custo_estimado', 0.0) + sum(i['custo_usd'] for i in interrupcoes)
+                )
+    
+    def _iniciar_validacao(self):
+        """Validação incremental da tentativa (limites de tamanho pelo max_tokens)"""
+        if self.validador is None:
+            return None
+        return self.validador.iniciar_incremental(max_tokens=self.params['max_tokens'])
+    
+    def _registrar_interrupcao(
+        self,
+        params: Dict,
+        violacao: ViolacaoEstrutural,
+        uso_parcial: Dict,
+        uso_anterior: Dict
+    ) -> Dict:
+        """Registra no livro o uso da tentativa interrompida (com continuações anteriores)"""
+        for campo, valor in uso_anterior.items():
+            uso_parcial[campo] += valor
+        
+        registro = self.gerador.livro_custos.registrar(
+            params['model'],
+            uso_parcial,
+            operacao='geracao_interrompida',
+            tipo_caso=self.dados_peticao.get('tipo_caso')
+        )
+        
+        return {
+            'regra': violacao.regra,
+            'mensagem': violacao.mensagem,
+            'acao': violacao.acao,
+            'caracteres': violacao.caracteres,
+            'output_tokens': uso_parcial['output_tokens'],
+            'tokens_economizados_estimados': max(params['max_tokens'] - uso_parcial['output_tokens'], 0),
+            'custo_usd': registro['custo_usd']['total']
+        }
+    
+    def _resultado_interrompido(self, violacao: ViolacaoEstrutural, interrupcoes: List[Dict]) -> Dict:
+        """Resultado de falha de uma geração abortada pela validação incremental"""
+        economizados = sum(i['tokens_economizados_estimados'] for i in interrupcoes)
+        print(f"🛑 Geração abortada: {violacao.mensagem} (~{economizados:,} tokens de output evitados)\n")
+        
+        return {
+            'contestacao': None,
+            'erro': f"Geração interrompida pela validação incremental: {violacao.mensagem}",
+            'sucesso': False,
+            'interrupcoes': interrupcoes,
+            'custo_estimado': sum(i['custo_usd'] for i in interrupcoes),
+            'metricas_parciais': self.validacao.metricas
+        }
+
+
+def _metricas_streaming(output_tokens: int, ttft: Optional[float], duracao: float) -> Dict:
+    """TTFT, duração total e tokens/s (medidos após o primeiro token)"""
+    ttft = ttft if ttft is not None else duracao
+    tempo_geracao = duracao - ttft
+    
+    return {
+        'ttft_s': round(ttft, 3),
+        'duracao_s': round(duracao, 3),
+        'tokens_por_segundo': round(output_tokens / tempo_geracao, 1) if tempo_geracao > 0 else 0.0
+    }
@@ -0,0 +1,461 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+GERAÇÃO EM LOTE - MESSAGE BATCHES API
+═══════════════════════════════════════════════════════════════════════════
+Submete as contestações de várias petições como um único lote assíncrono
+(metade do preço da chamada síncrona), acompanha o processamento e mapeia
+os resultados de volta às petições. O estado de cada lote é gravado em
+Config.BATCH_DIR, de modo que um lote submetido sobrevive a reinícios.
+
+Os custos de um lote encerrado são registrados no livro só depois que os
+resultados coletados estão salvos, e cada registro leva a referência
+'<batch_id>/<custom_id>': uma retomada após falha no meio do registro
+pula o que já está no livro (nenhuma requisição é cobrada duas vezes).
+
+EndpointLotesLocal simula o endpoint de lotes em processo, para testes.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional
+
+import anthropic
+
+from config.settings import Config
+from modules.contabilidade import CAMPOS_USO, calcular_custo
+from modules.llm_generator import LLMGenerator
+from modules.tokens import contar_tokens
+
+# Status local do lote
+STATUS_SUBMETENDO = 'submetendo'
+STATUS_PROCESSANDO = 'processando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_FALHOU = 'falhou'
+STATUS_FINAIS = (STATUS_CONCLUIDO, STATUS_FALHOU)
+
+
+class GeradorLote:
+    """Geração de contestações em lote, com estado persistente por lote"""
+    
+    def __init__(
+        self,
+        gerador: LLMGenerator,
+        endpoint=None,
+        diretorio: Optional[Path] = None
+    ):
+        """
+        Args:
+            gerador: LLMGenerator usado para montar as requisições e
+                registrar custos
+            endpoint: Endpoint de lotes (padrão: gerador.client.messages.batches;
+                use EndpointLotesLocal em testes)
+            diretorio: Diretório do estado dos lotes (padrão: Config.BATCH_DIR)
+        """
+        self.gerador = gerador
+        self.endpoint = endpoint or gerador.client.messages.batches
+        self.diretorio = Path(diretorio or Config.BATCH_DIR)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+    
+    def submeter(
+        self,
+        itens: List[Dict],
+        temperatura: float = Config.DEFAULT_TEMPERATURE,
+        top_k: int = Config.DEFAULT_TOP_K,
+        max_tokens: int = Config.DEFAULT_MAX_TOKENS
+    ) -> Dict:
+        """
+        Monta e submete as requisições de várias petições como um lote
+        
+        Args:
+            itens: Lista de dicts com 'referencia' (identificador da petição,
+                ex: nome do arquivo), 'dados_peticao' e 'contexto_rag'
+            temperatura: Parâmetro de temperatura (0.3-0.9)
+            top_k: Parâmetro top-k (20-60)
+            max_tokens: Tokens máximos por contestação
+        
+        Returns:
+            Estado do lote (id_local, batch_id, status, peticoes...)
+        """
+        if not itens:
+            raise ValueError("Lote vazio: nenhuma petição informada")
+        
+        print("\n" + "="*80)
+        print(f"📦 SUBMETENDO LOTE ({len(itens)} petições)")
+        print("="*80 + "\n")
+        
+        requisicoes = []
+        peticoes = {}
+        
+        for indice, item in enumerate(itens):
+            # custom_id: até 64 caracteres [a-zA-Z0-9_-]; a referência
+            # original fica no mapeamento do estado
+            custom_id = f"peticao-{indice:04d}"
+            dados_peticao = item['dados_peticao']
+            
+            params, tokens_previstos = self.gerador._preparar_requisicao(
+                dados_peticao, item['contexto_rag'], temperatura, top_k, max_tokens,
+                aquecer_cache=False
+            )
+            requisicoes.append({'custom_id': custom_id, 'params': params})
+            
+            peticoes[custom_id] = {
+                'referencia': item['referencia'],
+                'tipo_caso': dados_peticao.get('tipo_caso'),
+                'confianca': dados_peticao.get('confianca'),
+                'input_tokens_previstos': tokens_previstos
+            }
+        
+        estado = {
+            'id_local': f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}",
+            'batch_id': None,
+            'status': STATUS_SUBMETENDO,
+            'criado_em': datetime.now().isoformat(timespec='seconds'),
+            'parametros': {
+                'model': Config.CLAUDE_MODEL,
+                'temperature': requisicoes[0]['params']['temperature'],
+                'top_k': requisicoes[0]['params']['top_k'],
+                'max_tokens': max_tokens
+            },
+            'peticoes': peticoes,
+            'contagens': {},
+            'resultados': {}
+        }
+        self._salvar(estado)
+        
+        try:
+            lote = self.endpoint.create(requests=requisicoes)
+        except Exception as e:
+            # Estado final: o lote não foi aceito e não deve ficar pendente
+            estado['status'] = STATUS_FALHOU
+            estado['erro'] = f"{type(e).__name__}: {e}"
+            self._salvar(estado)
+            print(f"❌ Falha ao submeter lote {estado['id_local']}: {e}\n")
+            raise
+        
+        estado['batch_id'] = lote.id
+        estado['status'] = STATUS_PROCESSANDO
+        self._salvar(estado)
+        
+        print(f"✅ Lote submetido: {lote.id} (estado local: {estado['id_local']})\n")
+        
+        return estado
+    
+    def atualizar(self, id_local: str) -> Dict:
+        """
+        Consulta o lote e, se encerrado, coleta e persiste os resultados
+        
+        Idempotente: lotes concluídos não são consultados de novo (nem
+        registrados duas vezes no livro de custos). Um lote concluído com
+        custos ainda pendentes (falha durante o registro) tem o registro
+        retomado.
+        
+        Args:
+            id_local: Identificador local do lote
+        
+        Returns:
+            Estado atualizado do lote
+        """
+        estado = self.carregar(id_local)
+        
+        if estado['status'] == STATUS_CONCLUIDO and estado.get('custos_pendentes'):
+            self._registrar_custos(estado, retomada=True)
+            return estado
+        
+        if estado['status'] != STATUS_PROCESSANDO:
+            return estado
+        
+        lote = self.endpoint.retrieve(estado['batch_id'])
+        estado['contagens'] = _contagens(lote)
+        
+        if lote.processing_status != 'ended':
+            self._salvar(estado)
+            return estado
+        
+        # Resultados (e a lista de custos a registrar) salvos antes do livro
+        self._coletar_resultados(estado)
+        estado['status'] = STATUS_CONCLUIDO
+        estado['concluido_em'] = datetime.now().isoformat(timespec='seconds')
+        self._salvar(estado)
+        
+        self._registrar_custos(estado)
+        return estado
+    
+    def aguardar(
+        self,
+        id_local: str,
+        intervalo_s: float = Config.BATCH_INTERVALO_POLLING_S,
+        timeout_s: Optional[float] = None
+    ) -> Dict:
+        """
+        Consulta o lote periodicamente até o fim do processamento
+        
+        Args:
+            id_local: Identificador local do lote
+            intervalo_s: Intervalo entre consultas
+            timeout_s: Tempo máximo de espera (None = sem limite)
+        
+        Returns:
+            Estado do lote (status 'concluido', salvo em caso de timeout)
+        """
+        inicio = time.monotonic()
+        
+        while True:
+            estado = self.atualizar(id_local)
+            if estado['status'] == STATUS_CONCLUIDO:
+                return estado
+            
+            contagens = estado['contagens']
+            print(f"⏳ Lote {id_local}: {contagens.get('processing', 0)} em processamento, "
+                  f"{contagens.get('succeeded', 0)} concluídas")
+            
+            if timeout_s is not None and time.monotonic() - inicio + intervalo_s > timeout_s:
+                return estado
+            
+            time.sleep(intervalo_s)
+    
+    def resultados(self, id_local: str) -> Dict[str, Dict]:
+        """
+        Resultados do lote por referência da petição
+        
+        Args:
+            id_local: Identificador local do lote
+        
+        Returns:
+            Dict referência → resultado no formato de gerar_contestacao
+            (vazio enquanto o lote não estiver concluído)
+        """
+        estado = self.carregar(id_local)
+        
+        return {
+            estado['peticoes'][custom_id]['referencia']: resultado
+            for custom_id, resultado in estado['resultados'].items()
+        }
+    
+    def listar(self, apenas_pendentes: bool = False) -> List[Dict]:
+        """
+        Lista os lotes com estado salvo (mais recentes primeiro)
+        
+        Args:
+            apenas_pendentes: Retornar só lotes ainda não concluídos (ex: para
+                retomar o acompanhamento após um reinício)
+        
+        Returns:
+            Estados dos lotes
+        """
+        estados = [
+            json.loads(arquivo.read_text(encoding='utf-8'))
+            for arquivo in sorted(self.diretorio.glob('*.json'), reverse=True)
+        ]
+        
+        if apenas_pendentes:
+            estados = [e for e in estados if e['status'] not in STATUS_FINAIS]
+        
+        return estados
+    
+    def carregar(self, id_local: str) -> Dict:
+        """Carrega o estado salvo de um lote"""
+        arquivo = self.diretorio / f"{id_local}.json"
+        if not arquivo.exists():
+            raise ValueError(f"Lote não encontrado: {id_local}")
+        
+        return json.loads(arquivo.read_text(encoding='utf-8'))
+    
+    def _salvar(self, estado: Dict):
+        """Grava o estado do lote de forma atômica (arquivo parcial + rename)"""
+        destino = self.diretorio / f"{estado['id_local']}.json"
+        parcial = destino.with_name(f"{destino.name}.{os.getpid()}.{threading.get_ident()}.parcial")
+        
+        parcial.write_text(json.dumps(estado, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(parcial, destino)
+    
+    def _coletar_resultados(self, estado: Dict):
+        """Lê os resultados do lote encerrado (custos calculados, ainda não registrados)"""
+        parametros = estado['parametros']
+        estado['custos_pendentes'] = []
+        
+        for entrada in self.endpoint.results(estado['batch_id']):
+            peticao = estado['peticoes'].get(entrada.custom_id)
+            if peticao is None:
+                continue
+            
+            if entrada.result.type != 'succeeded':
+                erro = getattr(entrada.result, 'error', None)
+                estado['resultados'][entrada.custom_id] = {
+                    'contestacao': None,
+                    'erro': f"{entrada.result.type}: {erro}" if erro else entrada.result.type,
+                    'sucesso': False
+                }
+                continue
+            
+            mensagem = entrada.result.message
+            metadados = self.gerador._montar_metadados(
+                parametros,
+                mensagem,
+                {'tipo_caso': peticao['tipo_caso'], 'confianca': peticao['confianca']},
+                peticao['input_tokens_previstos']
+            )
+            metadados['lote'] = estado['batch_id']
+            
+            custo_resultado = calcular_custo(metadados['model'], metadados, Config.FATOR_PRECO_LOTE)
+            
+            estado['resultados'][entrada.custom_id] = {
+                'contestacao': mensagem.content[0].text,
+                'metadados': metadados,
+                'custo_estimado': custo_resultado['total'],
+                'custo_detalhado': custo_resultado,
+                'sucesso': True
+            }
+            estado['custos_pendentes'].append(entrada.custom_id)
+        
+        sucessos = sum(1 for r in estado['resultados'].values() if r['sucesso'])
+        custo = sum(r.get('custo_estimado', 0.0) for r in estado['resultados'].values())
+        print(f"✅ Lote {estado['batch_id']} concluído: {sucessos}/{len(estado['peticoes'])} "
+              f"contestações, custo ${custo:.4f}\n")
+    
+    def _registrar_custos(self, estado: Dict, retomada: bool = False):
+        """
+        Registra no livro os custos pendentes do lote e limpa a pendência
+        
+        Args:
+            estado: Estado do lote concluído (já salvo com os resultados)
+            retomada: Registro interrompido antes; pula as referências que
+                já estão no livro
+        """
+        prefixo = f"{estado['batch_id']}/"
+        ja_registradas = (
+            self.gerador.livro_custos.referencias(prefixo, desde=estado['concluido_em'][:10])
+            if retomada else set()
+        )
+        
+        for custom_id in estado['custos_pendentes']:
+            if prefixo + custom_id in ja_registradas:
+                continue
+            
+            peticao = estado['peticoes'][custom_id]
+            metadados = estado['resultados'][custom_id]['metadados']
+            self.gerador.livro_custos.registrar(
+                metadados['model'],
+                metadados,
+                operacao='lote',
+                tipo_caso=peticao['tipo_caso'],
+                input_tokens_previstos=peticao['input_tokens_previstos'],
+                fator_preco=Config.FATOR_PRECO_LOTE,
+                referencia=prefixo + custom_id
+            )
+        
+        estado['custos_pendentes'] = []
+        self._salvar(estado)
+
+
+def _contagens(lote) -> Dict[str, int]:
+    """Contagens de requisições do lote por situação"""
+    contagens = lote.request_counts
+    return {
+        situacao: getattr(contagens, situacao, 0)
+        for situacao in ('processing', 'succeeded', 'errored', 'canceled', 'expired')
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# ENDPOINT LOCAL (TESTES)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class EndpointLotesLocal:
+    """
+    Endpoint de lotes em processo, com a interface de messages.batches
+    
+    Os lotes ficam 'in_progress' por latencia_s segundos e então são
+    respondidos requisição a requisição por `responder(params)`. O
+    responder padrão devolve uma contestação sintética com uso de tokens
+    estimado localmente; um responder que lance exceção gera um resultado
+    'errored' para a requisição.
+    """
+    
+    def __init__(
+        self,
+        responder: Optional[Callable[[Dict], object]] = None,
+        latencia_s: float = 0.0
+    ):
+        self.responder = responder or _resposta_sintetica
+        self.latencia_s = latencia_s
+        self._lotes: Dict[str, Dict] = {}
+        self._sequencia = itertools.count(1)
+    
+    def create(self, requests: List[Dict]):
+        lote_id = f"msgbatch_local_{next(self._sequencia):06d}"
+        self._lotes[lote_id] = {
+            'requisicoes': list(requests),
+            'criado': time.monotonic(),
+            'resultados': None
+        }
+        return self.retrieve(lote_id)
+    
+    def retrieve(self, batch_id: str):
+        lote = self._obter(batch_id)
+        encerrado = time.monotonic() - lote['criado'] >= self.latencia_s
+        
+        if encerrado and lote['resultados'] is None:
+            lote['resultados'] = [self._processar(r) for r in lote['requisicoes']]
+        
+        if lote['resultados'] is None:
+            contagens = {'processing': len(lote['requisicoes'])}
+        else:
+            contagens = {'processing': 0}
+            for entrada in lote['resultados']:
+                contagens[entrada.result.type] = contagens.get(entrada.result.type, 0) + 1
+        
+        return SimpleNamespace(
+            id=batch_id,
+            type='message_batch',
+            processing_status='ended' if encerrado else 'in_progress',
+            request_counts=SimpleNamespace(**contagens)
+        )
+    
+    def results(self, batch_id: str) -> Iterator:
+        lote = self._obter(batch_id)
+        if lote['resultados'] is None:
+            raise anthropic.AnthropicError(f"Lote {batch_id} ainda em processamento")
+        return iter(lote['resultados'])
+    
+    def _obter(self, batch_id: str) -> Dict:
+        if batch_id not in self._lotes:
+            raise anthropic.AnthropicError(f"Lote não encontrado: {batch_id}")
+        return self._lotes[batch_id]
+    
+    def _processar(self, requisicao: Dict):
+        try:
+            resultado = SimpleNamespace(type='succeeded', message=self.responder(requisicao['params']))
+        except Exception as e:
+            resultado = SimpleNamespace(type='errored', error=str(e))
+        return SimpleNamespace(custom_id=requisicao['custom_id'], result=resultado)
+
+
+def _resposta_sintetica(params: Dict):
+    """Mensagem no formato da API com uma contestação sintética"""
+    texto = (
+        "EXCELENTÍSSIMO SENHOR DOUTOR JUIZ DE DIREITO\n\n"
+        "I - DA IDENTIFICAÇÃO\n\nUNIMED FERJ, já qualificada, apresenta CONTESTAÇÃO.\n\n"
+        "II - DOS FATOS\n\nContestação sintética gerada pelo endpoint local de lotes.\n\n"
+        "III - DO DIREITO\n\nNos termos do art. 30 da Lei 9.656/98.\n\n"
+        "IV - DOS PEDIDOS\n\nRequer a total improcedência da ação."
+    )
+    
+    uso = {campo: 0 for campo in CAMPOS_USO}
+    uso['input_tokens'] = sum(
+        contar_tokens(bloco['text']) for bloco in params['system'] + params['messages'][0]['content']
+    )
+    uso['output_tokens'] = contar_tokens(texto)
+    
+    return SimpleNamespace(
+        content=[SimpleNamespace(type='text', text=texto)],
+        usage=SimpleNamespace(**uso),
+        stop_reason='end_turn',
+        model=params['model']
+    )
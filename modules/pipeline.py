@@ -0,0 +1,309 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+PIPELINE DE GERAÇÃO DE CONTESTAÇÕES
+═══════════════════════════════════════════════════════════════════════════
+Etapas do fluxo completo, da petição à contestação validada:
+
+    processamento → retrieval → contexto → geração → validação
+
+Cada etapa é um método próprio (para execução escalonada, ex: workers por
+etapa) e executar() encadeia todas, avisando o início e o fim de cada uma
+a um callback de progresso. Os componentes pesados (modelo de embeddings,
+collection, índice de citações) vêm do registro de modules.recursos.
+"""
+
+import time
+from typing import Callable, Dict, Optional
+
+from config.settings import Config
+from modules.agendador import obter_agendador
+from modules.document_processor import processar_peticao_bytes
+from modules.llm_generator import ContextBuilder, LLMGenerator
+from modules.rag_retriever import RAGRetriever
+from modules.recursos import obter_gerador, obter_indice_citacoes
+from modules.roteador import RoteadorModelos
+from modules.telemetria import span
+from modules.validator import ValidadorContestacao
+
+# Etapas, na ordem de execução
+ETAPAS = ('processamento', 'retrieval', 'contexto', 'geracao', 'validacao')
+
+NOMES_ETAPAS = {
+    'processamento': "📄 Processamento da petição",
+    'retrieval': "🔍 Retrieval RAG",
+    'contexto': "📚 Construção do contexto",
+    'geracao': "🤖 Geração da contestação",
+    'validacao': "✅ Validação"
+}
+
+# Modos de geração (mesmas opções da interface); o roteamento de modelo é
+# independente do modo: só os casos que decidir() manda ao modelo rápido
+# deixam o modo escolhido (requisição única, sem streaming)
+MODOS_GERACAO = ('streaming', 'paralelo', 'agendador')
+
+OPCOES_PADRAO = {
+    'temperatura': Config.DEFAULT_TEMPERATURE,
+    'top_k': Config.DEFAULT_TOP_K,
+    'max_tokens': Config.DEFAULT_MAX_TOKENS,
+    'modo': 'agendador',
+    'roteamento': Config.ROTEAMENTO_ATIVO,
+    'usar_cache': Config.CACHE_GERACAO_ATIVO,
+    'validacao_incremental': Config.VALIDACAO_STREAM_ATIVA
+}
+
+# Callback de progresso: (etapa, evento, detalhes); evento é 'inicio',
+# 'andamento' (só na geração em streaming; detalhes com o 'trecho' novo e
+# 'reiniciar', quando o texto anterior foi descartado) ou 'fim'
+Progresso = Callable[[str, str, Dict], None]
+
+# Callback de andamento do streaming: (trecho novo, reiniciar)
+Andamento = Callable[[str, bool], None]
+
+
+class ErroPipeline(Exception):
+    """Falha de uma etapa (a geração retornou sucesso=False)"""
+    
+    def __init__(self, etapa: str, mensagem: str, resultado: Optional[Dict] = None):
+        super().__init__(mensagem)
+        self.etapa = etapa
+        self.resultado = resultado
+
+
+class PipelineContestacao:
+    """Fluxo completo de geração, etapa por etapa"""
+    
+    def __init__(
+        self,
+        retriever: Optional[RAGRetriever] = None,
+        builder: Optional[ContextBuilder] = None,
+        generator: Optional[LLMGenerator] = None,
+        validador: Optional[ValidadorContestacao] = None,
+        roteador: Optional[RoteadorModelos] = None
+    ):
+        """
+        Args:
+            retriever: Retriever RAG (padrão: recursos compartilhados)
+            builder: Construtor de contexto (padrão: novo ContextBuilder)
+            generator: Gerador (padrão: o compartilhado, ver obter_gerador)
+            validador: Validador (padrão: com o índice de citações se
+                Config.VERIFICAR_CITACOES)
+            roteador: Roteador de modelos (padrão: sobre generator, pelo
+                agendador compartilhado)
+        """
+        self.retriever = retriever or RAGRetriever()
+        self.builder = builder or ContextBuilder()
+        self.generator = generator or obter_gerador()
+        
+        if validador is None:
+            validador = ValidadorContestacao(obter_indice_citacoes() if Config.VERIFICAR_CITACOES else None)
+        self.validador = validador
+        
+        self.roteador = roteador or RoteadorModelos(
+            self.generator,
+            self.validador,
+            executar=lambda *args, **kwargs: obter_agendador().gerar(*args, **kwargs)
+        )
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # ETAPAS
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    def processar(self, conteudo: bytes, extensao: str) -> Dict:
+        """Extrai e estrutura a petição (dados_peticao + texto da query)"""
+        with span('pipeline.processamento', extensao=extensao):
+            peticao = processar_peticao_bytes(conteudo, extensao)
+        return {'dados_peticao': peticao.para_dict(), 'texto_query': peticao.texto_embedding}
+    
+    def recuperar(self, texto_query: str) -> Dict:
+        """Retrieval hierárquico nos 3 níveis"""
+        with span('pipeline.retrieval') as registro:
+            resultado_rag = self.retriever.retrieval_hierarquico(texto_query)
+            registro.atributos['chunks'] = resultado_rag['total_chunks']
+        return resultado_rag
+    
+    def construir_contexto(self, dados_peticao: Dict, resultado_rag: Dict) -> Dict:
+        """Contexto RAG do prompt (completa tipo_caso/confianca em dados_peticao)"""
+        with span('pipeline.contexto') as registro:
+            contexto = self.builder.construir_contexto(dados_peticao, resultado_rag)
+            alocacao = contexto['alocacao_tokens']
+            registro.atributos.update(
+                tokens=alocacao['total'],
+                chunks=sum(nivel['chunks'] for nivel in alocacao['por_nivel'].values()),
+                tipo_caso=dados_peticao.get('tipo_caso')
+            )
+        return contexto
+    
+    def gerar(
+        self,
+        dados_peticao: Dict,
+        contexto: Dict,
+        opcoes: Optional[Dict] = None,
+        andamento: Optional[Andamento] = None
+    ) -> Dict:
+        """
+        Gera a contestação no modo escolhido
+        
+        Args:
+            dados_peticao: Dados estruturados da petição
+            contexto: Contexto RAG construído
+            opcoes: Parâmetros (ver OPCOES_PADRAO)
+            andamento: No modo 'streaming', recebe cada trecho novo e se o
+                texto anterior foi descartado (quem acumula junta só quando precisa)
+        
+        Returns:
+            Resultado no formato de gerar_contestacao
+        """
+        opcoes = {**OPCOES_PADRAO, **(opcoes or {})}
+        
+        if opcoes['modo'] not in MODOS_GERACAO:
+            raise ValueError(f"Modo de geração inválido: {opcoes['modo']} (use {', '.join(MODOS_GERACAO)})")
+        
+        with span('pipeline.geracao', modo=opcoes['modo'], roteamento=opcoes['roteamento']) as registro:
+            resultado = self._gerar(dados_peticao, contexto, opcoes, andamento)
+            metadados = resultado.get('metadados', {})
+            registro.atributos.update(
+                sucesso=resultado['sucesso'],
+                modelo=metadados.get('model'),
+                input_tokens=metadados.get('input_tokens'),
+                output_tokens=metadados.get('output_tokens'),
+                custo=resultado.get('custo_estimado'),
+                do_cache=resultado.get('do_cache', False)
+            )
+        return resultado
+    
+    def _gerar(
+        self,
+        dados_peticao: Dict,
+        contexto: Dict,
+        opcoes: Dict,
+        andamento: Optional[Andamento]
+    ) -> Dict:
+        """Geração com roteamento de modelo, se ativado (ver gerar)"""
+        if not opcoes['roteamento']:
+            return self._gerar_modo(dados_peticao, contexto, opcoes, andamento)
+        
+        # Modelo principal (direto ou na escalada) pelo modo escolhido
+        return self.roteador.gerar(
+            dados_peticao,
+            contexto,
+            temperatura=opcoes['temperatura'],
+            top_k=opcoes['top_k'],
+            max_tokens=opcoes['max_tokens'],
+            usar_cache=opcoes['usar_cache'],
+            executar_principal=lambda *args, **kwargs: self._gerar_modo(dados_peticao, contexto, opcoes, andamento)
+        )
+    
+    def _gerar_modo(
+        self,
+        dados_peticao: Dict,
+        contexto: Dict,
+        opcoes: Dict,
+        andamento: Optional[Andamento]
+    ) -> Dict:
+        """Chamada ao gerador do modo escolhido, com o modelo principal"""
+        parametros = {'temperatura': opcoes['temperatura'], 'top_k': opcoes['top_k']}
+        modo = opcoes['modo']
+        
+        if modo == 'paralelo':
+            return self.generator.gerar_contestacao_paralela(dados_peticao, contexto, **parametros)
+        
+        parametros.update(max_tokens=opcoes['max_tokens'], usar_cache=opcoes['usar_cache'])
+        
+        if modo == 'streaming':
+            stream = self.generator.gerar_contestacao_stream(
+                dados_peticao,
+                contexto,
+                validacao_incremental=opcoes['validacao_incremental'],
+                validador=self.validador,
+                **parametros
+            )
+            reinicios = 0
+            for trecho in stream:
+                # Tentativa descartada pela validação incremental: recomeçar
+                reiniciar = stream.reinicios != reinicios
+                reinicios = stream.reinicios
+                if andamento:
+                    andamento(trecho, reiniciar)
+            return stream.resultado
+        
+        # Agendador compartilhado: limites de taxa e novas tentativas
+        return obter_agendador().gerar(dados_peticao, contexto, **parametros)
+    
+    def validar(self, resultado: Dict) -> Dict:
+        """Validação final (reaproveita a da validação incremental, se houver)"""
+        with span('pipeline.validacao') as registro:
+            validacao = resultado.get('validacao') or self.validador.validar(resultado['contestacao'])
+            registro.atributos['score'] = validacao['metricas']['score_qualidade']
+        return validacao
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # FLUXO COMPLETO
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    def executar(
+        self,
+        conteudo: bytes,
+        extensao: str,
+        opcoes: Optional[Dict] = None,
+        progresso: Optional[Progresso] = None
+    ) -> Dict:
+        """
+        Executa todas as etapas para uma petição
+        
+        Args:
+            conteudo: Bytes do arquivo da petição
+            extensao: Extensão do arquivo (ex: '.pdf')
+            opcoes: Parâmetros de geração (ver OPCOES_PADRAO)
+            progresso: Callback (etapa, evento, detalhes)
+        
+        Returns:
+            Dict com contestacao, metadados, validacao, dados_peticao,
+            contexto_rag, resultado_rag_completo, custo, do_cache e
+            roteamento (o formato de st.session_state.resultado)
+        
+        Raises:
+            ErroPipeline: A geração falhou (resultado com 'erro' e
+                eventuais 'interrupcoes')
+        """
+        avisar = progresso or (lambda etapa, evento, detalhes: None)
+        
+        with span('pipeline', extensao=extensao, modo=(opcoes or {}).get('modo', OPCOES_PADRAO['modo'])):
+            return self._executar(conteudo, extensao, opcoes, avisar)
+    
+    def _executar(self, conteudo: bytes, extensao: str, opcoes: Optional[Dict], avisar: Progresso) -> Dict:
+        """Etapas de executar(), dentro do span raiz 'pipeline'"""
+        def etapa(nome: str, funcao: Callable[[], Dict]) -> Dict:
+            avisar(nome, 'inicio', {})
+            inicio = time.perf_counter()
+            saida = funcao()
+            avisar(nome, 'fim', {'duracao_s': round(time.perf_counter() - inicio, 3)})
+            return saida
+        
+        peticao = etapa('processamento', lambda: self.processar(conteudo, extensao))
+        dados_peticao = peticao['dados_peticao']
+        
+        resultado_rag = etapa('retrieval', lambda: self.recuperar(peticao['texto_query']))
+        contexto = etapa('contexto', lambda: self.construir_contexto(dados_peticao, resultado_rag))
+        
+        resultado = etapa('geracao', lambda: self.gerar(
+            dados_peticao,
+            contexto,
+            opcoes,
+            andamento=lambda trecho, reiniciar: avisar('geracao', 'andamento', {'trecho': trecho, 'reiniciar': reiniciar})
+        ))
+        if not resultado['sucesso']:
+            raise ErroPipeline('geracao', resultado.get('erro', 'Erro desconhecido'), resultado)
+        
+        validacao = etapa('validacao', lambda: self.validar(resultado))
+        
+        return {
+            'contestacao': resultado['contestacao'],
+            'metadados': resultado['metadados'],
+            'validacao': validacao,
+            'dados_peticao': dados_peticao,
+            'contexto_rag': contexto,
+            'resultado_rag_completo': resultado_rag,
+            'custo': resultado['custo_estimado'],
+            'do_cache': resultado.get('do_cache', False),
+            'roteamento': resultado.get('roteamento')
+        }
@@ -5,50 +5,54 @@ RAG RETRIEVER - RECUPERAÇÃO HIERÁRQUICA MULTI-NÍVEL
 Implementa busca vetorial hierárquica em 3 níveis
 """
 
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Optional
 from pathlib import Path
 import numpy as np
 
 from config.settings import Config
+from modules.recursos import obter_cliente_chroma, obter_collection, obter_modelo_embeddings
+from modules.telemetria import span
 
 class RAGRetriever:
     """Recuperação RAG hierárquica com ChromaDB"""
     
-    def __init__(self, vector_store_dir: Optional[Path] = None):
+    def __init__(
+        self,
+        vector_store_dir: Optional[Path] = None,
+        embedding_model=None,
+        collection=None
+    ):
         """
         Inicializa o retriever
         
+        Modelo e collection vêm do registro do processo (modules.recursos),
+        de modo que vários retrievers compartilham a mesma memória.
+        
         Args:
             vector_store_dir: Diretório do vector store (usa Config se None)
+            embedding_model: Modelo de embeddings a usar (padrão: compartilhado)
+            collection: Collection do ChromaDB a usar (padrão: compartilhada)
         """
         self.vector_store_dir = vector_store_dir or Config.VECTOR_STORE_DIR
         
-        # Carregar modelo de embeddings
-        print(f"📥 Carregando modelo de embeddings: {Config.EMBEDDING_MODEL}")
-        self.embedding_model = SentenceTransformer(Config.EMBEDDING_MODEL)
-        print("✅ Modelo carregado")
+        self.embedding_model = embedding_model or obter_modelo_embeddings()
         
-        # Conectar ao ChromaDB
-        print(f"🔌 Conectando ao vector store: {self.vector_store_dir}")
-        self.client = chromadb.PersistentClient(
-            path=str(self.vector_store_dir),
-            settings=Settings(anonymized_telemetry=False)
-        )
-        
-        self.collection = self.client.get_collection(name=Config.COLLECTION_NAME)
-        print(f"✅ Conectado à collection: {Config.COLLECTION_NAME}")
+        if collection is None:
+            self.client = obter_cliente_chroma(self.vector_store_dir)
+            collection = obter_collection(self.vector_store_dir)
+        else:
+            self.client = None
+        self.collection = collection
         print(f"📊 Total de chunks: {self.collection.count()}\n")
     
     def gerar_embedding(self, texto: str) -> List[float]:
         """Gera embedding para um texto"""
-        embedding = self.embedding_model.encode(
-            texto,
-            convert_to_numpy=True,
-            normalize_embeddings=True  # Normalizar para cosine similarity
-        )
+        with span('embedding', caracteres=len(texto)):
+            embedding = self.embedding_model.encode(
+                texto,
+                convert_to_numpy=True,
+                normalize_embeddings=True  # Normalizar para cosine similarity
+            )
         return embedding.tolist()
     
     def buscar_nivel_1(
@@ -64,7 +68,7 @@ class RAGRetriever:
             query_embedding: Embedding da query
             tipo_caso: Filtrar por tipo de caso (opcional)
             top_k: Número de resultados (usa Config se None)
-            
+        
         Returns:
             Lista de chunks recuperados com metadados
         """
@@ -83,12 +87,14 @@ class RAGRetriever:
             where_filter = {'nivel': 1}
         
         # Buscar
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where_filter,
-            include=['documents', 'metadatas', 'distances']
-        )
+        with span('retrieval.nivel_1', tipo_caso=tipo_caso, top_k=top_k) as registro:
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                where=where_filter,
+                include=['documents', 'metadatas', 'distances']
+            )
+            registro.atributos['chunks'] = len(results['ids'][0])
         
         # Processar resultados
         chunks = []
@@ -126,7 +132,7 @@ class RAGRetriever:
             tipo_caso: Filtrar por tipo de caso (opcional)
             tipo_doc: Filtrar por tipo de documento - "inicial" ou "contestacao" (opcional)
             top_k: Número de resultados
-            
+        
         Returns:
             Lista de chunks recuperados
         """
@@ -149,12 +155,14 @@ class RAGRetriever:
             where_filter = filters[0]
         
         # Buscar
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where_filter,
-            include=['documents', 'metadatas', 'distances']
-        )
+        with span('retrieval.nivel_2', tipo_caso=tipo_caso, top_k=top_k) as registro:
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                where=where_filter,
+                include=['documents', 'metadatas', 'distances']
+            )
+            registro.atributos['chunks'] = len(results['ids'][0])
         
         # Processar resultados
         chunks = []
@@ -188,7 +196,7 @@ class RAGRetriever:
             query_embedding: Embedding da query
             tipo_caso: Filtrar por tipo de caso (opcional)
             top_k: Número de resultados
-            
+        
         Returns:
             Lista de chunks recuperados
         """
@@ -207,12 +215,14 @@ class RAGRetriever:
             where_filter = {'nivel': 3}
         
         # Buscar
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where_filter,
-            include=['documents', 'metadatas', 'distances']
-        )
+        with span('retrieval.nivel_3', tipo_caso=tipo_caso, top_k=top_k) as registro:
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                where=where_filter,
+                include=['documents', 'metadatas', 'distances']
+            )
+            registro.atributos['chunks'] = len(results['ids'][0])
         
         # Processar resultados
         chunks = []
@@ -239,7 +249,7 @@ class RAGRetriever:
         
         Args:
             query_embedding: Embedding da petição inicial
-            
+        
         Returns:
             Dict com tipo_caso e confiança
         """
@@ -294,7 +304,7 @@ class RAGRetriever:
             query_text: Texto da query (petição inicial)
             tipo_caso: Tipo de caso (se conhecido). Se None e auto_classificar=True, classifica automaticamente
             auto_classificar: Se True, classifica automaticamente o tipo de caso
-            
+        
         Returns:
             Dict com chunks de todos os níveis e metadados
         """
@@ -310,7 +320,12 @@ class RAGRetriever:
         # 2. Classificar tipo de caso (se necessário)
         if tipo_caso is None and auto_classificar:
             print("🏷️  Classificando tipo de caso...")
-            classificacao = self.classificar_tipo_caso(query_embedding)
+            with span('classificacao') as registro:
+                classificacao = self.classificar_tipo_caso(query_embedding)
+                registro.atributos.update(
+                    tipo_caso=classificacao['tipo_caso'],
+                    confianca=round(classificacao['confianca'], 4)
+                )
             tipo_caso = classificacao['tipo_caso']
             confianca = classificacao['confianca']
             
@@ -0,0 +1,255 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+RECURSOS COMPARTILHADOS DO PROCESSO
+═══════════════════════════════════════════════════════════════════════════
+Registro único, por processo, dos recursos pesados do sistema RAG:
+
+- modelo de embeddings (SentenceTransformer), carregado uma só vez e com
+  encode() serializado por lock;
+- cliente PersistentClient do ChromaDB e a collection (um por diretório);
+- índice de citações do nível 3;
+- gerador (LLMGenerator) com o cliente da API, o livro de custos e o
+  cache de resultados.
+
+Cada sessão do Streamlit (e cada worker de scripts) obtém as mesmas
+instâncias em vez de carregar cópias próprias; relatorio_memoria() mostra
+o custo de cada recurso e a economia em relação a uma cópia por sessão.
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config.settings import Config
+
+_RECURSOS: Dict[str, object] = {}
+_CARGAS: Dict[str, Dict] = {}
+# _LOCK_RECURSOS só protege os dicts; cada carga tem o próprio lock, para
+# que um recurso lento (ex: o modelo de embeddings) não bloqueie os demais
+_LOCK_RECURSOS = threading.Lock()
+_LOCKS_CARGA: Dict[str, threading.Lock] = {}
+
+
+class _MarcadorSessao:
+    """Objeto guardado no estado da sessão; some quando a sessão é descartada"""
+
+
+_SESSOES = weakref.WeakSet()
+
+
+class ModeloEmbeddingsCompartilhado:
+    """
+    Modelo de embeddings compartilhado entre threads
+    
+    encode() é serializado: sessões simultâneas esperam a vez em vez de
+    disputar o mesmo modelo (e a mesma memória de ativações). Os demais
+    atributos são delegados ao SentenceTransformer.
+    """
+    
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self._lock = threading.Lock()
+    
+    def encode(self, *args, **kwargs):
+        with self._lock:
+            return self.modelo.encode(*args, **kwargs)
+    
+    def __getattr__(self, nome):
+        return getattr(self.modelo, nome)
+    
+    def tamanho_mb(self) -> float:
+        """Memória ocupada por parâmetros e buffers do modelo"""
+        total = sum(p.numel() * p.element_size() for p in self.modelo.parameters())
+        total += sum(b.numel() * b.element_size() for b in self.modelo.buffers())
+        return total / 1_000_000
+
+
+def rss_mb() -> float:
+    """Memória residente atual do processo (pico, fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 1_000_000
+    except (OSError, ValueError, IndexError):
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss: KB no Linux, bytes no macOS
+        return pico / 1_000_000 if sys.platform == 'darwin' else pico / 1000
+
+
+def _obter(nome: str, carregar: Callable[[], object]) -> object:
+    """
+    Recurso do registro, carregando-o na primeira chamada
+    
+    Args:
+        nome: Chave do recurso
+        carregar: Função que cria o recurso
+    
+    Returns:
+        Instância compartilhada
+    """
+    with _LOCK_RECURSOS:
+        if nome in _RECURSOS:
+            return _RECURSOS[nome]
+        lock_carga = _LOCKS_CARGA.setdefault(nome, threading.Lock())
+    
+    # Quem chega durante a carga espera só por este recurso
+    with lock_carga:
+        with _LOCK_RECURSOS:
+            if nome in _RECURSOS:
+                return _RECURSOS[nome]
+        
+        # Cargas simultâneas de recursos diferentes somam-se no RSS medido
+        rss_antes = rss_mb()
+        inicio = time.perf_counter()
+        instancia = carregar()
+        carga = {
+            'recurso': nome,
+            'duracao_s': round(time.perf_counter() - inicio, 2),
+            'rss_mb': round(max(rss_mb() - rss_antes, 0.0), 1)
+        }
+        
+        with _LOCK_RECURSOS:
+            _RECURSOS[nome] = instancia
+            _CARGAS[nome] = carga
+        return instancia
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RECURSOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def obter_modelo_embeddings(nome_modelo: Optional[str] = None) -> ModeloEmbeddingsCompartilhado:
+    """
+    Modelo de embeddings único do processo
+    
+    Args:
+        nome_modelo: Modelo do SentenceTransformer (padrão: Config.EMBEDDING_MODEL)
+    """
+    nome_modelo = nome_modelo or Config.EMBEDDING_MODEL
+    
+    def carregar():
+        from sentence_transformers import SentenceTransformer
+        
+        print(f"📥 Carregando modelo de embeddings: {nome_modelo}")
+        modelo = ModeloEmbeddingsCompartilhado(SentenceTransformer(nome_modelo))
+        print("✅ Modelo carregado")
+        return modelo
+    
+    return _obter(f"embeddings:{nome_modelo}", carregar)
+
+
+def obter_cliente_chroma(vector_store_dir: Optional[Path] = None):
+    """
+    PersistentClient do ChromaDB único por diretório
+    
+    Args:
+        vector_store_dir: Diretório do vector store (padrão: Config.VECTOR_STORE_DIR)
+    """
+    diretorio = Path(vector_store_dir or Config.VECTOR_STORE_DIR).resolve()
+    
+    def carregar():
+        import chromadb
+        from chromadb.config import Settings
+        
+        print(f"🔌 Conectando ao vector store: {diretorio}")
+        return chromadb.PersistentClient(
+            path=str(diretorio),
+            settings=Settings(anonymized_telemetry=False)
+        )
+    
+    return _obter(f"chroma:{diretorio}", carregar)
+
+
+def obter_collection(vector_store_dir: Optional[Path] = None, nome: Optional[str] = None):
+    """
+    Collection do ChromaDB compartilhada (o cliente é seguro entre threads)
+    
+    Args:
+        vector_store_dir: Diretório do vector store (padrão: Config.VECTOR_STORE_DIR)
+        nome: Nome da collection (padrão: Config.COLLECTION_NAME)
+    """
+    diretorio = Path(vector_store_dir or Config.VECTOR_STORE_DIR).resolve()
+    nome = nome or Config.COLLECTION_NAME
+    cliente = obter_cliente_chroma(diretorio)
+    
+    def carregar():
+        collection = cliente.get_collection(name=nome)
+        print(f"✅ Conectado à collection: {nome}")
+        return collection
+    
+    return _obter(f"collection:{diretorio}:{nome}", carregar)
+
+
+def obter_indice_citacoes():
+    """Índice de citações do nível 3 da collection padrão (ver modules.citacoes)"""
+    from modules.citacoes import IndiceCitacoes
+    
+    collection = obter_collection()
+    return _obter("indice_citacoes", lambda: IndiceCitacoes.carregar_ou_construir(collection))
+
+
+def obter_gerador():
+    """
+    LLMGenerator compartilhado (sem estado por requisição; seguro entre threads)
+    
+    Sessões do Streamlit, pipelines e agendadores criados sem gerador
+    próprio usam esta instância, com o mesmo livro de custos e cache de
+    resultados.
+    """
+    def carregar():
+        from modules.llm_generator import LLMGenerator
+        return LLMGenerator()
+    
+    return _obter("gerador", carregar)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SESSÕES E MEMÓRIA
+# ═══════════════════════════════════════════════════════════════════════════
+
+def registrar_sessao() -> _MarcadorSessao:
+    """
+    Registra uma sessão usuária dos recursos compartilhados
+    
+    Returns:
+        Marcador a guardar no estado da sessão; a sessão deixa de ser
+        contada quando ele é coletado
+    """
+    marcador = _MarcadorSessao()
+    _SESSOES.add(marcador)
+    return marcador
+
+
+def relatorio_memoria() -> Dict:
+    """
+    Memória do processo e custo dos recursos compartilhados
+    
+    Returns:
+        Dict com rss_mb do processo, sessoes_ativas, recursos (duração e
+        RSS adicionado na carga de cada um), compartilhado_mb (soma) e
+        economia_mb (o que N sessões com cópias próprias ocupariam a mais)
+    """
+    with _LOCK_RECURSOS:
+        recursos: List[Dict] = [dict(carga) for carga in _CARGAS.values()]
+        instancias = dict(_RECURSOS)
+    
+    for carga in recursos:
+        instancia = instancias[carga['recurso']]
+        if isinstance(instancia, ModeloEmbeddingsCompartilhado):
+            carga['parametros_mb'] = round(instancia.tamanho_mb(), 1)
+    
+    sessoes = len(_SESSOES)
+    compartilhado = sum(carga['rss_mb'] for carga in recursos)
+    
+    return {
+        'rss_mb': round(rss_mb(), 1),
+        'sessoes_ativas': sessoes,
+        'recursos': recursos,
+        'compartilhado_mb': round(compartilhado, 1),
+        'economia_mb': round(compartilhado * max(sessoes - 1, 0), 1)
+    }
@@ -0,0 +1,346 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+ROTEADOR DE MODELOS
+═══════════════════════════════════════════════════════════════════════════
+Camada à frente do LLMGenerator que escolhe modelo e max_tokens por petição.
+Casos rotineiros (tipo frequente, classificação confiável, poucos pedidos,
+petição curta) vão ao modelo rápido com orçamento proporcional aos pedidos;
+o rascunho passa pelo ValidadorContestacao e, abaixo do score mínimo (ou em
+falha), é regerado com o modelo principal. Tipos cujos rascunhos escalam com
+frequência (nos últimos Config.ROTEAMENTO_HISTORICO_DIAS) vão direto ao
+modelo principal, salvo uma sondagem periódica com o modelo rápido.
+
+Só o rascunho do modelo rápido usa `executar` (requisição única); o modelo
+principal, direto ou na escalada, usa `executar_principal`, de modo que o
+roteamento convive com o modo escolhido (ex: streaming com validação
+incremental).
+
+Cada decisão (com latência, custo e economia estimada frente ao modelo
+principal) é registrada em Config.LOG_ROTEAMENTO (JSONL). O histórico usado
+nas decisões fica em memória (janela por tipo), carregado uma vez do fim do
+log e atualizado a cada rascunho do processo.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional
+
+from config.settings import Config
+from modules.contabilidade import calcular_custo, precos_modelo
+from modules.llm_generator import LLMGenerator
+from modules.validator import ValidadorContestacao
+
+_LOCK_LOG = threading.Lock()
+
+# Casos rotineiros mandados ao modelo principal pelo histórico, por tipo
+# (a cada Config.ROTEAMENTO_SONDAGEM_A_CADA, um vai ao modelo rápido)
+_BLOQUEADOS: Dict[str, int] = {}
+
+# Por arquivo de log: rascunhos recentes do modelo rápido por tipo de caso
+_HISTORICOS: Dict[Path, Dict[str, Deque[Dict]]] = {}
+
+
+@dataclass(frozen=True)
+class DecisaoRoteamento:
+    """Modelo e orçamento escolhidos para uma petição"""
+    modelo: str
+    max_tokens: int
+    rapido: bool
+    motivos: List[str] = field(default_factory=list)
+
+
+class RoteadorModelos:
+    """Escolhe o modelo por petição e escala rascunhos fracos"""
+    
+    def __init__(
+        self,
+        gerador: LLMGenerator,
+        validador: Optional[ValidadorContestacao] = None,
+        executar: Optional[Callable[..., Dict]] = None,
+        caminho_log: Optional[Path] = None
+    ):
+        """
+        Args:
+            gerador: Gerador usado (padrão de execução: gerar_contestacao)
+            validador: Validador dos rascunhos (padrão: novo ValidadorContestacao)
+            executar: Função com a assinatura de gerar_contestacao (ex:
+                AgendadorGeracao.gerar, para respeitar limites de taxa)
+            caminho_log: Arquivo JSONL das decisões (padrão: Config.LOG_ROTEAMENTO)
+        """
+        # Falhar já na criação se o modelo rápido não tiver preço cadastrado
+        precos_modelo(Config.MODELO_RAPIDO)
+        
+        self.gerador = gerador
+        self.validador = validador or ValidadorContestacao()
+        self.executar = executar or gerador.gerar_contestacao
+        self.caminho_log = Path(caminho_log or Config.LOG_ROTEAMENTO)
+    
+    def decidir(self, dados_peticao: Dict, max_tokens: Optional[int] = None) -> DecisaoRoteamento:
+        """
+        Escolhe modelo e max_tokens para a petição
+        
+        Args:
+            dados_peticao: Dados da petição (com tipo_caso e confianca do
+                ContextBuilder)
+            max_tokens: Orçamento solicitado (teto; padrão: Config.DEFAULT_MAX_TOKENS)
+        
+        Returns:
+            Decisão com os motivos (para o modelo principal, os critérios
+            de rotina não atendidos)
+        """
+        max_tokens = max_tokens or Config.DEFAULT_MAX_TOKENS
+        principal = lambda motivos: DecisaoRoteamento(Config.CLAUDE_MODEL, max_tokens, False, motivos)
+        
+        if not Config.ROTEAMENTO_ATIVO:
+            return principal(['roteamento desativado'])
+        
+        tipo_caso = dados_peticao.get('tipo_caso')
+        confianca = dados_peticao.get('confianca', 0)
+        pedidos = len(dados_peticao.get('pedidos', []))
+        caracteres = len(dados_peticao.get('texto_completo', ''))
+        
+        motivos = []
+        if tipo_caso not in Config.ROTEAMENTO_TIPOS_ROTINEIROS:
+            motivos.append(f"tipo {tipo_caso} não rotineiro")
+        if confianca < Config.ROTEAMENTO_MIN_CONFIANCA:
+            motivos.append(f"confiança {confianca:.0%} < {Config.ROTEAMENTO_MIN_CONFIANCA:.0%}")
+        if pedidos > Config.ROTEAMENTO_MAX_PEDIDOS:
+            motivos.append(f"{pedidos} pedidos > {Config.ROTEAMENTO_MAX_PEDIDOS}")
+        if caracteres > Config.ROTEAMENTO_MAX_CARACTERES:
+            motivos.append(f"petição com {caracteres:,} caracteres")
+        
+        if motivos:
+            return principal(motivos)
+        
+        motivo_rapido = 'caso rotineiro'
+        historico = self.historico(tipo_caso)
+        if (historico['rascunhos'] >= Config.ROTEAMENTO_MIN_HISTORICO
+                and historico['taxa_escalada'] > Config.ROTEAMENTO_MAX_TAXA_ESCALADA):
+            taxa = f"{historico['taxa_escalada']:.0%} dos rascunhos recentes do tipo escalados"
+            with _LOCK_LOG:
+                bloqueados = _BLOQUEADOS[tipo_caso] = _BLOQUEADOS.get(tipo_caso, 0) + 1
+            if bloqueados % Config.ROTEAMENTO_SONDAGEM_A_CADA:
+                return principal([taxa])
+            motivo_rapido = f"sondagem ({taxa})"
+        
+        orcamento = Config.ROTEAMENTO_TOKENS_BASE + Config.ROTEAMENTO_TOKENS_POR_PEDIDO * max(pedidos, 1)
+        return DecisaoRoteamento(Config.MODELO_RAPIDO, min(orcamento, max_tokens), True, [motivo_rapido])
+    
+    def gerar(
+        self,
+        dados_peticao: Dict,
+        contexto_rag: Dict,
+        temperatura: float = Config.DEFAULT_TEMPERATURE,
+        top_k: int = Config.DEFAULT_TOP_K,
+        max_tokens: Optional[int] = None,
+        executar_principal: Optional[Callable[..., Dict]] = None,
+        **kwargs
+    ) -> Dict:
+        """
+        Gera com o modelo escolhido, escalando rascunhos fracos
+        
+        Args:
+            dados_peticao: Dados estruturados da petição
+            contexto_rag: Contexto RAG construído
+            temperatura: Parâmetro de temperatura
+            top_k: Parâmetro top-k
+            max_tokens: Orçamento solicitado (teto)
+            executar_principal: Geração com o modelo principal, mesma
+                assinatura de executar (padrão: executar)
+            **kwargs: Repassados a executar (ex: usar_cache)
+        
+        Returns:
+            Resultado de gerar_contestacao com 'validacao' (da versão final)
+            e 'roteamento' (registro da decisão); custo_estimado inclui o
+            rascunho descartado, se houver
+        """
+        decisao = self.decidir(dados_peticao, max_tokens)
+        print(f"🧭 Roteamento: {decisao.modelo} (max_tokens={decisao.max_tokens}) - {'; '.join(decisao.motivos)}")
+        
+        principal = executar_principal or self.executar
+        
+        inicio = time.perf_counter()
+        resultado = (self.executar if decisao.rapido else principal)(
+            dados_peticao,
+            contexto_rag,
+            temperatura=temperatura,
+            top_k=top_k,
+            max_tokens=decisao.max_tokens,
+            modelo=decisao.modelo,
+            **kwargs
+        )
+        duracao_inicial = time.perf_counter() - inicio
+        
+        validacao = self._validar(resultado)
+        score_inicial = validacao['metricas']['score_qualidade'] if validacao else None
+        rascunho = None
+        
+        # Escalar: rascunho do modelo rápido falhou ou ficou abaixo do score mínimo
+        if decisao.rapido and (score_inicial is None or score_inicial < Config.ROTEAMENTO_SCORE_MINIMO):
+            print(f"⬆️  Rascunho com score {score_inicial} < {Config.ROTEAMENTO_SCORE_MINIMO}: "
+                  f"regerando com {Config.CLAUDE_MODEL}")
+            rascunho = resultado
+            resultado = principal(
+                dados_peticao,
+                contexto_rag,
+                temperatura=temperatura,
+                top_k=top_k,
+                max_tokens=max_tokens or Config.DEFAULT_MAX_TOKENS,
+                modelo=Config.CLAUDE_MODEL,
+                **kwargs
+            )
+            validacao = self._validar(resultado)
+        
+        duracao = time.perf_counter() - inicio
+        
+        registro = self._registrar(
+            dados_peticao, decisao, resultado, rascunho, score_inicial, validacao, duracao, duracao_inicial
+        )
+        
+        if resultado['sucesso']:
+            resultado['custo_estimado'] = registro['custo_usd']
+            resultado['validacao'] = validacao
+        resultado['roteamento'] = registro
+        
+        return resultado
+    
+    def _validar(self, resultado: Dict) -> Optional[Dict]:
+        """Validação do resultado (reaproveita a da validação incremental, se houver)"""
+        if not resultado['sucesso']:
+            return None
+        return resultado.get('validacao') or self.validador.validar(resultado['contestacao'])
+    
+    def historico(self, tipo_caso: Optional[str]) -> Dict:
+        """
+        Rascunhos recentes do modelo rápido para o tipo de caso
+        
+        Returns:
+            Dict com 'rascunhos', 'escalados', 'taxa_escalada' e
+            'score_medio' (últimos Config.ROTEAMENTO_JANELA_HISTORICO, dos
+            últimos Config.ROTEAMENTO_HISTORICO_DIAS)
+        """
+        desde = (date.today() - timedelta(days=Config.ROTEAMENTO_HISTORICO_DIAS)).isoformat()
+        with _LOCK_LOG:
+            rascunhos = [r for r in self._historicos().get(tipo_caso, ()) if r['dia'] >= desde]
+        
+        escalados = sum(1 for r in rascunhos if r.get('escalado'))
+        scores = [r['score_inicial'] for r in rascunhos if r.get('score_inicial') is not None]
+        
+        return {
+            'rascunhos': len(rascunhos),
+            'escalados': escalados,
+            'taxa_escalada': escalados / len(rascunhos) if rascunhos else 0.0,
+            'score_medio': sum(scores) / len(scores) if scores else None
+        }
+    
+    def _registrar(
+        self,
+        dados_peticao: Dict,
+        decisao: DecisaoRoteamento,
+        resultado: Dict,
+        rascunho: Optional[Dict],
+        score_inicial: Optional[float],
+        validacao: Optional[Dict],
+        duracao: float,
+        duracao_inicial: float
+    ) -> Dict:
+        """Grava a decisão com latência, custo e economia frente ao modelo principal"""
+        custo = sum(r.get('custo_estimado', 0.0) for r in (rascunho, resultado) if r and r['sucesso'])
+        
+        # Custo sem roteamento: com escalada, só a geração do modelo principal
+        # (o rascunho é o sobrecusto); sem, o mesmo uso aos preços dele
+        custo_principal = custo
+        if rascunho is not None:
+            custo_principal = resultado.get('custo_estimado', 0.0) if resultado['sucesso'] else 0.0
+        elif decisao.rapido and resultado['sucesso']:
+            custo_principal = calcular_custo(Config.CLAUDE_MODEL, resultado['metadados'])['total']
+        
+        agora = datetime.now()
+        registro = {
+            'ts': agora.isoformat(timespec='seconds'),
+            'dia': agora.date().isoformat(),
+            'tipo_caso': dados_peticao.get('tipo_caso'),
+            'confianca': dados_peticao.get('confianca'),
+            'pedidos': len(dados_peticao.get('pedidos', [])),
+            'caracteres': len(dados_peticao.get('texto_completo', '')),
+            'modelo_inicial': decisao.modelo,
+            'max_tokens': decisao.max_tokens,
+            'motivos': decisao.motivos,
+            'score_inicial': score_inicial,
+            'escalado': rascunho is not None,
+            'modelo_final': resultado.get('metadados', {}).get('model', Config.CLAUDE_MODEL),
+            'score_final': validacao['metricas']['score_qualidade'] if validacao else None,
+            'duracao_s': round(duracao, 3),
+            'duracao_rascunho_s': round(duracao_inicial, 3) if rascunho is not None else None,
+            'custo_usd': custo,
+            'custo_principal_estimado_usd': custo_principal,
+            'economia_usd': custo_principal - custo,
+            'sucesso': resultado['sucesso']
+        }
+        
+        linha = json.dumps(registro, ensure_ascii=False) + "\n"
+        with _LOCK_LOG:
+            historicos = self._historicos()
+            try:
+                self.caminho_log.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.caminho_log, 'a', encoding='utf-8') as arquivo:
+                    arquivo.write(linha)
+            except OSError as e:
+                print(f"⚠️  Não foi possível gravar o log de roteamento: {e}")
+            
+            if decisao.rapido:
+                _adicionar_historico(historicos, registro)
+        
+        return registro
+    
+    def _historicos(self) -> Dict[str, Deque[Dict]]:
+        """
+        Janelas por tipo deste log (chamar com _LOCK_LOG); na primeira vez,
+        preenchidas com o fim do arquivo (Config.ROTEAMENTO_LOG_CAUDA_BYTES)
+        """
+        chave = self.caminho_log.resolve()
+        if chave not in _HISTORICOS:
+            historicos: Dict[str, Deque[Dict]] = {}
+            for registro in _ler_cauda(chave, Config.ROTEAMENTO_LOG_CAUDA_BYTES):
+                if registro.get('modelo_inicial') == Config.MODELO_RAPIDO:
+                    _adicionar_historico(historicos, registro)
+            _HISTORICOS[chave] = historicos
+        return _HISTORICOS[chave]
+
+
+def _adicionar_historico(historicos: Dict[str, Deque[Dict]], registro: Dict):
+    """Acrescenta o rascunho à janela do tipo (só os campos usados em historico)"""
+    janela = historicos.setdefault(registro.get('tipo_caso'), deque(maxlen=Config.ROTEAMENTO_JANELA_HISTORICO))
+    janela.append({
+        'dia': registro.get('dia', ''),
+        'escalado': registro.get('escalado', False),
+        'score_inicial': registro.get('score_inicial')
+    })
+
+
+def _ler_cauda(caminho: Path, max_bytes: int) -> List[Dict]:
+    """Últimas decisões do log, lendo no máximo max_bytes do fim (linhas corrompidas são ignoradas)"""
+    try:
+        with open(caminho, 'rb') as arquivo:
+            tamanho = arquivo.seek(0, os.SEEK_END)
+            arquivo.seek(max(tamanho - max_bytes, 0))
+            if tamanho > max_bytes:
+                # Descartar a linha cortada no início da cauda
+                arquivo.readline()
+            linhas = arquivo.read().decode('utf-8', errors='replace').splitlines()
+    except FileNotFoundError:
+        return []
+    
+    registros = []
+    for linha in linhas:
+        try:
+            registros.append(json.loads(linha))
+        except json.JSONDecodeError:
+            continue
+    return registros
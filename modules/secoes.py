@@ -0,0 +1,289 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+SEÇÕES DA CONTESTAÇÃO
+═══════════════════════════════════════════════════════════════════════════
+Divide uma contestação gerada em seções processuais (identificação,
+preliminares, fatos, direito, pedidos, requerimentos), identifica quais
+seções um pedido de ajuste afeta, para regenerar apenas essas seções, e
+une partes redigidas em paralelo com numeração consistente.
+
+A divisão é sem perdas: juntar_secoes(dividir_secoes(texto)) == texto.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+# Seções na ordem processual (a estrutura pedida em PROMPT_INSTRUCOES_TEMPLATE)
+ORDEM_SECOES = (
+    'identificacao',
+    'preliminares',
+    'fatos',
+    'direito',
+    'pedidos',
+    'requerimentos'
+)
+
+NOMES_SECOES = {
+    'identificacao': 'Identificação',
+    'preliminares': 'Preliminares',
+    'fatos': 'Dos Fatos',
+    'direito': 'Do Direito',
+    'pedidos': 'Dos Pedidos',
+    'requerimentos': 'Requerimentos Finais'
+}
+
+# Título (sem numeração, acentos ou marcação) que abre cada seção. Exceto
+# nas preliminares ("PRELIMINAR DE ILEGITIMIDADE..."), o título precisa ser
+# o nome da seção inteiro, para que subtítulos como "Dos pedidos de dano
+# moral" não abram seção. "DO MÉRITO" abre a seção de fatos, primeira parte
+# do mérito.
+_TITULOS_SECOES = {
+    'identificacao': re.compile(r'^(DA\s+)?(IDENTIFICACAO|QUALIFICACAO)'),
+    'preliminares': re.compile(r'^((DAS?|EM)\s+)?PRELIMINAR'),
+    'fatos': re.compile(
+        r'^((DO|NO)\s+)?MERITO$|^(DOS\s+)?FATOS$|^(DA\s+)?SINTESE\s+(DOS\s+FATOS|FATICA)$'
+    ),
+    'direito': re.compile(
+        r'^(DO\s+)?DIREITO$|^(DA\s+)?FUNDAMENTACAO\s+JURIDICA$|^(DOS\s+)?FUNDAMENTOS\s+JURIDICOS$'
+    ),
+    'pedidos': re.compile(r'^(DOS?\s+)?PEDIDOS?(\s+E\s+REQUERIMENTOS)?$'),
+    'requerimentos': re.compile(r'^(DOS\s+)?REQUERIMENTOS(\s+FINAIS)?$'),
+}
+
+# Linha de título: markdown (#), negrito ou linha curta em caixa alta,
+# opcionalmente numerada (1., 3.2., II -, IV.)
+_RE_MARCACAO_TITULO = re.compile(r'^\s*(#{1,6}\s*)?(\*\*)?\s*')
+_RE_NUMERACAO = re.compile(r'^((\d+\.)+\d*|\d+|[IVXLC]+)\s*[-–—.)]?\s+')
+_MAX_TAMANHO_TITULO = 100
+
+# Numeração decimal de um título (1., 3.2., 3.2.1) após a marcação
+_RE_NUMERO_TITULO = re.compile(r'^(\s*(?:#{1,6}\s*)?(?:\*\*)?\s*)(\d+(?:\.\d+)*)(\.?)(?=\s)')
+
+# Termos de um pedido de ajuste que indicam cada seção (regex aplicada ao
+# texto sem acentos, em minúsculas, a partir do início de palavra)
+TERMOS_AJUSTE = {
+    'identificacao': (
+        r'identifica', r'qualifica', r'partes\b', r'numero do processo',
+        r'vara\b', r'comarca', r'enderecamento', r'cabecalho'
+    ),
+    'preliminares': (
+        r'preliminar', r'ilegitimidade', r'incompetencia', r'prescri',
+        r'decadencia', r'interesse de agir', r'inepcia'
+    ),
+    'fatos': (
+        r'fat(o|os|ic)', r'cronologia', r'narrativa', r'relacao contratual'
+    ),
+    'direito': (
+        r'direito\b', r'fundamenta', r'merito', r'lei\b', r'art(igo|s?\.)',
+        r'jurisprudencia', r'precedente', r'sumula', r'tese\b', r'argument',
+        r'doutrina', r'cdc\b', r'ans\b', r'rol\b'
+    ),
+    'pedidos': (
+        r'pedido', r'improcedencia', r'honorario', r'custas\b', r'subsidiari'
+    ),
+    'requerimentos': (
+        r'requerimento', r'provas?\b', r'pericia', r'intima', r'audiencia'
+    ),
+}
+
+_RE_TERMOS_AJUSTE = {
+    chave: re.compile(r'\b(?:' + '|'.join(termos) + ')')
+    for chave, termos in TERMOS_AJUSTE.items()
+}
+
+
+@dataclass(frozen=True)
+class Secao:
+    """Trecho contíguo da contestação pertencente a uma seção processual"""
+    chave: str
+    texto: str
+    
+    @property
+    def titulo(self) -> str:
+        """Primeira linha não vazia (o título da seção)"""
+        for linha in self.texto.splitlines():
+            if linha.strip():
+                return linha.strip()
+        return NOMES_SECOES.get(self.chave, self.chave)
+
+
+def _sem_acentos(texto: str) -> str:
+    normalizado = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in normalizado if not unicodedata.combining(c))
+
+
+def classificar_titulo(linha: str) -> Optional[str]:
+    """
+    Seção aberta por uma linha, se ela for um título reconhecido
+    
+    Args:
+        linha: Linha da contestação
+    
+    Returns:
+        Chave da seção ou None
+    """
+    if not linha.strip() or len(linha.strip()) > _MAX_TAMANHO_TITULO:
+        return None
+    
+    marcacao = _RE_MARCACAO_TITULO.match(linha)
+    markdown = bool(marcacao.group(1) or marcacao.group(2))
+    titulo = linha[marcacao.end():].strip().strip('*:.').strip()
+    titulo = _RE_NUMERACAO.sub('', titulo)
+    
+    # Sem marcação, só linhas em caixa alta contam como título
+    letras = [c for c in titulo if c.isalpha()]
+    if not letras or (not markdown and any(c.islower() for c in letras)):
+        return None
+    
+    titulo = _sem_acentos(titulo).upper()
+    for chave, padrao in _TITULOS_SECOES.items():
+        if padrao.match(titulo):
+            return chave
+    
+    return None
+
+
+def dividir_secoes(texto: str) -> List[Secao]:
+    """
+    Divide a contestação em seções processuais
+    
+    O trecho antes do primeiro título reconhecido (endereçamento ao juízo,
+    qualificação) pertence à identificação. Só avançam de seção títulos de
+    seções posteriores na ordem processual, de modo que subtítulos como
+    "Dos fatos impeditivos" dentro do direito não quebram a divisão.
+    
+    Args:
+        texto: Contestação completa
+    
+    Returns:
+        Seções em ordem; a concatenação dos textos reproduz o original
+    """
+    secoes: List[Secao] = []
+    atual = ORDEM_SECOES[0]
+    linhas_atuais: List[str] = []
+    
+    for linha in texto.splitlines(keepends=True):
+        chave = classificar_titulo(linha)
+        
+        if chave and ORDEM_SECOES.index(chave) > ORDEM_SECOES.index(atual):
+            if linhas_atuais:
+                secoes.append(Secao(atual, ''.join(linhas_atuais)))
+            atual = chave
+            linhas_atuais = []
+        
+        linhas_atuais.append(linha)
+    
+    if linhas_atuais:
+        secoes.append(Secao(atual, ''.join(linhas_atuais)))
+    
+    return secoes
+
+
+def juntar_secoes(secoes: List[Secao]) -> str:
+    """Reconstrói a contestação a partir das seções"""
+    return ''.join(secao.texto for secao in secoes)
+
+
+def substituir_secao(secao: Secao, novo_texto: str) -> Secao:
+    """
+    Troca o texto de uma seção preservando o espaçamento até a próxima
+    
+    Se o texto novo não trouxer o título, o título original é mantido.
+    
+    Args:
+        secao: Seção original
+        novo_texto: Texto regenerado
+    
+    Returns:
+        Nova seção
+    """
+    corpo = novo_texto.strip()
+    if classificar_titulo(corpo.split('\n', 1)[0]) != secao.chave and secao.chave != ORDEM_SECOES[0]:
+        corpo = f"{secao.titulo}\n\n{corpo}"
+    
+    espaco_final = secao.texto[len(secao.texto.rstrip()):]
+    return replace(secao, texto=corpo + (espaco_final or '\n\n'))
+
+
+def renumerar_titulos(texto: str) -> str:
+    """
+    Renumera sequencialmente os títulos com numeração decimal
+    
+    O nível de cada título é a profundidade da numeração original (3. →
+    1, 3.2. → 2); a nova numeração segue a ordem em que aparecem. Corrige
+    lacunas e repetições ao unir partes redigidas separadamente (ex: sem
+    preliminares, DO MÉRITO passa de 3 a 2 e DO DIREITO de 3.2 a 2.2).
+    
+    Args:
+        texto: Contestação (ou partes já concatenadas)
+    
+    Returns:
+        Texto com os títulos renumerados; o restante fica inalterado
+    """
+    contadores: List[int] = []
+    linhas = []
+    
+    for linha in texto.splitlines(keepends=True):
+        numero = _RE_NUMERO_TITULO.match(linha)
+        
+        if numero and _eh_titulo(linha):
+            nivel = numero.group(2).count('.') + 1
+            contadores = contadores[:nivel]
+            if len(contadores) == nivel:
+                contadores[-1] += 1
+            else:
+                contadores += [1] * (nivel - len(contadores))
+            
+            novo = '.'.join(str(n) for n in contadores)
+            linha = numero.group(1) + novo + numero.group(3) + linha[numero.end():]
+        
+        linhas.append(linha)
+    
+    return ''.join(linhas)
+
+
+def unir_partes(partes: List[str]) -> str:
+    """
+    Une partes redigidas separadamente em uma contestação
+    
+    Args:
+        partes: Textos das partes, na ordem processual (vazias são ignoradas)
+    
+    Returns:
+        Contestação com títulos renumerados
+    """
+    texto = '\n\n'.join(parte.strip() for parte in partes if parte.strip())
+    return renumerar_titulos(texto + '\n')
+
+
+def _eh_titulo(linha: str) -> bool:
+    """Linha com marcação de título (markdown/negrito) ou em caixa alta"""
+    marcacao = _RE_MARCACAO_TITULO.match(linha)
+    if marcacao.group(1) or marcacao.group(2):
+        return True
+    
+    letras = [c for c in linha if c.isalpha()]
+    return bool(letras) and len(linha.strip()) <= _MAX_TAMANHO_TITULO and not any(c.islower() for c in letras)
+
+
+def secoes_afetadas(ajustes: str) -> List[str]:
+    """
+    Seções que um pedido de ajuste afeta, por termos-chave
+    
+    Args:
+        ajustes: Texto do pedido de ajuste
+    
+    Returns:
+        Chaves das seções mencionadas, na ordem processual (vazio = nenhuma
+        identificada)
+    """
+    texto = _sem_acentos(ajustes).lower()
+    
+    return [chave for chave in ORDEM_SECOES if _RE_TERMOS_AJUSTE[chave].search(texto)]
+
+
+def resumo_secoes(secoes: List[Secao]) -> Dict[str, int]:
+    """Tamanho (caracteres) de cada seção, para logs e interface"""
+    return {secao.chave: len(secao.texto) for secao in secoes}
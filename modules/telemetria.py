@@ -0,0 +1,378 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+TELEMETRIA - SPANS POR ETAPA DO PIPELINE
+═══════════════════════════════════════════════════════════════════════════
+API leve de spans para medir onde o tempo de cada geração é gasto:
+
+    with span('retrieval.nivel_1', tipo_caso=tipo) as s:
+        chunks = ...
+        s.atributos['chunks'] = len(chunks)
+
+Cada span registra duração, variação de RSS do processo e atributos
+(chunks, tokens, modelo...). Spans aninhados na mesma thread herdam o
+rastro do span externo (ex: 'pipeline'), o que agrupa as etapas de uma
+mesma petição. Os registros são exportados para Config.METRICS_DIR:
+
+- TELEMETRIA_SPANS: uma linha JSON por span (somente acréscimo), gravada
+  em lotes por uma thread própria e rotacionada ao atingir
+  TELEMETRIA_SPANS_MAX_MB;
+- TELEMETRIA_PROMETHEUS: histograma de duração, erros e contadores de
+  atributos por span, no formato texto do Prometheus (para o textfile
+  collector do node_exporter), regravado a cada
+  TELEMETRIA_INTERVALO_PROMETHEUS_S.
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from config.settings import Config
+from modules.recursos import rss_mb
+
+# Atributos numéricos somados em contadores do Prometheus
+ATRIBUTOS_CONTADORES = (
+    'chunks', 'input_tokens', 'output_tokens', 'cache_read_input_tokens',
+    'cache_creation_input_tokens', 'tokens', 'caracteres', 'bytes'
+)
+
+_SPAN_ATUAL: contextvars.ContextVar = contextvars.ContextVar('span_atual', default=None)
+
+
+@dataclass
+class Span:
+    """Span em andamento (atributos podem ser completados dentro do bloco)"""
+    nome: str
+    atributos: Dict = field(default_factory=dict)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    rastro: Optional[str] = None
+    pai: Optional[str] = None
+    
+    def __post_init__(self):
+        # Span sem externo inicia um rastro próprio
+        self.rastro = self.rastro or self.id
+
+
+@contextmanager
+def span(nome: str, **atributos) -> Iterator[Span]:
+    """
+    Mede um bloco de código como um span
+    
+    Args:
+        nome: Nome da etapa (ex: 'pipeline.geracao', 'api.messages')
+        **atributos: Atributos iniciais do span
+    
+    Yields:
+        Span, cujos atributos podem ser completados no bloco
+    """
+    if not Config.TELEMETRIA_ATIVA:
+        yield Span(nome, atributos)
+        return
+    
+    externo = _SPAN_ATUAL.get()
+    atual = Span(
+        nome,
+        atributos,
+        rastro=externo.rastro if externo else None,
+        pai=externo.id if externo else None
+    )
+    token = _SPAN_ATUAL.set(atual)
+    
+    erro = None
+    rss_antes = rss_mb()
+    inicio = time.perf_counter()
+    try:
+        yield atual
+    except BaseException as e:
+        erro = type(e).__name__
+        raise
+    finally:
+        duracao = time.perf_counter() - inicio
+        _SPAN_ATUAL.reset(token)
+        obter_exportador().registrar(atual, duracao, rss_mb() - rss_antes, erro)
+
+
+def registrar_span(nome: str, duracao_s: float, **atributos):
+    """
+    Registra um span já medido (geradores e código assíncrono, em que o
+    bloco `with span(...)` atravessaria yields/awaits de outros contextos)
+    
+    Args:
+        nome: Nome da etapa
+        duracao_s: Duração medida pelo chamador
+        **atributos: Atributos do span
+    """
+    if not Config.TELEMETRIA_ATIVA:
+        return
+    
+    externo = _SPAN_ATUAL.get()
+    registro = Span(nome, atributos, rastro=externo.rastro if externo else None, pai=externo.id if externo else None)
+    obter_exportador().registrar(registro, duracao_s, None, None)
+
+
+@contextmanager
+def dentro_de(raiz: Span) -> Iterator[Span]:
+    """
+    Torna `raiz` o span externo do bloco, para agrupar no mesmo rastro
+    etapas de uma petição executadas em threads diferentes (ex: pools por
+    etapa da CLI); a raiz é registrada pelo chamador com encerrar_rastro
+    
+    Args:
+        raiz: Span criado pelo chamador (ex: Span('cli.peticao', {...}))
+    """
+    token = _SPAN_ATUAL.set(raiz)
+    try:
+        yield raiz
+    finally:
+        _SPAN_ATUAL.reset(token)
+
+
+def encerrar_rastro(raiz: Span, duracao_s: float, erro: Optional[str] = None):
+    """Registra a raiz de um rastro usado com dentro_de"""
+    if Config.TELEMETRIA_ATIVA:
+        obter_exportador().registrar(raiz, duracao_s, None, erro)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# EXPORTAÇÃO
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ExportadorTelemetria:
+    """Grava spans em JSONL e mantém os agregados exportados ao Prometheus"""
+    
+    def __init__(
+        self,
+        caminho_spans: Optional[Path] = None,
+        caminho_prometheus: Optional[Path] = None,
+        buckets_s: Optional[List[float]] = None
+    ):
+        """
+        Args:
+            caminho_spans: Arquivo JSONL (padrão: Config.TELEMETRIA_SPANS)
+            caminho_prometheus: Arquivo .prom (padrão: Config.TELEMETRIA_PROMETHEUS)
+            buckets_s: Limites do histograma de duração (padrão:
+                Config.TELEMETRIA_BUCKETS_S)
+        """
+        self.caminho_spans = Path(caminho_spans or Config.TELEMETRIA_SPANS)
+        self.caminho_prometheus = Path(caminho_prometheus or Config.TELEMETRIA_PROMETHEUS)
+        self.buckets_s = sorted(buckets_s or Config.TELEMETRIA_BUCKETS_S)
+        
+        # Por nome de span: contagem, soma, buckets, erros, RSS e atributos
+        self._agregados: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._ultima_exportacao = 0.0
+        
+        # Linhas do JSONL gravadas por uma thread própria, fora do caminho
+        # de quem registra o span
+        self._fila: queue.Queue = queue.Queue(maxsize=Config.TELEMETRIA_FILA_MAX)
+        self._escritor: Optional[threading.Thread] = None
+        self._descartados = 0
+    
+    def registrar(self, registro: Span, duracao_s: float, rss_delta_mb: Optional[float], erro: Optional[str]):
+        """Enfileira o span para gravação e atualiza os agregados"""
+        linha = json.dumps({
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'span': registro.nome,
+            'id': registro.id,
+            'rastro': registro.rastro,
+            'pai': registro.pai,
+            'duracao_ms': round(duracao_s * 1000, 3),
+            'rss_delta_mb': round(rss_delta_mb, 2) if rss_delta_mb is not None else None,
+            'erro': erro,
+            'atributos': registro.atributos
+        }, ensure_ascii=False, default=str) + "\n"
+        
+        with self._lock:
+            agregado = self._agregados.setdefault(registro.nome, {
+                'contagem': 0,
+                'soma_s': 0.0,
+                'buckets': [0] * len(self.buckets_s),
+                'erros': 0,
+                'rss_delta_mb': 0.0,
+                'contadores': {}
+            })
+            agregado['contagem'] += 1
+            agregado['soma_s'] += duracao_s
+            for indice, limite in enumerate(self.buckets_s):
+                if duracao_s <= limite:
+                    agregado['buckets'][indice] += 1
+            agregado['erros'] += erro is not None
+            agregado['rss_delta_mb'] += rss_delta_mb or 0.0
+            for atributo in ATRIBUTOS_CONTADORES:
+                valor = registro.atributos.get(atributo)
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    agregado['contadores'][atributo] = agregado['contadores'].get(atributo, 0) + valor
+            
+            if self._escritor is None:
+                self._escritor = threading.Thread(target=self._gravar_spans, daemon=True, name='telemetria-spans')
+                self._escritor.start()
+            
+            exportar = (
+                registro.pai is None
+                and time.monotonic() - self._ultima_exportacao >= Config.TELEMETRIA_INTERVALO_PROMETHEUS_S
+            )
+        
+        try:
+            self._fila.put_nowait(linha)
+        except queue.Full:
+            with self._lock:
+                self._descartados += 1
+                avisar = self._descartados == 1
+            if avisar:
+                print(f"⚠️  Fila de telemetria cheia; spans descartados (gravação de {self.caminho_spans} atrasada)")
+        
+        if exportar:
+            self.exportar_prometheus()
+    
+    def descarregar(self):
+        """Bloqueia até os spans enfileirados serem gravados"""
+        if self._escritor is not None:
+            self._fila.join()
+    
+    def _gravar_spans(self):
+        """Thread de gravação: acrescenta ao JSONL em lotes (falhas de escrita são apenas avisadas)"""
+        while True:
+            linhas = [self._fila.get()]
+            while len(linhas) < 1000:
+                try:
+                    linhas.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                self.caminho_spans.parent.mkdir(parents=True, exist_ok=True)
+                self._rotacionar()
+                with open(self.caminho_spans, 'a', encoding='utf-8') as arquivo:
+                    arquivo.write("".join(linhas))
+            except OSError as e:
+                print(f"⚠️  Não foi possível gravar spans de telemetria: {e}")
+            finally:
+                for _ in linhas:
+                    self._fila.task_done()
+    
+    def _rotacionar(self):
+        """Renomeia spans.jsonl para .1 (e .1 para .2...) ao atingir TELEMETRIA_SPANS_MAX_MB"""
+        try:
+            tamanho = self.caminho_spans.stat().st_size
+        except FileNotFoundError:
+            return
+        if tamanho < Config.TELEMETRIA_SPANS_MAX_MB * 1024 * 1024:
+            return
+        
+        nome = self.caminho_spans.name
+        for indice in range(Config.TELEMETRIA_SPANS_ARQUIVOS - 1, 0, -1):
+            antigo = self.caminho_spans.with_name(f"{nome}.{indice}")
+            if antigo.exists():
+                os.replace(antigo, self.caminho_spans.with_name(f"{nome}.{indice + 1}"))
+        os.replace(self.caminho_spans, self.caminho_spans.with_name(f"{nome}.1"))
+    
+    def resumo(self) -> List[Dict]:
+        """Agregados por span no processo: contagem, média, total e erros (maior total primeiro)"""
+        with self._lock:
+            linhas = [
+                {
+                    'span': nome,
+                    'contagem': agregado['contagem'],
+                    'media_ms': round(agregado['soma_s'] / agregado['contagem'] * 1000, 1),
+                    'total_s': round(agregado['soma_s'], 2),
+                    'erros': agregado['erros'],
+                    'rss_delta_mb': round(agregado['rss_delta_mb'], 1),
+                    **agregado['contadores']
+                }
+                for nome, agregado in self._agregados.items()
+            ]
+        return sorted(linhas, key=lambda linha: linha['total_s'], reverse=True)
+    
+    def formatar_prometheus(self) -> str:
+        """Agregados no formato texto de exposição do Prometheus"""
+        def rotulo(nome: str, **extras) -> str:
+            pares = {'span': nome, **extras}
+            return "{" + ",".join(f'{chave}="{valor}"' for chave, valor in pares.items()) + "}"
+        
+        linhas = [
+            "# HELP rag_span_duracao_segundos Duração das etapas do pipeline",
+            "# TYPE rag_span_duracao_segundos histogram"
+        ]
+        with self._lock:
+            agregados = json.loads(json.dumps(self._agregados))
+        
+        for nome, agregado in sorted(agregados.items()):
+            for limite, contagem in zip(self.buckets_s, agregado['buckets']):
+                linhas.append(f"rag_span_duracao_segundos_bucket{rotulo(nome, le=limite)} {contagem}")
+            linhas.append(f"rag_span_duracao_segundos_bucket{rotulo(nome, le='+Inf')} {agregado['contagem']}")
+            linhas.append(f"rag_span_duracao_segundos_sum{rotulo(nome)} {agregado['soma_s']:.6f}")
+            linhas.append(f"rag_span_duracao_segundos_count{rotulo(nome)} {agregado['contagem']}")
+        
+        linhas += [
+            "# HELP rag_span_erros_total Spans encerrados por exceção",
+            "# TYPE rag_span_erros_total counter"
+        ]
+        linhas += [f"rag_span_erros_total{rotulo(nome)} {a['erros']}" for nome, a in sorted(agregados.items())]
+        
+        linhas += [
+            "# HELP rag_span_rss_delta_megabytes_total Variação acumulada de RSS durante os spans",
+            "# TYPE rag_span_rss_delta_megabytes_total counter"
+        ]
+        linhas += [
+            f"rag_span_rss_delta_megabytes_total{rotulo(nome)} {a['rss_delta_mb']:.2f}"
+            for nome, a in sorted(agregados.items())
+        ]
+        
+        linhas += [
+            "# HELP rag_span_atributo_total Soma de atributos numéricos (chunks, tokens...) por span",
+            "# TYPE rag_span_atributo_total counter"
+        ]
+        for nome, agregado in sorted(agregados.items()):
+            for atributo, valor in sorted(agregado['contadores'].items()):
+                linhas.append(f"rag_span_atributo_total{rotulo(nome, atributo=atributo)} {valor}")
+        
+        linhas += [
+            "# HELP rag_processo_rss_megabytes Memória residente do processo",
+            "# TYPE rag_processo_rss_megabytes gauge",
+            f"rag_processo_rss_megabytes {rss_mb():.1f}"
+        ]
+        return "\n".join(linhas) + "\n"
+    
+    def exportar_prometheus(self):
+        """Regrava o arquivo .prom de forma atômica (arquivo parcial + rename)"""
+        with self._lock:
+            self._ultima_exportacao = time.monotonic()
+        
+        parcial = self.caminho_prometheus.with_name(
+            f"{self.caminho_prometheus.name}.{os.getpid()}.{threading.get_ident()}.parcial"
+        )
+        try:
+            self.caminho_prometheus.parent.mkdir(parents=True, exist_ok=True)
+            parcial.write_text(self.formatar_prometheus(), encoding='utf-8')
+            os.replace(parcial, self.caminho_prometheus)
+        except OSError as e:
+            print(f"⚠️  Não foi possível exportar métricas Prometheus: {e}")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# INSTÂNCIA COMPARTILHADA
+# ═══════════════════════════════════════════════════════════════════════════
+
+_EXPORTADOR: Optional[ExportadorTelemetria] = None
+_LOCK_EXPORTADOR = threading.Lock()
+
+
+def obter_exportador() -> ExportadorTelemetria:
+    """Exportador único do processo (grava os spans pendentes e exporta o .prom ao encerrar)"""
+    global _EXPORTADOR
+    
+    with _LOCK_EXPORTADOR:
+        if _EXPORTADOR is None:
+            _EXPORTADOR = ExportadorTelemetria()
+            atexit.register(_EXPORTADOR.exportar_prometheus)
+            atexit.register(_EXPORTADOR.descarregar)
+        return _EXPORTADOR
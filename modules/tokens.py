@@ -0,0 +1,172 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+CONTAGEM E TRUNCAMENTO DE TOKENS
+═══════════════════════════════════════════════════════════════════════════
+Contagem de tokens para o orçamento de contexto (Config.MAX_CONTEXT_TOKENS).
+
+O tokenizador do Claude não é distribuído localmente; usa-se o cl100k_base
+do tiktoken como aproximação. Sem o tiktoken (ou sem o arquivo de
+vocabulário, ex: máquina offline), cai para a estimativa de ~4 caracteres
+por token.
+
+Nenhum dos dois é o tokenizador do Claude, então a contagem local é
+multiplicada por um fator de correção: começa no valor conservador de
+Config.TOKENS_FATOR_INICIAL e é recalibrado pela razão entre o
+count_tokens da API e a contagem local de cada requisição pré-contada
+(ver calibrar). Sobre ele incide a margem Config.TOKENS_MARGEM_SEGURANCA.
+"""
+
+import math
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+from config.settings import Config
+
+# Encoding do tiktoken usado como aproximação do tokenizador do Claude
+ENCODING_TIKTOKEN = "cl100k_base"
+
+# Estimativa usada quando o tiktoken não está disponível
+CARACTERES_POR_TOKEN = 4
+
+# Fim de frase: pontuação seguida de espaço/quebra de linha
+_RE_FIM_FRASE = re.compile(r'[.!?;:](?=\s)')
+
+# Truncamento só recua até o fim de frase se preservar ao menos esta fração
+_FRACAO_MINIMA_FRASE = 0.3
+
+# Peso de cada nova medição na média móvel do fator de correção, e limites
+# do fator (medições fora deles indicam contagem incomparável, ex: imagens)
+_PESO_CALIBRACAO = 0.3
+_FATOR_MIN, _FATOR_MAX = 0.5, 3.0
+
+# Fator de correção calibrado, por método de contagem
+_FATORES: Dict[str, float] = {}
+_LOCK_FATORES = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _obter_encoding():
+    """Carrega o encoding do tiktoken uma única vez (None se indisponível)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING_TIKTOKEN)
+    except Exception as e:
+        print(f"⚠️  tiktoken indisponível ({type(e).__name__}); orçamento de tokens "
+              f"estimado por ~{CARACTERES_POR_TOKEN} caracteres por token "
+              f"(fator de correção {Config.TOKENS_FATOR_INICIAL['caracteres']}x até calibrar "
+              f"com count_tokens, margem de {Config.TOKENS_MARGEM_SEGURANCA:.0%})")
+        return None
+
+
+def contagem_exata() -> bool:
+    """Indica se a contagem usa o tokenizador (True) ou a estimativa (False)"""
+    return _obter_encoding() is not None
+
+
+def metodo_contagem() -> str:
+    """Método da contagem local: 'tiktoken' ou 'caracteres'"""
+    return 'tiktoken' if contagem_exata() else 'caracteres'
+
+
+def fator_correcao() -> float:
+    """Fator aplicado à contagem local (calibrado × margem de segurança)"""
+    metodo = metodo_contagem()
+    with _LOCK_FATORES:
+        fator = _FATORES.get(metodo, Config.TOKENS_FATOR_INICIAL[metodo])
+    return fator * (1 + Config.TOKENS_MARGEM_SEGURANCA)
+
+
+def calibrar(tokens_locais: int, tokens_api: int):
+    """
+    Atualiza o fator de correção com uma medição da mesma requisição
+    
+    Args:
+        tokens_locais: Contagem local sem correção (contar_tokens_brutos)
+        tokens_api: Contagem exata do count_tokens da API
+    """
+    if tokens_locais <= 0 or tokens_api <= 0:
+        return
+    
+    razao = tokens_api / tokens_locais
+    if not _FATOR_MIN <= razao <= _FATOR_MAX:
+        return
+    
+    metodo = metodo_contagem()
+    with _LOCK_FATORES:
+        anterior = _FATORES.get(metodo)
+        _FATORES[metodo] = razao if anterior is None else anterior + _PESO_CALIBRACAO * (razao - anterior)
+
+
+def contar_tokens_brutos(texto: str) -> int:
+    """
+    Conta tokens de um texto pelo método local, sem fator de correção
+    
+    Args:
+        texto: Texto a medir
+    
+    Returns:
+        Tokens do cl100k_base (ou estimativa por caracteres sem o tiktoken)
+    """
+    if not texto:
+        return 0
+    
+    encoding = _obter_encoding()
+    if encoding is None:
+        return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+    
+    return len(encoding.encode(texto, disallowed_special=()))
+
+
+def contar_tokens(texto: str) -> int:
+    """
+    Conta tokens de um texto para orçamento (limite superior conservador)
+    
+    Args:
+        texto: Texto a medir
+    
+    Returns:
+        Contagem local × fator de correção (ver fator_correcao)
+    """
+    if not texto:
+        return 0
+    return math.ceil(contar_tokens_brutos(texto) * fator_correcao())
+
+
+def truncar_tokens(texto: str, max_tokens: int) -> Optional[str]:
+    """
+    Trunca texto para caber em max_tokens, preferindo fim de frase
+    
+    Args:
+        texto: Texto original
+        max_tokens: Limite de tokens
+    
+    Returns:
+        Texto truncado (inalterado se já couber) ou None se nada couber
+    """
+    if max_tokens <= 0:
+        return None
+    
+    if contar_tokens(texto) <= max_tokens:
+        return texto
+    
+    # Limite na unidade da contagem local
+    limite = int(max_tokens / fator_correcao())
+    
+    encoding = _obter_encoding()
+    if encoding is None:
+        corte = texto[:limite * CARACTERES_POR_TOKEN]
+    else:
+        corte = encoding.decode(encoding.encode(texto, disallowed_special=())[:limite])
+    
+    # Recuar até o último fim de frase; sem um próximo o bastante, até o
+    # último espaço (nunca cortar palavra ao meio)
+    fins = [m.end() for m in _RE_FIM_FRASE.finditer(corte)]
+    if fins and fins[-1] >= len(corte) * _FRACAO_MINIMA_FRASE:
+        corte = corte[:fins[-1]]
+    elif ' ' in corte:
+        corte = corte[:corte.rfind(' ')]
+    
+    corte = corte.rstrip()
+    return corte or None
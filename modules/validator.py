@@ -5,21 +5,141 @@ VALIDADOR E FORMATADOR DE CONTESTAÇÕES
 Valida qualidade e formata para DOCX
 """
 
+import hashlib
+import io
+import json
 import re
-from typing import Dict, List, Tuple
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
+from xml.sax.saxutils import escape
 import docx
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
 from docx.shared import Pt, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
 from config.settings import Config
+from modules.citacoes import IndiceCitacoes, rotulo_citacao
+from modules.secoes import NOMES_SECOES, classificar_titulo
+from modules.telemetria import span
+
+CONECTIVOS_ARGUMENTATIVOS = (
+    'portanto', 'assim', 'dessa forma', 'consequentemente',
+    'ademais', 'além disso', 'outrossim', 'por outro lado',
+    'em que pese', 'não obstante', 'contudo', 'todavia'
+)
+
+# Padrões aplicados ao texto já em minúsculas (equivalem aos originais com
+# re.IGNORECASE). A citação é dividida em início e término para ser contada
+# em tempo linear, sem o ".*?" que reescaneava a linha a cada "art."
+_RE_INICIO_CITACAO = re.compile(r'(?:art\.|artigo)\s*\d+[º°]?(?:[-,]\s*§\s*\d+[º°]?)?')
+_RE_FIM_CITACAO = re.compile(r'lei|cf|cdc')
+_RE_JURISPRUDENCIA = re.compile(r'jurisprudência|precedente|acórdão|súmula|stj|stf|tjrj')
+
+# Exportação DOCX: template construído uma vez por processo e documentos
+# prontos em cache LRU (hash da contestação e metadados → bytes)
+_TEMPLATE_DOCX: Optional[bytes] = None
+_CACHE_DOCX: 'OrderedDict[str, bytes]' = OrderedDict()
+_LOCK_DOCX = threading.Lock()
+_QUEBRA_PAGINA = '<quebra de página>'
+
+# Caracteres de controle não permitidos em XML 1.0
+_RE_CARACTERES_INVALIDOS_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Únicos caracteres que re.IGNORECASE equipara a letras dos padrões acima e
+# que str.lower() não converte para elas
+_EQUIVALENCIAS_IGNORECASE = str.maketrans({'İ': 'i', 'ı': 'i', 'ſ': 's'})
+
+
+def _minusculas_ignorecase(texto: str, minusculo: str) -> str:
+    """Texto em minúsculas em que casar padrões equivale a re.IGNORECASE"""
+    if 'İ' in texto or 'ı' in texto or 'ſ' in texto:
+        return texto.translate(_EQUIVALENCIAS_IGNORECASE).lower()
+    return minusculo
+
+
+def _contar_citacoes(texto: str) -> int:
+    """
+    Conta citações legais como re.findall do padrão original
+    
+    Cada citação vai do início ("art. 5º, § 2º") até o primeiro término
+    (Lei/CF/CDC) na mesma linha; a busca recomeça após o término. Os
+    ponteiros para o próximo término e a próxima quebra de linha só avançam,
+    então o texto é percorrido uma única vez.
+    
+    Args:
+        texto: Texto em minúsculas (ver _minusculas_ignorecase)
+    
+    Returns:
+        Número de citações
+    """
+    total = 0
+    posicao = 0
+    termino = None
+    quebra = -1
+    
+    while True:
+        inicio = _RE_INICIO_CITACAO.search(texto, posicao)
+        if inicio is None:
+            break
+        
+        fim = inicio.end()
+        if termino is None or termino.start() < fim:
+            termino = _RE_FIM_CITACAO.search(texto, fim)
+            if termino is None:
+                break
+        
+        if quebra < fim:
+            quebra = texto.find('\n', fim)
+            if quebra == -1:
+                quebra = len(texto)
+        
+        if termino.start() < quebra:
+            total += 1
+            posicao = termino.end()
+        else:
+            # Sem término nesta linha: tentar a partir do próximo caractere,
+            # como o regex faria
+            posicao = inicio.start() + 1
+    
+    return total
+
+
+def _padrao_secao(secao: str) -> re.Pattern:
+    """Padrão de uma seção obrigatória (texto em minúsculas, com variações de espaço)"""
+    return re.compile(secao.lower().replace(' ', r'\s+'))
+
+
+def _pontuar(completude: float, citacoes: int, jurisprudencia: int, conectivos: int) -> float:
+    """Score geral de qualidade (0-100), sem arredondamento"""
+    score = 0
+    score += min(completude * 40, 40)  # 40% - Estrutura
+    score += min((citacoes / 5) * 30, 30)  # 30% - Citações
+    score += min((jurisprudencia / 3) * 15, 15)  # 15% - Jurisprudência
+    score += min((conectivos / 5) * 15, 15)  # 15% - Argumentação
+    return score
+
 
 class ValidadorContestacao:
     """Valida qualidade da contestação gerada"""
     
-    def __init__(self):
-        pass
+    def __init__(self, indice_citacoes: Optional[IndiceCitacoes] = None):
+        """
+        Args:
+            indice_citacoes: Índice das citações do material de referência
+                (nível 3); sem ele, as citações não são verificadas
+        """
+        self.indice_citacoes = indice_citacoes
+        
+        # Seções obrigatórias pré-compiladas (busca no texto em minúsculas)
+        self._padroes_secoes = [
+            (secao, _padrao_secao(secao)) for secao in Config.SECOES_OBRIGATORIAS
+        ]
     
     def validar(self, contestacao: str) -> Dict:
         """
@@ -27,13 +147,17 @@ class ValidadorContestacao:
         
         Args:
             contestacao: Texto da contestação
-            
+        
         Returns:
             Dict com métricas e alertas
         """
         metricas = {}
         alertas = []
         
+        # Uma única conversão para minúsculas alimenta todos os padrões
+        minusculo = contestacao.lower()
+        normalizado = _minusculas_ignorecase(contestacao, minusculo)
+        
         # 1. Validar tamanho
         tamanho = len(contestacao)
         metricas['tamanho_caracteres'] = tamanho
@@ -43,62 +167,57 @@ class ValidadorContestacao:
         elif tamanho > Config.MAX_CONTESTACAO_LENGTH:
             alertas.append(f"⚠️  Contestação muito longa ({tamanho} caracteres)")
         
-        # 2. Verificar presença de seções obrigatórias
-        secoes_presentes = []
-        secoes_faltantes = []
-        
-        for secao in Config.SECOES_OBRIGATORIAS:
-            # Buscar seção (case insensitive, com variações)
-            padrao = secao.replace(' ', r'\s+')
-            if re.search(padrao, contestacao, re.IGNORECASE):
-                secoes_presentes.append(secao)
-            else:
-                secoes_faltantes.append(secao)
+        # 2. Verificar presença de seções obrigatórias (com variações de espaço)
+        secoes_faltantes = [
+            secao for secao, padrao in self._padroes_secoes
+            if not padrao.search(normalizado)
+        ]
         
-        metricas['completude_estrutural'] = len(secoes_presentes) / len(Config.SECOES_OBRIGATORIAS)
+        metricas['completude_estrutural'] = (
+            (len(self._padroes_secoes) - len(secoes_faltantes)) / len(self._padroes_secoes)
+        )
         
         if secoes_faltantes:
             alertas.append(f"⚠️  Seções faltantes: {', '.join(secoes_faltantes)}")
         
         # 3. Detectar citações legais
-        citacoes_lei = re.findall(
-            r'(?:art\.|artigo)\s*\d+[º°]?(?:[-,]\s*§\s*\d+[º°]?)?.*?(?:Lei|CF|CDC)',
-            contestacao,
-            re.IGNORECASE
-        )
-        metricas['citacoes_legais'] = len(citacoes_lei)
+        citacoes_lei = _contar_citacoes(normalizado)
+        metricas['citacoes_legais'] = citacoes_lei
         
-        if len(citacoes_lei) < 3:
+        if citacoes_lei < 3:
             alertas.append("⚠️  Poucas citações legais detectadas")
         
         # 4. Detectar precedentes/jurisprudência
-        precedentes = re.findall(
-            r'(?:jurisprudência|precedente|acórdão|súmula|STJ|STF|TJRJ)',
-            contestacao,
-            re.IGNORECASE
-        )
-        metricas['mencoes_jurisprudencia'] = len(precedentes)
+        metricas['mencoes_jurisprudencia'] = len(_RE_JURISPRUDENCIA.findall(normalizado))
+        
+        # 4.1. Verificar citações no material de referência (índice do nível 3)
+        nao_verificadas = []
+        if self.indice_citacoes is not None:
+            verificacao = self.indice_citacoes.verificar(contestacao)
+            nao_verificadas = [rotulo_citacao(chave) for chave in verificacao['nao_verificadas']]
+            metricas['citacoes_verificadas'] = len(verificacao['verificadas'])
+            metricas['citacoes_nao_verificadas'] = len(nao_verificadas)
+            
+            if nao_verificadas:
+                alertas.append(
+                    f"⚠️  Citações não encontradas no material de referência: {', '.join(nao_verificadas)}"
+                )
         
         # 5. Densidade de fundamentação
-        tokens = contestacao.split()
-        metricas['densidade_fundamentacao'] = len(citacoes_lei) / len(tokens) if tokens else 0
+        tokens = len(contestacao.split())
+        metricas['densidade_fundamentacao'] = citacoes_lei / tokens if tokens else 0
         
         # 6. Estrutura de argumentação (presença de conectivos lógicos)
-        conectivos = [
-            'portanto', 'assim', 'dessa forma', 'consequentemente',
-            'ademais', 'além disso', 'outrossim', 'por outro lado',
-            'em que pese', 'não obstante', 'contudo', 'todavia'
-        ]
-        
-        count_conectivos = sum(1 for c in conectivos if c in contestacao.lower())
+        count_conectivos = sum(1 for c in CONECTIVOS_ARGUMENTATIVOS if c in minusculo)
         metricas['conectivos_argumentativos'] = count_conectivos
         
         # 7. Score geral de qualidade (0-100)
-        score = 0
-        score += min(metricas['completude_estrutural'] * 40, 40)  # 40% - Estrutura
-        score += min((metricas['citacoes_legais'] / 5) * 30, 30)  # 30% - Citações
-        score += min((metricas['mencoes_jurisprudencia'] / 3) * 15, 15)  # 15% - Jurisprudência
-        score += min((count_conectivos / 5) * 15, 15)  # 15% - Argumentação
+        score = _pontuar(
+            metricas['completude_estrutural'],
+            metricas['citacoes_legais'],
+            metricas['mencoes_jurisprudencia'],
+            count_conectivos
+        )
         
         metricas['score_qualidade'] = round(score, 1)
         
@@ -114,15 +233,280 @@ class ValidadorContestacao:
         
         metricas['classificacao'] = classificacao
         
-        return {
+        resultado = {
             'metricas': metricas,
             'alertas': alertas,
             'valido': len(alertas) == 0 or metricas['score_qualidade'] >= 50
         }
+        if self.indice_citacoes is not None:
+            resultado['citacoes_nao_verificadas'] = nao_verificadas
+        
+        return resultado
+    
+    def validar_lote(self, contestacoes: Iterable[str]) -> List[Dict]:
+        """
+        Valida várias contestações (ex: reavaliação de saídas arquivadas)
+        
+        Args:
+            contestacoes: Textos das contestações
+        
+        Returns:
+            Resultados de validar, na mesma ordem
+        """
+        return [self.validar(contestacao) for contestacao in contestacoes]
+    
+    def iniciar_incremental(
+        self,
+        acao: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> 'ValidacaoIncremental':
+        """
+        Inicia a validação incremental de uma contestação em streaming
+        
+        Args:
+            acao: Ação sinalizada nas violações (padrão: Config.VALIDACAO_STREAM_ACAO)
+            max_tokens: max_tokens da geração, base dos limites de tamanho
+                (padrão: Config.DEFAULT_MAX_TOKENS)
+        
+        Returns:
+            ValidacaoIncremental que consome os deltas de texto
+        """
+        return ValidacaoIncremental(self, acao, max_tokens)
+
+
+@dataclass(frozen=True)
+class ViolacaoEstrutural:
+    """Expectativa estrutural já violada durante o streaming"""
+    regra: str
+    mensagem: str
+    orientacao: str
+    acao: str
+    caracteres: int
+
+
+class ValidacaoIncremental:
+    """
+    Métricas de uma contestação atualizadas a cada delta do streaming
+    
+    Cada linha completa é processada uma única vez (seções, citações,
+    jurisprudência, conectivos, tokens e seção corrente); após cada delta,
+    as expectativas de Config.VALIDACAO_STREAM_* são verificadas. A primeira
+    violação de cada regra é sinalizada com a ação configurada:
+    'redirecionar' (reiniciar com a orientação corretiva), 'abortar' ou
+    'alertar' (apenas registrar). finalizar() devolve o resultado de
+    ValidadorContestacao.validar sobre o texto completo.
+    
+    Os limites de tamanho (contestação e seção) acompanham o max_tokens
+    da geração: um orçamento maior permite legitimamente seções maiores.
+    """
+    
+    ACOES = ('redirecionar', 'abortar', 'alertar')
+    
+    def __init__(
+        self,
+        validador: ValidadorContestacao,
+        acao: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ):
+        """
+        Args:
+            validador: Validador usado em finalizar
+            acao: Ação sinalizada nas violações (padrão: Config.VALIDACAO_STREAM_ACAO)
+            max_tokens: max_tokens da geração (padrão: Config.DEFAULT_MAX_TOKENS)
+        """
+        self.acao = acao or Config.VALIDACAO_STREAM_ACAO
+        if self.acao not in self.ACOES:
+            raise ValueError(f"Ação inválida: {self.acao} (use {', '.join(self.ACOES)})")
+        
+        orcamento = (max_tokens or Config.DEFAULT_MAX_TOKENS) * Config.VALIDACAO_STREAM_CARACTERES_POR_TOKEN
+        self.max_caracteres = max(Config.MAX_CONTESTACAO_LENGTH, orcamento)
+        self.max_caracteres_secao = int(orcamento * Config.VALIDACAO_STREAM_FRACAO_MAX_SECAO)
+        
+        self.validador = validador
+        self.violacoes: List[ViolacaoEstrutural] = []
+        self.tamanho = 0
+        
+        self._partes: List[str] = []
+        self._pendente = ''
+        self._processados = 0
+        self._ultima_linha = ''
+        
+        # Seções buscadas: obrigatórias e as com prazo em VALIDACAO_STREAM_SECOES_ATE
+        self._padroes_secoes = {
+            secao: _padrao_secao(secao)
+            for secao in dict.fromkeys(
+                list(Config.SECOES_OBRIGATORIAS) + list(Config.VALIDACAO_STREAM_SECOES_ATE)
+            )
+        }
+        self._secoes_presentes = set()
+        self._conectivos = set()
+        self._citacoes = 0
+        self._jurisprudencia = 0
+        self._tokens = 0
+        self._secao_atual: Optional[str] = None
+        self._inicio_secao = 0
+    
+    @property
+    def texto(self) -> str:
+        """Texto consumido até agora"""
+        return ''.join(self._partes)
+    
+    def consumir(self, delta: str) -> Optional[ViolacaoEstrutural]:
+        """
+        Processa um delta de texto do streaming
+        
+        Args:
+            delta: Trecho recebido
+        
+        Returns:
+            Violação nova com ação 'redirecionar' ou 'abortar' (o chamador
+            deve interromper a geração) ou None
+        """
+        self._partes.append(delta)
+        self.tamanho += len(delta)
+        self._pendente += delta
+        
+        # Só linhas completas: padrões não atravessam o fim do delta
+        quebra = self._pendente.rfind('\n')
+        if quebra != -1:
+            bloco = self._pendente[:quebra + 1]
+            self._pendente = self._pendente[quebra + 1:]
+            self._processar(bloco)
+        
+        for violacao in self._verificar():
+            self.violacoes.append(violacao)
+            print(f"⚠️  Validação incremental ({violacao.caracteres:,} caracteres): {violacao.mensagem}")
+            if violacao.acao != 'alertar':
+                return violacao
+        
+        return None
+    
+    @property
+    def metricas(self) -> Dict:
+        """Métricas parciais (mesmas chaves de validar, sobre as linhas completas)"""
+        completude = (
+            sum(1 for secao in Config.SECOES_OBRIGATORIAS if secao in self._secoes_presentes)
+            / len(Config.SECOES_OBRIGATORIAS)
+        )
+        score = _pontuar(completude, self._citacoes, self._jurisprudencia, len(self._conectivos))
+        
+        return {
+            'tamanho_caracteres': self.tamanho,
+            'completude_estrutural': completude,
+            'citacoes_legais': self._citacoes,
+            'mencoes_jurisprudencia': self._jurisprudencia,
+            'densidade_fundamentacao': self._citacoes / self._tokens if self._tokens else 0,
+            'conectivos_argumentativos': len(self._conectivos),
+            'score_qualidade': round(score, 1),
+            'secao_atual': NOMES_SECOES.get(self._secao_atual, 'Início')
+        }
+    
+    def finalizar(self) -> Dict:
+        """Validação completa do texto consumido (ver ValidadorContestacao.validar)"""
+        resultado = self.validador.validar(self.texto)
+        resultado['violacoes_streaming'] = [violacao.regra for violacao in self.violacoes]
+        return resultado
+    
+    def _processar(self, bloco: str):
+        """Atualiza as métricas com um bloco de linhas completas"""
+        minusculo = bloco.lower()
+        normalizado = _minusculas_ignorecase(bloco, minusculo)
+        
+        # Última linha do bloco anterior: títulos quebrados ("DO\nDIREITO")
+        contexto = self._ultima_linha + normalizado
+        for secao, padrao in self._padroes_secoes.items():
+            if secao not in self._secoes_presentes and padrao.search(contexto):
+                self._secoes_presentes.add(secao)
+        
+        self._citacoes += _contar_citacoes(normalizado)
+        self._jurisprudencia += len(_RE_JURISPRUDENCIA.findall(normalizado))
+        self._tokens += len(bloco.split())
+        self._conectivos.update(c for c in CONECTIVOS_ARGUMENTATIVOS if c in minusculo)
+        
+        inicio_linha = self._processados
+        for linha in bloco.splitlines(keepends=True):
+            secao = classificar_titulo(linha)
+            if secao is not None and secao != self._secao_atual:
+                self._secao_atual = secao
+                self._inicio_secao = inicio_linha
+            inicio_linha += len(linha)
+        
+        self._processados += len(bloco)
+        self._ultima_linha = normalizado[normalizado.rfind('\n', 0, -1) + 1:]
+    
+    def _verificar(self) -> List[ViolacaoEstrutural]:
+        """Regras violadas pela primeira vez com o texto atual"""
+        sinalizadas = {violacao.regra for violacao in self.violacoes}
+        violacoes = []
+        
+        def violar(regra: str, mensagem: str, orientacao: str):
+            if regra not in sinalizadas:
+                violacoes.append(ViolacaoEstrutural(regra, mensagem, orientacao, self.acao, self.tamanho))
+        
+        # Seções que já deveriam ter aparecido
+        for secao, limite in Config.VALIDACAO_STREAM_SECOES_ATE.items():
+            if secao not in self._secoes_presentes and self._processados > limite:
+                violar(
+                    f"secao_ausente:{secao}",
+                    f"Seção {secao} ausente após {limite:,} caracteres",
+                    f"A contestação deve seguir a estrutura pedida e apresentar a seção {secao} "
+                    f"nos primeiros {limite:,} caracteres."
+                )
+        
+        # Fundamentação sem citações legais
+        if (self._citacoes < Config.VALIDACAO_STREAM_MIN_CITACOES
+                and self._processados > Config.VALIDACAO_STREAM_CITACOES_ATE):
+            violar(
+                'sem_citacoes',
+                f"{self._citacoes} citações legais após {Config.VALIDACAO_STREAM_CITACOES_ATE:,} caracteres",
+                "Fundamente cada argumento com citações legais expressas (ex: art. 51 do CDC, "
+                "art. 35-C da Lei 9.656/98)."
+            )
+        
+        # Seção descontrolada
+        tamanho_secao = self.tamanho - self._inicio_secao
+        if tamanho_secao > self.max_caracteres_secao:
+            nome = NOMES_SECOES.get(self._secao_atual, 'Início')
+            violar(
+                'secao_descontrolada',
+                f"Seção {nome} com {tamanho_secao:,} caracteres "
+                f"(limite: {self.max_caracteres_secao:,})",
+                f"Seja conciso: nenhuma seção deve passar de "
+                f"{self.max_caracteres_secao:,} caracteres."
+            )
+        
+        # Contestação já acima do orçamento pedido
+        if self.tamanho > self.max_caracteres:
+            violar(
+                'tamanho',
+                f"Contestação com {self.tamanho:,} caracteres (máximo: {self.max_caracteres:,})",
+                f"A contestação completa deve ter no máximo {self.max_caracteres:,} caracteres."
+            )
+        
+        return violacoes
 
 
 class FormatadorDOCX:
-    """Formata contestação em documento DOCX profissional"""
+    """
+    Formata contestação em documento DOCX profissional
+    
+    O documento parte de um template com margens e estilos prontos (gerado
+    uma vez por processo, ou Config.DOCX_TEMPLATE_PATH se existir); os
+    parágrafos são montados como WordprocessingML e inseridos de uma vez,
+    sem formatação run a run. criar_docx_bytes guarda os documentos em um
+    cache LRU em memória pelo hash da contestação e dos metadados.
+    """
+    
+    # Estilos de parágrafo do template (nome → tamanho, negrito, alinhamento, cinza)
+    ESTILOS = {
+        'Contestacao Corpo': (12, False, WD_ALIGN_PARAGRAPH.JUSTIFY, False),
+        'Contestacao Titulo': (14, True, WD_ALIGN_PARAGRAPH.CENTER, False),
+        'Contestacao Secao 1': (13, True, None, False),
+        'Contestacao Secao 2': (12, True, None, False),
+        'Contestacao Secao 3': (11, True, None, False),
+        'Contestacao Centralizado': (12, False, WD_ALIGN_PARAGRAPH.CENTER, False),
+        'Contestacao Info': (8, False, None, True),
+    }
     
     def __init__(self):
         pass
@@ -140,62 +524,136 @@ class FormatadorDOCX:
             contestacao: Texto da contestação
             metadados: Metadados da geração
             output_path: Caminho de saída
-            
+        
         Returns:
             Path do arquivo criado
         """
-        doc = docx.Document()
-        
-        # Configurar margens
-        sections = doc.sections
-        for section in sections:
-            section.top_margin = Inches(1)
-            section.bottom_margin = Inches(1)
-            section.left_margin = Inches(1.25)
-            section.right_margin = Inches(1)
-        
-        # Cabeçalho
-        self._adicionar_cabecalho(doc, metadados)
-        
-        # Conteúdo da contestação
-        self._adicionar_conteudo(doc, contestacao)
-        
-        # Rodapé
-        self._adicionar_rodape(doc, metadados)
-        
-        # Salvar
-        doc.save(output_path)
+        Path(output_path).write_bytes(self.criar_docx_bytes(contestacao, metadados))
         print(f"✅ Documento DOCX salvo: {output_path}")
         
         return output_path
     
-    def _adicionar_cabecalho(self, doc, metadados):
-        """Adiciona cabeçalho ao documento"""
-        # Título centralizado
-        titulo = doc.add_paragraph()
-        titulo.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = titulo.add_run("CONTESTAÇÃO")
-        run.bold = True
-        run.font.size = Pt(14)
+    def criar_docx_bytes(self, contestacao: str, metadados: Dict) -> bytes:
+        """
+        Cria documento DOCX formatado em memória
         
-        doc.add_paragraph()  # Espaço
+        Args:
+            contestacao: Texto da contestação
+            metadados: Metadados da geração
         
-        # Identificação
-        p = doc.add_paragraph()
-        p.add_run("EXCELENTÍSSIMO SENHOR DOUTOR JUIZ DE DIREITO DA ___ª VARA CÍVEL DA COMARCA DO RIO DE JANEIRO").bold = True
+        Returns:
+            Conteúdo do arquivo .docx (do cache, se já exportado)
+        """
+        chave = self.chave_docx(contestacao, metadados)
         
-        doc.add_paragraph()  # Espaço
+        with _LOCK_DOCX:
+            if chave in _CACHE_DOCX:
+                _CACHE_DOCX.move_to_end(chave)
+                return _CACHE_DOCX[chave]
         
-        # Informações sobre geração (comentário discreto)
-        info = doc.add_paragraph()
-        run = info.add_run(f"[Gerado automaticamente em {datetime.now().strftime('%d/%m/%Y %H:%M')}]")
-        run.font.size = Pt(8)
-        run.font.color.rgb = docx.shared.RGBColor(128, 128, 128)
+        # Span só na montagem (acertos do cache não são medidos)
+        with span('docx', caracteres=len(contestacao)) as registro:
+            doc = docx.Document(io.BytesIO(self._template()))
+            
+            paragrafos = self._paragrafos_cabecalho()
+            paragrafos += self._paragrafos_conteudo(contestacao)
+            paragrafos += self._paragrafos_rodape(metadados)
+            self._inserir_paragrafos(doc, paragrafos)
+            
+            saida = io.BytesIO()
+            doc.save(saida)
+            conteudo = saida.getvalue()
+            registro.atributos.update(paragrafos=len(paragrafos), bytes=len(conteudo))
         
-        doc.add_paragraph()  # Espaço
+        with _LOCK_DOCX:
+            _CACHE_DOCX[chave] = conteudo
+            while len(_CACHE_DOCX) > Config.DOCX_CACHE_MAX_ITENS:
+                _CACHE_DOCX.popitem(last=False)
+        
+        return conteudo
+    
+    @staticmethod
+    def chave_docx(contestacao: str, metadados: Dict) -> str:
+        """Hash SHA-256 da contestação e dos metadados impressos no documento"""
+        normalizado = json.dumps(
+            {'contestacao': contestacao, 'metadados': metadados},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(normalizado.encode('utf-8')).hexdigest()
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # TEMPLATE
+    # ═══════════════════════════════════════════════════════════════════════
+    
+    @classmethod
+    def _template(cls) -> bytes:
+        """Template com margens e estilos (construído uma vez por processo)"""
+        global _TEMPLATE_DOCX
+        
+        with _LOCK_DOCX:
+            if _TEMPLATE_DOCX is None:
+                _TEMPLATE_DOCX = cls._construir_template()
+            return _TEMPLATE_DOCX
+    
+    @classmethod
+    def _construir_template(cls) -> bytes:
+        """Documento vazio com margens, fonte padrão e os estilos de ESTILOS"""
+        caminho = Config.DOCX_TEMPLATE_PATH
+        doc = docx.Document(str(caminho)) if caminho and Path(caminho).exists() else docx.Document()
+        
+        # Template próprio: só o corpo é descartado (margens e estilos mantidos)
+        corpo = doc.element.body
+        for elemento in list(corpo):
+            if elemento.tag != qn('w:sectPr'):
+                corpo.remove(elemento)
+        
+        for section in doc.sections:
+            section.top_margin = Inches(1)
+            section.bottom_margin = Inches(1)
+            section.left_margin = Inches(1.25)
+            section.right_margin = Inches(1)
+        
+        normal = doc.styles['Normal'].font
+        normal.name = 'Times New Roman'
+        normal.size = Pt(12)
+        
+        for nome, (tamanho, negrito, alinhamento, cinza) in cls.ESTILOS.items():
+            if nome in [estilo.name for estilo in doc.styles]:
+                continue
+            estilo = doc.styles.add_style(nome, WD_STYLE_TYPE.PARAGRAPH)
+            estilo.base_style = doc.styles['Normal']
+            estilo.font.size = Pt(tamanho)
+            estilo.font.bold = negrito
+            if cinza:
+                estilo.font.color.rgb = docx.shared.RGBColor(128, 128, 128)
+            if alinhamento is not None:
+                estilo.paragraph_format.alignment = alinhamento
+        
+        saida = io.BytesIO()
+        doc.save(saida)
+        return saida.getvalue()
+    
+    # ═══════════════════════════════════════════════════════════════════════
+    # CONTEÚDO
+    # ═══════════════════════════════════════════════════════════════════════
     
-    def _adicionar_conteudo(self, doc, contestacao):
-        """Adiciona conteúdo formatado"""
+    def _paragrafos_cabecalho(self) -> List[Tuple[str, List[Tuple[str, bool]]]]:
+        """Título, endereçamento e informação sobre a geração"""
+        return [
+            ('Contestacao Titulo', [("CONTESTAÇÃO", False)]),
+            ('Normal', []),
+            ('Normal', [("EXCELENTÍSSIMO SENHOR DOUTOR JUIZ DE DIREITO DA ___ª VARA CÍVEL DA COMARCA DO RIO DE JANEIRO", True)]),
+            ('Normal', []),
+            ('Contestacao Info', [(f"[Gerado automaticamente em {datetime.now().strftime('%d/%m/%Y %H:%M')}]", False)]),
+            ('Normal', []),
+        ]
+    
+    def _paragrafos_conteudo(self, contestacao: str) -> List[Tuple[str, List[Tuple[str, bool]]]]:
+        """Seções (títulos markdown, itens numerados e parágrafos) da contestação"""
+        paragrafos = []
+        
         # Dividir por seções principais
         secoes = re.split(r'\n(?=#{1,3}\s|\d+\.\s[A-Z])', contestacao)
         
@@ -203,91 +661,75 @@ class FormatadorDOCX:
             if not secao.strip():
                 continue
             
-            # Detectar se é título principal
+            # Título principal (negrito e tamanho pelo estilo do nível)
             if secao.startswith('#'):
-                nivel = secao.count('#')
+                nivel = min(secao.count('#'), 3)
                 texto = secao.lstrip('#').strip()
-                
-                p = doc.add_paragraph()
-                run = p.add_run(texto)
-                run.bold = True
-                
-                if nivel == 1:
-                    run.font.size = Pt(13)
-                elif nivel == 2:
-                    run.font.size = Pt(12)
-                else:
-                    run.font.size = Pt(11)
-                
-                doc.add_paragraph()  # Espaço após título
+                paragrafos.append((f'Contestacao Secao {nivel}', [(texto, False)]))
+                paragrafos.append(('Normal', []))  # Espaço após título
             
-            # Detectar numeração (ex: 1., 1.1., a))
+            # Numeração (ex: 1., 1.1., a))
             elif re.match(r'^\d+\.', secao.strip()):
-                p = doc.add_paragraph(secao.strip())
-                p.style = 'List Number'
+                paragrafos.append(('List Number', [(secao.strip(), False)]))
             
-            # Parágrafo normal
+            # Parágrafos normais, com negrito inline (**texto**)
             else:
-                # Processar parágrafos
-                paragrafos = secao.split('\n\n')
-                for para in paragrafos:
+                for para in secao.split('\n\n'):
                     if para.strip():
-                        # Aplicar formatação inline (negrito, itálico)
-                        self._adicionar_paragrafo_formatado(doc, para.strip())
-    
-    def _adicionar_paragrafo_formatado(self, doc, texto):
-        """Adiciona parágrafo com formatação inline"""
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                        paragrafos.append(('Contestacao Corpo', [
+                            (parte[2:-2], True) if parte.startswith('**') and parte.endswith('**') else (parte, False)
+                            for parte in re.split(r'(\*\*.*?\*\*)', para.strip())
+                        ]))
         
-        # Processar negrito (**texto**)
-        partes = re.split(r'(\*\*.*?\*\*)', texto)
-        
-        for parte in partes:
-            if parte.startswith('**') and parte.endswith('**'):
-                run = p.add_run(parte[2:-2])
-                run.bold = True
-            else:
-                p.add_run(parte)
-        
-        # Configurar fonte
-        for run in p.runs:
-            run.font.name = 'Times New Roman'
-            run.font.size = Pt(12)
+        return paragrafos
     
-    def _adicionar_rodape(self, doc, metadados):
-        """Adiciona rodapé com informações da geração"""
-        doc.add_page_break()
-        
-        p = doc.add_paragraph()
-        p.add_run("Nestes termos,\nPede deferimento.")
-        
-        doc.add_paragraph()
-        doc.add_paragraph()
-        doc.add_paragraph()
-        
-        # Assinatura (placeholder)
-        assinatura = doc.add_paragraph()
-        assinatura.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        assinatura.add_run("_"*50)
-        
-        nome_advogado = doc.add_paragraph()
-        nome_advogado.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        nome_advogado.add_run("[Nome do Advogado]")
-        
-        oab = doc.add_paragraph()
-        oab.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        oab.add_run("OAB/RJ nº [número]")
-        
-        # Informações técnicas (ocultas em fonte pequena)
-        doc.add_page_break()
-        
-        info_tecnica = doc.add_paragraph()
-        info_tecnica.add_run("INFORMAÇÕES TÉCNICAS DA GERAÇÃO\n").bold = True
+    def _paragrafos_rodape(self, metadados: Dict) -> List[Tuple[str, List[Tuple[str, bool]]]]:
+        """Fecho, assinatura e informações técnicas da geração"""
+        info_tecnica = "".join(f"\n{chave}: {valor}" for chave, valor in metadados.items())
+        
+        return [
+            (_QUEBRA_PAGINA, []),
+            ('Normal', [("Nestes termos,\nPede deferimento.", False)]),
+            ('Normal', []),
+            ('Normal', []),
+            ('Normal', []),
+            ('Contestacao Centralizado', [("_" * 50, False)]),
+            ('Contestacao Centralizado', [("[Nome do Advogado]", False)]),
+            ('Contestacao Centralizado', [("OAB/RJ nº [número]", False)]),
+            (_QUEBRA_PAGINA, []),
+            ('Contestacao Info', [("INFORMAÇÕES TÉCNICAS DA GERAÇÃO\n", True), (info_tecnica, False)]),
+        ]
+    
+    def _inserir_paragrafos(self, doc, paragrafos: List[Tuple[str, List[Tuple[str, bool]]]]):
+        """
+        Monta os parágrafos como WordprocessingML e os insere de uma vez
         
-        for chave, valor in metadados.items():
-            info_tecnica.add_run(f"\n{chave}: {valor}")
+        Args:
+            doc: Documento criado do template
+            paragrafos: (nome do estilo, [(texto, negrito), ...]); quebras de
+                linha no texto viram <w:br/>
+        """
+        ids_estilos = {estilo.name: estilo.style_id for estilo in doc.styles}
         
-        for run in info_tecnica.runs:
-            run.font.size = Pt(8)
-            run.font.color.rgb = docx.shared.RGBColor(128, 128, 128)
+        xml = [f'<w:body {nsdecls("w")}>']
+        for estilo, runs in paragrafos:
+            if estilo == _QUEBRA_PAGINA:
+                xml.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+                continue
+            
+            xml.append(f'<w:p><w:pPr><w:pStyle w:val="{ids_estilos.get(estilo, "Normal")}"/></w:pPr>')
+            for texto, negrito in runs:
+                if not texto:
+                    continue
+                linhas = '<w:br/>'.join(
+                    f'<w:t xml:space="preserve">{escape(_RE_CARACTERES_INVALIDOS_XML.sub("", linha))}</w:t>'
+                    for linha in texto.split('\n')
+                )
+                xml.append(f'<w:r>{"<w:rPr><w:b/></w:rPr>" if negrito else ""}{linhas}</w:r>')
+            xml.append('</w:p>')
+        xml.append('</w:body>')
+        
+        fragmento = parse_xml(''.join(xml))
+        sect_pr = doc.element.body.sectPr
+        for paragrafo in list(fragmento):
+            sect_pr.addprevious(paragrafo)
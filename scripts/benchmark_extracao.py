@@ -0,0 +1,186 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+BENCHMARK DOS EXTRATORES DE TEXTO
+═══════════════════════════════════════════════════════════════════════════
+Mede throughput (páginas/s, MB/s) e pico de memória de cada backend de
+extração disponível sobre um corpus local de petições (PDF/DOCX).
+
+Uso:
+    python scripts/benchmark_extracao.py <diretorio_corpus> [--repeticoes N]
+    python scripts/benchmark_extracao.py --docx-sintetico 200
+
+Observação: o pico de memória é medido com tracemalloc (heap Python) em
+uma execução separada da cronometrada; memória alocada por bibliotecas
+nativas (ex: PDFium) não é contabilizada.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+# Permitir execução direta a partir da raiz do projeto
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.extratores import listar_extratores
+
+
+def medir_extrator(extrator_cls, arquivos: List[Path], repeticoes: int) -> Dict:
+    """
+    Mede um backend sobre os arquivos do corpus
+    
+    Args:
+        extrator_cls: Classe do extrator
+        arquivos: Arquivos do corpus (mesma extensão)
+        repeticoes: Número de repetições cronometradas
+    
+    Returns:
+        Dict com páginas, bytes, tempo, throughput e pico de memória
+    """
+    extrator = extrator_cls()
+    paginas = 0
+    total_bytes = sum(arquivo.stat().st_size for arquivo in arquivos)
+    erros = 0
+    
+    # Execução cronometrada (melhor de N)
+    melhor_tempo = float('inf')
+    for _ in range(repeticoes):
+        paginas = 0
+        inicio = time.perf_counter()
+        for arquivo in arquivos:
+            try:
+                paginas += sum(1 for _ in extrator.extrair_paginas(arquivo))
+            except Exception:
+                erros += 1
+        melhor_tempo = min(melhor_tempo, time.perf_counter() - inicio)
+    
+    # Execução separada para pico de memória (tracemalloc distorce o tempo)
+    pico = 0
+    for arquivo in arquivos:
+        tracemalloc.start()
+        try:
+            for _ in extrator.extrair_paginas(arquivo):
+                pass
+        except Exception:
+            pass
+        pico = max(pico, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    
+    return {
+        'backend': extrator_cls.nome,
+        'arquivos': len(arquivos),
+        'paginas': paginas,
+        'mb': total_bytes / 1_000_000,
+        'tempo_s': melhor_tempo,
+        'paginas_s': paginas / melhor_tempo if melhor_tempo else 0.0,
+        'mb_s': (total_bytes / 1_000_000) / melhor_tempo if melhor_tempo else 0.0,
+        'pico_mb': pico / 1_000_000,
+        'erros': erros // max(repeticoes, 1)
+    }
+
+
+def gerar_docx_sintetico(paginas: int, destino: Path) -> Path:
+    """
+    Gera DOCX sintético com ~paginas páginas (parágrafos e tabelas)
+    
+    Args:
+        paginas: Número aproximado de páginas
+        destino: Diretório de saída
+    
+    Returns:
+        Caminho do arquivo gerado
+    """
+    import docx
+    
+    documento = docx.Document()
+    paragrafo = (
+        "A parte autora alega que a operadora negou cobertura ao tratamento "
+        "prescrito, em afronta ao art. 35-C da Lei 9.656/98 e ao CDC. "
+    ) * 3
+    
+    for pagina in range(paginas):
+        documento.add_paragraph(f"{pagina + 1}. DOS FATOS E FUNDAMENTOS")
+        for _ in range(5):
+            documento.add_paragraph(paragrafo)
+        
+        # Uma tabela de pedidos a cada 5 páginas
+        if pagina % 5 == 0:
+            tabela = documento.add_table(rows=4, cols=2)
+            for i, linha in enumerate(tabela.rows):
+                linha.cells[0].text = f"Pedido {i + 1}"
+                linha.cells[1].text = "Condenação da ré ao custeio integral do tratamento."
+    
+    arquivo = destino / f"sintetico_{paginas}p.docx"
+    documento.save(arquivo)
+    return arquivo
+
+
+def imprimir_tabela(extensao: str, resultados: List[Dict]):
+    """Imprime resultados ordenados por throughput"""
+    unidade = 'páginas' if extensao == '.pdf' else 'parágrafos'
+    
+    print(f"\n📊 {extensao.upper()} ({resultados[0]['arquivos']} arquivos, "
+          f"{resultados[0]['mb']:.2f} MB)")
+    print(f"   {'backend':<14}{unidade:>12}{'tempo (s)':>12}{unidade + '/s':>16}"
+          f"{'MB/s':>10}{'pico (MB)':>12}{'erros':>8}")
+    
+    for r in sorted(resultados, key=lambda r: r['mb_s'], reverse=True):
+        print(f"   {r['backend']:<14}{r['paginas']:>12}{r['tempo_s']:>12.3f}"
+              f"{r['paginas_s']:>16.1f}{r['mb_s']:>10.2f}{r['pico_mb']:>12.1f}{r['erros']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos extratores de texto")
+    parser.add_argument('corpus', type=Path, nargs='?', help="Diretório com petições PDF/DOCX")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições cronometradas")
+    parser.add_argument(
+        '--docx-sintetico', type=int, metavar='PAGINAS',
+        help="Incluir DOCX sintético com o número de páginas indicado"
+    )
+    args = parser.parse_args()
+    
+    if args.corpus is None and not args.docx_sintetico:
+        parser.error("informe o diretório do corpus ou --docx-sintetico")
+    
+    if args.corpus is not None and not args.corpus.is_dir():
+        print(f"❌ Diretório não encontrado: {args.corpus}")
+        return 1
+    
+    temporario = tempfile.TemporaryDirectory()
+    sinteticos = []
+    if args.docx_sintetico:
+        sinteticos.append(gerar_docx_sintetico(args.docx_sintetico, Path(temporario.name)))
+    
+    print("="*80)
+    print("⏱️  BENCHMARK DE EXTRAÇÃO DE TEXTO")
+    print("="*80)
+    
+    for extensao in ('.pdf', '.docx'):
+        arquivos = sorted(args.corpus.rglob(f'*{extensao}')) if args.corpus else []
+        arquivos += [a for a in sinteticos if a.suffix == extensao]
+        if not arquivos:
+            continue
+        
+        resultados = [
+            medir_extrator(extrator_cls, arquivos, args.repeticoes)
+            for extrator_cls in listar_extratores(extensao)
+        ]
+        imprimir_tabela(extensao, resultados)
+        
+        indisponiveis = [
+            e.nome for e in listar_extratores(extensao, apenas_disponiveis=False)
+            if not e.disponivel()
+        ]
+        if indisponiveis:
+            print(f"   (não instalados: {', '.join(indisponiveis)})")
+    
+    temporario.cleanup()
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
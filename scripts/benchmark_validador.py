@@ -0,0 +1,205 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+BENCHMARK DO VALIDADOR DE CONTESTAÇÕES
+═══════════════════════════════════════════════════════════════════════════
+Compara o ValidadorContestacao com a implementação anterior (um regex por
+métrica, reproduzida aqui como referência) sobre um corpus de contestações
+arquivadas (.md/.txt) ou sintéticas: confere que métricas e alertas são
+idênticos e mede o throughput (contestações/s, MB/s) de cada versão.
+
+Uso:
+    python scripts/benchmark_validador.py <diretorio_corpus> [--repeticoes N]
+    python scripts/benchmark_validador.py --sinteticas 2000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Permitir execução direta a partir da raiz do projeto
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.settings import Config
+from modules.validator import ValidadorContestacao
+
+
+def validar_referencia(contestacao: str) -> Dict:
+    """Implementação anterior de ValidadorContestacao.validar"""
+    metricas = {}
+    alertas = []
+    
+    tamanho = len(contestacao)
+    metricas['tamanho_caracteres'] = tamanho
+    
+    if tamanho < Config.MIN_CONTESTACAO_LENGTH:
+        alertas.append(f"⚠️  Contestação muito curta ({tamanho} caracteres)")
+    elif tamanho > Config.MAX_CONTESTACAO_LENGTH:
+        alertas.append(f"⚠️  Contestação muito longa ({tamanho} caracteres)")
+    
+    secoes_presentes = []
+    secoes_faltantes = []
+    for secao in Config.SECOES_OBRIGATORIAS:
+        padrao = secao.replace(' ', r'\s+')
+        if re.search(padrao, contestacao, re.IGNORECASE):
+            secoes_presentes.append(secao)
+        else:
+            secoes_faltantes.append(secao)
+    
+    metricas['completude_estrutural'] = len(secoes_presentes) / len(Config.SECOES_OBRIGATORIAS)
+    
+    if secoes_faltantes:
+        alertas.append(f"⚠️  Seções faltantes: {', '.join(secoes_faltantes)}")
+    
+    citacoes_lei = re.findall(
+        r'(?:art\.|artigo)\s*\d+[º°]?(?:[-,]\s*§\s*\d+[º°]?)?.*?(?:Lei|CF|CDC)',
+        contestacao,
+        re.IGNORECASE
+    )
+    metricas['citacoes_legais'] = len(citacoes_lei)
+    
+    if len(citacoes_lei) < 3:
+        alertas.append("⚠️  Poucas citações legais detectadas")
+    
+    precedentes = re.findall(
+        r'(?:jurisprudência|precedente|acórdão|súmula|STJ|STF|TJRJ)',
+        contestacao,
+        re.IGNORECASE
+    )
+    metricas['mencoes_jurisprudencia'] = len(precedentes)
+    
+    tokens = contestacao.split()
+    metricas['densidade_fundamentacao'] = len(citacoes_lei) / len(tokens) if tokens else 0
+    
+    conectivos = [
+        'portanto', 'assim', 'dessa forma', 'consequentemente',
+        'ademais', 'além disso', 'outrossim', 'por outro lado',
+        'em que pese', 'não obstante', 'contudo', 'todavia'
+    ]
+    count_conectivos = sum(1 for c in conectivos if c in contestacao.lower())
+    metricas['conectivos_argumentativos'] = count_conectivos
+    
+    score = 0
+    score += min(metricas['completude_estrutural'] * 40, 40)
+    score += min((metricas['citacoes_legais'] / 5) * 30, 30)
+    score += min((metricas['mencoes_jurisprudencia'] / 3) * 15, 15)
+    score += min((count_conectivos / 5) * 15, 15)
+    
+    metricas['score_qualidade'] = round(score, 1)
+    
+    if score >= 80:
+        classificacao = "Excelente"
+    elif score >= 60:
+        classificacao = "Boa"
+    elif score >= 40:
+        classificacao = "Regular"
+    else:
+        classificacao = "Necessita Revisão"
+    
+    metricas['classificacao'] = classificacao
+    
+    return {
+        'metricas': metricas,
+        'alertas': alertas,
+        'valido': len(alertas) == 0 or metricas['score_qualidade'] >= 50
+    }
+
+
+def gerar_sinteticas(quantidade: int, semente: int = 42) -> List[str]:
+    """
+    Gera contestações sintéticas com citações, precedentes e conectivos
+    em posições e caixas variadas (inclusive citações sem término na linha)
+    
+    Args:
+        quantidade: Número de contestações
+        semente: Semente do gerador aleatório
+    
+    Returns:
+        Lista de textos
+    """
+    aleatorio = random.Random(semente)
+    trechos = [
+        "## IDENTIFICAÇÃO\n", "## DO MÉRITO\n", "### DOS  FATOS\n", "### Do\nDireito\n",
+        "## PEDIDOS\n", "Nos termos do art. 10, § 4º da Lei 9.656/98, ",
+        "conforme o artigo 51 do CDC ", "o Art.5º garante ", "e o art. 35-C ",
+        "(art. 6º,\n§ 1º da Lei) ", "art. 12 sem término\n", "da CF.\n",
+        "Portanto, ", "ASSIM, ", "Dessa forma ", "Ademais, ", "Contudo ", "Todavia, ",
+        "Não obstante ", "em que pese ", "segundo a jurisprudência do STJ ",
+        "o ACÓRDÃO do TJRJ ", "a Súmula 608 do STF ", "precedentes ",
+        "A parte autora alega negativa indevida de cobertura. ", "\n\n"
+    ]
+    
+    return [
+        "".join(aleatorio.choice(trechos) for _ in range(aleatorio.randint(5, 400)))
+        for _ in range(quantidade)
+    ]
+
+
+def medir(validar: Callable[[str], Dict], textos: List[str], repeticoes: int) -> float:
+    """Melhor tempo (s) de N passagens do validador sobre os textos"""
+    melhor_tempo = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for texto in textos:
+            validar(texto)
+        melhor_tempo = min(melhor_tempo, time.perf_counter() - inicio)
+    return melhor_tempo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do validador de contestações")
+    parser.add_argument('corpus', type=Path, nargs='?', help="Diretório com contestações .md/.txt")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições cronometradas")
+    parser.add_argument('--sinteticas', type=int, metavar='N', help="Incluir N contestações sintéticas")
+    args = parser.parse_args()
+    
+    if args.corpus is None and not args.sinteticas:
+        parser.error("informe o diretório do corpus ou --sinteticas")
+    
+    if args.corpus is not None and not args.corpus.is_dir():
+        print(f"❌ Diretório não encontrado: {args.corpus}")
+        return 1
+    
+    textos = []
+    if args.corpus is not None:
+        for extensao in ('*.md', '*.txt'):
+            textos += [arquivo.read_text(encoding='utf-8') for arquivo in sorted(args.corpus.rglob(extensao))]
+    if args.sinteticas:
+        textos += gerar_sinteticas(args.sinteticas)
+    
+    if not textos:
+        print("❌ Nenhuma contestação encontrada")
+        return 1
+    
+    validador = ValidadorContestacao()
+    megabytes = sum(len(texto.encode('utf-8')) for texto in textos) / 1_000_000
+    
+    print("="*80)
+    print(f"⏱️  BENCHMARK DO VALIDADOR ({len(textos)} contestações, {megabytes:.2f} MB)")
+    print("="*80)
+    
+    divergentes = [
+        i for i, texto in enumerate(textos)
+        if validador.validar(texto) != validar_referencia(texto)
+    ]
+    if divergentes:
+        print(f"❌ {len(divergentes)} contestações com resultado divergente (ex: índice {divergentes[0]})")
+    else:
+        print("✅ Métricas e alertas idênticos à implementação anterior")
+    
+    print(f"\n   {'versão':<14}{'tempo (s)':>12}{'contestações/s':>18}{'MB/s':>10}")
+    tempos = {}
+    for nome, validar in (('anterior', validar_referencia), ('atual', validador.validar)):
+        tempos[nome] = medir(validar, textos, args.repeticoes)
+        print(f"   {nome:<14}{tempos[nome]:>12.3f}{len(textos) / tempos[nome]:>18.1f}"
+              f"{megabytes / tempos[nome]:>10.2f}")
+    
+    print(f"\n   Aceleração: {tempos['anterior'] / tempos['atual']:.1f}x\n")
+    return 1 if divergentes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
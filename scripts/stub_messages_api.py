@@ -0,0 +1,508 @@
+"""
+═══════════════════════════════════════════════════════════════════════════
+STUB LOCAL DA MESSAGES API
+═══════════════════════════════════════════════════════════════════════════
+Servidor HTTP que imita a Messages API da Anthropic, para exercitar e medir
+o pipeline (LLMGenerator, agendador, lotes) sem chave de API real:
+
+- POST /v1/messages, com e sem streaming (SSE): latência até o primeiro
+  token e vazão de tokens configuráveis, uso de tokens e cache de prompt
+  simulado (prefixos até cada cache_control, TTL de 5 min);
+- POST /v1/messages/count_tokens;
+- Message Batches: criar, consultar e baixar resultados;
+- injeção de erros 429 (com retry-after) e 529 em uma fração das requisições;
+- gravação (--gravar DIR --upstream URL): repassa à API real e grava cada
+  resposta; reprodução (--reproduzir DIR): devolve as respostas gravadas,
+  endereçadas pelo hash da requisição, de forma determinística.
+
+Uso:
+    python scripts/stub_messages_api.py --porta 8765 --ttft 0.8 --tokens-por-segundo 60
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub streamlit run app.py
+
+    python scripts/stub_messages_api.py --gravar gravacoes/ --upstream https://api.anthropic.com
+    python scripts/stub_messages_api.py --reproduzir gravacoes/
+
+Em processo (benchmarks):
+    servidor, url = iniciar_stub(ConfigStub(ttft_s=0.1, taxa_429=0.1))
+    cliente = anthropic.Anthropic(api_key="stub", base_url=url)
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Permitir execução direta a partir da raiz do projeto
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.tokens import contar_tokens_brutos
+
+# TTL do cache de prompt efêmero simulado
+TTL_CACHE_S = 300
+
+# Tokens por evento content_block_delta no streaming
+TOKENS_POR_DELTA = 4
+
+# Cabeçalhos repassados à API real no modo gravação
+CABECALHOS_REPASSADOS = ('x-api-key', 'authorization', 'anthropic-version', 'anthropic-beta', 'content-type')
+
+_PARAGRAFO = (
+    "A operadora observou integralmente a Lei nº 9.656/98 e as resoluções normativas da ANS, "
+    "não havendo ato ilícito que justifique a pretensão autoral. "
+)
+
+
+@dataclass
+class ConfigStub:
+    """Comportamento do stub"""
+    ttft_s: float = 0.5
+    tokens_por_segundo: float = 80.0
+    tokens_saida: int = 3000
+    taxa_429: float = 0.0
+    taxa_529: float = 0.0
+    retry_after_s: float = 1.0
+    latencia_lote_s: float = 2.0
+    semente: Optional[int] = None
+    gravar: Optional[Path] = None
+    reproduzir: Optional[Path] = None
+    upstream: str = "https://api.anthropic.com"
+
+
+class EstadoStub:
+    """Estado compartilhado entre as threads do servidor"""
+    
+    def __init__(self, config: ConfigStub):
+        self.config = config
+        self.rng = random.Random(config.semente)
+        self.lock = threading.Lock()
+        self.prefixos: Dict[str, float] = {}
+        self.lotes: Dict[str, Dict] = {}
+        self.sequencia = itertools.count(1)
+        self.contadores = {'requisicoes': 0, 'erros_429': 0, 'erros_529': 0, 'reproduzidas': 0, 'gravadas': 0, 'streams_interrompidos': 0}
+    
+    def sortear_erro(self) -> Optional[int]:
+        """Status de erro injetado nesta requisição (ou None)"""
+        with self.lock:
+            self.contadores['requisicoes'] += 1
+            sorteio = self.rng.random()
+            if sorteio < self.config.taxa_429:
+                self.contadores['erros_429'] += 1
+                return 429
+            if sorteio < self.config.taxa_429 + self.config.taxa_529:
+                self.contadores['erros_529'] += 1
+                return 529
+        return None
+    
+    def uso_cache(self, params: Dict) -> Dict[str, int]:
+        """
+        Uso de tokens de input com cache de prompt simulado
+        
+        O prefixo até cada bloco com cache_control é identificado pelo hash
+        do conteúdo; o mais longo já visto (dentro do TTL) é lido do cache e
+        o trecho até o último breakpoint é gravado.
+        """
+        hash_prefixo = hashlib.sha256()
+        tokens = 0
+        breakpoints: List[Tuple[str, int]] = []
+        
+        for bloco in _blocos(params):
+            hash_prefixo.update(json.dumps(bloco, sort_keys=True).encode('utf-8'))
+            tokens += contar_tokens_brutos(bloco.get('text', ''))
+            if bloco.get('cache_control'):
+                breakpoints.append((hash_prefixo.hexdigest(), tokens))
+        
+        agora = time.monotonic()
+        with self.lock:
+            lidos = max(
+                (n for chave, n in breakpoints if agora - self.prefixos.get(chave, -TTL_CACHE_S) < TTL_CACHE_S),
+                default=0
+            )
+            gravados = breakpoints[-1][1] - lidos if breakpoints and breakpoints[-1][1] > lidos else 0
+            for chave, _ in breakpoints:
+                self.prefixos[chave] = agora
+        
+        return {
+            'input_tokens': tokens - lidos - gravados,
+            'cache_creation_input_tokens': gravados,
+            'cache_read_input_tokens': lidos
+        }
+    
+    def novo_id(self, prefixo: str) -> str:
+        return f"{prefixo}_stub_{next(self.sequencia):08d}"
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RESPOSTAS SINTÉTICAS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _blocos(params: Dict) -> Iterator[Dict]:
+    """Blocos de texto do system e das mensagens, em ordem"""
+    system = params.get('system') or []
+    yield from ([{'type': 'text', 'text': system}] if isinstance(system, str) else system)
+    for mensagem in params.get('messages', []):
+        conteudo = mensagem['content']
+        yield from ([{'type': 'text', 'text': conteudo}] if isinstance(conteudo, str) else conteudo)
+
+
+def _texto_sintetico(tokens: int, continuacao: bool) -> str:
+    """Contestação sintética com aproximadamente o número de tokens pedido"""
+    inicio = "" if continuacao else (
+        "EXCELENTÍSSIMO SENHOR DOUTOR JUIZ DE DIREITO\n\n"
+        "## 1. IDENTIFICAÇÃO\n\nUNIMED FERJ, já qualificada, apresenta CONTESTAÇÃO.\n\n"
+        "## 2. DO MÉRITO\n\n### 2.1. DOS FATOS\n\n"
+    )
+    fim = "\n\n## 3. DOS PEDIDOS\n\nRequer a total improcedência da ação.\n\nNestes termos, pede deferimento."
+    
+    texto = inicio
+    while contar_tokens_brutos(texto) + contar_tokens_brutos(fim) < tokens:
+        texto += _PARAGRAFO
+    return (texto + fim) if tokens >= contar_tokens_brutos(fim) else texto
+
+
+def gerar_mensagem(estado: EstadoStub, params: Dict) -> Dict:
+    """
+    Mensagem completa no formato da API
+    
+    Gera Config.tokens_saida tokens no total; com prefill (último turno do
+    assistente), só o restante. Acima de max_tokens, para em 'max_tokens'.
+    """
+    mensagens = params.get('messages', [])
+    prefill = mensagens[-1]['content'] if mensagens and mensagens[-1]['role'] == 'assistant' else None
+    prefill_texto = prefill if isinstance(prefill, str) else ''.join(b.get('text', '') for b in prefill or [])
+    
+    restante = max(estado.config.tokens_saida - contar_tokens_brutos(prefill_texto), 1)
+    tokens = min(restante, params['max_tokens'])
+    texto = _texto_sintetico(tokens, continuacao=prefill is not None)
+    
+    return {
+        'id': estado.novo_id('msg'),
+        'type': 'message',
+        'role': 'assistant',
+        'model': params['model'],
+        'content': [{'type': 'text', 'text': texto}],
+        'stop_reason': 'max_tokens' if restante > params['max_tokens'] else 'end_turn',
+        'stop_sequence': None,
+        'usage': {**estado.uso_cache(params), 'output_tokens': tokens}
+    }
+
+
+def _erro(status: int, mensagem: str) -> Dict:
+    tipos = {429: 'rate_limit_error', 529: 'overloaded_error', 404: 'not_found_error', 400: 'invalid_request_error'}
+    return {'type': 'error', 'error': {'type': tipos.get(status, 'api_error'), 'message': mensagem}}
+
+
+def _data_iso(instante: datetime) -> str:
+    return instante.isoformat().replace('+00:00', 'Z')
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SERVIDOR
+# ═══════════════════════════════════════════════════════════════════════════
+
+class HandlerStub(BaseHTTPRequestHandler):
+    """Rotas da Messages API (estado em self.server.estado)"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, formato, *args):
+        pass
+    
+    def do_POST(self):
+        self._atender('POST')
+    
+    def do_GET(self):
+        self._atender('GET')
+    
+    def _atender(self, metodo: str):
+        estado: EstadoStub = self.server.estado
+        tamanho = int(self.headers.get('content-length') or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b''
+        caminho = self.path.split('?', 1)[0]
+        
+        if estado.config.reproduzir or estado.config.gravar:
+            self._gravacao(metodo, corpo)
+            return
+        
+        try:
+            params = json.loads(corpo) if corpo else {}
+        except json.JSONDecodeError:
+            self._json(400, _erro(400, "JSON inválido"))
+            return
+        
+        if metodo == 'POST' and caminho == '/v1/messages':
+            status = estado.sortear_erro()
+            if status:
+                self._json(status, _erro(status, f"Erro {status} injetado pelo stub"),
+                           {'retry-after': str(estado.config.retry_after_s)})
+            elif params.get('stream'):
+                self._stream(gerar_mensagem(estado, params))
+            else:
+                mensagem = gerar_mensagem(estado, params)
+                time.sleep(estado.config.ttft_s + mensagem['usage']['output_tokens'] / estado.config.tokens_por_segundo)
+                self._json(200, mensagem)
+        elif metodo == 'POST' and caminho == '/v1/messages/count_tokens':
+            self._json(200, {'input_tokens': sum(contar_tokens_brutos(b.get('text', '')) for b in _blocos(params))})
+        elif metodo == 'POST' and caminho == '/v1/messages/batches':
+            self._json(200, self._criar_lote(params['requests']))
+        elif metodo == 'GET' and caminho.startswith('/v1/messages/batches/'):
+            partes = caminho.split('/')
+            lote_id = partes[4]
+            if lote_id not in estado.lotes:
+                self._json(404, _erro(404, f"Lote não encontrado: {lote_id}"))
+            elif len(partes) > 5 and partes[5] == 'results':
+                self._resultados_lote(lote_id)
+            else:
+                self._json(200, self._objeto_lote(lote_id))
+        else:
+            self._json(404, _erro(404, f"Rota não suportada pelo stub: {metodo} {caminho}"))
+    
+    # Respostas ──────────────────────────────────────────────────────────
+    
+    def _json(self, status: int, dados: Dict, cabecalhos: Optional[Dict[str, str]] = None):
+        self._enviar(status, json.dumps(dados, ensure_ascii=False).encode('utf-8'), 'application/json', cabecalhos)
+    
+    def _enviar(self, status: int, corpo: bytes, tipo: str, cabecalhos: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('content-type', tipo)
+        self.send_header('content-length', str(len(corpo)))
+        self.send_header('request-id', self.server.estado.novo_id('req'))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+    
+    def _stream(self, mensagem: Dict):
+        """Mensagem em eventos SSE, no ritmo de tokens_por_segundo"""
+        config = self.server.estado.config
+        texto = mensagem['content'][0]['text']
+        uso = mensagem['usage']
+        
+        self.send_response(200)
+        self.send_header('content-type', 'text/event-stream')
+        self.send_header('cache-control', 'no-cache')
+        self.send_header('connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        
+        def evento(tipo: str, dados: Dict):
+            self.wfile.write(f"event: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        
+        inicio = {**mensagem, 'content': [], 'stop_reason': None, 'usage': {**uso, 'output_tokens': 1}}
+        evento('message_start', {'type': 'message_start', 'message': inicio})
+        evento('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                       'content_block': {'type': 'text', 'text': ''}})
+        time.sleep(config.ttft_s)
+        
+        passo = TOKENS_POR_DELTA * 4
+        intervalo = uso['output_tokens'] / config.tokens_por_segundo / max(len(texto) / passo, 1)
+        try:
+            for posicao in range(0, len(texto), passo):
+                evento('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                               'delta': {'type': 'text_delta', 'text': texto[posicao:posicao + passo]}})
+                time.sleep(intervalo)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente fechou o stream (ex: validação incremental interrompeu)
+            with self.server.estado.lock:
+                self.server.estado.contadores['streams_interrompidos'] += 1
+            return
+        
+        evento('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        evento('message_delta', {'type': 'message_delta',
+                                 'delta': {'stop_reason': mensagem['stop_reason'], 'stop_sequence': None},
+                                 'usage': {'output_tokens': uso['output_tokens']}})
+        evento('message_stop', {'type': 'message_stop'})
+    
+    # Lotes ──────────────────────────────────────────────────────────────
+    
+    def _criar_lote(self, requisicoes: List[Dict]) -> Dict:
+        estado: EstadoStub = self.server.estado
+        lote_id = estado.novo_id('msgbatch')
+        with estado.lock:
+            estado.lotes[lote_id] = {
+                'requisicoes': requisicoes,
+                'criado': datetime.now(timezone.utc),
+                'resultados': None
+            }
+        return self._objeto_lote(lote_id)
+    
+    def _objeto_lote(self, lote_id: str) -> Dict:
+        estado: EstadoStub = self.server.estado
+        lote = estado.lotes[lote_id]
+        encerrado = datetime.now(timezone.utc) - lote['criado'] >= timedelta(seconds=estado.config.latencia_lote_s)
+        
+        if encerrado and lote['resultados'] is None:
+            lote['resultados'] = [
+                {'custom_id': r['custom_id'], 'result': {'type': 'succeeded', 'message': gerar_mensagem(estado, r['params'])}}
+                for r in lote['requisicoes']
+            ]
+        
+        total = len(lote['requisicoes'])
+        return {
+            'id': lote_id,
+            'type': 'message_batch',
+            'processing_status': 'ended' if encerrado else 'in_progress',
+            'request_counts': {
+                'processing': 0 if encerrado else total,
+                'succeeded': total if encerrado else 0,
+                'errored': 0,
+                'canceled': 0,
+                'expired': 0
+            },
+            'created_at': _data_iso(lote['criado']),
+            'expires_at': _data_iso(lote['criado'] + timedelta(hours=24)),
+            'ended_at': _data_iso(datetime.now(timezone.utc)) if encerrado else None,
+            'cancel_initiated_at': None,
+            'archived_at': None,
+            'results_url': (f"http://{self.headers.get('host')}/v1/messages/batches/{lote_id}/results"
+                            if encerrado else None)
+        }
+    
+    def _resultados_lote(self, lote_id: str):
+        resultados = self.server.estado.lotes[lote_id]['resultados']
+        if resultados is None:
+            self._json(400, _erro(400, f"Lote {lote_id} ainda em processamento"))
+            return
+        corpo = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in resultados)
+        self._enviar(200, corpo.encode('utf-8'), 'application/binary')
+    
+    # Gravação / reprodução ──────────────────────────────────────────────
+    
+    def _gravacao(self, metodo: str, corpo: bytes):
+        """Reproduz a resposta gravada ou repassa à API real e grava"""
+        estado: EstadoStub = self.server.estado
+        chave = chave_gravacao(metodo, self.path, corpo)
+        
+        if estado.config.reproduzir:
+            arquivo = Path(estado.config.reproduzir) / f"{chave}.json"
+            if not arquivo.exists():
+                self._json(404, _erro(404, f"Sem gravação para {metodo} {self.path} ({chave[:12]})"))
+                return
+            gravada = json.loads(arquivo.read_text(encoding='utf-8'))
+            with estado.lock:
+                estado.contadores['reproduzidas'] += 1
+            self._enviar(gravada['status'], gravada['corpo'].encode('utf-8'),
+                         gravada['cabecalhos'].pop('content-type', 'application/json'), gravada['cabecalhos'])
+            return
+        
+        requisicao = urllib.request.Request(
+            estado.config.upstream.rstrip('/') + self.path,
+            data=corpo if metodo == 'POST' else None,
+            method=metodo,
+            headers={nome: self.headers[nome] for nome in CABECALHOS_REPASSADOS if self.headers.get(nome)}
+        )
+        try:
+            with urllib.request.urlopen(requisicao, timeout=600) as resposta:
+                status, cabecalhos, dados = resposta.status, dict(resposta.headers), resposta.read()
+        except urllib.error.HTTPError as e:
+            status, cabecalhos, dados = e.code, dict(e.headers), e.read()
+        
+        cabecalhos = {nome.lower(): valor for nome, valor in cabecalhos.items()
+                      if nome.lower() in ('content-type', 'retry-after', 'request-id')}
+        
+        destino = Path(estado.config.gravar)
+        destino.mkdir(parents=True, exist_ok=True)
+        (destino / f"{chave}.json").write_text(json.dumps({
+            'metodo': metodo,
+            'caminho': self.path,
+            'status': status,
+            'cabecalhos': cabecalhos,
+            'corpo': dados.decode('utf-8')
+        }, ensure_ascii=False), encoding='utf-8')
+        with estado.lock:
+            estado.contadores['gravadas'] += 1
+        
+        self._enviar(status, dados, cabecalhos.pop('content-type', 'application/json'), cabecalhos)
+
+
+def chave_gravacao(metodo: str, caminho: str, corpo: bytes) -> str:
+    """Hash da requisição (corpo JSON normalizado) que endereça a gravação"""
+    try:
+        normalizado = json.dumps(json.loads(corpo), sort_keys=True, ensure_ascii=False) if corpo else ''
+    except json.JSONDecodeError:
+        normalizado = corpo.decode('utf-8', errors='replace')
+    return hashlib.sha256(f"{metodo} {caminho}\n{normalizado}".encode('utf-8')).hexdigest()
+
+
+def iniciar_stub(config: Optional[ConfigStub] = None, porta: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Inicia o stub em uma thread de segundo plano
+    
+    Args:
+        config: Comportamento do stub (padrão: ConfigStub())
+        porta: Porta local (0 = livre, escolhida pelo sistema)
+    
+    Returns:
+        (servidor, URL base para ANTHROPIC_BASE_URL); encerrar com
+        servidor.shutdown()
+    """
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), HandlerStub)
+    servidor.daemon_threads = True
+    servidor.estado = EstadoStub(config or ConfigStub())
+    
+    threading.Thread(target=servidor.serve_forever, name="stub-messages-api", daemon=True).start()
+    
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local da Messages API")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--ttft', type=float, default=0.5, help="Segundos até o primeiro token")
+    parser.add_argument('--tokens-por-segundo', type=float, default=80.0)
+    parser.add_argument('--tokens-saida', type=int, default=3000, help="Tokens de cada resposta sintética")
+    parser.add_argument('--taxa-429', type=float, default=0.0, help="Fração das requisições com 429")
+    parser.add_argument('--taxa-529', type=float, default=0.0, help="Fração das requisições com 529")
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--latencia-lote', type=float, default=2.0, help="Segundos até um lote encerrar")
+    parser.add_argument('--semente', type=int, default=None, help="Semente da injeção de erros")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument('--gravar', type=Path, help="Repassar à API real e gravar as respostas neste diretório")
+    modo.add_argument('--reproduzir', type=Path, help="Responder com as gravações deste diretório")
+    parser.add_argument('--upstream', default="https://api.anthropic.com", help="API real (modo gravação)")
+    args = parser.parse_args()
+    
+    config = ConfigStub(
+        ttft_s=args.ttft,
+        tokens_por_segundo=args.tokens_por_segundo,
+        tokens_saida=args.tokens_saida,
+        taxa_429=args.taxa_429,
+        taxa_529=args.taxa_529,
+        retry_after_s=args.retry_after,
+        latencia_lote_s=args.latencia_lote,
+        semente=args.semente,
+        gravar=args.gravar,
+        reproduzir=args.reproduzir,
+        upstream=args.upstream
+    )
+    servidor, url = iniciar_stub(config, args.porta)
+    
+    modo_texto = (f"reproduzindo {args.reproduzir}" if args.reproduzir
+                  else f"gravando {args.upstream} → {args.gravar}" if args.gravar else "sintético")
+    print(f"🧪 Stub da Messages API em {url} ({modo_texto})")
+    print(f"   ANTHROPIC_BASE_URL={url}")
+    print("   Ctrl+C para encerrar\n")
+    
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+        print(f"\n📊 {servidor.estado.contadores}")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
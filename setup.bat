@@ -86,7 +86,6 @@ REM Criar diretórios
 echo Criando diretórios de output...
 if not exist outputs mkdir outputs
 if not exist logs mkdir logs
-if not exist temp mkdir temp
 echo ✅ Diretórios criados
 echo.
 
@@ -0,0 +1,111 @@
+"""
+Fixtures compartilhadas dos testes
+
+Nenhum teste usa a API real: as gerações passam pelo stub local da Messages
+API (scripts/stub_messages_api.py) ou pelo endpoint de lotes em processo
+(modules.lotes.EndpointLotesLocal). Arquivos de estado, livro de custos e
+logs vão para o diretório temporário de cada teste.
+"""
+
+import inspect
+from types import SimpleNamespace
+
+import anthropic
+import pytest
+
+from config.settings import Config
+from modules import roteador
+from modules.cache_geracao import CacheGeracao
+from modules.contabilidade import LivroCustos
+from modules.llm_generator import LLMGenerator
+
+DADOS_PETICAO = {
+    'tipo_caso': 'REEMBOLSO',
+    'confianca': 0.95,
+    'texto_completo': 'Petição inicial de reembolso de despesas médicas.',
+    'pedidos': ['reembolso integral'],
+    'autor': 'Maria da Silva',
+    'reu': 'UNIMED FERJ'
+}
+
+CONTEXTO_RAG = {
+    'contexto_formatado': 'Art. 12 da Lei 9.656/98: reembolso nos limites do contrato.',
+    'tipo_caso': 'REEMBOLSO'
+}
+
+
+@pytest.fixture(autouse=True)
+def isolar_config(tmp_path, monkeypatch):
+    """Saídas no diretório temporário; sem threads de aquecimento nem telemetria"""
+    monkeypatch.setattr(Config, 'LEDGER_CUSTOS', tmp_path / 'custos.jsonl')
+    monkeypatch.setattr(Config, 'LOG_ROTEAMENTO', tmp_path / 'roteamento.jsonl')
+    monkeypatch.setattr(Config, 'BATCH_DIR', tmp_path / 'lotes')
+    monkeypatch.setattr(Config, 'CACHE_GERACAO_DIR', tmp_path / 'cache_geracao')
+    monkeypatch.setattr(Config, 'PROMPT_CACHE_MANTER_AQUECIDO', False)
+    monkeypatch.setattr(Config, 'TELEMETRIA_ATIVA', False)
+    monkeypatch.setattr(roteador, '_HISTORICOS', {})
+    monkeypatch.setattr(roteador, '_BLOQUEADOS', {})
+
+
+@pytest.fixture
+def livro(tmp_path):
+    return LivroCustos(tmp_path / 'custos.jsonl')
+
+
+@pytest.fixture
+def gerador_offline(tmp_path, livro):
+    """LLMGenerator sem servidor (contagem de tokens local; para lotes locais)"""
+    cliente = SimpleNamespace(messages=SimpleNamespace())
+    return LLMGenerator(client=cliente, livro_custos=livro, cache_resultados=CacheGeracao(tmp_path / 'cache'))
+
+
+class _MensagensCompat:
+    """
+    messages de um cliente cujo SDK não aceita temperature/top_k como
+    argumentos nomeados: os parâmetros de amostragem seguem em extra_body
+    """
+    
+    def __init__(self, mensagens):
+        self._mensagens = mensagens
+    
+    def __getattr__(self, nome):
+        return getattr(self._mensagens, nome)
+    
+    @staticmethod
+    def _ajustar(params):
+        params = dict(params)
+        amostragem = {chave: params.pop(chave) for chave in ('temperature', 'top_k') if chave in params}
+        if amostragem:
+            params['extra_body'] = {**params.get('extra_body', {}), **amostragem}
+        return params
+    
+    def create(self, **params):
+        return self._mensagens.create(**self._ajustar(params))
+    
+    def stream(self, **params):
+        return self._mensagens.stream(**self._ajustar(params))
+    
+    def count_tokens(self, **params):
+        return self._mensagens.count_tokens(**self._ajustar(params))
+
+
+@pytest.fixture
+def stub():
+    """Stub da Messages API: (servidor, cliente anthropic apontado para ele)"""
+    from stub_messages_api import ConfigStub, iniciar_stub
+    
+    servidor, url = iniciar_stub(ConfigStub(ttft_s=0.0, tokens_por_segundo=1e6, latencia_lote_s=0.1, semente=1))
+    cliente = anthropic.Anthropic(api_key="stub", base_url=url, max_retries=0)
+    if 'temperature' not in inspect.signature(cliente.messages.create).parameters:
+        cliente.messages = _MensagensCompat(cliente.messages)
+    
+    yield servidor, cliente
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def gerador_stub(stub, tmp_path, livro):
+    """LLMGenerator ligado ao stub da Messages API"""
+    _, cliente = stub
+    return LLMGenerator(client=cliente, livro_custos=livro, cache_resultados=CacheGeracao(tmp_path / 'cache'))
@@ -0,0 +1,64 @@
+"""Normalização das chaves de citação e verificação contra o índice"""
+
+import pytest
+
+from modules.citacoes import IndiceCitacoes, extrair_citacoes, rotulo_citacao
+
+
+def _chaves(texto: str) -> set:
+    return {chave for _, chave in extrair_citacoes(texto)}
+
+
+@pytest.mark.parametrize('texto, chave', [
+    ("Lei nº 9.656/98", 'lei:9656'),
+    ("LEI N° 9656", 'lei:9656'),
+    ("Lei Complementar 109/2001", 'lei-complementar:109'),
+    ("art. 35-C da Lei 9.656/98", 'artigo:35-c@lei:9656'),
+    ("artigo 51, IV, do CDC", 'artigo:51@cdc'),
+    ("art. 51 do Código de Defesa do Consumidor", 'artigo:51@cdc'),
+    ("art. 6º da Lei 8.078/90", 'artigo:6@cdc'),
+    ("art. 5º da Constituição Federal", 'artigo:5@cf'),
+    ("art. 5º da CRFB/88", 'artigo:5@cf'),
+    ("art. 186 do Código Civil", 'artigo:186@cc'),
+    ("art. 373 do CPC", 'artigo:373@cpc'),
+    ("art. 012", 'artigo:12'),
+    ("Súmula 608 do STJ", 'sumula:608@stj'),
+    ("súmula nº 608/STJ", 'sumula:608@stj'),
+    ("Súmula Vinculante 10", 'sumula:10@stf'),
+    ("Sumula 302", 'sumula:302'),
+    ("Tema Repetitivo 990", 'tema:990'),
+    ("REsp 1.733.013/PR", 'recurso:resp:1733013'),
+    ("AREsp nº 1.234.567", 'recurso:aresp:1234567'),
+    ("0012345-67.2019.8.19.0001", 'processo:00123456720198190001'),
+])
+def test_chave_normalizada(texto, chave):
+    assert chave in _chaves(texto)
+
+
+def test_lei_de_codigo_nao_gera_chave_de_lei():
+    assert ('lei', 'lei:8078') not in set(extrair_citacoes("Lei 8.078/90"))
+
+
+def test_artigo_sem_diploma_na_mesma_linha():
+    assert _chaves("art. 14\nda Lei 9.656/98") == {'artigo:14', 'lei:9656'}
+
+
+def test_rotulos_legiveis():
+    assert rotulo_citacao('sumula:608@stj') == 'Súmula 608/STJ'
+    assert rotulo_citacao('artigo:35-c@lei:9656') == 'art. 35-C da Lei 9656'
+    assert rotulo_citacao('recurso:resp:1733013') == 'REsp 1733013'
+    assert rotulo_citacao('processo:00123456720198190001') == 'Processo 0012345-67.2019.8.19.0001'
+
+
+def test_verificar_usa_forma_qualificada():
+    indice = IndiceCitacoes({
+        chave: 1 for chave in IndiceCitacoes._chaves_documento("art. 51 do CDC e Súmula 608 do STJ")
+    })
+    
+    verificacao = indice.verificar(
+        "Conforme o artigo 51 do Código de Defesa do Consumidor, a súmula nº 608/STJ e o art. 51 da CF",
+        tipos=['artigo', 'sumula']
+    )
+    
+    assert verificacao['verificadas'] == ['artigo:51@cdc', 'sumula:608@stj']
+    assert verificacao['nao_verificadas'] == ['artigo:51@cf']
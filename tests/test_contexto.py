@@ -0,0 +1,81 @@
+"""Orçamento de tokens do contexto RAG (ContextBuilder._empacotar)"""
+
+from modules.llm_generator import ContextBuilder
+from modules.tokens import contar_tokens
+
+CABECALHO = ContextBuilder.TOKENS_CABECALHO_CHUNK
+
+
+def _chunk(palavras: int, similaridade: float, rotulo: str) -> dict:
+    frases = ' '.join(f"Frase {rotulo} número {i} sobre reembolso contratual." for i in range(palavras // 6 + 1))
+    return {'conteudo': frases, 'similaridade': similaridade, 'rotulo': rotulo}
+
+
+def _custo(chunk: dict) -> int:
+    return contar_tokens(chunk['conteudo']) + CABECALHO
+
+
+def test_tudo_cabe_no_orcamento():
+    candidatos = {
+        'nivel_1': [_chunk(30, 0.9, 'a'), _chunk(30, 0.8, 'b')],
+        'nivel_3': [_chunk(30, 0.7, 'c')],
+        'especificos': []
+    }
+    
+    contexto = ContextBuilder(max_tokens=10_000)._empacotar(candidatos)
+    
+    assert [c['rotulo'] for c in contexto['nivel_1']] == ['a', 'b']
+    assert [c['rotulo'] for c in contexto['nivel_3']] == ['c']
+    assert contexto['especificos'] == []
+    alocacao = contexto['alocacao_tokens']
+    assert alocacao['descartados'] == 0
+    assert alocacao['total'] == sum(_custo(c) for lista in candidatos.values() for c in lista)
+    assert alocacao['por_nivel']['nivel_1'] == {'chunks': 2, 'candidatos': 2, 'tokens': alocacao['total'] - _custo(candidatos['nivel_3'][0]), 'truncados': 0}
+
+
+def test_maior_valor_por_token_entra_primeiro():
+    curto_relevante = _chunk(20, 0.9, 'curto')
+    longo_relevante = _chunk(400, 0.9, 'longo')
+    curto_fraco = _chunk(20, 0.6, 'fraco')
+    candidatos = {'nivel_1': [longo_relevante, curto_relevante], 'nivel_3': [curto_fraco]}
+    
+    # Cabem os dois curtos, mas não o longo nem um fragmento dele
+    orcamento = _custo(curto_relevante) + _custo(curto_fraco) + ContextBuilder.MIN_TOKENS_FRAGMENTO // 2
+    contexto = ContextBuilder(max_tokens=orcamento)._empacotar(candidatos)
+    
+    assert [c['rotulo'] for c in contexto['nivel_1']] == ['curto']
+    assert [c['rotulo'] for c in contexto['nivel_3']] == ['fraco']
+    assert contexto['alocacao_tokens']['descartados'] == 1
+    assert contexto['alocacao_tokens']['total'] <= orcamento
+
+
+def test_sobra_recebe_fragmento_do_melhor_excedente():
+    pequeno = _chunk(20, 0.9, 'pequeno')
+    grande = _chunk(600, 0.8, 'grande')
+    candidatos = {'nivel_1': [grande, pequeno]}
+    
+    orcamento = _custo(pequeno) + CABECALHO + 3 * ContextBuilder.MIN_TOKENS_FRAGMENTO
+    contexto = ContextBuilder(max_tokens=orcamento)._empacotar(candidatos)
+    
+    # Ordem original de relevância preservada; o grande entra truncado
+    assert [c['rotulo'] for c in contexto['nivel_1']] == ['grande', 'pequeno']
+    fragmento = contexto['nivel_1'][0]
+    assert fragmento['truncado']
+    assert grande['conteudo'].startswith(fragmento['conteudo'].rstrip('.').rstrip())
+    assert len(fragmento['conteudo']) < len(grande['conteudo'])
+    
+    alocacao = contexto['alocacao_tokens']
+    assert alocacao['descartados'] == 0
+    assert alocacao['por_nivel']['nivel_1']['truncados'] == 1
+    assert alocacao['total'] <= orcamento
+
+
+def test_sobra_pequena_demais_nao_vira_fragmento():
+    pequeno = _chunk(20, 0.9, 'pequeno')
+    grande = _chunk(600, 0.8, 'grande')
+    
+    orcamento = _custo(pequeno) + CABECALHO + ContextBuilder.MIN_TOKENS_FRAGMENTO - 1
+    contexto = ContextBuilder(max_tokens=orcamento)._empacotar({'nivel_1': [grande, pequeno]})
+    
+    assert [c['rotulo'] for c in contexto['nivel_1']] == ['pequeno']
+    assert contexto['alocacao_tokens']['descartados'] == 1
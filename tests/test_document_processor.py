@@ -0,0 +1,39 @@
+"""Parada antecipada da extração: detecção das seções da petição"""
+
+import pytest
+
+from modules.document_processor import DetectorSecoesIncremental
+
+
+@pytest.mark.parametrize('texto', [
+    "III - DOS PEDIDOS\na) a condenação da ré",
+    "5. DOS REQUERIMENTOS\n",
+    "  Do Pedido\nReembolso integral.",
+    "Diante do exposto, requer:\na) a procedência",
+    "Ante o exposto, a autora REQUER\n",
+])
+def test_secao_de_pedidos_reconhecida(texto):
+    detector = DetectorSecoesIncremental(['pedidos'])
+    detector.alimentar(texto)
+    
+    assert detector.pendentes == []
+
+
+@pytest.mark.parametrize('texto', [
+    "Requerente: MARIA DA SILVA, brasileira, casada",
+    "REQUERIDA: UNIMED FERJ",
+    "A autora formulou requerimento administrativo, e o réu negou.",
+    "conforme se verá na análise do pedido de tutela de urgência",
+])
+def test_qualificacao_e_texto_corrido_nao_abrem_pedidos(texto):
+    detector = DetectorSecoesIncremental(['pedidos'])
+    detector.alimentar(texto)
+    
+    assert detector.pendentes == ['pedidos']
+
+
+def test_qualificacao_nao_encerra_leitura_antes_dos_pedidos():
+    detector = DetectorSecoesIncremental(['pedidos'])
+    
+    assert not detector.alimentar("Requerente: MARIA DA SILVA\nRequerido: UNIMED FERJ\nNESTES TERMOS")
+    assert detector.alimentar("\nIV - DOS PEDIDOS\na) reembolso")
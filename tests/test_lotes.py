@@ -0,0 +1,141 @@
+"""Geração em lote: submeter → consultar → coletar contra EndpointLotesLocal"""
+
+import time
+
+import pytest
+
+from cli import ETAPAS_CLI, ExecutorEtapas
+from config.settings import Config
+from modules.contabilidade import calcular_custo
+from modules.lotes import STATUS_CONCLUIDO, STATUS_PROCESSANDO, EndpointLotesLocal, GeradorLote
+from tests.conftest import CONTEXTO_RAG, DADOS_PETICAO
+
+
+def _itens(*referencias):
+    return [
+        {'referencia': referencia, 'dados_peticao': dict(DADOS_PETICAO), 'contexto_rag': CONTEXTO_RAG}
+        for referencia in referencias
+    ]
+
+
+def test_submeter_consultar_coletar(gerador_offline, livro, tmp_path):
+    lote = GeradorLote(gerador_offline, EndpointLotesLocal(latencia_s=0.2), tmp_path / 'lotes')
+    
+    estado = lote.submeter(_itens('a.pdf', 'b.pdf'))
+    assert estado['status'] == STATUS_PROCESSANDO
+    assert lote.atualizar(estado['id_local'])['status'] == STATUS_PROCESSANDO
+    assert lote.resultados(estado['id_local']) == {}
+    
+    estado = lote.aguardar(estado['id_local'], intervalo_s=0.05, timeout_s=5)
+    assert estado['status'] == STATUS_CONCLUIDO
+    
+    resultados = lote.resultados(estado['id_local'])
+    assert set(resultados) == {'a.pdf', 'b.pdf'}
+    assert all(r['sucesso'] and 'CONTESTAÇÃO' in r['contestacao'] for r in resultados.values())
+    assert all(r['metadados']['lote'] == estado['batch_id'] for r in resultados.values())
+    
+    # Custos registrados uma vez, com a referência do lote
+    assert livro.referencias(f"{estado['batch_id']}/") == {
+        f"{estado['batch_id']}/peticao-0000", f"{estado['batch_id']}/peticao-0001"
+    }
+    linhas = livro.caminho.read_text(encoding='utf-8').splitlines()
+    lote.atualizar(estado['id_local'])
+    assert livro.caminho.read_text(encoding='utf-8').splitlines() == linhas
+
+
+def test_lote_no_stub_da_messages_api(gerador_stub, livro, tmp_path):
+    lote = GeradorLote(gerador_stub, diretorio=tmp_path / 'lotes')
+    
+    estado = lote.aguardar(lote.submeter(_itens('a.pdf', 'b.pdf'))['id_local'], intervalo_s=0.05, timeout_s=10)
+    resultados = lote.resultados(estado['id_local'])
+    
+    assert estado['status'] == STATUS_CONCLUIDO
+    assert all(r['sucesso'] for r in resultados.values())
+    
+    # Lote cobrado com desconto sobre o uso devolvido pelo endpoint
+    entradas = [e for e in livro.ler() if e['operacao'] == 'lote']
+    assert len(entradas) == 2
+    assert sum(e['custo_usd']['total'] for e in entradas) == pytest.approx(
+        sum(r['custo_estimado'] for r in resultados.values())
+    )
+    for entrada in entradas:
+        assert entrada['custo_usd']['total'] == pytest.approx(
+            calcular_custo(entrada['model'], entrada, Config.FATOR_PRECO_LOTE)['total']
+        )
+    assert {e['referencia'] for e in entradas} == livro.referencias(f"{estado['batch_id']}/")
+    
+    # Estado persistido: outra instância retoma o lote sem recobrar
+    outro = GeradorLote(gerador_stub, diretorio=tmp_path / 'lotes')
+    assert outro.listar(apenas_pendentes=True) == []
+    assert set(outro.resultados(estado['id_local'])) == {'a.pdf', 'b.pdf'}
+    assert len([e for e in livro.ler() if e['operacao'] == 'lote']) == 2
+
+
+def test_requisicao_com_erro_no_lote(gerador_offline, tmp_path):
+    def responder(params):
+        raise RuntimeError("overloaded")
+    
+    lote = GeradorLote(gerador_offline, EndpointLotesLocal(responder), tmp_path / 'lotes')
+    estado = lote.aguardar(lote.submeter(_itens('a.pdf'))['id_local'], intervalo_s=0.01, timeout_s=5)
+    
+    resultado = lote.resultados(estado['id_local'])['a.pdf']
+    assert not resultado['sucesso']
+    assert 'overloaded' in resultado['erro']
+    assert not estado['custos_pendentes']
+
+
+def test_submissao_recusada_nao_fica_pendente(gerador_offline, tmp_path):
+    class EndpointRecusa(EndpointLotesLocal):
+        def create(self, requests):
+            raise RuntimeError("recusado")
+    
+    lote = GeradorLote(gerador_offline, EndpointRecusa(), tmp_path / 'lotes')
+    with pytest.raises(RuntimeError):
+        lote.submeter(_itens('a.pdf'))
+    
+    assert lote.listar(apenas_pendentes=True) == []
+
+
+class _PipelineLocal:
+    """Etapas anteriores e posteriores à geração, sem RAG nem API"""
+    
+    def processar(self, conteudo, extensao):
+        if b'ilegivel' in conteudo:
+            raise ValueError("arquivo ilegível")
+        return {'dados_peticao': dict(DADOS_PETICAO), 'texto_query': conteudo.decode()}
+    
+    def recuperar(self, texto_query):
+        return {}
+    
+    def construir_contexto(self, dados_peticao, resultado_rag):
+        return CONTEXTO_RAG
+    
+    def validar(self, resultado):
+        return {'metricas': {'score_qualidade': 80.0}}
+
+
+def test_cli_gera_todas_as_peticoes_em_um_lote(gerador_offline, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'BATCH_INTERVALO_POLLING_S', 0.01)
+    endpoint = EndpointLotesLocal(latencia_s=0.05)
+    lote = GeradorLote(gerador_offline, endpoint, tmp_path / 'lotes')
+    
+    itens = []
+    for nome, conteudo in (('a.txt', b'reembolso'), ('b.txt', b'reembolso'), ('c.txt', b'ilegivel')):
+        caminho = tmp_path / nome
+        caminho.write_bytes(conteudo)
+        itens.append({'arquivo': nome, 'caminho': caminho, 'sha256': nome})
+    
+    opcoes = {'temperatura': 0.5, 'top_k': 40, 'max_tokens': 4000}
+    executor = ExecutorEtapas(_PipelineLocal(), {etapa: 2 for etapa in ETAPAS_CLI}, opcoes, lote=lote)
+    inicio = time.monotonic()
+    concluidos = {item['arquivo']: item for item in executor.executar(itens)}
+    executor.encerrar()
+    assert time.monotonic() - inicio < 10
+    
+    assert len(endpoint._lotes) == 1
+    assert concluidos['c.txt']['etapa_falha'] == 'processamento'
+    for nome in ('a.txt', 'b.txt'):
+        assert 'erro' not in concluidos[nome]
+        assert concluidos[nome]['resultado']['sucesso']
+        assert concluidos[nome]['validacao']['metricas']['score_qualidade'] == 80.0
+        assert 'geracao' in concluidos[nome]['duracoes_s']
@@ -0,0 +1,140 @@
+"""Roteamento de modelos: decisão, escalada e custos (via stub da Messages API)"""
+
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from config.settings import Config
+from modules.contabilidade import calcular_custo
+from modules.roteador import RoteadorModelos
+from tests.conftest import CONTEXTO_RAG, DADOS_PETICAO
+
+
+class _GeradorInerte:
+    """Gerador que não deve ser chamado (testes só de decisão)"""
+    
+    def gerar_contestacao(self, *args, **kwargs):
+        raise AssertionError("geração não esperada")
+
+
+def _log_escalados(caminho, quantidade: int, dia: str):
+    registro = {
+        'tipo_caso': 'REEMBOLSO', 'modelo_inicial': Config.MODELO_RAPIDO,
+        'escalado': True, 'score_inicial': 40.0, 'dia': dia
+    }
+    caminho.write_text(''.join(json.dumps(registro) + '\n' for _ in range(quantidade)), encoding='utf-8')
+    return caminho
+
+
+def _roteador(caminho_log) -> RoteadorModelos:
+    return RoteadorModelos(_GeradorInerte(), validador=object(), caminho_log=caminho_log)
+
+
+def test_caso_rotineiro_vai_para_o_modelo_rapido(tmp_path):
+    decisao = _roteador(tmp_path / 'log.jsonl').decidir(dict(DADOS_PETICAO, pedidos=['a', 'b']), max_tokens=16000)
+    
+    assert decisao.rapido
+    assert decisao.modelo == Config.MODELO_RAPIDO
+    assert decisao.max_tokens == Config.ROTEAMENTO_TOKENS_BASE + 2 * Config.ROTEAMENTO_TOKENS_POR_PEDIDO
+    assert decisao.motivos == ['caso rotineiro']
+
+
+def test_orcamento_do_modelo_rapido_respeita_o_teto(tmp_path):
+    assert _roteador(tmp_path / 'log.jsonl').decidir(dict(DADOS_PETICAO), max_tokens=2000).max_tokens == 2000
+
+
+@pytest.mark.parametrize('ajuste, motivo', [
+    ({'tipo_caso': 'FRAUDE'}, "tipo FRAUDE não rotineiro"),
+    ({'confianca': 0.5}, "confiança 50% < 85%"),
+    ({'pedidos': ['p'] * 5}, "5 pedidos > 4"),
+    ({'texto_completo': 'x' * 30001}, "petição com 30,001 caracteres"),
+])
+def test_caso_nao_rotineiro_vai_para_o_modelo_principal(tmp_path, ajuste, motivo):
+    decisao = _roteador(tmp_path / 'log.jsonl').decidir(dict(DADOS_PETICAO, **ajuste))
+    
+    assert not decisao.rapido
+    assert decisao.modelo == Config.CLAUDE_MODEL
+    assert decisao.motivos == [motivo]
+
+
+def test_roteamento_desativado(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'ROTEAMENTO_ATIVO', False)
+    
+    assert _roteador(tmp_path / 'log.jsonl').decidir(dict(DADOS_PETICAO)).motivos == ['roteamento desativado']
+
+
+def test_tipo_muito_escalado_usa_principal_com_sondagens(tmp_path):
+    roteador = _roteador(_log_escalados(tmp_path / 'log.jsonl', 6, date.today().isoformat()))
+    
+    decisoes = [roteador.decidir(dict(DADOS_PETICAO)) for _ in range(2 * Config.ROTEAMENTO_SONDAGEM_A_CADA)]
+    
+    sondagens = [d for d in decisoes if d.rapido]
+    assert len(sondagens) == 2
+    assert all(d.motivos[0].startswith('sondagem (100%') for d in sondagens)
+    assert all(d.modelo == Config.CLAUDE_MODEL for d in decisoes if not d.rapido)
+
+
+def test_escaladas_antigas_saem_da_janela(tmp_path):
+    antigo = (date.today() - timedelta(days=Config.ROTEAMENTO_HISTORICO_DIAS + 1)).isoformat()
+    roteador = _roteador(_log_escalados(tmp_path / 'log.jsonl', 6, antigo))
+    
+    assert roteador.historico('REEMBOLSO')['rascunhos'] == 0
+    assert roteador.decidir(dict(DADOS_PETICAO)).rapido
+
+
+def test_historico_lido_uma_vez_e_atualizado_em_memoria(tmp_path):
+    caminho = _log_escalados(tmp_path / 'log.jsonl', 6, date.today().isoformat())
+    roteador = _roteador(caminho)
+    assert roteador.historico('REEMBOLSO')['escalados'] == 6
+    
+    # Alterações externas ao arquivo não são relidas
+    caminho.write_text('', encoding='utf-8')
+    assert roteador.historico('REEMBOLSO')['escalados'] == 6
+
+
+def test_rascunho_bom_do_modelo_rapido(gerador_stub, livro, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'ROTEAMENTO_SCORE_MINIMO', 0)
+    roteador = RoteadorModelos(gerador_stub, caminho_log=tmp_path / 'roteamento.jsonl')
+    
+    resultado = roteador.gerar(dict(DADOS_PETICAO), CONTEXTO_RAG, usar_cache=False)
+    
+    assert resultado['sucesso']
+    assert resultado['metadados']['model'] == Config.MODELO_RAPIDO
+    registro = resultado['roteamento']
+    assert not registro['escalado']
+    assert registro['modelo_final'] == Config.MODELO_RAPIDO
+    
+    # Custo registrado no livro igual ao calculado pelo uso devolvido
+    entradas = list(livro.ler())
+    assert [e['model'] for e in entradas] == [Config.MODELO_RAPIDO]
+    assert entradas[0]['custo_usd']['total'] == pytest.approx(
+        calcular_custo(Config.MODELO_RAPIDO, resultado['metadados'])['total']
+    )
+    assert registro['custo_usd'] == pytest.approx(entradas[0]['custo_usd']['total'])
+    assert registro['economia_usd'] > 0
+    assert roteador.historico('REEMBOLSO') == {
+        'rascunhos': 1, 'escalados': 0, 'taxa_escalada': 0.0, 'score_medio': registro['score_inicial']
+    }
+
+
+def test_rascunho_fraco_escala_para_o_modelo_principal(gerador_stub, livro, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'ROTEAMENTO_SCORE_MINIMO', 101)
+    roteador = RoteadorModelos(gerador_stub, caminho_log=tmp_path / 'roteamento.jsonl')
+    
+    resultado = roteador.gerar(dict(DADOS_PETICAO), CONTEXTO_RAG, usar_cache=False)
+    
+    assert resultado['sucesso']
+    registro = resultado['roteamento']
+    assert registro['escalado']
+    assert registro['modelo_final'] == Config.CLAUDE_MODEL
+    
+    # Rascunho descartado e versão final cobrados, cada um pelo seu modelo
+    entradas = list(livro.ler())
+    assert [e['model'] for e in entradas] == [Config.MODELO_RAPIDO, Config.CLAUDE_MODEL]
+    assert resultado['custo_estimado'] == pytest.approx(sum(e['custo_usd']['total'] for e in entradas))
+    assert registro['economia_usd'] < 0
+    assert roteador.historico('REEMBOLSO')['escalados'] == 1
+    
+    linhas = (tmp_path / 'roteamento.jsonl').read_text(encoding='utf-8').splitlines()
+    assert json.loads(linhas[-1])['escalado']
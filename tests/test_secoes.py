@@ -0,0 +1,92 @@
+"""Divisão da contestação em seções e substituição de seções regeneradas"""
+
+from modules.secoes import (
+    Secao,
+    dividir_secoes,
+    juntar_secoes,
+    secoes_afetadas,
+    substituir_secao,
+    unir_partes
+)
+
+CONTESTACAO = (
+    "EXCELENTÍSSIMO SENHOR DOUTOR JUIZ DE DIREITO\n\n"
+    "## 1. IDENTIFICAÇÃO\n\nUNIMED FERJ, já qualificada, apresenta CONTESTAÇÃO.\n\n"
+    "## 2. PRELIMINAR DE ILEGITIMIDADE PASSIVA\n\nA ré não é parte legítima.\n\n"
+    "## 3. DO MÉRITO\n\n### 3.1. DOS FATOS\n\nO autor pediu reembolso.\n\n"
+    "### 3.2. DO DIREITO\n\nDos fatos impeditivos: art. 12 da Lei 9.656/98.\n\n"
+    "**Dos pedidos de dano moral**\n\nNão há dano moral.\n\n"
+    "## 4. DOS PEDIDOS\n\nImprocedência.\n\n"
+    "## 5. REQUERIMENTOS FINAIS\n\nProvas documentais.\n"
+)
+
+
+def test_divisao_sem_perdas_e_na_ordem_processual():
+    secoes = dividir_secoes(CONTESTACAO)
+    
+    assert [secao.chave for secao in secoes] == [
+        'identificacao', 'preliminares', 'fatos', 'direito', 'pedidos', 'requerimentos'
+    ]
+    assert juntar_secoes(secoes) == CONTESTACAO
+    assert secoes[1].titulo == "## 2. PRELIMINAR DE ILEGITIMIDADE PASSIVA"
+
+
+def test_subtitulos_nao_abrem_secao():
+    direito = {secao.chave: secao for secao in dividir_secoes(CONTESTACAO)}['direito']
+    
+    # "Dos pedidos de dano moral" é subtítulo do direito, não a seção de pedidos
+    assert "Dos pedidos de dano moral" in direito.texto
+    assert "Não há dano moral." in direito.texto
+
+
+def test_texto_sem_titulos_e_todo_identificacao():
+    texto = "Contestação sem estrutura alguma.\nSegunda linha.\n"
+    
+    assert dividir_secoes(texto) == [Secao('identificacao', texto)]
+
+
+def test_substituir_secao_mantem_titulo_e_espacamento():
+    secoes = dividir_secoes(CONTESTACAO)
+    pedidos = secoes[4]
+    
+    nova = substituir_secao(pedidos, "Improcedência total e condenação em honorários.")
+    
+    assert nova.chave == 'pedidos'
+    assert nova.texto == "## 4. DOS PEDIDOS\n\nImprocedência total e condenação em honorários.\n\n"
+    secoes[4] = nova
+    assert [secao.chave for secao in dividir_secoes(juntar_secoes(secoes))] == [secao.chave for secao in secoes]
+
+
+def test_substituir_secao_com_titulo_no_texto_novo():
+    pedidos = dividir_secoes(CONTESTACAO)[4]
+    
+    nova = substituir_secao(pedidos, "## 4. DOS PEDIDOS\n\nImprocedência.\n\n\n")
+    
+    assert nova.texto == "## 4. DOS PEDIDOS\n\nImprocedência.\n\n"
+
+
+def test_ultima_secao_recebe_espacamento_padrao():
+    requerimentos = Secao('requerimentos', "## 5. REQUERIMENTOS FINAIS\n\nProvas.")
+    
+    assert substituir_secao(requerimentos, "Perícia.").texto == "## 5. REQUERIMENTOS FINAIS\n\nPerícia.\n\n"
+
+
+def test_secoes_afetadas_por_ajuste():
+    assert secoes_afetadas("Incluir jurisprudência do STJ e súmula 608") == ['direito']
+    assert secoes_afetadas("Reforçar a preliminar e o pedido de honorários") == ['preliminares', 'pedidos']
+    assert secoes_afetadas("Melhorar o texto") == []
+
+
+def test_unir_partes_renumera_titulos():
+    partes = [
+        "## 1. IDENTIFICAÇÃO\n\nRé.",
+        "",
+        "## 3. DO MÉRITO\n\n### 3.2. DO DIREITO\n\nArt. 12.",
+        "## 5. DOS PEDIDOS\n\nImprocedência."
+    ]
+    
+    assert unir_partes(partes) == (
+        "## 1. IDENTIFICAÇÃO\n\nRé.\n\n"
+        "## 2. DO MÉRITO\n\n### 2.1. DO DIREITO\n\nArt. 12.\n\n"
+        "## 3. DOS PEDIDOS\n\nImprocedência.\n"
+    )
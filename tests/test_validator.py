@@ -0,0 +1,107 @@
+"""Validador: contagens lineares equivalentes às expressões regulares originais"""
+
+import random
+import re
+
+import pytest
+
+from config.settings import Config
+from modules.validator import ValidadorContestacao, _contar_citacoes, _minusculas_ignorecase
+
+# Padrões e cálculo do score anteriores aos scanners lineares
+_RE_CITACAO_ORIGINAL = re.compile(
+    r'(?:art\.|artigo)\s*\d+[º°]?(?:[-,]\s*§\s*\d+[º°]?)?.*?(?:Lei|CF|CDC)', re.IGNORECASE
+)
+_RE_JURISPRUDENCIA_ORIGINAL = re.compile(
+    r'(?:jurisprudência|precedente|acórdão|súmula|STJ|STF|TJRJ)', re.IGNORECASE
+)
+_CONECTIVOS = (
+    'portanto', 'assim', 'dessa forma', 'consequentemente',
+    'ademais', 'além disso', 'outrossim', 'por outro lado',
+    'em que pese', 'não obstante', 'contudo', 'todavia'
+)
+
+_TRECHOS = [
+    "art. 5º, § 2º da CF", "artigo 51 do CDC", "Art. 12 da Lei 9.656/98", "art. 35-C",
+    "ART. 14, §3° do cdc", "artigo 186 do Código Civil", "art.7 lei", "art. 10\nda Lei",
+    "Súmula 608 do STJ", "jurisprudência do TJRJ", "precedente do STF", "acórdão",
+    "portanto", "ademais", "por outro lado", "contudo", "Assim", "cf.", "cdc",
+    "DOS FATOS", "DO DIREITO", "DOS PEDIDOS", "PRELIMINAR", "\n", "\n\n", " ", ", ",
+    "İSTANBUL art. 3 lei", "ſúmula", "artigo 9ı", "Artıgo 4 CF", "texto qualquer."
+]
+
+
+def _metricas_originais(contestacao: str) -> dict:
+    """Métricas de ValidadorContestacao.validar antes dos scanners lineares"""
+    presentes = sum(
+        1 for secao in Config.SECOES_OBRIGATORIAS
+        if re.search(secao.replace(' ', r'\s+'), contestacao, re.IGNORECASE)
+    )
+    completude = presentes / len(Config.SECOES_OBRIGATORIAS)
+    citacoes = len(_RE_CITACAO_ORIGINAL.findall(contestacao))
+    jurisprudencia = len(_RE_JURISPRUDENCIA_ORIGINAL.findall(contestacao))
+    conectivos = sum(1 for c in _CONECTIVOS if c in contestacao.lower())
+    tokens = contestacao.split()
+    
+    score = 0
+    score += min(completude * 40, 40)
+    score += min((citacoes / 5) * 30, 30)
+    score += min((jurisprudencia / 3) * 15, 15)
+    score += min((conectivos / 5) * 15, 15)
+    
+    return {
+        'completude_estrutural': completude,
+        'citacoes_legais': citacoes,
+        'mencoes_jurisprudencia': jurisprudencia,
+        'densidade_fundamentacao': citacoes / len(tokens) if tokens else 0,
+        'conectivos_argumentativos': conectivos,
+        'score_qualidade': round(score, 1)
+    }
+
+
+def _textos_aleatorios(quantidade: int, semente: int = 7):
+    rng = random.Random(semente)
+    for _ in range(quantidade):
+        yield ''.join(rng.choice(_TRECHOS) + rng.choice(['', ' ', '\n']) for _ in range(rng.randint(0, 40)))
+
+
+@pytest.mark.parametrize('texto', [
+    "",
+    "art. 5º da CF e art. 6º do CDC",
+    "art. 5º\nda CF",
+    "art. 1 art. 2 art. 3 Lei",
+    "artigo 12, § 1º, da Lei 9.656/98; art. 35-C da lei",
+    "ART. 51 DO CDC; artigo 6º, VIII, do cdc\nartigo 7 sem término",
+    "Artıgo 4 da CF e İSTANBUL art. 3 lei",
+])
+def test_contar_citacoes_como_findall_original(texto):
+    normalizado = _minusculas_ignorecase(texto, texto.lower())
+    
+    assert _contar_citacoes(normalizado) == len(_RE_CITACAO_ORIGINAL.findall(texto))
+
+
+def test_contar_citacoes_em_textos_aleatorios():
+    for texto in _textos_aleatorios(500):
+        normalizado = _minusculas_ignorecase(texto, texto.lower())
+        assert _contar_citacoes(normalizado) == len(_RE_CITACAO_ORIGINAL.findall(texto)), texto
+
+
+def test_scores_iguais_aos_originais():
+    validador = ValidadorContestacao()
+    
+    for texto in _textos_aleatorios(300, semente=11):
+        metricas = validador.validar(texto)['metricas']
+        originais = _metricas_originais(texto)
+        assert {chave: metricas[chave] for chave in originais} == originais, texto
+
+
+def test_validacao_incremental_igual_a_completa():
+    validador = ValidadorContestacao()
+    
+    for texto in _textos_aleatorios(50, semente=3):
+        incremental = validador.iniciar_incremental()
+        for inicio in range(0, len(texto), 7):
+            incremental.consumir(texto[inicio:inicio + 7])
+        
+        assert incremental.finalizar()['metricas']['score_qualidade'] == \
+            validador.validar(texto)['metricas']['score_qualidade'], texto